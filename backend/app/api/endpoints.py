@@ -1,26 +1,58 @@
-from fastapi import APIRouter, Depends, HTTPException, Body
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, HTTPException, Body, Header, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ConfigDict
 from typing import List, Optional, Dict, Any
+import asyncio
 import json
 import os
+import secrets
+import time
 from datetime import datetime
 
-from backend.app.dependencies import get_chat_controller
-from backend.app.services.chat_controller import ChatController
+from backend.app.core.config import MARKET_BATCH_LIMIT, DECK_MAX_LINES, ADMIN_TOKEN
+from backend.app.dependencies import get_chat_controller, get_session_store, get_market_service, get_deck_analyzer, get_rag_service
+from backend.app.services.deck import DeckAnalyzer
+from backend.app.services.market import MarketIntelligenceService, batch_records
+from backend.app.services.rag import RAGService
+from backend.app.services.session_store import new_session_id, new_session_state, append_turn
+from backend.app.services.chat_controller import AsyncChatController
 
 router = APIRouter()
 
 # --- Request/Response Models ---
+class CardVersion(BaseModel):
+    # What the versions menu and report read; the other Scryfall fields pass through
+    model_config = ConfigDict(extra="allow")
+    id: str
+    name: str
+    set_name: str
+    set: str
+    rarity: str
+    prices: Dict[str, Optional[str]] = {}
+
+class ClientContext(BaseModel):
+    # The card context a client may seed a new session with. Anything else, notably the
+    # server-side "artifacts" (memoized card data, summaries), is dropped.
+    cards: List[str] = []
+    intent: Optional[str] = None
+    active_versions: List[CardVersion] = []
+    ct_prices: Dict[str, str] = {}
+
 class ChatRequest(BaseModel):
     query: str
+    # With a session_id the server keeps history and card context; history/context
+    # only seed a new (or expired) session.
+    session_id: Optional[str] = None
     history: List[str] = []
     smart_mode: bool = False
-    context: Optional[Dict[str, Any]] = None
+    context: Optional[ClientContext] = None
 
 class ChatResponse(BaseModel):
     response: str
     intent: str
     context: Dict[str, Any]
+    cached: bool = False  # True when the answer was served from the semantic answer cache
+    session_id: Optional[str] = None
 
 class FeedbackRequest(BaseModel):
     query: str
@@ -34,25 +66,157 @@ class ReportRequest(BaseModel):
     comment: str
     model: str
 
+class MarketBatchRequest(BaseModel):
+    # Scryfall print ids, card names, or {"id"/"name", "cm"} objects
+    cards: List[Any]
+    include_cardtrader: bool = True
+
+class DeckRequest(BaseModel):
+    decklist: str  # MTGO or Arena export
+    formats: Optional[List[str]] = None  # default: every supported format
+
 # --- Endpoints ---
 
+def _load_session(request: ChatRequest, store):
+    """
+    Returns (session_id, state) for the request. Ids are only ever issued by the server:
+    an unknown or expired session_id starts a new session under a fresh id.
+    """
+    state = store.get(request.session_id) if request.session_id else None
+    if state is None:
+        context = request.context.model_dump(exclude_unset=True) if request.context else None
+        return new_session_id(), new_session_state(request.history, context)
+    return request.session_id, state
+
+def _save_session(store, session_id, state, query, result):
+    """Stores the turn; returns the request's stage timings, which are not kept with the session."""
+    timings = result["context"].pop("timings", None) or {}
+    result["context"].pop("session_id", None)
+    state["context"] = result["context"]
+    append_turn(state, query, result["response"])
+    store.save(session_id, state)
+    return timings
+
+def _server_timing(timings, total):
+    """Server-Timing header value, e.g. 'classify;dur=120.4, llm;dur=310.2, total;dur=450.9'."""
+    return ", ".join(f"{stage};dur={ms:.1f}" for stage, ms in [*timings.items(), ("total", total * 1000)])
+
+def _public_context(context):
+    """The memoized pipeline artifacts stay server-side with the session."""
+    return {k: v for k, v in context.items() if k != "artifacts"}
+
 @router.post("/chat", response_model=ChatResponse)
-async def chat_endpoint(request: ChatRequest, controller: ChatController = Depends(get_chat_controller)):
+async def chat_endpoint(request: ChatRequest, response: Response, controller: AsyncChatController = Depends(get_chat_controller),
+                        sessions = Depends(get_session_store)):
     """
     Main chat endpoint.
     Use 'smart_mode=True' to enable the 70B model.
+    Pass back the returned 'session_id' instead of re-sending history and context.
+    Per-stage durations (classify, extract, retrieve, card_data, llm, ...) come back in Server-Timing.
     """
+    start = time.perf_counter()
     try:
-        result = controller.process_message(
+        # Store calls run on worker threads: SQLiteSessionStore reads and writes block
+        session_id, state = await asyncio.to_thread(_load_session, request, sessions)
+        result = await controller.process_message(
             request.query, 
-            request.history, 
+            state["history"], 
             smart_mode=request.smart_mode,
-            context=request.context
+            context=state["context"],
+            session_id=session_id
         )
-        return ChatResponse(**result)
+        timings = await asyncio.to_thread(_save_session, sessions, session_id, state, request.query, result)
+        response.headers["Server-Timing"] = _server_timing(timings, time.perf_counter() - start)
+        return ChatResponse(**{**result, "context": _public_context(result["context"])}, session_id=session_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest, controller: AsyncChatController = Depends(get_chat_controller),
+                               sessions = Depends(get_session_store)):
+    """
+    Streaming chat endpoint (Server-Sent Events).
+    Emits a 'meta' event (intent, card image, session id), then 'token' events, then 'done'.
+    """
+    async def event_source():
+        try:
+            # Inside the stream so store failures reach the client as an 'error' event
+            session_id, state = await asyncio.to_thread(_load_session, request, sessions)
+            async for event in controller.process_message_stream(
+                request.query,
+                state["history"],
+                smart_mode=request.smart_mode,
+                context=state["context"],
+                session_id=session_id
+            ):
+                if event["event"] in ("meta", "done"):
+                    event["session_id"] = session_id
+                if event["event"] == "done":
+                    await asyncio.to_thread(_save_session, sessions, session_id, state, request.query, event)
+                    event = {**event, "context": _public_context(event["context"])}
+                yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'event': 'error', 'detail': str(e)})}\n\n"
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/market/batch")
+async def market_batch_endpoint(request: MarketBatchRequest, market: MarketIntelligenceService = Depends(get_market_service)):
+    """
+    Arbitrage spreads, ratings and 7/30/90-day price stats for a watchlist.
+    Missing prices come back as null.
+    """
+    if len(request.cards) > MARKET_BATCH_LIMIT:
+        raise HTTPException(status_code=413, detail=f"At most {MARKET_BATCH_LIMIT} cards per request.")
+    resolved = market.resolve_prints(request.cards)
+    idx = resolved[0]
+    if request.include_cardtrader:
+        ids = [market.history.ids[i] if i >= 0 else None for i in idx]
+        ct_prices = await market.ct_service.get_nm_prices(ids)
+    else:
+        ct_prices = [float("nan")] * len(request.cards)
+    columns = market.analyze_batch(request.cards, ct_prices=ct_prices, resolved=resolved)
+    return {"cards": batch_records(columns)}
+
+@router.post("/deck/analyze")
+def deck_analyze_endpoint(request: DeckRequest, analyzer: DeckAnalyzer = Depends(get_deck_analyzer)):
+    """
+    Legality per format and price totals for a whole decklist, from local card data (no LLM).
+    Plain 'def': FastAPI runs it in its threadpool, so the CPU work never blocks the event loop.
+    """
+    if request.decklist.count("\n") >= DECK_MAX_LINES:
+        raise HTTPException(status_code=413, detail=f"At most {DECK_MAX_LINES} decklist lines.")
+    return analyzer.analyze(request.decklist, request.formats)
+
+def _check_admin(token):
+    # Denied unless ADMIN_TOKEN is configured and matches: an unset token never opens the routes
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin routes are disabled (ADMIN_TOKEN is not set).")
+    if not secrets.compare_digest(token or "", ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token.")
+
+@router.get("/admin/index")
+def index_status_endpoint(rag: RAGService = Depends(get_rag_service), x_admin_token: Optional[str] = Header(None)):
+    """
+    Active rules index version, retained versions and the state of any background load.
+    """
+    _check_admin(x_admin_token)
+    return rag.status()
+
+@router.post("/admin/index/reload")
+def index_reload_endpoint(rag: RAGService = Depends(get_rag_service), x_admin_token: Optional[str] = Header(None)):
+    """
+    Checks the index manifest now instead of waiting for the watcher. The new version is
+    loaded and warmed in the background; requests keep using the current one meanwhile.
+    """
+    _check_admin(x_admin_token)
+    loading = rag.check_for_update()
+    return {"loading": loading or rag.status()["loading"], "active": rag.index_version}
+
 @router.post("/feedback")
 async def feedback_endpoint(feedback: FeedbackRequest):
     """
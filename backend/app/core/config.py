@@ -5,22 +5,124 @@ import os
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 DATA_DIR = os.path.join(BASE_DIR, "data")
 RULEBOOK_PATH = os.path.join(DATA_DIR, "MagicCompRules.txt")
-INDEX_PATH = os.path.join(DATA_DIR, "rulebook_index.pkl")
+INDEX_PATH = os.path.join(DATA_DIR, "rulebook_index.pkl")  # legacy single index (used when there is no manifest)
+INDEX_DIR = os.path.join(DATA_DIR, "indexes")  # one rulebook_<version>.pkl per index version
+INDEX_MANIFEST_PATH = os.path.join(DATA_DIR, "index_manifest.json")
+INDEX_RETAIN = 2             # loaded versions kept for in-flight requests (active included)
+INDEX_WATCH_INTERVAL = 30    # seconds between manifest checks
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")  # /api/admin/* requires it in X-Admin-Token (disabled when unset)
 BR_FILE = os.path.join(DATA_DIR, "banned_restricted.json")
+BR_META_FILE = os.path.join(DATA_DIR, "banned_restricted.meta.json")  # ETag / hashes of the last sync
+INTERACTIONS_LOG = os.path.join("logs", "interactions.jsonl")
+SETUP_STATE_PATH = os.path.join(DATA_DIR, "setup_state.json")  # input hashes of completed data setup stages
+REPLAY_DIR = os.path.join(DATA_DIR, "replays")  # recorded sessions (cassette + conversations) for src.replay
+REPLAY_CONVERSATION_GAP = 600  # seconds between logged queries that start a new conversation
+BENCH_BASELINE_PATH = os.path.join(BASE_DIR, "benchmarks", "baseline.json")  # src.bench reference timings
+BENCH_TOLERANCE = 0.25  # a hot path slower than baseline * (1 + tolerance) fails `make bench`
 
 # API Configuration
 SERVICE_NAME = "mtg_rulebook_ai"
 USERNAME = "groq_api_key"
-RULES_DOWNLOAD_URL = "https://media.wizards.com/2025/downloads/MagicCompRules%2020251114.txt"
-SCRYFALL_NAMED_URL = "https://api.scryfall.com/cards/named"
-SCRYFALL_SEARCH_URL = "https://api.scryfall.com/cards/search"
-BR_URL = "https://magic.wizards.com/en/banned-restricted-list"
+# External endpoints can be pointed elsewhere through the environment, e.g. at the local
+# stand-ins (python -m fake_services prints the matching exports)
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL")  # None: the Groq SDK default
+RULES_DOWNLOAD_URL = os.getenv("RULES_DOWNLOAD_URL", "https://media.wizards.com/2025/downloads/MagicCompRules%2020251114.txt")
+SCRYFALL_API_URL = os.getenv("SCRYFALL_API_URL", "https://api.scryfall.com")
+SCRYFALL_NAMED_URL = f"{SCRYFALL_API_URL}/cards/named"
+SCRYFALL_SEARCH_URL = f"{SCRYFALL_API_URL}/cards/search"
+SCRYFALL_BULK_URL = f"{SCRYFALL_API_URL}/bulk-data"
+BR_URL = os.getenv("BR_URL", "https://magic.wizards.com/en/banned-restricted-list")
+CARDTRADER_API_URL = os.getenv("CARDTRADER_API_URL", "https://api.cardtrader.com/api/v2")
+HTTP_TIMEOUT = 10  # seconds, for Scryfall and CardTrader calls
 
 # Model Configuration
 SMART_MODEL = "llama-3.3-70b-versatile"
 NORMAL_MODEL = "llama-3.1-8b-instant"
 TOP_K_CHUNKS = 10
 
+# Groq quota per model (requests and tokens per minute), enforced by RateLimitScheduler
+GROQ_RATE_LIMITS = {
+    NORMAL_MODEL: {"rpm": 30, "tpm": 6000},
+    SMART_MODEL: {"rpm": 30, "tpm": 12000},
+}
+# Longest a call may wait in the scheduler queue before it is rejected, by priority
+# (0 = interactive chat, 1 = 8B->70B escalation, 2 = background jobs)
+SCHEDULER_MAX_WAIT = {0: 15, 1: 10, 2: 120}
+
+# 8B -> 70B escalation ("stream": abandon a malformed 8B answer while it streams,
+# "hedge": also start 70B if 8B has no valid answer after HEDGE_AFTER_SECONDS)
+ESCALATION_MODE = "stream"
+HEDGE_AFTER_SECONDS = 4.0
+# Max characters allowed before each judge section header must appear
+# (CARD INFO from the start, then each one after the previous header)
+FORMAT_SECTION_BUDGETS = [300, 600, 1500, 3000]
+# Router trained from the interactions log (scripts/train_escalation_predictor.py)
+ESCALATION_PREDICTOR_PATH = os.path.join(DATA_DIR, "escalation_predictor.json")
+ESCALATION_PREDICTOR_THRESHOLD = 0.5
+ESCALATION_PREDICTOR_MIN_SAMPLES = 100  # logged 8B answers carrying features before a router is trained
+ENCODER_WORKERS = 2  # threads dedicated to sentence-embedding work in the async API
+
+# Answer Cache (semantic reuse of rules answers)
+ANSWER_CACHE_SIZE = 512
+ANSWER_CACHE_TTL = 7 * 24 * 3600  # seconds
+ANSWER_CACHE_THRESHOLD = 0.92     # cosine similarity between questions
+
+# API conversation sessions ("memory" per process, or "sqlite" shared by workers on one host)
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")
+SESSION_DB_PATH = os.path.join(DATA_DIR, "sessions.db")
+SESSION_CACHE_SIZE = 1000
+SESSION_TTL = 24 * 3600  # seconds since the last message
+SESSION_HISTORY_LIMIT = 8  # history entries (user + judge) kept per session
+
+# History compaction for multi-turn rules prompts
+HISTORY_VERBATIM_TURNS = 2  # most recent exchanges sent in full
+HISTORY_TOKEN_BUDGET = {NORMAL_MODEL: 1000, SMART_MODEL: 2500}  # tokens of history per prompt
+HISTORY_SUMMARY_CHARS = 300
+HISTORY_SUMMARY_CACHE_SIZE = 2048
+
+# Per-session memo of pipeline artifacts (resolved cards, card blocks, chunk ids)
+ARTIFACT_MAX_QUERIES = 16
+ARTIFACT_MAX_CARD_SETS = 8
+
+# Deterministic answers for lookup/meta/off_topic/clarify and version-menu selections.
+# Set to False to have the LLM generate them (previous behaviour).
+FAST_PATHS = True
+PERSONA_POOL_PATH = os.path.join(DATA_DIR, "persona_pool.json")
+
+# CardTrader prices for the versions menu
+CT_PRICE_DEADLINE = 2.0      # seconds the menu waits; slower lookups show "N/A" and finish in the background
+CT_PREFETCH_LIMIT = 60       # listed versions whose price is fetched
+CT_PRICE_TTL = 600           # seconds a fetched price is reused
+CT_PRICE_CACHE_SIZE = 2048
+CT_PRICE_WORKERS = 8         # concurrent menu price lookups (threads for the blocking controller)
+
+# CardTrader Blueprint Index (scryfall_id -> blueprint ids, from the per-expansion exports)
+CARDTRADER_GAME_ID = 1  # Magic: The Gathering
+CARDTRADER_INDEX_PATH = os.path.join(DATA_DIR, "cardtrader_blueprints.json")
+CARDTRADER_INDEX_MAX_AGE = 24 * 3600  # seconds before the index is rebuilt
+
+# Price History (daily Scryfall bulk snapshots, one append-only float32 column file per price field)
+PRICE_HISTORY_DIR = os.path.join(DATA_DIR, "price_history")
+SCRYFALL_BULK_PATH = os.path.join(DATA_DIR, "scryfall_default_cards.json")
+MARKET_FORMATS = ["standard", "pioneer", "modern", "legacy", "vintage", "pauper", "commander"]
+PRICE_HISTORY_POLL = 300  # seconds between checks for a new snapshot (API / CLI processes)
+
+# Market Movers (precomputed from the price history after each snapshot)
+MOVERS_LOOKBACK_DAYS = 7
+MOVERS_TOP_K = 10
+MOVERS_MIN_PRICE = {"all": 2.0, "standard": 1.0, "pioneer": 1.0, "modern": 2.0, "legacy": 5.0,
+                    "vintage": 10.0, "pauper": 0.25, "commander": 2.0}  # EUR, on either end of the move
+MOVERS_LIQUIDITY_DAYS = 30
+MOVERS_MIN_LIQUIDITY = 0.8  # share of those snapshot days with a listed price
+ARBITRAGE_HIGH_PCT = 15     # CardTrader vs Cardmarket spread (%) rated "High"
+MARKET_BATCH_LIMIT = 5000   # cards per /api/market/batch request
+
+# Deck Analysis (local card catalog built from the Scryfall bulk export)
+CARD_CATALOG_PATH = os.path.join(DATA_DIR, "card_catalog.json")
+DECK_FORMATS = list(MARKET_FORMATS)
+DECK_MAX_LINES = 400  # decklist lines accepted by /api/deck/analyze
+LEGALITY_WATCH_INTERVAL = 60  # seconds between checks for a new banned_restricted.json
+
 # AI Prompts
 PROMPT_INTENT = """Analyze the query and classify into: rules, versions, market, meta, off_topic, or clarify.
 
@@ -2,13 +2,18 @@ from functools import lru_cache
 import os
 from dotenv import load_dotenv
 
-from backend.app.services.chat_controller import ChatController
-from backend.app.services.llm import LLMService
+from backend.app.services.chat_controller import AsyncChatController
+from backend.app.services.llm import AsyncLLMService
 from backend.app.services.rag import RAGService
-from backend.app.services.scryfall import CardService
+from backend.app.services.scryfall import AsyncCardService
 from backend.app.services.legality import LegalityService
-from backend.app.services.cardtrader import CardTraderService
+from backend.app.services.cardtrader import AsyncCardTraderService
 from backend.app.services.market import MarketIntelligenceService
+from backend.app.services.answer_cache import AnswerCache
+from backend.app.services.scheduler import RateLimitScheduler
+from backend.app.services.session_store import create_session_store
+from backend.app.services.card_catalog import CardCatalog
+from backend.app.services.deck import DeckAnalyzer
 import keyring
 
 load_dotenv()
@@ -19,19 +24,67 @@ from backend.app.core.config import SERVICE_NAME, USERNAME
 def get_chat_controller():
     # Retrieve Keys
     groq_api_key = os.getenv("GROQ_API_KEY") or keyring.get_password(SERVICE_NAME, USERNAME)
-    cardtrader_token = os.getenv("CARDTRADER_TOKEN") or keyring.get_password(SERVICE_NAME, "cardtrader_api_key")
 
     if not groq_api_key:
         raise ValueError("GROQ_API_KEY not found in environment or keyring.")
 
-    # Initialize Services
-    llm = LLMService(groq_api_key)
-    rag = RAGService()
-    cards = CardService()
-    legality = LegalityService()
+    # Initialize Services (async variants: the API must never block its event loop)
+    llm = AsyncLLMService(groq_api_key, scheduler=RateLimitScheduler())
+    rag = get_rag_service()
+    cards = AsyncCardService()
+    legality = get_legality_service()
     # Market
-    cardtrader = CardTraderService()
+    market = get_market_service()
+    cardtrader = market.ct_service
+    # Answer cache, warmed with gold answers from previous sessions
+    answer_cache = AnswerCache(rag.encode)
+    seeded = answer_cache.seed_from_log(rag.index_version)
+    print(f"♻️ Answer cache seeded with {seeded} gold answers.")
+    # Answers built on a replaced rules index are never served again
+    rag.on_swap(lambda old, new: answer_cache.invalidate(old))
+
+    # Prices that miss the versions-menu deadline are written into the session when they land
+    return AsyncChatController(llm, rag, cards, legality, cardtrader, market, answer_cache=answer_cache,
+                               session_store=get_session_store())
+
+
+@lru_cache()
+def get_rag_service():
+    rag = RAGService()
+    rag.start_watch()  # new index versions are loaded, warmed and swapped in the background
+    return rag
+
+
+@lru_cache()
+def get_market_service():
+    """CardTrader client and market intelligence, shared by the chat controller and /api/market."""
+    cardtrader_token = os.getenv("CARDTRADER_TOKEN") or keyring.get_password(SERVICE_NAME, "cardtrader_api_key")
+    cardtrader = AsyncCardTraderService(api_key=cardtrader_token)
+    cardtrader.start_index_refresh()  # scryfall_id -> blueprint index, rebuilt daily in the background
     # Stocks removed
     market = MarketIntelligenceService(cardtrader)
+    market.start_history_watch()  # movers are recomputed when a new price snapshot lands
+    return market
 
-    return ChatController(llm, rag, cards, legality, cardtrader, market)
+
+@lru_cache()
+def get_card_catalog():
+    return CardCatalog()
+
+
+@lru_cache()
+def get_legality_service():
+    legality = LegalityService(get_card_catalog())
+    legality.start_watch()  # ban updates are swapped in without a restart
+    return legality
+
+
+@lru_cache()
+def get_deck_analyzer():
+    """Decklist checks use local data only: no Groq key needed."""
+    return DeckAnalyzer(get_card_catalog(), get_legality_service(), get_market_service())
+
+
+@lru_cache()
+def get_session_store():
+    return create_session_store()
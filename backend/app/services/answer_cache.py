@@ -0,0 +1,147 @@
+import json
+import os
+import re
+import time
+import threading
+from collections import OrderedDict
+import numpy as np
+from backend.app.core.config import (
+    ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL, ANSWER_CACHE_THRESHOLD, INTERACTIONS_LOG
+)
+
+CARD_INFO_PATTERN = re.compile(r'CARD INFO\W*:?\**\s*([^|\n]+)\|', re.IGNORECASE)
+
+
+def normalize_card_set(card_names):
+    """Order- and case-insensitive key for a resolved set of card names."""
+    return tuple(sorted({n.strip().lower() for n in (card_names or []) if n and n.strip()}))
+
+
+class AnswerCache:
+    """Semantic cache of judge answers.
+
+    Entries are bucketed by (card set, model tier, index version) and a lookup only
+    considers its own bucket, so a paraphrased question about the same cards can reuse
+    an answer while a question about different cards (or a new rulebook) never does.
+    """
+
+    def __init__(self, encoder, max_size=ANSWER_CACHE_SIZE, ttl=ANSWER_CACHE_TTL, threshold=ANSWER_CACHE_THRESHOLD):
+        self.encoder = encoder
+        self.max_size = max_size
+        self.ttl = ttl
+        self.threshold = threshold
+        self._entries = OrderedDict()  # entry_id -> entry (LRU order, oldest first)
+        self._buckets = {}             # bucket key -> [entry_id, ...]
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _embed(self, text):
+        return self._normalize(self.encoder([text])[0])
+
+    @staticmethod
+    def _normalize(vec):
+        vec = np.asarray(vec, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    @staticmethod
+    def _bucket_key(card_names, model, index_version):
+        return (normalize_card_set(card_names), model, index_version)
+
+    def lookup(self, query, card_names, model, index_version, embedding=None):
+        """Returns the best cached entry above the similarity threshold, or None."""
+        key = self._bucket_key(card_names, model, index_version)
+        with self._lock:
+            if not self._buckets.get(key):
+                self.misses += 1
+                return None
+        # Callers on an event loop pass a precomputed embedding to keep encoding off the loop
+        embedding = self._embed(query) if embedding is None else self._normalize(embedding)
+
+        with self._lock:
+            self._evict_expired()
+            ids = self._buckets.get(key, [])
+            if not ids:
+                self.misses += 1
+                return None
+            matrix = np.stack([self._entries[i]["embedding"] for i in ids])
+            scores = matrix @ embedding
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+            entry_id = ids[best]
+            self._entries.move_to_end(entry_id)
+            self.hits += 1
+            entry = self._entries[entry_id]
+            return {"answer": entry["answer"], "image_md": entry["image_md"], "query": entry["query"], "score": float(scores[best])}
+
+    def store(self, query, answer, card_names, model, index_version, image_md="", embedding=None, timestamp=None):
+        """Adds an answer to the cache, evicting the least recently used entry when full."""
+        # Callers on an event loop pass a precomputed embedding to keep encoding off the loop
+        embedding = self._embed(query) if embedding is None else self._normalize(embedding)
+        key = self._bucket_key(card_names, model, index_version)
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = {
+                "key": key,
+                "query": query,
+                "answer": answer,
+                "image_md": image_md,
+                "embedding": embedding,
+                "created": time.time() if timestamp is None else timestamp,
+            }
+            self._buckets.setdefault(key, []).append(entry_id)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, index_version=None):
+        """Drops every entry (or only those built against a given index version)."""
+        with self._lock:
+            for entry_id in list(self._entries):
+                if index_version is None or self._entries[entry_id]["key"][2] == index_version:
+                    self._remove(entry_id)
+
+    def _remove(self, entry_id):
+        entry = self._entries.pop(entry_id)
+        bucket = self._buckets.get(entry["key"], [])
+        bucket.remove(entry_id)
+        if not bucket:
+            self._buckets.pop(entry["key"], None)
+
+    def _evict_expired(self):
+        if not self.ttl:
+            return
+        cutoff = time.time() - self.ttl
+        # Entries are not strictly ordered by age once LRU reorders them, so scan all.
+        for entry_id in [i for i, e in self._entries.items() if e["created"] < cutoff]:
+            self._remove(entry_id)
+
+    def seed_from_log(self, index_version, log_path=INTERACTIONS_LOG):
+        """Pre-loads 'gold' (70B) answers from the interaction log. Returns the number seeded."""
+        if not os.path.exists(log_path):
+            return 0
+        seeded = 0
+        with open(log_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if not entry.get("is_gold"):
+                    continue
+                # Entries logged before versioning are assumed to match the current index.
+                if entry.get("index_version", index_version) != index_version:
+                    continue
+                cards = entry.get("cards") or CARD_INFO_PATTERN.findall(entry.get("response", ""))
+                if not cards:
+                    continue
+                self.store(entry["query"], entry["response"], cards, entry["model"], index_version)
+                seeded += 1
+        return seeded
@@ -0,0 +1,90 @@
+import json
+import os
+import re
+import unicodedata
+from backend.app.core.config import CARD_CATALOG_PATH
+
+QUOTES = str.maketrans({"’": "'", "‘": "'", "“": '"', "”": '"'})
+ANY_NUMBER = "a deck can have any number of cards named"
+
+
+def normalize_card_name(name):
+    """Lookup key for card names: case, accents, curly quotes and split-card separators don't matter."""
+    name = unicodedata.normalize("NFKD", (name or "").translate(QUOTES)).encode("ascii", "ignore").decode()
+    name = re.sub(r"\s*/{1,2}\s*", " // ", name)
+    return " ".join(name.lower().split())
+
+
+def _entry(card):
+    faces = card.get("card_faces") or []
+    oracle = card.get("oracle_text") or " ".join(f.get("oracle_text", "") for f in faces)
+    type_line = card.get("type_line") or (faces[0].get("type_line", "") if faces else "")
+    return {
+        "name": card["name"],
+        "type_line": type_line,
+        "mana_value": card.get("cmc", 0),
+        "legalities": card.get("legalities", {}),
+        # Basic lands, Relentless Rats & co. ignore the copy limit
+        "unlimited": type_line.startswith("Basic") or ANY_NUMBER in oracle.lower(),
+    }
+
+
+class CardCatalog:
+    """
+    Compact local card data (one entry per Oracle card: name, type line, mana value,
+    Scryfall format legalities), keyed by normalize_card_name of both the full name
+    and, for split/double-faced cards, the front face. Built from the Scryfall bulk
+    export, so batch lookups (decklists) never call Scryfall.
+    """
+
+    def __init__(self, path=CARD_CATALOG_PATH):
+        self.path = path
+        self.cards = {}
+        self.keys = {}
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self._index(json.load(f))
+
+    def __len__(self):
+        return len(self.cards)
+
+    def _index(self, cards):
+        self.cards = cards
+        self.keys = {key: key for key in cards}
+        for key, card in cards.items():
+            front = normalize_card_name(card["name"].split(" // ")[0])
+            self.keys.setdefault(front, key)
+
+    def get(self, name):
+        key = self.keys.get(normalize_card_name(name))
+        return self.cards[key] if key else None
+
+    def get_many(self, names):
+        """Catalog entries for many names (None when unknown)."""
+        return [self.get(name) for name in names]
+
+    def build_from_bulk(self, bulk_path):
+        """Rebuilds the catalog from a Scryfall bulk file (see CardService.download_bulk_data). Returns the card count."""
+        with open(bulk_path, "r", encoding="utf-8") as f:
+            return self.build_from_cards(json.load(f))
+
+    def build_from_cards(self, bulk):
+        """Rebuilds the catalog from already parsed Scryfall card objects. Returns the card count."""
+        cards = {}
+        for card in bulk:
+            if not card.get("name") or card.get("layout") in ("token", "double_faced_token", "emblem", "art_series"):
+                continue
+            key = normalize_card_name(card["name"])
+            # Paper prints win over digital-only ones (Alchemy rebalances etc.)
+            if key not in cards or (cards[key]["digital"] and not card.get("digital")):
+                cards[key] = {**_entry(card), "digital": bool(card.get("digital"))}
+        self._index(cards)
+        if self.path:
+            folder = os.path.dirname(self.path)
+            if folder:  # "" for a bare file name in the working directory
+                os.makedirs(folder, exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(cards, f)
+            os.replace(tmp, self.path)
+        return len(cards)
@@ -1,36 +1,249 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import requests
+import httpx
 import keyring
-from backend.app.core.config import SERVICE_NAME
+import numpy as np
+from backend.app.core.config import (
+    SERVICE_NAME, CARDTRADER_API_URL, HTTP_TIMEOUT, CARDTRADER_GAME_ID, CARDTRADER_INDEX_PATH,
+    CARDTRADER_INDEX_MAX_AGE, CT_PRICE_TTL, CT_PRICE_CACHE_SIZE, CT_PRICE_WORKERS
+)
+
+
+def format_price(cents):
+    return f"{cents / 100:.2f}€" if cents is not None else "N/A"
+
+
+class BlueprintIndex:
+    """
+    Local scryfall_id -> [CardTrader blueprint ids] map, built from the per-expansion
+    bulk exports (/blueprints/export?expansion_id=...) and persisted as JSON, so a
+    price lookup never has to search CardTrader for the print first.
+    """
+
+    def __init__(self, path=CARDTRADER_INDEX_PATH, max_age=CARDTRADER_INDEX_MAX_AGE):
+        self.path = path
+        self.max_age = max_age
+        self.blueprints = {}
+        self.built_at = 0.0
+        self.load()
+
+    def __len__(self):
+        return len(self.blueprints)
+
+    def get(self, scryfall_id):
+        return self.blueprints.get(scryfall_id, [])
+
+    def is_stale(self):
+        return time.time() - self.built_at > self.max_age
+
+    def load(self):
+        if self.path and os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.blueprints = data.get("blueprints", {})
+            self.built_at = data.get("built_at", 0.0)
+
+    def replace(self, exports):
+        """Rebuilds the map from blueprint exports and persists it (atomic file swap)."""
+        blueprints = {}
+        for export in exports:
+            for bp in export:
+                if bp.get("scryfall_id"):
+                    blueprints.setdefault(bp["scryfall_id"], []).append(bp["id"])
+        self.blueprints = blueprints
+        self.built_at = time.time()
+        if self.path:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"built_at": self.built_at, "blueprints": blueprints}, f)
+            os.replace(tmp, self.path)
+        return len(blueprints)
+
 
 class CardTraderService:
-    def __init__(self):
-        self.api_key = keyring.get_password(SERVICE_NAME, "cardtrader_api_key")
-        self.base_url = "https://api.cardtrader.com/api/v2"
+    def __init__(self, api_key=None, session=None, index=None, price_ttl=CT_PRICE_TTL):
+        self.api_key = api_key or os.getenv("CARDTRADER_TOKEN") or keyring.get_password(SERVICE_NAME, "cardtrader_api_key")
+        self.base_url = CARDTRADER_API_URL
+        self.session = session or requests.Session()
+        self.index = index if index is not None else BlueprintIndex()
+        self.price_ttl = price_ttl
+        self._prices = {}  # blueprint_id -> (fetched_at, cheapest English NM price in cents or None)
+        self._price_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
 
     def get_nm_price(self, scryfall_id):
-        """Fetches the English Near Mint price for a card using its Scryfall ID."""
+        """Cheapest English Near Mint listing on CardTrader for a print (by Scryfall ID)."""
         if not self.api_key:
             return "N/A (Key missing)"
-        
+
         try:
-            # 1. Get Blueprints for Scryfall ID
-            headers = {"Authorization": f"Bearer {self.api_key}"}
-            # Note: CardTrader API structure varies, this is a standard blueprints lookup
-            resp = requests.get(
-                f"{self.base_url}/blueprints/export?scryfall_id={scryfall_id}",
-                headers=headers,
-                timeout=10
-            )
-            if resp.status_code != 200:
-                return "N/A"
-            
-            blueprints = resp.json()
-            if not blueprints:
-                return "N/A"
-            
-            # 2. Find the best English NM price (simplified)
-            # This logic depends on the specific CT API response format
-            # For now, we return a placeholder or link if we can't parse complex market depth
-            return "Fetching..." # Placeholder for real integration
+            return format_price(self.nm_price_cents(scryfall_id))
         except Exception:
             return "N/A"
+
+    def nm_price_cents(self, scryfall_id):
+        """Numeric form of get_nm_price: cheapest English NM listing in cents, None if there is none."""
+        blueprint_ids = self.index.get(scryfall_id) or self._lookup_blueprints(scryfall_id)
+        cents = [self._blueprint_price(bp_id) for bp_id in blueprint_ids]
+        return min((c for c in cents if c is not None), default=None)
+
+    def get_nm_prices(self, scryfall_ids):
+        """EUR prices for many prints as a float array (NaN when missing), fetched on a thread pool."""
+        def price(scryfall_id):
+            try:
+                return self.nm_price_cents(scryfall_id) if scryfall_id and self.api_key else None
+            except Exception:
+                return None
+
+        with ThreadPoolExecutor(max_workers=CT_PRICE_WORKERS) as executor:
+            cents = list(executor.map(price, scryfall_ids))
+        return np.array([np.nan if c is None else c for c in cents], dtype=np.float64) / 100
+
+    def _headers(self):
+        return {"Authorization": f"Bearer {self.api_key}"}
+
+    def _get(self, path, **params):
+        resp = self.session.get(f"{self.base_url}{path}", params=params, headers=self._headers(), timeout=HTTP_TIMEOUT)
+        resp.raise_for_status()
+        return resp.json()
+
+    def _lookup_blueprints(self, scryfall_id):
+        """Fallback for prints missing from the index (e.g. a set released since the last refresh)."""
+        return self._parse_blueprint_ids(self._get("/blueprints/export", scryfall_id=scryfall_id), scryfall_id)
+
+    def _blueprint_price(self, blueprint_id):
+        cached = self._cached_price(blueprint_id)
+        if cached is not None:
+            return cached[1]
+        products = self._get("/marketplace/products", blueprint_id=blueprint_id)
+        return self._store_price(blueprint_id, products)
+
+    def _cached_price(self, blueprint_id):
+        entry = self._prices.get(blueprint_id)
+        if entry and time.time() - entry[0] < self.price_ttl:
+            return entry
+        return None
+
+    def _store_price(self, blueprint_id, products):
+        cents = self._parse_price(products.get(str(blueprint_id), []) if isinstance(products, dict) else products)
+        with self._price_lock:
+            self._prices.pop(blueprint_id, None)  # re-insert: dicts keep insertion order, oldest first
+            self._prices[blueprint_id] = (time.time(), cents)
+            while len(self._prices) > CT_PRICE_CACHE_SIZE:
+                self._prices.pop(next(iter(self._prices)))
+        return cents
+
+    # --- Blueprint index ---
+
+    def refresh_blueprint_index(self, force=False):
+        """Rebuilds the scryfall_id -> blueprint index from every MTG expansion export."""
+        with self._refresh_lock:
+            if not force and not self.index.is_stale():
+                return len(self.index)
+            expansions = [e for e in self._get("/expansions") if e.get("game_id") == CARDTRADER_GAME_ID]
+            exports = []
+            for exp in expansions:
+                try:
+                    exports.append(self._get("/blueprints/export", expansion_id=exp["id"]))
+                except Exception as e:
+                    print(f"⚠️ CardTrader export failed for {exp.get('code')}: {e}")
+            count = self.index.replace(exports)
+            print(f"🗂️ CardTrader blueprint index: {count} prints from {len(expansions)} expansions.")
+            return count
+
+    def start_index_refresh(self, interval=CARDTRADER_INDEX_MAX_AGE):
+        """Refreshes the blueprint index now (if stale) and then every `interval` seconds, on a daemon thread."""
+        def loop():
+            while True:
+                try:
+                    self.refresh_blueprint_index()
+                except Exception as e:
+                    print(f"⚠️ CardTrader index refresh failed: {e}")
+                time.sleep(interval)
+
+        if self.api_key:
+            threading.Thread(target=loop, name="cardtrader-index", daemon=True).start()
+
+    @staticmethod
+    def _parse_blueprint_ids(blueprints, scryfall_id):
+        return [bp["id"] for bp in blueprints or [] if bp.get("scryfall_id") == scryfall_id]
+
+    @staticmethod
+    def _parse_price(products):
+        """Cheapest English, Near Mint, non-foil, unaltered listing, in cents (None if there is none)."""
+        best = None
+        for p in products or []:
+            props = p.get("properties_hash") or {}
+            if props.get("condition") != "Near Mint" or props.get("mtg_language", "en") != "en":
+                continue
+            if props.get("mtg_foil") or props.get("altered") or props.get("signed") or p.get("graded"):
+                continue
+            cents = p.get("price_cents", (p.get("price") or {}).get("cents"))
+            currency = p.get("price_currency", (p.get("price") or {}).get("currency", "EUR"))
+            if cents is None or currency != "EUR":
+                continue
+            if best is None or cents < best:
+                best = cents
+        return best
+
+
+class AsyncCardTraderService(CardTraderService):
+    """Non-blocking CardTrader client for the API. Shares the blueprint index and price cache logic."""
+
+    def __init__(self, api_key=None, client=None, index=None, price_ttl=CT_PRICE_TTL):
+        super().__init__(api_key=api_key, index=index, price_ttl=price_ttl)
+        self.client = client or httpx.AsyncClient(timeout=HTTP_TIMEOUT)
+
+    async def get_nm_price(self, scryfall_id):
+        """Cheapest English Near Mint listing on CardTrader for a print (by Scryfall ID)."""
+        if not self.api_key:
+            return "N/A (Key missing)"
+        try:
+            return format_price(await self.nm_price_cents(scryfall_id))
+        except Exception:
+            return "N/A"
+
+    async def nm_price_cents(self, scryfall_id):
+        blueprint_ids = self.index.get(scryfall_id)
+        if not blueprint_ids:
+            blueprints = await self._aget("/blueprints/export", scryfall_id=scryfall_id)
+            blueprint_ids = self._parse_blueprint_ids(blueprints, scryfall_id)
+        cents = await asyncio.gather(*[self._ablueprint_price(bp_id) for bp_id in blueprint_ids])
+        return min((c for c in cents if c is not None), default=None)
+
+    async def get_nm_prices(self, scryfall_ids):
+        """EUR prices for many prints as a float array (NaN when missing), at most CT_PRICE_WORKERS requests at a time."""
+        limit = asyncio.Semaphore(CT_PRICE_WORKERS)
+
+        async def price(scryfall_id):
+            if not scryfall_id or not self.api_key:
+                return None
+            async with limit:
+                try:
+                    return await self.nm_price_cents(scryfall_id)
+                except Exception:
+                    return None
+
+        cents = await asyncio.gather(*[price(i) for i in scryfall_ids])
+        return np.array([np.nan if c is None else c for c in cents], dtype=np.float64) / 100
+
+    async def _aget(self, path, **params):
+        resp = await self.client.get(f"{self.base_url}{path}", params=params, headers=self._headers())
+        resp.raise_for_status()
+        return resp.json()
+
+    async def _ablueprint_price(self, blueprint_id):
+        cached = self._cached_price(blueprint_id)
+        if cached is not None:
+            return cached[1]
+        products = await self._aget("/marketplace/products", blueprint_id=blueprint_id)
+        return self._store_price(blueprint_id, products)
+
+    async def aclose(self):
+        await self.client.aclose()
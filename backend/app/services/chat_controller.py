@@ -1,139 +1,513 @@
-from backend.app.core.config import SMART_MODEL, NORMAL_MODEL, PROMPT_OFF_TOPIC, PROMPT_CLARIFY, PROMPT_HISTORIAN, PROMPT_JUDGE, PROMPT_LOOKUP
+import asyncio
+import copy
+import threading
+import time
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, wait
+from backend.app.core.config import (
+    SMART_MODEL, NORMAL_MODEL, PROMPT_OFF_TOPIC, PROMPT_CLARIFY, PROMPT_HISTORIAN, PROMPT_JUDGE, PROMPT_LOOKUP, FAST_PATHS,
+    CT_PRICE_DEADLINE, CT_PREFETCH_LIMIT, CT_PRICE_WORKERS
+)
+from backend.app.services.history_compactor import HistoryCompactor
+from backend.app.services.rag import IndexVersionGone
+from backend.app.services.session_artifacts import SessionArtifacts
+from backend.app.services.fast_paths import PersonaPool, render_card_info
 from backend.app.utils.market_links import get_cm_search_link, get_cm_version_link, get_ct_search_link, get_ct_version_link
-from backend.app.services.market import MarketIntelligenceService
-from backend.app.services.rag import RAGService
-from backend.app.services.llm import LLMService
-# We need to import the services that this controller will manage
+
+RETRY_UNAVAILABLE = "I cannot try again because there is no previous conversation history to retry."
+PROMPT_META = "You are the MTG Know-it-all Judge. Explain your authority on Magic: The Gathering."
+SIMPLE_PROMPTS = {"meta": PROMPT_META, "off_topic": PROMPT_OFF_TOPIC, "clarify": PROMPT_CLARIFY}
+
+
+# Steps yielded by the pipeline generators: each names a piece of I/O for the driver to perform
+# and send the result back. The pipeline never calls a service itself, so the blocking and the
+# event-loop controllers share every decision and differ only in how they do the I/O.
+
+class Call:
+    """Call fn(*args, **kwargs) (awaiting it on the event loop); 'stage' names it in ctx["timings"]."""
+
+    def __init__(self, stage, fn, *args, **kwargs):
+        self.stage = stage
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+
+
+class Stage:
+    """Result of the sub-pipeline 'steps'; the async driver may already be running it speculatively."""
+
+    def __init__(self, name, steps):
+        self.name = name
+        self.steps = steps
+
+
+class Stream:
+    """Stream an answer as 'token' events; the full text is sent back."""
+
+    def __init__(self, model, messages):
+        self.model = model
+        self.messages = messages
+
+
+class Speculate:
+    """The query is known: stages that do not depend on the intent may start now."""
+
+    def __init__(self, query, history):
+        self.query = query
+        self.history = history
+
+
+class Narrow:
+    """The intent is known: stages it does not need may be dropped."""
+
+    def __init__(self, intent):
+        self.intent = intent
+
 
 class ChatController:
-    def __init__(self, llm_service, rag_service, card_service, legality_service, cardtrader_service, market_service):
+    """
+    Message pipeline: intent -> cards / rules retrieval -> answer.
+
+    The pipeline itself is written once, as generator methods that yield the I/O they need
+    (see Call, Stage, Stream) and return their result. ChatController is the blocking driver
+    and performs each step inline; AsyncChatController drives the same steps on an event loop.
+    """
+
+    def __init__(self, llm_service, rag_service, card_service, legality_service, cardtrader_service, market_service, answer_cache=None, compactor=None, fast_paths=FAST_PATHS, session_store=None):
         self.llm = llm_service
         self.rag = rag_service
         self.cards = card_service
         self.legality = legality_service
         self.cardtrader = cardtrader_service
         self.market = market_service
-        # State is now passed per request, but we can maintain session context if we were using a DB.
-        # For this refactor, we assume context is passed in or managed by the client/API session.
-        self.active_context = {"cards": [], "intent": None, "active_versions": []}
+        self.answer_cache = answer_cache
+        self.compactor = compactor or HistoryCompactor()
+        # Template/persona answers instead of LLM calls where no generation is needed
+        self.fast_paths = fast_paths
+        self.personas = PersonaPool()
+        # Marketplace price lookups in flight, so concurrent menus join one lookup per print: scryfall_id -> future/task
+        self._price_fetches = {}
+        self._price_lock = threading.Lock()  # finished lookups remove themselves from executor threads
+        self.price_executor = ThreadPoolExecutor(max_workers=CT_PRICE_WORKERS, thread_name_prefix="prices")
+        # No conversation state lives here: the card context is passed in with each
+        # request (see SessionStore) and returned updated, so one controller can
+        # serve many concurrent sessions. The store is only written to directly for
+        # prices that arrive after their request has answered.
+        self.sessions = session_store
 
-    def process_message(self, user_input, history, smart_mode=False, context=None):
+    def process_message(self, user_input, history, smart_mode=False, context=None, session_id=None):
         """
         Main entry point for processing a user message.
         """
+        ctx = self._new_context(context, session_id)
+        return self._run(self._message(user_input, history, smart_mode, ctx), ctx)
+
+    def process_message_stream(self, user_input, history, smart_mode=False, context=None, session_id=None):
+        """
+        Streaming variant of process_message. Yields events:
+        'meta' (intent, image markdown, cached flag), then 'token' chunks, then 'done'
+        with the full response and updated context.
+        """
+        ctx = self._new_context(context, session_id)
+        steps = self._message_events(user_input, history, smart_mode, ctx)
+        value = None
+        while True:
+            try:
+                step = steps.send(value)
+            except StopIteration:
+                return
+            if isinstance(step, dict):
+                value = None
+                yield step
+            elif isinstance(step, Stream):
+                parts = []
+                for delta in self.llm.stream_completion(step.model, step.messages):
+                    parts.append(delta)
+                    yield {"event": "token", "content": delta}
+                value = "".join(parts)
+            else:
+                value = self._perform(step, ctx)
+
+    # --- Blocking driver ---
+
+    def _run(self, steps, ctx):
+        """Runs pipeline steps to completion and returns their result."""
+        value = None
+        while True:
+            try:
+                step = steps.send(value)
+            except StopIteration as done:
+                return done.value
+            value = self._perform(step, ctx)
+
+    def _perform(self, step, ctx):
+        if isinstance(step, Call):
+            start = time.perf_counter()
+            result = step.fn(*step.args, **step.kwargs)
+            if step.stage:
+                self._record_timing(ctx, step.stage, start)
+            return result
+        if isinstance(step, Stage):
+            return self._run(step.steps, ctx)
+        # Speculate / Narrow: nothing runs ahead of the pipeline here
+        return None
+
+    @staticmethod
+    def _record_timing(ctx, stage, start):
+        """Adds a stage's wall time (ms) to ctx["timings"]; concurrent stages overlap."""
+        timings = ctx["timings"]
+        timings[stage] = timings.get(stage, 0.0) + (time.perf_counter() - start) * 1000
+
+    def _retrieve_ids(self, query, history, version):
+        try:
+            return self.rag.retrieve_ids(query, history, index_version=version)
+        except IndexVersionGone:
+            return None
+
+    def _encode_query(self, query):
+        # The answer cache embeds the query itself on lookup
+        return None
+
+    def _update_session(self, session_id, fn):
+        self.sessions.update(session_id, fn)
+
+    def _start_price_fetch(self, scryfall_id):
+        return self.price_executor.submit(self.cardtrader.get_nm_price, scryfall_id)
+
+    @staticmethod
+    def _wait_prices(fetches, timeout):
+        if fetches:
+            wait(fetches, timeout=timeout)
+
+    @staticmethod
+    def _joinable(fetch):
+        return not fetch.done()
+
+    # --- Pipeline (shared by both drivers) ---
+
+    @staticmethod
+    def _new_context(context=None, session_id=None):
+        """Per-request copy of the card context, so concurrent requests never share one."""
+        ctx = {"cards": [], "intent": None, "active_versions": []}
         if context:
-            self.active_context = context
+            ctx.update(context)
+            # Updated in place during the request: never write into the caller's copy
+            for key in ("artifacts", "ct_prices"):
+                if key in ctx:
+                    ctx[key] = copy.deepcopy(ctx[key])
+        # For this request only, never stored with the session:
+        ctx["timings"] = {}  # stage -> ms (Server-Timing)
+        ctx["session_id"] = session_id  # where late prices are written
+        return ctx
 
+    def _message(self, user_input, history, smart_mode, ctx):
+        """Steps of process_message; returns the result dict."""
         selected_model = SMART_MODEL if smart_mode else NORMAL_MODEL
-        
+
+        intent, user_input, history = yield from self._resolve_intent(user_input, history, ctx)
+        if intent is None:
+            return self._result(RETRY_UNAVAILABLE, "meta", ctx)
+
+        cached = False
+        if intent == "rules":
+            response, cached = yield from self._handle_rules(user_input, history, selected_model, ctx)
+        else:
+            response = yield from self._dispatch(intent, user_input, history, selected_model, ctx)
+
+        ctx["intent"] = intent
+        return self._result(response, intent, ctx, cached)
+
+    def _message_events(self, user_input, history, smart_mode, ctx):
+        """Steps of process_message_stream; events are yielded as dicts between them."""
+        selected_model = SMART_MODEL if smart_mode else NORMAL_MODEL
+
+        intent, user_input, history = yield from self._resolve_intent(user_input, history, ctx)
+        if intent is None:
+            yield from self._single_shot_events("meta", RETRY_UNAVAILABLE, ctx)
+            return
+
+        if intent != "rules":
+            # Other intents are short (or not LLM generated at all): send them in one piece.
+            response = yield from self._dispatch(intent, user_input, history, selected_model, ctx)
+            ctx["intent"] = intent
+            yield from self._single_shot_events(intent, response, ctx)
+            return
+
+        prepared = yield from self._prepare_rules(user_input, history, selected_model, ctx)
+        hit = prepared["hit"]
+        yield {"event": "meta", "intent": intent, "image": prepared["image_md"], "cached": hit is not None}
+
+        if hit:
+            answer = hit["answer"]
+            yield {"event": "token", "content": answer}
+        else:
+            answer = yield Stream(selected_model, prepared["messages"])
+            self._cache_answer(user_input, selected_model, prepared, answer)
+
+        ctx["intent"] = intent
+        yield self._done_event(prepared["image_md"] + answer, hit is not None, ctx)
+
+    def _remember_summary(self, response, ctx):
+        # Stored with the session: later turns compact this answer without re-summarizing it
+        SessionArtifacts(ctx).remember_summary(response, self.compactor.summary(response))
+
+    def _result(self, response, intent, ctx, cached=False):
+        self._remember_summary(response, ctx)
+        return {
+            "response": response,
+            "intent": intent,
+            "context": ctx,
+            "cached": cached
+        }
+
+    def _single_shot_events(self, intent, response, ctx):
+        yield {"event": "meta", "intent": intent, "image": "", "cached": False}
+        yield {"event": "token", "content": response}
+        yield self._done_event(response, False, ctx)
+
+    def _done_event(self, response, cached, ctx):
+        self._remember_summary(response, ctx)
+        return {"event": "done", "response": response, "context": ctx, "cached": cached}
+
+    def _resolve_intent(self, user_input, history, ctx):
+        """Classifies the intent, rewinding to the previous query on 'retry'.
+        Returns (intent, query, history); intent is None when there is nothing to retry."""
+        if self._is_menu_selection(user_input, ctx):
+            # Nothing to classify or speculate on: the selection is answered from the session
+            return "versions", user_input, history
+
         # 1. Intent Classification
-        intent = self.llm.classify_intent(user_input, history)
-        
+        yield Speculate(user_input, history)
+        intent = yield from self._classify(user_input, history, ctx)
+
         # 1b. Handle Retry
         if intent == "retry":
-            print(f"🔄 Retry detected. History length: {len(history)}")
-            if len(history) >= 2:
-                # Retrieve last user message (history is [User, Bot, User, Bot...])
-                # We want the message at index -2 (the user's last query)
-                last_user_query = history[-2]
-                print(f"🔄 Retrying previous query: {last_user_query}")
-                
-                # Update inputs to emulate the old query
-                user_input = last_user_query
-                # We conceptually rewind history to before the failed exchange
-                history = history[:-2]
-                
-                # Re-classify intent for the original query
-                intent = self.llm.classify_intent(user_input, history)
-            else:
-                 return {
-                    "response": "I cannot try again because there is no previous conversation history to retry.",
-                    "intent": "meta",
-                    "context": self.active_context
-                }
-        
-        response = ""
-        if intent == "meta":
-            response = self._handle_meta(user_input, selected_model)
-        elif intent == "off_topic":
-            response = self._handle_off_topic(user_input, selected_model)
-        elif intent == "clarify":
-            response = self._handle_clarify(user_input, selected_model)
+            rewound = self._rewind_for_retry(history)
+            if rewound is None:
+                return None, user_input, history
+            user_input, history = rewound
+
+            # Speculation was for the wrong query: restart it for the one being retried
+            yield Speculate(user_input, history)
+            # Re-classify intent for the original query (memoized: only the answer is regenerated)
+            intent = yield from self._classify(user_input, history, ctx)
+
+        yield Narrow(intent)
+        return intent, user_input, history
+
+    def _classify(self, query, history, ctx):
+        if self._is_menu_selection(query, ctx):
+            return "versions"
+        artifacts = SessionArtifacts(ctx)
+        intent = artifacts.query(query, history).get("intent")
+        if intent is None:
+            intent = yield Call("classify", self.llm.classify_intent, query, history)
+            artifacts.remember_query(query, history, intent=intent)
+        return intent
+
+    def _extract(self, query, history, ctx):
+        artifacts = SessionArtifacts(ctx)
+        memo = artifacts.query(query, history)
+        if "cards" in memo:
+            return memo["cards"]
+        card_names = yield Call("extract", self.llm.extract_cards, query, history)
+        artifacts.remember_query(query, history, cards=card_names)
+        return card_names
+
+    def _retrieve(self, query, history, ctx):
+        # Pinned for the whole retrieval: a hot-swapped index never mixes ids and chunks.
+        # If the pinned version is evicted meanwhile (IndexVersionGone), retrieve again on the new active one.
+        artifacts = SessionArtifacts(ctx)
+        search_query = self.rag.search_query(query, history)
+        while True:
+            version = self.rag.index_version
+            ids = artifacts.chunk_ids(search_query, version)
+            if ids is None:
+                ids = yield Call("retrieve", self._retrieve_ids, query, history, version)
+                if ids is None:
+                    continue
+                artifacts.remember_chunk_ids(search_query, version, ids)
+            try:
+                return self.rag.get_chunks(ids, index_version=version)
+            except IndexVersionGone:
+                continue
+
+    def _embedding(self, query):
+        return (yield Call("embed", self._encode_query, query))
+
+    @staticmethod
+    def _rewind_for_retry(history):
+        """Returns (previous query, history before it), or None if there is nothing to retry."""
+        print(f"🔄 Retry detected. History length: {len(history)}")
+        if len(history) < 2:
+            return None
+        # Retrieve last user message (history is [User, Bot, User, Bot...])
+        # We want the message at index -2 (the user's last query)
+        last_user_query = history[-2]
+        print(f"🔄 Retrying previous query: {last_user_query}")
+        # We conceptually rewind history to before the failed exchange
+        return last_user_query, history[:-2]
+
+    def _dispatch(self, intent, user_input, history, model, ctx):
+        """Routes non-rules intents to their handler."""
+        if intent in SIMPLE_PROMPTS:
+            if self.fast_paths:
+                return self.personas.next(intent)
+            return (yield Call("llm", self.llm.get_completion, model, self._simple_messages(SIMPLE_PROMPTS[intent], user_input)))
         elif intent == "lookup":
-            response = self._handle_lookup(user_input, history, selected_model)
+            return (yield from self._handle_lookup(user_input, history, model, ctx))
         elif intent == "versions":
-            response = self._handle_versions(user_input, history, selected_model)
+            return (yield from self._handle_versions(user_input, history, model, ctx))
         elif intent == "market":
-            response = self._handle_market(user_input, history, selected_model)
-        else: # rules
-            response = self._handle_rules(user_input, history, selected_model)
-            
-        self.active_context["intent"] = intent
-        
-        return {
-            "response": response,
-            "intent": intent,
-            "context": self.active_context
-        }
+            return (yield from self._handle_market(user_input, history, model, ctx))
+        return (yield from self._handle_rules(user_input, history, model, ctx))[0]
 
-    def _handle_meta(self, query, model):
-        system_msg = "You are the MTG Know-it-all Judge. Explain your authority on Magic: The Gathering."
-        messages = [{"role": "system", "content": system_msg}]
-        return self.llm.get_completion(model, messages + [{"role": "user", "content": query}])
-
-    def _handle_off_topic(self, query, model):
-        messages = [{"role": "system", "content": PROMPT_OFF_TOPIC}, {"role": "user", "content": query}]
-        return self.llm.get_completion(model, messages)
-
-    def _handle_clarify(self, query, model):
-        messages = [{"role": "system", "content": PROMPT_CLARIFY}, {"role": "user", "content": query}]
-        return self.llm.get_completion(model, messages)
-        
-    def _handle_lookup(self, query, history, model):
-        card_names = self.llm.extract_cards(query, history)
-        self._update_card_context(card_names)
-        
-        # Pre-fetch image markdown if context exists
-        img_md = ""
-        if self.active_context["cards"]:
-            img_md = self._get_image_markdown(self.active_context["cards"])
-
-        card_context = self._get_card_context(self.active_context["cards"])
-        # No RAG context needed for simple lookup usually, but we can verify oracle text
-        # Just send card context and request simple explanation
-        
-        system_instruction = f"{PROMPT_LOOKUP}\n\n{card_context}"
-        messages = [{"role": "system", "content": system_instruction}, {"role": "user", "content": query}]
-        
-        response = self.llm.get_completion(model, messages)
+    def _handle_lookup(self, query, history, model, ctx):
+        self._update_card_context(ctx, (yield Stage("cards", self._extract(query, history, ctx))))
+
+        img_md, card_context = yield Stage("card_blocks", self._card_blocks(ctx["cards"], ctx))
+        if self.fast_paths:
+            return self._card_info_response(img_md, ctx)
+        response = yield Call("llm", self.llm.get_completion, model, self._lookup_messages(query, card_context))
         return img_md + response # Image FIRST
 
-    def _handle_versions(self, query, history, model):
+    @staticmethod
+    def _card_info_response(img_md, ctx):
+        if not ctx.get("cards"):
+            return "No cards identified. Please specify a card name."
+        card_info = SessionArtifacts(ctx).card_info(ctx["cards"])
+        if not card_info:
+            return f"No card data found for {', '.join(ctx['cards'])}."
+        return img_md + "\n\n" + card_info # Image FIRST
+
+    def _handle_versions(self, query, history, model, ctx):
+        # Numeric reply to the last menu: answered from the session, no LLM or Scryfall call
+        if self._is_menu_selection(query, ctx):
+            return (yield from self._version_report(self._select_version(query.strip(), ctx), ctx))
+
         # 1. New card or context?
-        card_names = self.llm.extract_cards(query, history)
-        self._update_card_context(card_names)
-        
-        if self.active_context.get("cards"):
-            card_names = self.active_context["cards"]
+        self._update_card_context(ctx, (yield Stage("cards", self._extract(query, history, ctx))))
+
+        if ctx.get("cards"):
+            card_names = ctx["cards"]
         else:
             return "No cards identified. Please specify a card name."
 
         # 2. Check for version selection (numeric input)
-        version_choice = None
-        if query.isdigit() and "active_versions" in self.active_context:
-            try:
-                idx = int(query) - 1
-                if 0 <= idx < len(self.active_context["active_versions"]):
-                    version_choice = self.active_context["active_versions"][idx]
-            except Exception: pass
+        version_choice = self._select_version(query, ctx)
 
         # 3. Generate query
         if version_choice:
             scryfall_query = f"!\"{version_choice['name']}\""
         else:
-            scryfall_query = self.llm.generate_search_query(query, history)
-        
-        if card_names and not version_choice:
+            generated = yield Call("llm", self.llm.generate_search_query, query, history)
+            scryfall_query = self._sanitize_search_query(generated, query, card_names)
+
+        versions = yield Call("card_data", self.cards.get_card_versions, scryfall_query)
+        if not versions:
+            return f"No official records found for '{query}'."
+
+        ctx["active_versions"] = versions
+
+        # 4. If a specific version was chosen, give the REPORT
+        if version_choice:
+            return (yield from self._version_report(version_choice, ctx))
+
+        # 5. Otherwise, give the INITIAL LIST
+        prices = yield from self._menu_prices(versions, ctx)
+        return self._generate_versions_menu(versions, card_names, prices)
+
+    def _menu_prices(self, versions, ctx):
+        """
+        CardTrader prices for the menu, fetched concurrently. Prices not back within
+        CT_PRICE_DEADLINE show as 'N/A' but keep loading in the background and are
+        written into the session when they land (see _late_price), so the numeric
+        selection that follows finds them there.
+        """
+        listed = versions[:CT_PREFETCH_LIMIT]
+        fetches = [self._fetch_price(v['id']) for v in listed]
+        yield Call(None, self._wait_prices, fetches, CT_PRICE_DEADLINE)
+        return self._collect_prices(listed, fetches, ctx)
+
+    def _version_report(self, version, ctx):
+        # Read from the session: menu prices, including the ones that landed after the menu
+        price = ctx.get("ct_prices", {}).get(version['id'])
+        if price is None:
+            price = (yield from self._menu_prices([version], ctx))[0]
+        return self._generate_version_report(version, price)
+
+    def _fetch_price(self, scryfall_id):
+        """Joins the lookup already running for the print, or starts one."""
+        with self._price_lock:
+            fetch = self._price_fetches.get(scryfall_id)
+            if fetch is not None and self._joinable(fetch):
+                return fetch
+            fetch = self._start_price_fetch(scryfall_id)
+            self._price_fetches[scryfall_id] = fetch
+        # Outside the lock: the callback runs right away if the lookup already finished
+        fetch.add_done_callback(partial(self._fetch_done, scryfall_id))
+        return fetch
+
+    def _fetch_done(self, scryfall_id, fetch):
+        # Finished lookups are not kept: their prices live in the sessions (and CardTraderService's cache)
+        with self._price_lock:
+            if self._price_fetches.get(scryfall_id) is fetch:
+                del self._price_fetches[scryfall_id]
+
+    def _late_price(self, ctx, scryfall_id, fetch):
+        """Done-callback for a price that missed CT_PRICE_DEADLINE: stores it with the session."""
+        price = self._price_result(fetch)
+        if "N/A" in price:
+            return
+        # The request may not have saved its turn yet: it then stores the price with it
+        self._remember_price(ctx, scryfall_id, price)
+        session_id = ctx.get("session_id")
+        if self.sessions is None or session_id is None:
+            return
+        # Merged into whatever is stored now: never a read-modify-write over a turn saved meanwhile
+        self._update_session(session_id, lambda state: self._remember_price(state["context"], scryfall_id, price))
+
+    @staticmethod
+    def _price_result(fetch):
+        """Result of a finished lookup, 'N/A' if it failed or was cancelled."""
+        if fetch.cancelled() or fetch.exception() is not None:
+            return "N/A"
+        return fetch.result() or "N/A"
+
+    def _collect_prices(self, listed, fetches, ctx):
+        prices = []
+        for v, fetch in zip(listed, fetches):
+            if fetch.done():
+                price = self._price_result(fetch)
+                self._remember_price(ctx, v['id'], price)
+            else:
+                price = "N/A"
+                fetch.add_done_callback(partial(self._late_price, ctx, v['id']))
+            prices.append(price)
+        return prices
+
+    @staticmethod
+    def _remember_price(ctx, scryfall_id, price):
+        if price and "N/A" not in price:
+            # Replaced, not updated: a late price may land while the context is being saved
+            ctx["ct_prices"] = {**ctx.get("ct_prices", {}), scryfall_id: price}
+
+    def _is_menu_selection(self, query, ctx):
+        return self.fast_paths and self._select_version(query.strip(), ctx) is not None
+
+    def _select_version(self, query, ctx):
+        """Maps a numeric reply onto the last versions menu."""
+        if query.isdigit() and "active_versions" in ctx:
+            try:
+                idx = int(query) - 1
+                if 0 <= idx < len(ctx["active_versions"]):
+                    return ctx["active_versions"][idx]
+            except Exception: pass
+        return None
+
+    @staticmethod
+    def _sanitize_search_query(scryfall_query, query, card_names):
+        if card_names:
             # Fallback Heuristics:
             # 1. If generated query contains pronouns (it/that)
             # 2. If generated query is too short
@@ -142,33 +516,20 @@ class ChatController:
             is_raw_input = scryfall_query.strip().lower() == query.strip().lower()
             looks_invalid = " " in scryfall_query and "!" not in scryfall_query and ":" not in scryfall_query
             has_pronouns = any(p in scryfall_query.lower() for p in ["this", "it", "that", "the card"])
-            
+
             if has_pronouns or len(scryfall_query) < 3 or is_raw_input or looks_invalid:
                 scryfall_query = f"!\"{card_names[0]}\""
-            
-        versions = self.cards.get_card_versions(scryfall_query)
-        if not versions:
-            return f"No official records found for '{query}'."
-
-        self.active_context["active_versions"] = versions
-
-        # 4. If a specific version was chosen, give the REPORT
-        if version_choice:
-            return self._generate_version_report(version_choice)
-
-        # 5. Otherwise, give the INITIAL LIST
-        return self._generate_versions_menu(versions, card_names)
+        return scryfall_query
 
-    def _generate_version_report(self, v):
+    def _generate_version_report(self, v, ct_price):
         # stocks = self.market.mtgstocks.get_card_trend(...) - REMOVED
-        
+
         # Simplified Version Report using only current data
         cm_price = f"{v['prices'].get('eur', 'N/A')}€"
-        ct_price = self.cardtrader.get_nm_price(v['id'])
-        
+
         cm_link = get_cm_version_link(v['name'], v['set_name'])
         ct_link = get_ct_version_link(v['name'], v['set_name'])
-        
+
         # Identify absolute lowest price
         prices_to_compare = []
         if cm_price and "N/A" not in cm_price:
@@ -177,7 +538,7 @@ class ChatController:
         if ct_price and "N/A" not in ct_price:
              try: prices_to_compare.append((float(ct_price.replace('€', '').strip()), "Cardtrader"))
              except ValueError: pass
-        
+
         lowest_display = min(prices_to_compare) if prices_to_compare else (None, None)
         lowest_str = f"{lowest_display[0]}€ ({lowest_display[1]})" if lowest_display[0] else "N/A"
 
@@ -190,14 +551,13 @@ class ChatController:
         )
         return report
 
-    def _generate_versions_menu(self, versions, card_names):
+    def _generate_versions_menu(self, versions, card_names, ct_prices):
         all_prices = []
         for vx in versions:
             if vx['prices'].get('eur') and vx['prices']['eur'] != 'N/A':
                 all_prices.append((float(vx['prices']['eur']), "Cardmarket"))
-        
-        for vx in versions[:3]:
-            ct_p = self.cardtrader.get_nm_price(vx['id'])
+
+        for ct_p in ct_prices:
             if ct_p and ct_p != "N/A" and "€" in ct_p:
                  try:
                      p_val = float(ct_p.replace('€', '').strip())
@@ -208,105 +568,333 @@ class ChatController:
             lowest_val, lowest_src = min(all_prices)
             price_summary = f"📉 Lowest found: {lowest_val}€ on {lowest_src}."
         else:
-            price_summary = "📉 Pricing data checking..." 
-        
+            price_summary = "📉 Pricing data checking..."
+
         card_name = card_names[0] if card_names else "card"
         cm_search = get_cm_search_link(card_name)
         ct_search = get_ct_search_link(card_name)
-        
+
         header = f"Found {len(versions)} versions of {card_name}.\n"
         header += f"{price_summary}\n\n"
         header += f"🛒 STORE SEARCH:\n"
         header += f"  • [Cardmarket]({cm_search})\n\n"
         header += "Which version would you like the full price analysis for?\n"
-        
+
         menu = ""
         for i, v in enumerate(versions, 1):
              menu += f"{i}. {v['set_name']} ({v['set'].upper()}) - {v['rarity'].title()}\n"
-        
+
         return header + menu
 
-    def _handle_market(self, query, history, model):
-        from backend.app.core.config import PROMPT_MARKET_ANALYST
+    def _handle_market(self, query, history, model, ctx):
+        card_names = self._market_cards((yield Stage("cards", self._extract(query, history, ctx))), ctx)
+        response = yield Call("llm", self.llm.get_completion, model, self._market_messages(query, card_names), max_tokens=1000)
 
-        # Market Movers disabled
-        movers_str = ""
+        # Append image if available
+        if ctx["cards"]:
+            response += (yield Stage("card_blocks", self._card_blocks(ctx["cards"], ctx)))[0]
 
-        card_names = self.llm.extract_cards(query, history)
-        if not card_names and self.active_context["cards"]:
-            card_names = self.active_context["cards"]
+        return response
+
+    def _market_cards(self, card_names, ctx):
+        if not card_names and ctx["cards"]:
+            card_names = ctx["cards"]
         elif card_names:
-            self.active_context["cards"] = card_names
+            ctx["cards"] = card_names
+        return card_names
+
+    def _market_messages(self, query, card_names):
+        from backend.app.core.config import PROMPT_MARKET_ANALYST
+
+        # Precomputed after each price snapshot: no work per request
+        movers_str = self.market.movers_context(query) if self.market else ""
 
         extra_context = ""
         if card_names:
              # Shortened logic for succinctness
              extra_context = f"Analyzing {card_names[0]}..."
 
-        messages = [
+        return [
             {"role": "system", "content": PROMPT_MARKET_ANALYST},
             {"role": "user", "content": f"Query: {query}\n\n{movers_str}\n{extra_context}"}
         ]
-        response = self.llm.get_completion(model, messages, max_tokens=1000)
-        
-        # Append image if available
-        if self.active_context["cards"]:
-            response += self._get_image_markdown(self.active_context["cards"])
-            
-        return response
 
 
-    def _update_card_context(self, new_card_names):
+    def _update_card_context(self, ctx, new_card_names):
         if new_card_names:
-            if new_card_names != self.active_context.get("cards"):
-                self.active_context["cards"] = new_card_names
-                self.active_context["active_versions"] = [] # Reset on switch
+            if new_card_names != ctx.get("cards"):
+                ctx["cards"] = new_card_names
+                ctx["active_versions"] = [] # Reset on switch
+                ctx["ct_prices"] = {}
+
+    def _card_blocks(self, card_names, ctx):
+        """Image markdown (first card) and CARD DATA block from a single Scryfall fetch, memoized per card set."""
+        if not card_names: return "", ""
+        artifacts = SessionArtifacts(ctx)
+        blocks = artifacts.card_blocks(card_names)
+        if blocks is None:
+            data = yield Call("card_data", self.cards.get_card_data, card_names)
+            blocks = self._format_image_markdown(data), self._format_card_context(data)
+            artifacts.remember_card_blocks(card_names, *blocks, card_info=render_card_info(data))
+        return blocks
 
-    def _get_card_context(self, card_names):
-        if not card_names: return ""
-        data = self.cards.get_card_data(card_names)
+    @staticmethod
+    def _format_card_context(data):
         if not data: return ""
         context = "CARD DATA:\n"
         for c in data:
             context += f"Name: {c['name']}\nOracle: {c['oracle_text']}\nType: {c['type_line']}\n---\n"
         return context
 
-    def _get_image_markdown(self, card_names):
-        """Fetches markdown image link for the first card in the list."""
-        if not card_names: return ""
-        data = self.cards.get_card_data([card_names[0]]) # Just get first card
+    @staticmethod
+    def _format_image_markdown(data):
         if data and data[0].get('image'):
              return f"\n\n![{data[0]['name']}]({data[0]['image']})"
         return ""
 
-    def _handle_rules(self, query, history, model):
-        card_names = self.llm.extract_cards(query, history)
-        self._update_card_context(card_names)
-        
-        # Pre-fetch image markdown if context exists
-        img_md = ""
-        if self.active_context["cards"]:
-            img_md = self._get_image_markdown(self.active_context["cards"])
-
-        card_context = self._get_card_context(self.active_context["cards"])
-        rules_context = self._get_rules_context(query, history)
-        
+    @staticmethod
+    def _simple_messages(system_prompt, query):
+        return [{"role": "system", "content": system_prompt}, {"role": "user", "content": query}]
+
+    @staticmethod
+    def _lookup_messages(query, card_context):
+        # No RAG context needed for simple lookup usually, but we can verify oracle text
+        # Just send card context and request simple explanation
+        system_instruction = f"{PROMPT_LOOKUP}\n\n{card_context}"
+        return [{"role": "system", "content": system_instruction}, {"role": "user", "content": query}]
+
+    def _handle_rules(self, query, history, model, ctx):
+        """Answers a rules question. Returns (response, served_from_cache)."""
+        prepared = yield from self._prepare_rules(query, history, model, ctx)
+        if prepared["hit"]:
+            return prepared["image_md"] + prepared["hit"]["answer"], True
+
+        response = yield Call("llm", self.llm.get_completion, model, prepared["messages"])
+        self._cache_answer(query, model, prepared, response)
+        # Append image to response
+        return prepared["image_md"] + response, False
+
+    def _prepare_rules(self, query, history, model, ctx):
+        """Resolves cards, checks the answer cache and assembles the judge prompt."""
+        self._update_card_context(ctx, (yield Stage("cards", self._extract(query, history, ctx))))
+        version = self.rag.index_version
+
+        embedding = None
+        use_cache = self._is_cacheable_query(query, history)
+        if use_cache:
+            embedding = yield Stage("embedding", self._embedding(query))
+            hit = self.answer_cache.lookup(query, ctx["cards"], model, version, embedding=embedding)
+            if hit:
+                return self._cache_hit(hit)
+
+        # Join point: on the event loop, card data and retrieval have been running since the message arrived
+        img_md, card_context = yield Stage("card_blocks", self._card_blocks(ctx["cards"], ctx))
+        chunks = yield Stage("chunks", self._retrieve(query, history, ctx))
+        messages = self._rules_messages(query, history, card_context, self._format_rules_context(chunks), model,
+                                        SessionArtifacts(ctx).summaries())
+        return {"hit": None, "image_md": img_md, "messages": messages, "use_cache": use_cache, "embedding": embedding,
+                "cards": ctx["cards"], "index_version": version}
+
+    @staticmethod
+    def _cache_hit(hit):
+        print(f"♻️ Answer cache hit ({hit['score']:.2f}): {hit['query'][:60]}")
+        return {"hit": hit, "image_md": hit["image_md"], "messages": None, "use_cache": True}
+
+    def _rules_messages(self, query, history, card_context, rules_context, model, summaries=None):
         force_truth = "\n\nCRITICAL: EXTREME PRIORITY GIVEN TO 'CARD DATA'. USE ONLY PROVIDED TEXT."
         system_instruction = f"{PROMPT_JUDGE}\n\n{card_context}\n\n{rules_context}{force_truth}"
-        
+
         messages = [{"role": "system", "content": system_instruction}]
-        
-        # Add history
-        for i in range(0, len(history), 2):
-            if i+1 < len(history):
-                messages.append({"role": "user", "content": history[i]})
-                messages.append({"role": "assistant", "content": history[i+1]})
+
+        # Add history (older answers summarized, within the model's token budget)
+        messages.extend(self.compactor.compact(history, model, summaries))
         messages.append({"role": "user", "content": query})
+        return messages
 
-        response = self.llm.get_completion(model, messages)
-        # Append image to response
-        return img_md + response
+    def _cache_answer(self, query, model, prepared, response):
+        """Stores a freshly generated answer if it is well-formed."""
+        if prepared["use_cache"] and self.llm.validate_format(response)[0]:
+            self.answer_cache.store(query, response, prepared["cards"], model, prepared["index_version"],
+                                    image_md=prepared["image_md"], embedding=prepared["embedding"])
 
-    def _get_rules_context(self, query, history):
-         chunks = self.rag.retrieve(query, history)
+    def _is_cacheable_query(self, query, history):
+        """Short follow-ups lean on the conversation, so their answers are not reusable."""
+        if self.answer_cache is None:
+            return False
+        return not (history and len(query.split()) < 5)
+
+    @staticmethod
+    def _format_rules_context(chunks):
          return "RULES:\n" + "\n".join([f"[{c['rule_num']}] {c['text']}" for c in chunks])
+
+
+class AsyncChatController(ChatController):
+    """
+    Event-loop friendly controller for the API.
+    Expects the async service variants (AsyncLLMService, AsyncCardService,
+    AsyncCardTraderService) and runs embedding work on the RAG encoder executor,
+    so a single worker can interleave many conversations.
+
+    Drives the same pipeline as ChatController. Each message runs as a small dependency
+    graph: card extraction -> card data, retrieval and the answer-cache embedding start
+    speculatively alongside intent classification (Speculate), stages the resolved intent
+    does not need are cancelled (Narrow), and the rest are picked up where the pipeline
+    asks for them (Stage).
+    """
+
+    _gate = None  # (event loop, semaphore) bounding concurrent price lookups
+
+    # Speculative stages each intent consumes; everything else is cancelled.
+    STAGES_BY_INTENT = {
+        "meta": (),
+        "off_topic": (),
+        "clarify": (),
+        "lookup": ("cards", "card_blocks"),
+        "versions": ("cards",),
+        "market": ("cards", "card_blocks"),
+        "rules": ("cards", "card_blocks", "chunks", "embedding"),
+    }
+
+    async def process_message(self, user_input, history, smart_mode=False, context=None, session_id=None):
+        """
+        Main entry point for processing a user message.
+        """
+        ctx = self._new_context(context, session_id)
+        spec = {}
+        try:
+            return await self._run(self._message(user_input, history, smart_mode, ctx), ctx, spec)
+        finally:
+            await self._cancel(spec)
+
+    async def process_message_stream(self, user_input, history, smart_mode=False, context=None, session_id=None):
+        """Async generator version of ChatController.process_message_stream."""
+        ctx = self._new_context(context, session_id)
+        steps = self._message_events(user_input, history, smart_mode, ctx)
+        spec = {}
+        value = None
+        try:
+            while True:
+                try:
+                    step = steps.send(value)
+                except StopIteration:
+                    return
+                if isinstance(step, dict):
+                    value = None
+                    yield step
+                elif isinstance(step, Stream):
+                    # Every stage the answer needs is in: nothing speculative outlives the prompt
+                    await self._cancel(spec)
+                    parts = []
+                    async for delta in self.llm.stream_completion(step.model, step.messages):
+                        parts.append(delta)
+                        yield {"event": "token", "content": delta}
+                    value = "".join(parts)
+                else:
+                    value = await self._perform(step, ctx, spec)
+        finally:
+            await self._cancel(spec)
+
+    # --- Event-loop driver ---
+
+    async def _run(self, steps, ctx, spec=None):
+        value = None
+        while True:
+            try:
+                step = steps.send(value)
+            except StopIteration as done:
+                return done.value
+            value = await self._perform(step, ctx, spec)
+
+    async def _perform(self, step, ctx, spec=None):
+        if isinstance(step, Call):
+            if step.stage:
+                return await self._timed(ctx, step.stage, step.fn(*step.args, **step.kwargs))
+            return await step.fn(*step.args, **step.kwargs)
+        if isinstance(step, Stage):
+            task = spec.get(step.name) if spec else None
+            if task is not None and not task.cancelled():
+                step.steps.close()
+                return await task
+            return await self._run(step.steps, ctx)
+        if isinstance(step, Speculate):
+            await self._cancel(spec)
+            spec.clear()
+            spec.update(self._speculate(step.query, step.history, ctx))
+        elif isinstance(step, Narrow):
+            needed = self.STAGES_BY_INTENT.get(step.intent, self.STAGES_BY_INTENT["rules"])
+            for name, task in spec.items():
+                if name not in needed:
+                    task.cancel()
+        return None
+
+    def _speculate(self, query, history, ctx):
+        """Starts every stage that does not depend on the intent."""
+        extract = asyncio.create_task(self._run(self._extract(query, history, ctx), ctx))
+        spec = {
+            "cards": extract,
+            "card_blocks": asyncio.create_task(self._speculative_card_blocks(extract, ctx)),
+            "chunks": asyncio.create_task(self._run(self._retrieve(query, history, ctx), ctx)),
+        }
+        if self._is_cacheable_query(query, history):
+            spec["embedding"] = asyncio.create_task(self._run(self._embedding(query), ctx))
+        return spec
+
+    async def _speculative_card_blocks(self, extract_task, ctx):
+        # Shielded: cancelling the card fetch must not cancel extraction, which 'versions' still needs
+        names = await asyncio.shield(extract_task)
+        # Same resolution as _update_card_context, without mutating the context speculatively
+        return await self._run(self._card_blocks(names or ctx.get("cards"), ctx), ctx)
+
+    @staticmethod
+    async def _timed(ctx, stage, awaitable):
+        """Awaits one pipeline stage and adds its wall time (ms) to ctx["timings"]; concurrent stages overlap."""
+        start = time.perf_counter()
+        result = await awaitable
+        ChatController._record_timing(ctx, stage, start)
+        return result
+
+    @staticmethod
+    async def _cancel(spec):
+        """Cancels unfinished speculative stages and reaps all of them."""
+        for task in spec.values():
+            task.cancel()
+        await asyncio.gather(*spec.values(), return_exceptions=True)
+
+    async def _retrieve_ids(self, query, history, version):
+        try:
+            return await self.rag.aretrieve_ids(query, history, index_version=version)
+        except IndexVersionGone:
+            return None
+
+    async def _encode_query(self, query):
+        return (await self.rag.aencode([query]))[0]
+
+    def _update_session(self, session_id, fn):
+        # Called on the event loop: the store may block (SQLiteSessionStore)
+        asyncio.get_running_loop().run_in_executor(None, self.sessions.update, session_id, fn)
+
+    def _start_price_fetch(self, scryfall_id):
+        return asyncio.create_task(self._gated_price(self._price_gate(), scryfall_id))
+
+    async def _gated_price(self, gate, scryfall_id):
+        # At most CT_PRICE_WORKERS lookups at a time across all menus, like the blocking controller's executor
+        async with gate:
+            return await self.cardtrader.get_nm_price(scryfall_id)
+
+    def _price_gate(self):
+        # One gate per event loop: an asyncio.Semaphore is bound to the loop it first waits on
+        loop = asyncio.get_running_loop()
+        if self._gate is None or self._gate[0] is not loop:
+            self._gate = (loop, asyncio.Semaphore(CT_PRICE_WORKERS))
+        return self._gate[1]
+
+    @staticmethod
+    async def _wait_prices(fetches, timeout):
+        # asyncio.wait never cancels: a slow lookup keeps going for the next request
+        if fetches:
+            await asyncio.wait(fetches, timeout=timeout)
+
+    @staticmethod
+    def _joinable(fetch):
+        # Tasks are bound to the event loop that created them
+        return fetch.get_loop() is asyncio.get_running_loop() and not fetch.done()
@@ -0,0 +1,159 @@
+import re
+import numpy as np
+from backend.app.core.config import DECK_FORMATS
+
+# Section headers of Arena exports (and common hand-written variants)
+SECTIONS = {
+    "deck": "main", "main": "main", "maindeck": "main", "mainboard": "main",
+    "sideboard": "sideboard", "side": "sideboard", "companion": "sideboard",
+    "commander": "commander", "about": None,
+}
+# "4 Lightning Bolt", "4x Lightning Bolt", "SB: 2 Duress", "1 Fable of the Mirror-Breaker (NEO) 141"
+CARD_LINE = re.compile(r'^(SB:\s*)?(\d+)\s*x?\s+(.+?)(?:\s+\([A-Za-z0-9]+\)(?:\s+\S+)?)?\s*$', re.IGNORECASE)
+
+# Construction rules per format
+DECK_RULES = {fmt: {"min_main": 60, "max_main": None, "max_side": 15, "max_copies": 4} for fmt in DECK_FORMATS}
+DECK_RULES["commander"] = {"min_main": 100, "max_main": 100, "max_side": None, "max_copies": 1}
+
+
+def parse_decklist(text):
+    """
+    Parses an MTGO (.txt / "SB:" lines) or Arena export into {board: {card name: count}}
+    for the main, sideboard and commander boards. Without section headers, the first
+    blank line after the main deck starts the sideboard (MTGO convention).
+    """
+    boards = {"main": {}, "sideboard": {}, "commander": {}}
+    board, explicit = "main", False
+    for raw in text.splitlines():
+        line = raw.strip()
+        if not line:
+            if not explicit and board == "main" and boards["main"]:
+                board = "sideboard"
+            continue
+        if line.startswith(("//", "#")):
+            continue
+        header = line.rstrip(":").lower()
+        if header in SECTIONS:
+            board, explicit = SECTIONS[header], True
+            continue
+        match = CARD_LINE.match(line)
+        if not match or board is None:
+            continue
+        target = boards["sideboard"] if match.group(1) else boards[board]
+        name = match.group(3).strip()
+        target[name] = target.get(name, 0) + int(match.group(2))
+    return boards
+
+
+class DeckAnalyzer:
+    """
+    Legality and price check of a whole decklist with local data only (no LLM, no Scryfall
+    calls): names resolve against the CardCatalog, legality per format comes from
+    LegalityService's card index (Scryfall legalities + B&R list) in one check_many call,
+    and prices from MarketIntelligenceService (latest price of each card's cheapest print).
+    """
+
+    def __init__(self, catalog, legality, market=None, formats=DECK_FORMATS):
+        self.catalog = catalog
+        self.legality = legality
+        self.market = market
+        self.formats = formats
+
+    def analyze(self, text, formats=None):
+        formats = [f for f in (formats or self.formats) if f in DECK_RULES]
+        boards = parse_decklist(text)
+
+        rows = [(board, name, count) for board, cards in boards.items() for name, count in cards.items()]
+        names = [name for _, name, _ in rows]
+        entries = self.catalog.get_many(names)
+        statuses = self.legality.check_many(names, formats)
+        cards = []
+        for (board, name, count), entry, status in zip(rows, entries, statuses):
+            cards.append({
+                "name": entry["name"] if entry else name,
+                "count": count,
+                "board": board,
+                "found": entry is not None,
+                "type_line": entry["type_line"] if entry else None,
+                "legalities": status,
+            })
+
+        result = {
+            "counts": {board: sum(c.values()) for board, c in boards.items()},
+            "cards": cards,
+            "unknown": [c["name"] for c in cards if not c["found"]],
+            "formats": {fmt: self._check_format(fmt, cards, entries) for fmt in formats},
+        }
+        result["price"] = self._price(cards)
+        return result
+
+    def _check_format(self, fmt, cards, entries):
+        rules = DECK_RULES[fmt]
+        issues = []
+        main = sum(c["count"] for c in cards if c["board"] in ("main", "commander"))
+        side = sum(c["count"] for c in cards if c["board"] == "sideboard")
+        if main < rules["min_main"]:
+            issues.append(f"Main deck has {main} cards (minimum {rules['min_main']}).")
+        if rules["max_main"] and main > rules["max_main"]:
+            issues.append(f"Main deck has {main} cards (maximum {rules['max_main']}).")
+        if rules["max_side"] is not None and side > rules["max_side"]:
+            issues.append(f"Sideboard has {side} cards (maximum {rules['max_side']}).")
+
+        copies, seen = {}, {}
+        for card, entry in zip(cards, entries):
+            copies[card["name"]] = copies.get(card["name"], 0) + card["count"]
+            seen[card["name"]] = (card, entry)
+        for name, (card, entry) in seen.items():
+            status = card["legalities"].get(fmt, "unknown")
+            if not card["found"]:
+                issues.append(f"{name}: unknown card.")
+            elif status == "banned":
+                issues.append(f"{name} is banned.")
+            elif status == "not_legal":
+                issues.append(f"{name} is not legal in {fmt.title()}.")
+            elif status == "restricted" and copies[name] > 1:
+                issues.append(f"{name} is restricted ({copies[name]} copies).")
+            elif not entry["unlimited"] and copies[name] > rules["max_copies"]:
+                issues.append(f"{name}: {copies[name]} copies (maximum {rules['max_copies']}).")
+        return {"legal": not issues, "issues": issues}
+
+    def _price(self, cards):
+        """EUR totals at the cheapest printings; cards without a price are listed as missing."""
+        if not self.market or not cards:
+            return {"total_eur": None, "main_eur": None, "sideboard_eur": None, "missing": [c["name"] for c in cards]}
+        prices = self.market.cheapest_prices([c["name"] for c in cards])
+        counts = np.array([c["count"] for c in cards], dtype=np.float64)
+        boards = np.array([c["board"] for c in cards])
+        subtotal = counts * prices
+        for card, price in zip(cards, prices.tolist()):
+            card["price_eur"] = None if np.isnan(price) else round(price, 2)
+
+        def total(mask):
+            return round(float(np.nansum(subtotal[mask])), 2)
+
+        return {
+            "total_eur": total(np.ones(len(cards), dtype=bool)),
+            "main_eur": total(boards != "sideboard"),
+            "sideboard_eur": total(boards == "sideboard"),
+            "missing": [c["name"] for c, p in zip(cards, prices) if np.isnan(p)],
+        }
+
+
+def format_deck_report(result):
+    """Plain-text report of DeckAnalyzer.analyze for the CLI."""
+    counts = result["counts"]
+    lines = [f"🃏 Deck: {counts['main']} main / {counts['sideboard']} sideboard"
+             + (f" / {counts['commander']} commander" if counts["commander"] else "")]
+    for fmt, check in result["formats"].items():
+        lines.append(f"{'✅' if check['legal'] else '❌'} {fmt.title()}")
+        lines.extend(f"   - {issue}" for issue in check["issues"][:10])
+        if len(check["issues"]) > 10:
+            lines.append(f"   - ... {len(check['issues']) - 10} more")
+    price = result["price"]
+    if price["total_eur"] is not None:
+        lines.append(f"💰 Total: {price['total_eur']}€ (main {price['main_eur']}€, sideboard {price['sideboard_eur']}€)")
+    if price["missing"]:
+        lines.append(f"⚠️ No price for: {', '.join(price['missing'][:10])}")
+    if result["unknown"]:
+        lines.append(f"❓ Unknown cards: {', '.join(result['unknown'])}")
+    return "\n".join(lines)
@@ -0,0 +1,151 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, TimeoutError as FuturesTimeout
+from backend.app.core.config import (
+    NORMAL_MODEL, SMART_MODEL, ESCALATION_MODE, HEDGE_AFTER_SECONDS, FORMAT_SECTION_BUDGETS
+)
+from backend.app.services.scheduler import PRIORITY_INTERACTIVE, PRIORITY_ESCALATION
+
+JUDGE_SECTIONS = ["CARD INFO", "ORACLE TEXT", "RULING", "GAMEPLAY SCENARIO"]
+
+
+class FormatTracker:
+    """
+    Incremental version of LLMService.validate_format for streamed answers.
+    Each section header must show up within a character budget after the previous
+    one; once an answer overruns a budget it is declared broken, without waiting
+    for the rest of the generation.
+    """
+
+    def __init__(self, budgets=FORMAT_SECTION_BUDGETS):
+        self.budgets = budgets
+        self.text = ""
+        self.found = {}  # section -> end offset of its header
+        self.broken_reason = None
+
+    def feed(self, delta):
+        """Adds streamed text. Returns False once the answer can no longer be valid."""
+        self.text += delta
+        upper = self.text.upper()
+        for section in JUDGE_SECTIONS:
+            if section not in self.found:
+                pos = upper.find(section)
+                if pos != -1:
+                    self.found[section] = pos + len(section)
+
+        missing = self.missing()
+        if missing and self.broken_reason is None:
+            expected = JUDGE_SECTIONS.index(missing[0])
+            since = len(self.text) - max(self.found.values(), default=0)
+            if since > self.budgets[expected]:
+                self.broken_reason = f"'{missing[0]}' missing after {since} chars"
+        return self.broken_reason is None
+
+    def missing(self):
+        return [s for s in JUDGE_SECTIONS if s not in self.found]
+
+    def is_valid(self):
+        return not self.missing()
+
+
+class Escalator:
+    """
+    Critic pattern for rules answers: 8B first, 70B when the 8B answer is malformed.
+
+    Modes:
+    - 'stream': the 8B answer is checked while it streams and abandoned as soon as a
+      section header is overdue; the 70B request starts right away.
+    - 'hedge': a 70B request is also started if the 8B answer is not complete and
+      valid after `hedge_after` seconds; the first answer to pass validation wins and
+      the other request is cancelled.
+    """
+
+    def __init__(self, llm, mode=ESCALATION_MODE, hedge_after=HEDGE_AFTER_SECONDS, budgets=FORMAT_SECTION_BUDGETS):
+        self.llm = llm
+        self.mode = mode
+        self.hedge_after = hedge_after
+        self.budgets = budgets
+        self.executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="escalation")
+
+    def complete(self, model, messages, on_delta=None, on_abandon=None):
+        """
+        Returns (answer, model that produced it).
+        on_delta(text) receives streamed text of the current attempt ('stream' mode) or the
+        winning answer in one piece ('hedge' mode); on_abandon(reason, partial) fires before
+        escalating, with the 8B text generated so far.
+        """
+        if model != NORMAL_MODEL:
+            text, _ = self._attempt(model, messages, PRIORITY_INTERACTIVE, on_delta=on_delta)
+            return text, model
+        if self.mode == "hedge":
+            return self._complete_hedged(messages, on_delta, on_abandon)
+        return self._complete_streamed(messages, on_delta, on_abandon)
+
+    def _complete_streamed(self, messages, on_delta, on_abandon):
+        text, tracker = self._attempt(NORMAL_MODEL, messages, PRIORITY_INTERACTIVE, on_delta=on_delta, check=True)
+        if tracker.is_valid() or self._is_rate_limited(text):
+            return text, NORMAL_MODEL
+
+        if on_abandon:
+            on_abandon(tracker.broken_reason or f"missing {', '.join(tracker.missing())}", text)
+        text, _ = self._attempt(SMART_MODEL, messages, PRIORITY_ESCALATION, on_delta=on_delta)
+        return text, SMART_MODEL
+
+    def _complete_hedged(self, messages, on_delta, on_abandon):
+        cancel_fast, cancel_smart = threading.Event(), threading.Event()
+        fast_tracker = FormatTracker(self.budgets)
+        fast = self.executor.submit(self._attempt, NORMAL_MODEL, messages, PRIORITY_INTERACTIVE, cancel=cancel_fast, check=True, tracker=fast_tracker)
+        try:
+            text, tracker = fast.result(timeout=self.hedge_after)
+            if tracker.is_valid() or self._is_rate_limited(text):
+                return self._deliver(text, NORMAL_MODEL, on_delta)
+            reason = tracker.broken_reason or f"missing {', '.join(tracker.missing())}"
+        except FuturesTimeout:
+            reason = f"no valid 8B answer after {self.hedge_after}s, hedging with 70B"
+
+        if on_abandon:
+            on_abandon(reason, fast_tracker.text)
+        smart = self.executor.submit(self._attempt, SMART_MODEL, messages, PRIORITY_ESCALATION, cancel=cancel_smart)
+
+        # Race: the first answer that passes validation wins; a failed one waits for the other
+        attempts = {smart: (SMART_MODEL, cancel_smart), fast: (NORMAL_MODEL, cancel_fast)}
+        pending = set(attempts)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for attempt in done:
+                text, tracker = attempt.result()
+                if tracker.is_valid() and not self._is_rate_limited(text):
+                    for other in pending:
+                        attempts[other][1].set()
+                    return self._deliver(text, attempts[attempt][0], on_delta)
+
+        # Neither passed: the 70B answer, as without hedging
+        text, _ = smart.result()
+        return self._deliver(text, SMART_MODEL, on_delta)
+
+    @staticmethod
+    def _deliver(text, model, on_delta):
+        if on_delta:
+            on_delta(text)
+        return text, model
+
+    def _attempt(self, model, messages, priority, on_delta=None, cancel=None, check=False, tracker=None):
+        """Streams one completion. Stops early when cancelled or (with check) when the format breaks."""
+        tracker = tracker or FormatTracker(self.budgets)
+        stream = self.llm.stream_completion(model, messages, priority=priority)
+        try:
+            for delta in stream:
+                if cancel is not None and cancel.is_set():
+                    break
+                ok = tracker.feed(delta)
+                if on_delta:
+                    on_delta(delta)
+                if check and not ok and not self._is_rate_limited(tracker.text):
+                    break
+        finally:
+            stream.close()
+        return tracker.text, tracker
+
+    @staticmethod
+    def _is_rate_limited(text):
+        # Escalating a rate-limited request only burns more quota
+        return "rate_limit_exceeded" in text or "Request too large" in text
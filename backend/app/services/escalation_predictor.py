@@ -0,0 +1,118 @@
+import json
+import math
+import os
+import numpy as np
+from backend.app.core.config import NORMAL_MODEL, ESCALATION_PREDICTOR_PATH, ESCALATION_PREDICTOR_THRESHOLD
+
+INTENTS = ["rules", "versions", "market", "meta", "off_topic", "clarify"]
+FEATURE_NAMES = ["cards", "chunks", "log_query_words", "history_turns", "log_prompt_tokens"] + [f"intent_{i}" for i in INTENTS]
+# Keys of the logged "features" dict (see log_interaction) the vector is built from
+FEATURE_KEYS = ("intent", "cards", "chunks", "query_words", "history_turns", "prompt_tokens")
+
+
+def was_escalated(entry):
+    """Label of a logged answer: 8B was asked first but the answer came from 70B."""
+    return entry.get("model") == NORMAL_MODEL and bool(entry.get("is_gold"))
+
+
+def has_features(entry):
+    """True when a logged interaction recorded every feature the predictor uses."""
+    feats = entry.get("features")
+    return isinstance(feats, dict) and all(feats.get(key) is not None for key in FEATURE_KEYS)
+
+
+def extract_features(entry):
+    """
+    Feature vector for a logged interaction (or a live request shaped like one).
+    Only recorded values are used: older log lines without them are not backfilled
+    with constants (see has_features), since those would teach the model nothing real.
+    """
+    if not has_features(entry):
+        raise ValueError("interaction has no recorded features")
+    feats = entry["features"]
+    return [
+        float(feats["cards"]),
+        float(feats["chunks"]),
+        math.log1p(feats["query_words"]),
+        float(feats["history_turns"]),
+        math.log1p(feats["prompt_tokens"]),
+    ] + [1.0 if feats["intent"] == i else 0.0 for i in INTENTS]
+
+
+class EscalationPredictor:
+    """
+    Logistic-regression router trained offline on logs/interactions.jsonl
+    (see scripts/train_escalation_predictor.py). Predicts whether an 8B answer
+    would be escalated, so the request can start on 70B instead of burning
+    a full 8B generation first.
+    """
+
+    def __init__(self, weights, bias, mean, std, threshold=ESCALATION_PREDICTOR_THRESHOLD, metrics=None):
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.bias = float(bias)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.std = np.asarray(std, dtype=np.float64)
+        self.threshold = threshold
+        self.metrics = metrics or {}
+
+    # --- Inference ---
+
+    def probability(self, features):
+        x = (np.asarray(features, dtype=np.float64) - self.mean) / self.std
+        return float(1.0 / (1.0 + np.exp(-(x @ self.weights + self.bias))))
+
+    def should_escalate(self, features):
+        return self.probability(features) >= self.threshold
+
+    # --- Training ---
+
+    @classmethod
+    def fit(cls, X, y, threshold=ESCALATION_PREDICTOR_THRESHOLD, epochs=2000, lr=0.1, l2=0.01):
+        """Batch gradient descent on standardized features with class-balanced weights."""
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        mean = X.mean(axis=0)
+        std = X.std(axis=0)
+        std[std == 0] = 1.0
+        Xs = (X - mean) / std
+
+        # Escalations are rare: weight them up so the model does not just learn "never"
+        pos = y.sum()
+        sample_w = np.where(y == 1, len(y) / (2 * pos) if pos else 1.0,
+                            len(y) / (2 * (len(y) - pos)) if pos < len(y) else 1.0)
+
+        w = np.zeros(X.shape[1])
+        b = 0.0
+        for _ in range(epochs):
+            p = 1.0 / (1.0 + np.exp(-(Xs @ w + b)))
+            err = (p - y) * sample_w
+            w -= lr * (Xs.T @ err / len(y) + l2 * w)
+            b -= lr * err.mean()
+        return cls(w, b, mean, std, threshold)
+
+    # --- Persistence ---
+
+    def save(self, path=ESCALATION_PREDICTOR_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "features": FEATURE_NAMES,
+                "weights": self.weights.tolist(),
+                "bias": self.bias,
+                "mean": self.mean.tolist(),
+                "std": self.std.tolist(),
+                "threshold": self.threshold,
+                "metrics": self.metrics,
+            }, f, indent=2)
+
+    @classmethod
+    def load(cls, path=ESCALATION_PREDICTOR_PATH):
+        """Returns the trained predictor, or None when none has been trained (or features changed)."""
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("features") != FEATURE_NAMES:
+            print("⚠️ Escalation predictor was trained on different features. Retrain it.")
+            return None
+        return cls(data["weights"], data["bias"], data["mean"], data["std"], data.get("threshold", ESCALATION_PREDICTOR_THRESHOLD), data.get("metrics"))
@@ -0,0 +1,85 @@
+import itertools
+import json
+import os
+import threading
+from backend.app.core.config import PERSONA_POOL_PATH
+
+# Pre-generated Judge persona answers for intents that never need fresh generation.
+# scripts/generate_persona_pool.py can write more variants to PERSONA_POOL_PATH.
+PERSONA_RESPONSES = {
+    "meta": [
+        "I am the MTG Know-it-all Judge, the final word on Magic: The Gathering. Ask me about:\n"
+        "- Rules & Interactions (e.g., 'How does Blood Moon interact with Urza's Saga?')\n"
+        "- Card Data (e.g., 'Tell me about Black Lotus')\n"
+        "- Editions (e.g., 'Show me all versions of Sol Ring')\n"
+        "- Pricing (e.g., 'What is the price of Ragavan?')",
+        "You are speaking with the MTG Know-it-all Judge. Every card, every rule, every edition: I know them all. "
+        "Bring me a tricky interaction ('Can I Bolt the Bird in response to equip?'), a card to explain, "
+        "its printings, or its current market price.",
+        "Authority on Magic: The Gathering, at your service. I settle rules disputes with the Comprehensive Rules, "
+        "explain any card from its Oracle text, list its printings and check Cardmarket and CardTrader prices. "
+        "Try 'How does Trample work with deathtouch?'.",
+    ],
+    "off_topic": [
+        "That is not Magic: The Gathering, and therefore not my concern. Bring me a rules question or take it elsewhere.",
+        "Judge's ruling: off-topic. The stack is empty, and so is my interest. Ask me about Magic.",
+        "I adjudicate Magic: The Gathering and nothing else. Your question has been exiled. Try a card or a rules interaction.",
+        "Warning issued for Unsporting Conduct: wasting a Judge's time. I only answer questions about Magic: The Gathering.",
+    ],
+    "clarify": [
+        "I need more information to rule on this. Which card(s) are involved, and what is the game state (phase, board, stack)?",
+        "Please name the card(s) and describe the situation: whose turn it is, what is on the stack and what is on the battlefield.",
+        "Too little to go on. Tell me the exact card names and the moment in the turn, and I will give you a ruling.",
+    ],
+}
+
+
+class PersonaPool:
+    """Rotates through pre-generated persona answers per intent, so repeats vary without an LLM call."""
+
+    def __init__(self, path=PERSONA_POOL_PATH, responses=PERSONA_RESPONSES):
+        self.responses = {intent: list(answers) for intent, answers in responses.items()}
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for intent, answers in json.load(f).items():
+                    self.responses.setdefault(intent, []).extend(answers)
+        self._counters = {intent: itertools.count() for intent in self.responses}
+        self._lock = threading.Lock()
+
+    def __contains__(self, intent):
+        return bool(self.responses.get(intent))
+
+    def next(self, intent):
+        answers = self.responses[intent]
+        with self._lock:
+            i = next(self._counters[intent])
+        return answers[i % len(answers)]
+
+
+def render_card_info(cards, max_rulings=3):
+    """Card explanation straight from CardService data (replaces an LLM restatement of the same text)."""
+    if not cards:
+        return ""
+    blocks = []
+    for card in cards:
+        stats = ""
+        if card.get('power') and card.get('toughness'):
+            stats = f" | P/T: {card['power']}/{card['toughness']}"
+        elif card.get('loyalty'):
+            stats = f" | Loyalty: {card['loyalty']}"
+
+        block = (
+            f"🃏 **{card['name']}** {card.get('mana_cost') or ''}\n"
+            f"{card.get('type_line', 'N/A')}{stats}\n\n"
+            f"📜 {card.get('oracle_text', 'N/A')}\n"
+        )
+        rulings = (card.get('rulings') or [])[:max_rulings]
+        if rulings:
+            block += "\n⚖️ Key rulings:\n" + "\n".join(f"- {r}" for r in rulings) + "\n"
+        if card.get('set_name'):
+            block += f"\n🎨 {card['set_name']} ({(card.get('rarity') or '').title()})"
+            if card.get('artist'):
+                block += f" · Art by {card['artist']}"
+            block += "\n"
+        blocks.append(block)
+    return "\n---\n".join(blocks)
@@ -0,0 +1,91 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from backend.app.core.config import (
+    NORMAL_MODEL, HISTORY_VERBATIM_TURNS, HISTORY_TOKEN_BUDGET, HISTORY_SUMMARY_CHARS, HISTORY_SUMMARY_CACHE_SIZE
+)
+from backend.app.services.answer_cache import CARD_INFO_PATTERN
+from backend.app.services.scheduler import estimate_tokens
+
+RULING_PATTERN = re.compile(r'RULING\W*:?\**\s*(.*?)(?=\n\s*\d\.\s|GAMEPLAY SCENARIO|$)', re.IGNORECASE | re.DOTALL)
+IMAGE_PATTERN = re.compile(r'!\[[^\]]*\]\([^)]*\)')
+
+
+def answer_key(answer):
+    """Key of a judge answer in the summary stores (session artifacts and the in-process LRU)."""
+    return hashlib.sha1(answer.encode("utf-8")).hexdigest()
+
+
+def summarize_answer(answer, max_chars=HISTORY_SUMMARY_CHARS):
+    """Short stand-in for an old judge answer: its RULING section (or opening text), prefixed with the card."""
+    text = IMAGE_PATTERN.sub("", answer).strip()
+    ruling = RULING_PATTERN.search(text)
+    body = " ".join((ruling.group(1) if ruling else text).split())
+    if len(body) > max_chars:
+        body = body[:max_chars].rsplit(" ", 1)[0] + "…"
+    card = CARD_INFO_PATTERN.search(text)
+    prefix = f"[Earlier ruling on {card.group(1).strip()}] " if card else "[Earlier answer] "
+    return prefix + body
+
+
+class HistoryCompactor:
+    """
+    Turns the flat [user, judge, user, judge, ...] history into prompt messages
+    that fit a per-model token budget. The last `verbatim_turns` exchanges are
+    kept as is; older judge answers are replaced by their summary. If that is
+    still too large, the oldest exchanges are dropped, then recent answers are
+    summarized too.
+
+    Each turn's summary is stored with the session (SessionArtifacts.remember_summary)
+    and passed back in as `summaries`, so any worker can compact a conversation
+    without re-summarizing it. The in-process LRU keyed by the answer's hash only
+    spares recomputation (e.g. for the CLI, which has no session store).
+    """
+
+    def __init__(self, verbatim_turns=HISTORY_VERBATIM_TURNS, budgets=HISTORY_TOKEN_BUDGET, max_summaries=HISTORY_SUMMARY_CACHE_SIZE):
+        self.verbatim_turns = verbatim_turns
+        self.budgets = budgets
+        self.max_summaries = max_summaries
+        self._summaries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def summary(self, answer, stored=None):
+        """Summary of a judge answer: from `stored` (answer_key -> summary) when present, else the LRU."""
+        key = answer_key(answer)
+        if stored and key in stored:
+            return stored[key]
+        with self._lock:
+            if key in self._summaries:
+                self._summaries.move_to_end(key)
+                return self._summaries[key]
+        summary = summarize_answer(answer)
+        with self._lock:
+            self._summaries[key] = summary
+            while len(self._summaries) > self.max_summaries:
+                self._summaries.popitem(last=False)
+        return summary
+
+    def compact(self, history, model=NORMAL_MODEL, summaries=None):
+        """Returns the user/assistant messages for `history` within the model's budget (`summaries`: the session's stored ones)."""
+        turns = [(history[i], history[i + 1]) for i in range(0, len(history) - 1, 2)]
+        # Per turn: is the judge answer kept verbatim?
+        verbatim = [i >= len(turns) - self.verbatim_turns for i in range(len(turns))]
+        budget = self.budgets.get(model, self.budgets[NORMAL_MODEL])
+
+        def build():
+            messages = []
+            for (question, answer), full in zip(turns, verbatim):
+                messages.append({"role": "user", "content": question})
+                messages.append({"role": "assistant", "content": answer if full else self.summary(answer, summaries)})
+            return messages
+
+        messages = build()
+        while turns and estimate_tokens(messages) > budget:
+            if len(turns) > self.verbatim_turns or not any(verbatim):
+                turns.pop(0)
+                verbatim.pop(0)
+            else:
+                verbatim[verbatim.index(True)] = False
+            messages = build()
+        return messages
@@ -1,33 +1,171 @@
+import hashlib
 import json
 import os
-from backend.app.core.config import BR_FILE
+import threading
+import time
+from backend.app.core.config import BR_FILE, LEGALITY_WATCH_INTERVAL
+from backend.app.services.card_catalog import CardCatalog, normalize_card_name
+
+STATUS_LABELS = {"banned": "**BANNED**", "restricted": "**RESTRICTED**"}
+
 
 class LegalityService:
-    def __init__(self):
-        self.br_data = self._load_data()
+    """
+    Card -> {format: status} index, built once at load time: Scryfall legalities from the
+    local card catalog, overlaid with the official B&R list (banned_restricted.json), which
+    can be fresher and is authoritative for every format it covers (unbans included).
+    Cards the file lists without saying banned or restricted keep their catalog status, and
+    "banned" wins over "restricted". Keys are normalized names (see normalize_card_name), so
+    lookups are a single dict hit regardless of case, accents or which face of a split card is given.
+
+    A new banned_restricted.json (src/br_updater.py) is picked up by reload() /
+    start_watch(): the new index is built off to the side and swapped in as one
+    object, so a lookup sees either the old or the new list, never a mix.
+    """
+
+    def __init__(self, catalog=None, br_file=BR_FILE):
+        self.br_file = br_file
+        self.catalog = catalog if catalog is not None else CardCatalog()
+        self._stamp = None
+        self._state = None
+        self._reload_lock = threading.Lock()
+        self.reload()
+
+    # Everything a lookup reads lives in one dict, replaced (never mutated) on reload
+    @property
+    def br_data(self):
+        return self._state["br_data"]
+
+    @property
+    def index(self):
+        return self._state["index"]
+
+    @property
+    def version(self):
+        """Content hash of the loaded B&R file ("" when there is none)."""
+        return self._state["version"]
+
+    def _file_stamp(self):
+        try:
+            stat = os.stat(self.br_file)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def reload(self, force=False):
+        """Rebuilds the index if the B&R file changed on disk. Returns True when a new version was swapped in."""
+        with self._reload_lock:
+            return self._reload(force)
+
+    def _reload(self, force):
+        stamp = self._file_stamp()
+        if self._state is not None and stamp == self._stamp and not force:
+            return False
+        raw = self._load_data()
+        version = hashlib.sha256(raw).hexdigest()[:12] if raw else ""
+        if self._state is not None and version == self.version:
+            self._stamp = stamp  # touched, not changed
+            return False
+        try:
+            br_data = json.loads(raw) if raw else {}
+        except ValueError:
+            br_data = {}
+        index, format_names = self._build_index(br_data)
+        self._state = {"br_data": br_data, "index": index, "format_names": format_names, "version": version}
+        self._stamp = stamp
+        return True
+
+    def start_watch(self, interval=LEGALITY_WATCH_INTERVAL):
+        """Polls the B&R file on a daemon thread and hot-swaps the index when it changes."""
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    if self.reload():
+                        print(f"⚖️ Banned & Restricted list reloaded (version {self.version}).")
+                except Exception as e:
+                    print(f"⚠️ B&R reload failed: {e}")
+
+        threading.Thread(target=loop, name="legality-watch", daemon=True).start()
 
     def _load_data(self):
-        """Loads cached B&R data."""
-        if os.path.exists(BR_FILE):
+        """Loads cached B&R data (raw bytes, b"" when missing)."""
+        if os.path.exists(self.br_file):
             try:
-                with open(BR_FILE, 'r') as f:
-                    return json.load(f)
+                with open(self.br_file, 'rb') as f:
+                    return f.read()
             except Exception:
-                return {}
-        return {}
+                return b""
+        return b""
 
-    def check_legality(self, card_name):
-        """Cross-references card name with official B&R data."""
-        status = []
-        for fmt, list_data in self.br_data.items():
+    def _key(self, card_name):
+        key = normalize_card_name(card_name)
+        return self.catalog.keys.get(key, key)
+
+    def _build_index(self, br_data):
+        # The B&R file is authoritative for the formats it lists: a catalog "banned"/"restricted"
+        # there that the file no longer carries is an unban, so it falls back to "legal"
+        covered = {fmt.lower() for fmt, list_data in br_data.items()
+                   if fmt != "Categorical" and isinstance(list_data, (list, dict))}
+        # Catalog legalities are shared, not copied: only cards the file changes get their own dict
+        index = {}
+        format_names = {}
+        overlaid = set()
+        for key, card in self.catalog.cards.items():
+            legalities = card["legalities"]
+            stale = [fmt for fmt in covered if legalities.get(fmt) in STATUS_LABELS]
+            if stale:
+                legalities = {**legalities, **dict.fromkeys(stale, "legal")}
+                overlaid.add(key)
+            index[key] = legalities
+
+        def mark(fmt, names, status=None):
+            # status None: listed without saying which list, so the catalog status stands
+            fmt_id = fmt.lower()
+            format_names.setdefault(fmt_id, fmt)
+            for name in names:
+                key = self._key(name)
+                if status is None:
+                    status_here = self.catalog.cards.get(key, {}).get("legalities", {}).get(fmt_id)
+                    if status_here is None:
+                        continue
+                else:
+                    status_here = status
+                if key not in overlaid:
+                    index[key] = dict(index.get(key, {}))
+                    overlaid.add(key)
+                index[key][fmt_id] = status_here
+
+        for fmt, list_data in br_data.items():
             if fmt == "Categorical":
                 continue
             if isinstance(list_data, list):
-                if card_name in list_data:
-                    status.append(f"**BANNED** in {fmt}")
+                mark(fmt, list_data, "banned")
             elif isinstance(list_data, dict):
-                if card_name in list_data.get("banned", []):
-                    status.append(f"**BANNED** in {fmt}")
-                if card_name in list_data.get("restricted", []):
-                    status.append(f"**RESTRICTED** in {fmt}")
-        return status
+                banned = list(list_data.get("banned", []))
+                restricted = list(list_data.get("restricted", []))
+                # Files from older syncs put every Vintage card on both lists: those say nothing
+                both = set(banned) & set(restricted)
+                mark(fmt, [*list_data.get("unclassified", []), *both])
+                mark(fmt, [name for name in restricted if name not in both], "restricted")
+                # Last: "banned" wins over any other listing of the card
+                mark(fmt, [name for name in banned if name not in both], "banned")
+        return index, format_names
+
+    def format_status(self, card_name, state=None):
+        """Status per format for a card, e.g. {"modern": "banned", "vintage": "restricted", ...} ({} if unknown)."""
+        return (state or self._state)["index"].get(self._key(card_name), {})
+
+    def check_many(self, card_names, formats=None):
+        """format_status for many cards at once (all against the same index version), optionally restricted to `formats`."""
+        state = self._state
+        statuses = [self.format_status(name, state) for name in card_names]
+        if formats:
+            statuses = [{fmt: s.get(fmt, "unknown") for fmt in formats} for s in statuses]
+        return statuses
+
+    def check_legality(self, card_name):
+        """Banned/restricted notices for a card, e.g. ["**BANNED** in Modern"]."""
+        state = self._state
+        return [f"{STATUS_LABELS[status]} in {state['format_names'].get(fmt, fmt.title())}"
+                for fmt, status in self.format_status(card_name, state).items() if status in STATUS_LABELS]
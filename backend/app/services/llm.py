@@ -1,40 +1,76 @@
 import json
-from groq import Groq
-from backend.app.core.config import NORMAL_MODEL, SMART_MODEL, PROMPT_INTENT
+from groq import Groq, AsyncGroq, RateLimitError
+from backend.app.core.config import NORMAL_MODEL, SMART_MODEL, PROMPT_INTENT, GROQ_BASE_URL
+from backend.app.services.scheduler import PRIORITY_INTERACTIVE, CHARS_PER_TOKEN, estimate_tokens
+
+PROMPT_EXTRACT_CARDS = """Identify MTG card names EXPLICITLY mentioned in the user's latest query.
+        
+        NEGATIVE CONSTRAINTS:
+        - DO NOT return a name if it is not a substring of the query.
+        - DO NOT resolve pronouns like 'it', 'that card', 'the first one', or 'this'.
+        - DO NOT use information from the conversation history to infer card names.
+        
+        EXAMPLES:
+        - Query: 'what is its price?' -> []
+        - Query: 'Tell me about Black Lotus' -> ["Black Lotus"]
+        - Query: 'How much for the first one?' -> []
+        - Query: 'I was asking about Tundra earlier' -> ["Tundra"]
+        
+        Return ONLY a JSON list of strings. Empty list if none."""
+
+
+def _stream_usage(chunk):
+    """total_tokens reported on a streamed chunk (Groq puts usage in x_groq on the last one), else None."""
+    usage = getattr(chunk, "usage", None) or getattr(getattr(chunk, "x_groq", None), "usage", None)
+    return getattr(usage, "total_tokens", None)
 
 class LLMService:
     VALID_INTENTS = ["rules", "lookup", "meta", "off_topic", "clarify", "versions", "market", "retry"]
 
-    def __init__(self, api_key):
-        self.client = Groq(api_key=api_key)
+    def __init__(self, api_key, scheduler=None):
+        self.client = Groq(api_key=api_key, base_url=GROQ_BASE_URL)
+        self.scheduler = scheduler
+
+    def _create(self, priority=PRIORITY_INTERACTIVE, **kwargs):
+        """Sends a chat completion, going through the rate-limit scheduler when one is set."""
+        if self.scheduler is None:
+            return self.client.chat.completions.create(**kwargs)
+        model = kwargs["model"]
+        estimate = estimate_tokens(kwargs["messages"], kwargs.get("max_tokens"))
+        self.scheduler.acquire(model, estimate, priority)
+        try:
+            raw = self.client.chat.completions.with_raw_response.create(**kwargs)
+        except RateLimitError as e:
+            self.scheduler.penalize(model, e.response.headers)
+            raise
+        self.scheduler.observe(model, raw.headers)
+        resp = raw.parse()
+        if not kwargs.get("stream") and resp.usage:
+            self.scheduler.settle(model, estimate, resp.usage.total_tokens)
+        return resp
+
+    def _settle_stream(self, model, messages, max_tokens, usage, streamed_chars):
+        """
+        Returns the unused part of a streamed call's reservation once the stream closes:
+        by the usage Groq reports on the final chunk, or, when the stream ended early
+        (abandoned answer, error), by an estimate of what was actually generated.
+        """
+        if self.scheduler is None:
+            return
+        if usage is None:
+            usage = estimate_tokens(messages) + streamed_chars // CHARS_PER_TOKEN
+        self.scheduler.settle(model, estimate_tokens(messages, max_tokens), usage)
 
     def classify_intent(self, query, history=[]):
         """Determines the user's intent."""
-        messages = [{"role": "system", "content": PROMPT_INTENT}]
-        if history:
-            hist_str = ""
-            for i in range(0, len(history), 2):
-                if i < len(history): hist_str += f"User: {history[i]}\n"
-                if i+1 < len(history): hist_str += f"Judge: {history[i+1][:100]}...\n"
-            messages.append({"role": "user", "content": f"History:\n{hist_str}"})
-        
-        messages.append({"role": "user", "content": f"Query: {query}"})
-        
         try:
-            resp = self.client.chat.completions.create(
+            resp = self._create(
                 model=SMART_MODEL,
-                messages=messages,
+                messages=self._intent_messages(query, history),
                 temperature=0,
                 max_tokens=10
             )
-            prediction = resp.choices[0].message.content.lower().strip()
-            prediction = "".join(c for c in prediction if c.isalpha() or c == '_')
-            
-            valid_intents = self.VALID_INTENTS
-            for intent in valid_intents:
-                if intent in prediction:
-                    return intent
-            return "rules"
+            return self._parse_intent(resp.choices[0].message.content)
         except Exception as e:
             print(f"Error classifying intent: {e}")
             return "rules"
@@ -43,88 +79,41 @@ class LLMService:
         """Extracts card names explicitly mentioned in the query.
         Does NOT resolve pronouns or context—only returns names physically in the query string.
         """
-        prompt = """Identify MTG card names EXPLICITLY mentioned in the user's latest query.
-        
-        NEGATIVE CONSTRAINTS:
-        - DO NOT return a name if it is not a substring of the query.
-        - DO NOT resolve pronouns like 'it', 'that card', 'the first one', or 'this'.
-        - DO NOT use information from the conversation history to infer card names.
-        
-        EXAMPLES:
-        - Query: 'what is its price?' -> []
-        - Query: 'Tell me about Black Lotus' -> ["Black Lotus"]
-        - Query: 'How much for the first one?' -> []
-        - Query: 'I was asking about Tundra earlier' -> ["Tundra"]
-        
-        Return ONLY a JSON list of strings. Empty list if none."""
-
-        
-        # We don't pass history to extraction to avoid the LLM getting confused 
-        # about what is 'new' vs 'context'.
-        messages = [
-            {"role": "system", "content": prompt},
-            {"role": "user", "content": f"Query: {query}"}
-        ]
-        
         try:
-            resp = self.client.chat.completions.create(
+            resp = self._create(
                 model=SMART_MODEL,
-                messages=messages,
+                messages=self._extract_messages(query),
                 temperature=0,
                 max_tokens=100
             )
-            content = resp.choices[0].message.content.strip()
-            if "[" in content and "]" in content:
-                content = content[content.find("["):content.rfind("]")+1]
-            return list(set(json.loads(content)))
+            return self._parse_cards(resp.choices[0].message.content)
         except Exception:
             return []
 
     def generate_search_query(self, query, history=[]):
         """Converts natural language into Scryfall search syntax."""
-        from backend.app.core.config import PROMPT_SEARCH
-        
         # Short-circuit for numeric selection
         if query.isdigit():
             return query
-
-        messages = [{"role": "system", "content": PROMPT_SEARCH}]
-        if history:
-            messages.append({"role": "user", "content": f"Context: {history[-2:]}"})
-        messages.append({"role": "user", "content": query})
         
         try:
-            resp = self.client.chat.completions.create(
+            resp = self._create(
                 model=SMART_MODEL,
-                messages=messages,
+                messages=self._search_messages(query, history),
                 temperature=0,
                 max_tokens=100
             )
-            result = resp.choices[0].message.content.strip()
-            
-            # Post-process: specific fixes
-            # 1. If it starts with ! but has spaces and NO quotes, add them.
-            if result.startswith("!") and " " in result and '"' not in result:
-                # !Murktide Regent -> !"Murktide Regent"
-                card_part = result[1:]
-                result = f"!\"{card_part}\""
-            
-            return result
+            return self._parse_search_query(resp.choices[0].message.content)
         except Exception:
             return query
 
 
     def should_show_prices(self, query):
         """Detects if the user is asking for pricing."""
-        from backend.app.core.config import PROMPT_PRICE_DETECT
-        messages = [
-            {"role": "system", "content": PROMPT_PRICE_DETECT},
-            {"role": "user", "content": query}
-        ]
         try:
-            resp = self.client.chat.completions.create(
+            resp = self._create(
                 model=SMART_MODEL,
-                messages=messages,
+                messages=self._price_detect_messages(query),
                 temperature=0,
                 max_tokens=5
             )
@@ -134,25 +123,242 @@ class LLMService:
 
     def rewrite_query(self, query, history=[]):
         """Rewrites the query into a self-contained version using history."""
-        from backend.app.core.config import PROMPT_REWRITER
         if not history:
             return query
-            
+        
+        try:
+            resp = self._create(
+                model=NORMAL_MODEL,
+                messages=self._rewrite_messages(query, history),
+                temperature=0,
+                max_tokens=200
+            )
+            return resp.choices[0].message.content.strip()
+        except Exception:
+            return query
+
+    def get_completion(self, model, messages, temperature=0.7, max_tokens=1000, priority=PRIORITY_INTERACTIVE):
+        """Generic completion wrapper."""
+        try:
+            resp = self._create(
+                priority=priority,
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
+            return resp.choices[0].message.content
+        except Exception as e:
+            return f"Error: {e}"
+
+    def stream_completion(self, model, messages, temperature=0.7, max_tokens=1000, priority=PRIORITY_INTERACTIVE):
+        """Streaming completion wrapper. Yields content deltas as they arrive."""
+        try:
+            stream = self._create(
+                priority=priority,
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True
+            )
+            usage, streamed = None, 0
+            try:
+                for chunk in stream:
+                    usage = _stream_usage(chunk) or usage
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        streamed += len(delta)
+                        yield delta
+            finally:
+                # Also runs when the consumer abandons the answer early
+                stream.close()
+                self._settle_stream(model, messages, max_tokens, usage, streamed)
+        except Exception as e:
+            yield f"Error: {e}"
+
+    def validate_format(self, text):
+        """Checks if the response follows the 4-section format (robustly)."""
+        # We check for the keywords rather than exact emoji sequences to be robust
+        required_keywords = ["CARD INFO", "ORACLE TEXT", "RULING", "GAMEPLAY SCENARIO"]
+        text_upper = text.upper()
+        missing = [kw for kw in required_keywords if kw not in text_upper]
+        return len(missing) == 0, missing
+
+    # --- Prompt builders & parsers (shared by the sync and async clients) ---
+
+    @staticmethod
+    def _intent_messages(query, history):
+        messages = [{"role": "system", "content": PROMPT_INTENT}]
+        if history:
+            hist_str = ""
+            for i in range(0, len(history), 2):
+                if i < len(history): hist_str += f"User: {history[i]}\n"
+                if i+1 < len(history): hist_str += f"Judge: {history[i+1][:100]}...\n"
+            messages.append({"role": "user", "content": f"History:\n{hist_str}"})
+        
+        messages.append({"role": "user", "content": f"Query: {query}"})
+        return messages
+
+    def _parse_intent(self, content):
+        prediction = content.lower().strip()
+        prediction = "".join(c for c in prediction if c.isalpha() or c == '_')
+        
+        for intent in self.VALID_INTENTS:
+            if intent in prediction:
+                return intent
+        return "rules"
+
+    @staticmethod
+    def _extract_messages(query):
+        # We don't pass history to extraction to avoid the LLM getting confused 
+        # about what is 'new' vs 'context'.
+        return [
+            {"role": "system", "content": PROMPT_EXTRACT_CARDS},
+            {"role": "user", "content": f"Query: {query}"}
+        ]
+
+    @staticmethod
+    def _parse_cards(content):
+        content = content.strip()
+        if "[" in content and "]" in content:
+            content = content[content.find("["):content.rfind("]")+1]
+        return list(dict.fromkeys(json.loads(content)))  # deduplicated, in the model's order (not hash order)
+
+    @staticmethod
+    def _search_messages(query, history):
+        from backend.app.core.config import PROMPT_SEARCH
+        messages = [{"role": "system", "content": PROMPT_SEARCH}]
+        if history:
+            messages.append({"role": "user", "content": f"Context: {history[-2:]}"})
+        messages.append({"role": "user", "content": query})
+        return messages
+
+    @staticmethod
+    def _parse_search_query(content):
+        result = content.strip()
+        
+        # Post-process: specific fixes
+        # 1. If it starts with ! but has spaces and NO quotes, add them.
+        if result.startswith("!") and " " in result and '"' not in result:
+            # !Murktide Regent -> !"Murktide Regent"
+            card_part = result[1:]
+            result = f"!\"{card_part}\""
+        
+        return result
+
+    @staticmethod
+    def _price_detect_messages(query):
+        from backend.app.core.config import PROMPT_PRICE_DETECT
+        return [
+            {"role": "system", "content": PROMPT_PRICE_DETECT},
+            {"role": "user", "content": query}
+        ]
+
+    @staticmethod
+    def _rewrite_messages(query, history):
+        from backend.app.core.config import PROMPT_REWRITER
         hist_str = ""
         # Use last 4 messages for context
         for i in range(max(0, len(history)-4), len(history), 2):
             if i < len(history): hist_str += f"User: {history[i]}\n"
             if i+1 < len(history): hist_str += f"Judge: {history[i+1][:100]}...\n"
             
-        messages = [
+        return [
             {"role": "system", "content": PROMPT_REWRITER},
             {"role": "user", "content": f"History:\n{hist_str}\n\nLast User Query: {query}"}
         ]
-        
+
+
+class AsyncLLMService(LLMService):
+    """AsyncGroq-backed variant of LLMService for the API. Same prompts, awaitable calls."""
+
+    def __init__(self, api_key, scheduler=None):
+        self.client = AsyncGroq(api_key=api_key, base_url=GROQ_BASE_URL)
+        self.scheduler = scheduler
+
+    async def _acreate(self, priority=PRIORITY_INTERACTIVE, **kwargs):
+        if self.scheduler is None:
+            return await self.client.chat.completions.create(**kwargs)
+        model = kwargs["model"]
+        estimate = estimate_tokens(kwargs["messages"], kwargs.get("max_tokens"))
+        await self.scheduler.acquire_async(model, estimate, priority)
+        try:
+            raw = await self.client.chat.completions.with_raw_response.create(**kwargs)
+        except RateLimitError as e:
+            self.scheduler.penalize(model, e.response.headers)
+            raise
+        self.scheduler.observe(model, raw.headers)
+        resp = await raw.parse()
+        if not kwargs.get("stream") and resp.usage:
+            self.scheduler.settle(model, estimate, resp.usage.total_tokens)
+        return resp
+
+    async def classify_intent(self, query, history=[]):
+        """Determines the user's intent."""
+        try:
+            resp = await self._acreate(
+                model=SMART_MODEL,
+                messages=self._intent_messages(query, history),
+                temperature=0,
+                max_tokens=10
+            )
+            return self._parse_intent(resp.choices[0].message.content)
+        except Exception as e:
+            print(f"Error classifying intent: {e}")
+            return "rules"
+
+    async def extract_cards(self, query, history=[]):
+        """Extracts card names explicitly mentioned in the query."""
+        try:
+            resp = await self._acreate(
+                model=SMART_MODEL,
+                messages=self._extract_messages(query),
+                temperature=0,
+                max_tokens=100
+            )
+            return self._parse_cards(resp.choices[0].message.content)
+        except Exception:
+            return []
+
+    async def generate_search_query(self, query, history=[]):
+        """Converts natural language into Scryfall search syntax."""
+        if query.isdigit():
+            return query
         try:
-            resp = self.client.chat.completions.create(
+            resp = await self._acreate(
+                model=SMART_MODEL,
+                messages=self._search_messages(query, history),
+                temperature=0,
+                max_tokens=100
+            )
+            return self._parse_search_query(resp.choices[0].message.content)
+        except Exception:
+            return query
+
+    async def should_show_prices(self, query):
+        """Detects if the user is asking for pricing."""
+        try:
+            resp = await self._acreate(
+                model=SMART_MODEL,
+                messages=self._price_detect_messages(query),
+                temperature=0,
+                max_tokens=5
+            )
+            return "true" in resp.choices[0].message.content.lower()
+        except Exception:
+            return False
+
+    async def rewrite_query(self, query, history=[]):
+        """Rewrites the query into a self-contained version using history."""
+        if not history:
+            return query
+        try:
+            resp = await self._acreate(
                 model=NORMAL_MODEL,
-                messages=messages,
+                messages=self._rewrite_messages(query, history),
                 temperature=0,
                 max_tokens=200
             )
@@ -160,10 +366,11 @@ class LLMService:
         except Exception:
             return query
 
-    def get_completion(self, model, messages, temperature=0.7, max_tokens=1000):
+    async def get_completion(self, model, messages, temperature=0.7, max_tokens=1000, priority=PRIORITY_INTERACTIVE):
         """Generic completion wrapper."""
         try:
-            resp = self.client.chat.completions.create(
+            resp = await self._acreate(
+                priority=priority,
                 model=model,
                 messages=messages,
                 temperature=temperature,
@@ -173,10 +380,29 @@ class LLMService:
         except Exception as e:
             return f"Error: {e}"
 
-    def validate_format(self, text):
-        """Checks if the response follows the 4-section format (robustly)."""
-        # We check for the keywords rather than exact emoji sequences to be robust
-        required_keywords = ["CARD INFO", "ORACLE TEXT", "RULING", "GAMEPLAY SCENARIO"]
-        text_upper = text.upper()
-        missing = [kw for kw in required_keywords if kw not in text_upper]
-        return len(missing) == 0, missing
+    async def stream_completion(self, model, messages, temperature=0.7, max_tokens=1000, priority=PRIORITY_INTERACTIVE):
+        """Streaming completion wrapper. Yields content deltas as they arrive."""
+        try:
+            stream = await self._acreate(
+                priority=priority,
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True
+            )
+            usage, streamed = None, 0
+            try:
+                async for chunk in stream:
+                    usage = _stream_usage(chunk) or usage
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        streamed += len(delta)
+                        yield delta
+            finally:
+                await stream.close()
+                self._settle_stream(model, messages, max_tokens, usage, streamed)
+        except Exception as e:
+            yield f"Error: {e}"
@@ -1,75 +1,265 @@
 import requests
 from bs4 import BeautifulSoup
+import datetime
+import heapq
+import math
+import threading
+import time
 import numpy as np
+from backend.app.core.config import (
+    MARKET_FORMATS, MOVERS_LOOKBACK_DAYS, MOVERS_TOP_K, MOVERS_MIN_PRICE, MOVERS_LIQUIDITY_DAYS,
+    MOVERS_MIN_LIQUIDITY, PRICE_HISTORY_POLL, ARBITRAGE_HIGH_PCT
+)
+from backend.app.services.price_history import PriceHistoryStore
+
+MOVER_LISTS = ("gainers_abs", "losers_abs", "gainers_pct", "losers_pct")
+
+
+def _top_k(candidates, score, name_ids, k):
+    """Indices of the k best-scoring candidates (score > 0), one print per card, via a heap."""
+    candidates = candidates[score[candidates] > 0]
+    if not candidates.size:
+        return []
+    # Best print of each card first, then keep the first print per card
+    order = np.lexsort((-score[candidates], name_ids[candidates]))
+    names = name_ids[candidates][order]
+    best = candidates[order][np.r_[True, names[1:] != names[:-1]]]
+    return heapq.nlargest(k, best.tolist(), key=score.__getitem__)
+
+
+def compute_movers(history, lookback=MOVERS_LOOKBACK_DAYS, top_k=MOVERS_TOP_K, min_prices=MOVERS_MIN_PRICE,
+                   liquidity_days=MOVERS_LIQUIDITY_DAYS, min_liquidity=MOVERS_MIN_LIQUIDITY):
+    """
+    Top gainers and losers (absolute and percentage EUR change over `lookback` days) per format,
+    from one vectorized pass over every print in the price history.
+
+    A print qualifies when it has a price on both ends, was listed on at least `min_liquidity`
+    of the last `liquidity_days` snapshots (Scryfall carries no volume, so listing continuity
+    stands in for liquidity) and was worth the format's minimum price on either end.
+    """
+    state = history.snapshot()  # one consistent version for the whole pass
+    n = len(state["ids"])
+    if len(state["days"]) < 2 or not n:
+        return {}
+    days, matrix = history.window(np.arange(n), max(lookback, liquidity_days), "eur", state)
+    end = days[-1]
+    base_row = max(int(np.searchsorted(days, end - lookback, side="right")) - 1, 0)
+    current, base = matrix[-1].astype(np.float64), matrix[base_row].astype(np.float64)
+
+    change = current - base
+    with np.errstate(invalid="ignore", divide="ignore"):
+        pct = change / base * 100
+    liquidity = np.mean(~np.isnan(matrix[days > end - liquidity_days]), axis=0)
+    eligible = ~np.isnan(change) & (base > 0) & (liquidity >= min_liquidity)
+    peak = np.fmax(current, base)
+    scores = {"gainers_abs": change, "losers_abs": -change, "gainers_pct": pct, "losers_pct": -pct}
+    scores = {kind: np.where(eligible, score, -np.inf) for kind, score in scores.items()}
+
+    formats = state["meta"]["formats"]
+    movers = {}
+    for fmt in ["all"] + [f for f in MARKET_FORMATS if f in formats]:
+        mask = eligible & (peak >= min_prices.get(fmt, min_prices["all"]))
+        if fmt != "all":
+            mask &= (state["legal"][:n] & (1 << formats.index(fmt))) != 0
+        candidates = np.nonzero(mask)[0]
+        entry = {"format": fmt, "as_of": datetime.date.fromordinal(int(end)).isoformat(), "days": int(end - days[base_row])}
+        for kind in MOVER_LISTS:
+            entry[kind] = [{
+                "name": state["meta"]["names"][i],
+                "set": state["meta"]["sets"][i],
+                "id": state["ids"][i],
+                "price": round(float(current[i]), 2),
+                "prev_price": round(float(base[i]), 2),
+                "change": round(float(change[i]), 2),
+                "pct": round(float(pct[i]), 1),
+            } for i in _top_k(candidates, scores[kind], state["name_ids"], top_k)]
+        movers[fmt] = entry
+    return movers
+
+
+def format_movers(movers, limit=5):
+    """Prompt block for the market analyst."""
+    if not movers or not any(movers[kind] for kind in MOVER_LISTS):
+        return ""
+    label = "all formats" if movers["format"] == "all" else movers["format"].title()
+    lines = [f"MARKET MOVERS ({label}, {movers['days']}-day EUR change to {movers['as_of']}):"]
+    titles = {"gainers_pct": "Top gainers (%)", "losers_pct": "Top losers (%)",
+              "gainers_abs": "Top gainers (€)", "losers_abs": "Top losers (€)"}
+    for kind in ("gainers_pct", "losers_pct", "gainers_abs", "losers_abs"):
+        items = [f"{m['name']} ({m['set']}) {m['prev_price']}€ → {m['price']}€ ({m['pct']:+.1f}%)" for m in movers[kind][:limit]]
+        if items:
+            lines.append(f"- {titles[kind]}: " + "; ".join(items))
+    return "\n".join(lines) + "\n"
+
+
+def parse_prices(values):
+    """Price strings ("12.5€", "3.10", "N/A", None) or numbers -> float array, NaN when missing."""
+    out = np.full(len(values), np.nan)
+    for i, v in enumerate(values):
+        try:
+            out[i] = float(v) if isinstance(v, (int, float)) else float(str(v).replace('€', '').strip())
+        except (TypeError, ValueError):
+            pass
+    return out
+
+
+def arbitrage(cm, ct, high_pct=ARBITRAGE_HIGH_PCT):
+    """Vectorized CardTrader vs Cardmarket spread; NaN (rating "N/A") where either price is missing."""
+    cm, ct = np.asarray(cm, dtype=np.float64), np.asarray(ct, dtype=np.float64)
+    diff = ct - cm
+    with np.errstate(invalid="ignore", divide="ignore"):
+        pct = np.where(cm > 0, diff / cm * 100, np.where(np.isnan(diff), np.nan, 0.0))
+    rating = np.where(np.isnan(pct), "N/A", np.where(np.abs(pct) > high_pct, "High", "Normal"))
+    return {"cm": cm, "ct": ct, "diff": diff, "pct": pct, "rating": rating}
+
+
+def batch_records(columns):
+    """Rows of an analyze_batch result, JSON-ready (NaN -> None, prices rounded)."""
+    keys = list(columns)
+    rows = []
+    for values in zip(*(columns[k].tolist() for k in keys)):
+        rows.append({k: (None if isinstance(v, float) and math.isnan(v) else round(v, 2) if isinstance(v, float) else v)
+                     for k, v in zip(keys, values)})
+    return rows
+
 
 class MarketIntelligenceService:
-    def __init__(self, cardtrader_service):
+    def __init__(self, cardtrader_service, history=None):
         self.ct_service = cardtrader_service
+        self.history = history if history is not None else PriceHistoryStore()
+        self._movers = {}
+        self._movers_text = {}
+        self.refresh_movers()
 
-    def get_market_movers(self):
-        """
-        Market movers functionality disabled as per user request to remove MTGStocks.
-        Returns empty list for compatibility.
-        """
-        return []
+    def refresh_movers(self):
+        """Recomputes the movers (and their prompt text) from the price history. Run after each snapshot."""
+        movers = compute_movers(self.history)
+        self._movers, self._movers_text = movers, {fmt: format_movers(m) for fmt, m in movers.items()}
+        return movers
+
+    def start_history_watch(self, interval=PRICE_HISTORY_POLL):
+        """Picks up new snapshots written by scripts/snapshot_prices.py and refreshes the movers, on a daemon thread."""
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    if self.history.reload():
+                        self.refresh_movers()
+                        print(f"📈 Market movers refreshed for {self.history.last_day}.")
+                except Exception as e:
+                    print(f"⚠️ Price history refresh failed: {e}")
+
+        threading.Thread(target=loop, name="price-history", daemon=True).start()
+
+    def get_market_movers(self, fmt=None):
+        """Precomputed movers for a format ("all" by default): gainers/losers by € and % change."""
+        return self._movers.get(fmt or "all", {})
 
-    def analyze_arbitrage(self, card_name, cm_price_str, scryfall_id):
-        """Calculates arbitrage opportunity between CM and CT."""
+    def movers_context(self, query=""):
+        """Movers prompt block for the format named in the query (all formats otherwise)."""
+        words = query.lower()
+        fmt = next((f for f in MARKET_FORMATS if f in words), "all")
+        return self._movers_text.get(fmt, "")
+
+    def analyze_arbitrage(self, card_name, cm_price_str, scryfall_id, ct_price_str=None):
+        """Calculates arbitrage opportunity between CM and CT. Async callers pass the CT price they already awaited."""
         try:
-            if cm_price_str == "N/A" or not cm_price_str:
-                return None
-            cm_val = float(cm_price_str.replace('€', '').strip())
-            
-            ct_price_str = self.ct_service.get_nm_price(scryfall_id)
-            if "N/A" in ct_price_str or not ct_price_str:
+            cm = parse_prices([cm_price_str])
+            if np.isnan(cm[0]):
                 return None
-            
-            try:
-                ct_val = float(ct_price_str.replace('€', '').strip())
-            except ValueError:
+            if ct_price_str is None:
+                ct_price_str = self.ct_service.get_nm_price(scryfall_id)
+            result = arbitrage(cm, parse_prices([ct_price_str]))
+            if result["rating"][0] == "N/A":
                 return None
-            
-            diff = ct_val - cm_val
-            pct_diff = (diff / cm_val) * 100 if cm_val > 0 else 0
-            
-            return {
-                "cm": cm_val,
-                "ct": ct_val,
-                "diff": diff,
-                "pct": pct_diff,
-                "rating": "High" if abs(pct_diff) > 15 else "Normal"
-            }
+            return {key: (str(values[0]) if key == "rating" else float(values[0])) for key, values in result.items()}
         except Exception:
             return None
 
+    def analyze_batch(self, cards, ct_prices=None, resolved=None):
+        """
+        Arbitrage and price stats for a watchlist in one pass. `cards` are Scryfall print ids,
+        card names (resolved to their cheapest print in the price history) or dicts with
+        "id" / "name" and an optional numeric "cm" price.
+
+        Returns a dict of columns (NumPy arrays, NaN for missing prices); see batch_records
+        for JSON rows. The Cardmarket price defaults to the latest snapshot's eur price and
+        the CardTrader price is fetched in bulk unless `ct_prices` (EUR floats, aligned with
+        `cards`) is given, e.g. by an async caller that awaited get_nm_prices itself
+        (passing its resolve_prints result as `resolved`).
+        """
+        idx, names = resolved or self.resolve_prints(cards)
+        ids = np.array([self.history.ids[i] if i >= 0 else "" for i in idx], dtype=object)
+
+        cm = self.history.latest(idx)
+        given = np.array([c.get("cm", np.nan) if isinstance(c, dict) else np.nan for c in cards], dtype=np.float64)
+        cm = np.where(np.isnan(given), cm, given)
+        if ct_prices is None:
+            ct_prices = self.ct_service.get_nm_prices(ids.tolist()) if self.ct_service else np.full(len(cards), np.nan)
+
+        columns = {"name": names, "id": ids, **arbitrage(cm, np.asarray(ct_prices, dtype=np.float64))}
+        columns.update(self.history.stats_many(idx))
+        return columns
+
+    def cheapest_prices(self, names):
+        """Latest EUR price of each card's cheapest print in the price history (NaN when unknown)."""
+        idx, _ = self.resolve_prints([{"name": name} for name in names])
+        return self.history.latest(idx)
+
+    def resolve_prints(self, cards):
+        """Price-history print index per card (-1 when unknown) and the display names."""
+        latest = self.history.latest(np.arange(len(self.history.ids))) if self.history.ids else np.empty(0)
+        idx, names = np.full(len(cards), -1, dtype=np.int64), []
+        for j, card in enumerate(cards):
+            card = card if isinstance(card, dict) else ({"id": card} if card in self.history.position else {"name": card})
+            if card.get("id") in self.history.position:
+                idx[j] = self.history.position[card["id"]]
+            elif card.get("name"):
+                prints = self.history.by_name.get(card["name"].lower(), [])
+                if prints:
+                    prices = latest[prints]
+                    idx[j] = prints[int(np.nanargmin(prices))] if not np.isnan(prices).all() else prints[-1]
+            names.append(self.history.meta["names"][idx[j]] if idx[j] >= 0 else card.get("name") or card.get("id", ""))
+        return idx, np.array(names, dtype=object)
+
     def get_card_stats(self, card_name, versions):
         """Generates statistical metadata for a card based on versions and prices."""
         if not versions:
             return {}
-            
-        prices = [float(v['prices']['eur']) for v in versions if v['prices']['eur'] not in ['N/A', None]]
-        if not prices:
+
+        prices = parse_prices([v['prices']['eur'] for v in versions])
+        prices = prices[~np.isnan(prices)]
+        if not prices.size:
             return {}
-            
-        avg = round(sum(prices) / len(prices), 2)
-        
-        # Simple stats derived from Scryfall data only
-        avg_30d = "N/A" # No historical data without external index
-        trend_data = [] # No trend data without external index
+
+        avg = round(float(prices.mean()), 2)
+
+        # Rolling figures from the local daily snapshots (scripts/snapshot_prices.py)
+        history = self.history.card_stats(print_ids=[v['id'] for v in versions]) or self.history.card_stats(name=card_name)
+        def figure(key):
+            value = history.get(key)
+            return "N/A" if value is None or (isinstance(value, float) and math.isnan(value)) else value
+
+        trend_data = history.get("trend", [])
         source = "Scryfall Current Data"
+        if history.get("history_days"):
+            source += f" + Price History ({history['history_days']} days to {history['last_day']})"
 
         sparkline = self.generate_sparkline(trend_data)
 
         # Simplified stats object
         return {
             "avg_price": avg,
-            "max_price": max(prices),
-            "min_price": min(prices),
-            "price_spread": round(max(prices) - min(prices), 2),
+            "max_price": float(prices.max()),
+            "min_price": float(prices.min()),
+            "price_spread": round(float(prices.max() - prices.min()), 2),
             "version_count": len(versions),
             "source": source,
             "trend_graph": sparkline,
-            "last_30d_avg": avg_30d
+            "last_7d_avg": figure("avg_7d"),
+            "last_30d_avg": figure("avg_30d"),
+            "last_90d_avg": figure("avg_90d"),
+            "volatility_30d": figure("volatility_30d")
         }
 
     def generate_sparkline(self, data, length=10):
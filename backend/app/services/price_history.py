@@ -0,0 +1,312 @@
+import datetime
+import json
+import os
+import threading
+import numpy as np
+from backend.app.core.config import PRICE_HISTORY_DIR, MARKET_FORMATS
+
+PRICE_FIELDS = ("eur", "eur_foil", "usd", "usd_foil")
+WINDOWS = (7, 30, 90)
+
+
+def _nanmean(values, axis=None):
+    # np.nanmean warns on all-NaN slices; an empty window is simply NaN here
+    counts = np.sum(~np.isnan(values), axis=axis)
+    sums = np.nansum(values, axis=axis)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+
+def _price(value):
+    try:
+        return float(value) if value not in (None, "", "N/A") else np.nan
+    except (TypeError, ValueError):
+        return np.nan
+
+
+class PriceHistoryStore:
+    """
+    Daily price snapshots per print, stored column-wise under PRICE_HISTORY_DIR:
+
+    - <field>.f4   one float32 file per price field (eur, eur_foil, usd, usd_foil);
+                   each snapshot appends one row with a value per known print (NaN = no price)
+    - widths.i8    prints per row (new prints only ever get appended, so row d covers
+                   print indices 0..widths[d]-1)
+    - days.i4      snapshot day (date ordinal) per row, written last: it commits the row
+    - prints.json  print metadata (id, name, set, legal-format bitmask), in print-index order
+
+    Reads go through np.memmap, so any card's history is a single vectorized gather
+    (row offset + print index) instead of a scan.
+
+    Everything a read needs lives in one state dict that reload() replaces (never mutates)
+    with a single assignment; each read takes one reference to it, so it never mixes the
+    days of a new snapshot with the offsets of the previous one. Print indices are stable
+    across reloads (new prints are only appended).
+    """
+
+    def __init__(self, path=PRICE_HISTORY_DIR):
+        self.path = path
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._state = None
+        self.reload()
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    # --- Loading ---
+
+    def reload(self):
+        """(Re)opens the store. Returns True if the on-disk store changed since the last load."""
+        with self._lock:
+            return self._reload()
+
+    def _reload(self):
+        days_file = self._file("days.i4")
+        stamp = os.path.getsize(days_file) if os.path.exists(days_file) else 0
+        if stamp == self._stamp:
+            return False
+
+        days = np.fromfile(days_file, dtype=np.int32) if stamp else np.empty(0, np.int32)
+        widths = np.fromfile(self._file("widths.i8"), dtype=np.int64)[:len(days)] if stamp else np.empty(0, np.int64)
+        offsets = np.concatenate(([0], np.cumsum(widths))).astype(np.int64)
+
+        meta = {"formats": list(MARKET_FORMATS), "ids": [], "names": [], "sets": [], "legal": []}
+        if os.path.exists(self._file("prints.json")):
+            with open(self._file("prints.json"), "r", encoding="utf-8") as f:
+                meta.update(json.load(f))
+
+        columns = {}
+        for field in PRICE_FIELDS:
+            total = int(offsets[-1])
+            columns[field] = (np.memmap(self._file(f"{field}.f4"), dtype=np.float32, mode="r", shape=(total,))
+                              if total else np.empty(0, np.float32))
+
+        by_name = {}
+        for i, name in enumerate(meta["names"]):
+            by_name.setdefault(name.lower(), []).append(i)
+        self._state = {
+            "days": days, "widths": widths, "offsets": offsets, "columns": columns, "meta": meta,
+            "ids": meta["ids"],
+            "position": {pid: i for i, pid in enumerate(meta["ids"])},
+            "by_name": by_name,
+            "legal": np.asarray(meta["legal"], dtype=np.int64),
+            # Same id for every print of a card, e.g. to keep one print per card in rankings
+            "name_ids": np.unique(np.asarray([n.lower() for n in meta["names"]], dtype=str), return_inverse=True)[1]
+                        if meta["names"] else np.empty(0, np.int64),
+        }
+        self._stamp = stamp
+        return True
+
+    # Read-only views of the current state (a caller needing several at once should use snapshot())
+    def snapshot(self):
+        """The current state dict; it is never mutated, so it stays consistent while held."""
+        return self._state
+
+    @property
+    def days(self):
+        return self._state["days"]
+
+    @property
+    def widths(self):
+        return self._state["widths"]
+
+    @property
+    def offsets(self):
+        return self._state["offsets"]
+
+    @property
+    def columns(self):
+        return self._state["columns"]
+
+    @property
+    def meta(self):
+        return self._state["meta"]
+
+    @property
+    def ids(self):
+        return self._state["ids"]
+
+    @property
+    def position(self):
+        return self._state["position"]
+
+    @property
+    def by_name(self):
+        return self._state["by_name"]
+
+    @property
+    def legal(self):
+        return self._state["legal"]
+
+    @property
+    def name_ids(self):
+        return self._state["name_ids"]
+
+    def __len__(self):
+        return len(self.days)
+
+    @property
+    def last_day(self):
+        days = self.days
+        return datetime.date.fromordinal(int(days[-1])) if len(days) else None
+
+    # --- Snapshots ---
+
+    def append_snapshot(self, cards, day=None):
+        """
+        Appends one day of prices from Scryfall card objects (e.g. the default_cards bulk
+        export). A day that is already recorded is skipped. Returns the number of priced prints.
+        """
+        day = (day or datetime.date.today()).toordinal()
+        state = self._state
+        if len(state["days"]) and day <= state["days"][-1]:
+            return 0
+
+        ids, names, sets, legal = (list(state["meta"][k]) for k in ("ids", "names", "sets", "legal"))
+        formats = state["meta"]["formats"]
+        position = dict(state["position"])
+        rows, values = [], {field: [] for field in PRICE_FIELDS}
+        for card in cards:
+            if card.get("digital") or not card.get("id"):
+                continue
+            i = position.get(card["id"])
+            mask = sum(1 << b for b, fmt in enumerate(formats) if (card.get("legalities") or {}).get(fmt) in ("legal", "restricted"))
+            if i is None:
+                i = position[card["id"]] = len(ids)
+                ids.append(card["id"])
+                names.append(card.get("name", ""))
+                sets.append((card.get("set") or "").upper())
+                legal.append(mask)
+            else:
+                legal[i] = mask  # legality changes with bans and rotation
+            prices = card.get("prices") or {}
+            rows.append(i)
+            for field in PRICE_FIELDS:
+                values[field].append(_price(prices.get(field)))
+
+        width = len(ids)
+        rows = np.asarray(rows, dtype=np.int64)
+        os.makedirs(self.path, exist_ok=True)
+
+        # Drop anything a crashed snapshot appended past the last committed row
+        committed = int(state["offsets"][-1]) * 4
+        for field in PRICE_FIELDS:
+            row = np.full(width, np.nan, dtype=np.float32)
+            row[rows] = np.asarray(values[field], dtype=np.float32)
+            with open(self._file(f"{field}.f4"), "ab") as f:
+                f.truncate(committed)
+                row.tofile(f)
+
+        tmp = self._file("prints.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"formats": formats, "ids": ids, "names": names, "sets": sets, "legal": legal}, f)
+        os.replace(tmp, self._file("prints.json"))
+
+        with open(self._file("widths.i8"), "ab") as f:
+            f.truncate(len(state["days"]) * 8)
+            np.asarray([width], dtype=np.int64).tofile(f)
+        with open(self._file("days.i4"), "ab") as f:
+            np.asarray([day], dtype=np.int32).tofile(f)
+
+        self.reload()
+        return len(rows)
+
+    def snapshot_from_bulk(self, bulk_path, day=None):
+        """
+        Appends today's prices from a downloaded Scryfall bulk file (see CardService.download_bulk_data).
+        A caller that also builds the card catalog should parse the file once (CardService.load_bulk_data)
+        and pass the cards to append_snapshot and CardCatalog.build_from_cards instead.
+        """
+        with open(bulk_path, "r", encoding="utf-8") as f:
+            return self.append_snapshot(json.load(f), day=day)
+
+    # --- Reads ---
+
+    def indices(self, print_ids=None, name=None, state=None):
+        """Print indices for Scryfall ids, or for every print of a card name."""
+        state = state or self._state
+        if print_ids:
+            idx = [state["position"][pid] for pid in print_ids if pid in state["position"]]
+        else:
+            idx = state["by_name"].get((name or "").lower(), [])
+        return np.asarray(idx, dtype=np.int64)
+
+    def window(self, idx, days=90, field="eur", state=None):
+        """
+        (day ordinals, matrix) for the last `days` calendar days up to the latest snapshot;
+        matrix[d, j] is the price of print idx[j] on that day, NaN when missing.
+        """
+        state = state or self._state
+        all_days = state["days"]
+        if not len(all_days):
+            return np.empty(0, np.int32), np.empty((0, len(idx)), np.float32)
+        rows = np.nonzero(all_days > all_days[-1] - days)[0]
+        positions = state["offsets"][rows][:, None] + idx[None, :]
+        valid = idx[None, :] < state["widths"][rows][:, None]
+        values = np.asarray(state["columns"][field][np.where(valid, positions, 0)], dtype=np.float32) if valid.any() \
+            else np.full(positions.shape, np.nan, np.float32)
+        values[~valid] = np.nan
+        return all_days[rows], values
+
+    def latest(self, idx, field="eur"):
+        """Latest snapshot price for each print index (NaN when missing or idx < 0)."""
+        idx = np.asarray(idx, dtype=np.int64)
+        state = self._state
+        if not len(state["days"]):
+            return np.full(idx.shape, np.nan)
+        values = self.window(np.maximum(idx, 0), days=1, field=field, state=state)[1][-1].astype(np.float64)
+        values[idx < 0] = np.nan
+        return values
+
+    def stats_many(self, idx, field="eur"):
+        """
+        Per-print 7/30/90-day averages and 30-day volatility (std of daily returns, %)
+        for many print indices at once, as float arrays (NaN when unknown or no history).
+        """
+        idx = np.asarray(idx, dtype=np.int64)
+        stats = {f"avg_{n}d": np.full(idx.shape, np.nan) for n in WINDOWS}
+        stats["volatility_30d"] = np.full(idx.shape, np.nan)
+        state = self._state
+        if not len(state["days"]) or not idx.size:
+            return stats
+        days, matrix = self.window(np.maximum(idx, 0), max(WINDOWS), field, state)
+        matrix = matrix.astype(np.float64)
+        matrix[:, idx < 0] = np.nan
+        end = days[-1]
+        for n in WINDOWS:
+            stats[f"avg_{n}d"] = _nanmean(matrix[days > end - n], axis=0)
+
+        recent = matrix[days > end - 30]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            returns = np.diff(recent, axis=0) / recent[:-1]
+        counts = np.sum(~np.isnan(returns), axis=0)
+        mean = _nanmean(returns, axis=0)
+        variance = np.nansum((returns - mean) ** 2, axis=0) / np.maximum(counts, 1)
+        stats["volatility_30d"] = np.where(counts > 0, np.sqrt(variance) * 100, np.nan)
+        return stats
+
+    def card_stats(self, print_ids=None, name=None, field="eur", trend_days=30):
+        """
+        Rolling averages, volatility and trend for a card (the mean over its prints, per day).
+        Volatility is the standard deviation of daily returns over 30 days, in percent.
+        """
+        state = self._state
+        idx = self.indices(print_ids, name, state)
+        if not idx.size or not len(state["days"]):
+            return {}
+        days, matrix = self.window(idx, max(WINDOWS), field, state)
+        daily = _nanmean(matrix.astype(np.float64), axis=1)
+        end = days[-1]
+
+        stats = {f"avg_{n}d": float(_nanmean(daily[days > end - n])) for n in WINDOWS}
+        recent = daily[days > end - 30]
+        recent = recent[~np.isnan(recent)]
+        returns = np.diff(recent) / recent[:-1] if recent.size > 2 else np.empty(0)
+        stats["volatility_30d"] = float(np.std(returns) * 100) if returns.size else np.nan
+
+        trend = daily[days > end - trend_days]
+        stats["trend"] = [round(float(v), 2) for v in trend[~np.isnan(trend)]]
+        stats["history_days"] = int(np.sum(~np.isnan(daily)))
+        stats["last_day"] = datetime.date.fromordinal(int(end)).isoformat()
+        return {k: (round(float(v), 2) if isinstance(v, (float, np.floating)) else v) for k, v in stats.items()}
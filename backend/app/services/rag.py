@@ -1,35 +1,270 @@
 import os
+import asyncio
+import hashlib
+import json
 import pickle
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from backend.app.core.config import INDEX_PATH, TOP_K_CHUNKS
+from backend.app.core.config import (
+    INDEX_PATH, INDEX_MANIFEST_PATH, INDEX_RETAIN, INDEX_WATCH_INTERVAL, TOP_K_CHUNKS, ENCODER_WORKERS
+)
+
+WARMUP_QUERIES = ["How does trample work with deathtouch?", "What happens when a creature phases out?"]
+
+
+def _load_sentence_model(model_name):
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name)
+
+
+def read_manifest(path=INDEX_MANIFEST_PATH):
+    """{"active": version, "versions": {version: {"path", "model_name", ...}}} or None."""
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class IndexVersionGone(LookupError):
+    """A pinned index version was evicted (more than INDEX_RETAIN newer versions went live since)."""
+
+
+class RulebookIndex:
+    """One loaded index version: chunks, unit-normalized embeddings and the model that encodes queries."""
+
+    def __init__(self, version, data, model, path=None):
+        self.version = version
+        self.data = data
+        self.chunks = data['chunks']
+        embeddings = np.asarray(data['embeddings'], dtype=np.float32)
+        self.embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+        self.model = model
+        self.model_name = data['model_name']
+        self.path = path
+        self.loaded_at = time.time()
+
+    def retrieve_ids(self, text, top_k=TOP_K_CHUNKS):
+        query_embedding = self.model.encode([text])[0]
+        # Cosine similarity (chunk embeddings are pre-normalized)
+        similarities = self.embeddings @ query_embedding / np.linalg.norm(query_embedding)
+        top_indices = np.argsort(similarities)[-top_k:][::-1]
+        return [int(i) for i in top_indices]
+
 
 class RAGService:
-    def __init__(self):
-        self.index_data = self._load_index()
-        self.model = SentenceTransformer(self.index_data['model_name'])
+    """
+    Retrieval over the active rulebook index.
+
+    Index versions are listed in INDEX_MANIFEST_PATH (written by src/indexer.py). When the
+    manifest names a new active version, check_for_update() loads it in a background thread,
+    warms it up (model and embeddings) and swaps it in with a single assignment. The
+    previous INDEX_RETAIN versions stay loaded, so a request that pinned a version
+    (retrieve_ids / get_chunks with index_version=...) finishes on it; an evicted pinned
+    version raises IndexVersionGone rather than resolving ids on another index. Swap listeners
+    (on_swap) invalidate caches keyed on the old version.
+    """
+
+    def __init__(self, manifest_path=INDEX_MANIFEST_PATH, model_loader=_load_sentence_model):
+        self.manifest_path = manifest_path
+        self.model_loader = model_loader
+        self._models = {}  # model_name -> encoder, shared by index versions
+        self._indexes = OrderedDict()  # version -> RulebookIndex, oldest first
+        self._listeners = []
+        self._swap_lock = threading.Lock()
+        self._loading = None
+        self._manifest_stamp = None
+        self.last_error = None
+
+        manifest = read_manifest(manifest_path)
+        if manifest:
+            entry = manifest["versions"][manifest["active"]]
+            self._activate(self._load(manifest["active"], entry["path"]))
+            self._manifest_stamp = self._stamp()
+        else:
+            self._activate(self._load(None, INDEX_PATH))
+        # Encoding is CPU bound: async callers run it here instead of on the event loop
+        self.executor = ThreadPoolExecutor(max_workers=ENCODER_WORKERS, thread_name_prefix="encoder")
+
+    # --- Active index ---
+
+    @property
+    def active(self):
+        return self._active
+
+    @property
+    def index_version(self):
+        return self._active.version
+
+    @property
+    def index_data(self):
+        return self._active.data
+
+    @property
+    def model(self):
+        return self._active.model
+
+    def get_index(self, index_version=None):
+        """The index for a pinned version (IndexVersionGone once evicted), or the active one."""
+        if index_version is None:
+            return self._active
+        index = self._indexes.get(index_version)
+        if index is None:
+            raise IndexVersionGone(index_version)
+        return index
+
+    def on_swap(self, callback):
+        """Registers callback(old_version, new_version), called after a new index goes live."""
+        self._listeners.append(callback)
 
-    def _load_index(self):
-        """Loads the rulebook index from disk."""
-        if not os.path.exists(INDEX_PATH):
+    # --- Loading and swapping ---
+
+    def _load(self, version, path):
+        """Loads an index file (and its model, unless already loaded)."""
+        if not os.path.exists(path):
             raise FileNotFoundError("Index not found. Run indexer first.")
-        with open(INDEX_PATH, 'rb') as f:
-            return pickle.load(f)
+        with open(path, 'rb') as f:
+            data = pickle.load(f)
+        version = version or data.get('version') or self._fingerprint(path)
+        model = self._models.get(data['model_name'])
+        if model is None:
+            model = self._models[data['model_name']] = self.model_loader(data['model_name'])
+        return RulebookIndex(version, data, model, path)
 
-    def retrieve(self, query, history=None, top_k=TOP_K_CHUNKS):
-        """Finds the most relevant rule chunks."""
-        search_query = query
+    @staticmethod
+    def _fingerprint(path):
+        """Content hash of the index file, used as its version when none is embedded."""
+        digest = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()[:12]
+
+    @staticmethod
+    def _warm(index):
+        """First encodes and a full similarity pass, so the first real request after the swap is not a cold one."""
+        for query in WARMUP_QUERIES:
+            index.retrieve_ids(query)
+
+    def _activate(self, index):
+        self._indexes.pop(index.version, None)
+        self._indexes[index.version] = index
+        while len(self._indexes) > INDEX_RETAIN:
+            self._indexes.popitem(last=False)
+        self._active = index
+
+    def _stamp(self):
+        try:
+            return os.stat(self.manifest_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def check_for_update(self, wait=False):
+        """
+        Starts loading the manifest's active version if it differs from the live one.
+        Returns the version being loaded (None if already current or a load is running).
+        """
+        stamp = self._stamp()
+        if stamp is None or stamp == self._manifest_stamp:
+            return None
+        manifest = read_manifest(self.manifest_path)
+        version = manifest["active"]
+        with self._swap_lock:
+            if version == self.index_version or self._loading:
+                self._manifest_stamp = stamp
+                return None
+            self._loading = version
+        entry = manifest["versions"][version]
+        thread = threading.Thread(target=self._load_and_swap, args=(version, entry["path"], stamp),
+                                  name="index-loader", daemon=True)
+        thread.start()
+        if wait:
+            thread.join()
+        return version
+
+    def _load_and_swap(self, version, path, stamp):
+        try:
+            index = self._load(version, path)
+            self._warm(index)
+            old = self.index_version
+            with self._swap_lock:
+                self._activate(index)
+                self._manifest_stamp = stamp
+            self.last_error = None
+            print(f"🔁 Rules index swapped: {old} -> {version} ({len(index.chunks)} chunks).")
+            for callback in self._listeners:
+                try:
+                    callback(old, version)
+                except Exception as e:
+                    print(f"⚠️ Index swap listener failed: {e}")
+        except Exception as e:
+            self.last_error = f"{version}: {e}"
+            print(f"⚠️ Loading rules index {version} failed: {e}")
+        finally:
+            self._loading = None
+
+    def start_watch(self, interval=INDEX_WATCH_INTERVAL):
+        """Polls the manifest on a daemon thread and hot-swaps new index versions."""
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.check_for_update()
+                except Exception as e:
+                    print(f"⚠️ Index manifest check failed: {e}")
+
+        threading.Thread(target=loop, name="index-watch", daemon=True).start()
+
+    def status(self):
+        """Active version and registry state, for /api/admin/index."""
+        active = self._active
+        return {
+            "active": active.version,
+            "model_name": active.model_name,
+            "chunks": len(active.chunks),
+            "loaded_at": active.loaded_at,
+            "path": active.path,
+            "retained": list(self._indexes),
+            "loading": self._loading,
+            "last_error": self.last_error,
+            "manifest": self.manifest_path if self._manifest_stamp else None,
+        }
+
+    # --- Retrieval ---
+
+    def encode(self, texts):
+        """Embeds texts with the index's sentence model."""
+        return self._active.model.encode(texts)
+
+    @staticmethod
+    def search_query(query, history=None):
+        """Text actually embedded for retrieval: short follow-ups borrow the previous question."""
         if history and len(query.split()) < 5:
             last_user_q = history[-2] if len(history) >= 2 else ""
-            search_query = f"{last_user_q} {query}"
-
-        query_embedding = self.model.encode([search_query])[0]
-        chunk_embeddings = self.index_data['embeddings']
-        
-        # Calculate cosine similarity
-        similarities = np.dot(chunk_embeddings, query_embedding) / (
-            np.linalg.norm(chunk_embeddings, axis=1) * np.linalg.norm(query_embedding)
-        )
-        
-        top_indices = np.argsort(similarities)[-top_k:][::-1]
-        return [self.index_data['chunks'][i] for i in top_indices]
+            return f"{last_user_q} {query}"
+        return query
+
+    def retrieve(self, query, history=None, top_k=TOP_K_CHUNKS):
+        """Finds the most relevant rule chunks."""
+        index = self._active
+        return [index.chunks[i] for i in index.retrieve_ids(self.search_query(query, history), top_k)]
+
+    def retrieve_ids(self, query, history=None, top_k=TOP_K_CHUNKS, index_version=None):
+        """Positions of the most relevant chunks in the index (pinned version or active), best first."""
+        return self.get_index(index_version).retrieve_ids(self.search_query(query, history), top_k)
+
+    def get_chunks(self, ids, index_version=None):
+        chunks = self.get_index(index_version).chunks
+        return [chunks[i] for i in ids]
+
+    async def aencode(self, texts):
+        """Embeds texts on the encoder executor without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.encode, texts)
+
+    async def aretrieve_ids(self, query, history=None, top_k=TOP_K_CHUNKS, index_version=None):
+        """Async variant of retrieve_ids, run on the encoder executor."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.retrieve_ids, query, history, top_k, index_version)
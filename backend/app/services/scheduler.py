@@ -0,0 +1,226 @@
+import asyncio
+import heapq
+import itertools
+import re
+import threading
+import time
+from backend.app.core.config import GROQ_RATE_LIMITS, SCHEDULER_MAX_WAIT
+
+# Lower value = served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_ESCALATION = 1
+PRIORITY_BACKGROUND = 2
+
+CHARS_PER_TOKEN = 4
+TOKENS_PER_MESSAGE = 4  # role/formatting overhead of the chat template
+
+
+class RateLimitExceeded(Exception):
+    """Raised instead of sending a request that would (likely) be answered with a 429."""
+
+    def __init__(self, model, reason):
+        # Keeps the marker the CLI and controllers already look for in error text
+        super().__init__(f"rate_limit_exceeded ({model}): {reason}")
+        self.model = model
+        self.reason = reason
+
+
+def estimate_tokens(messages, max_tokens=0):
+    """Cheap prompt-size estimate (~4 chars/token) plus the completion budget."""
+    prompt = sum(len(m.get("content") or "") // CHARS_PER_TOKEN + TOKENS_PER_MESSAGE for m in messages)
+    return prompt + (max_tokens or 0)
+
+
+def parse_duration(value):
+    """Parses Groq reset headers such as '7.66s', '2m59.56s' or '120ms' into seconds."""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        pass
+    total = 0.0
+    for amount, unit in re.findall(r'([\d.]+)(ms|h|m|s)', str(value)):
+        total += float(amount) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[unit]
+    return total
+
+
+class TokenBucket:
+    """Continuously refilling bucket: `capacity` units per `period` seconds."""
+
+    def __init__(self, capacity, period=60.0):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / period
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        self._refill(now)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def consume(self, amount, now):
+        self._refill(now)
+        self.level -= amount
+
+    def refund(self, amount, now):
+        self._refill(now)
+        self.level = min(self.capacity, self.level + amount)
+
+    def sync(self, remaining, now):
+        """Trusts the server when it reports less headroom than we think we have."""
+        self._refill(now)
+        self.level = min(self.level, float(remaining))
+
+
+class _ModelState:
+    def __init__(self, rpm, tpm):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.blocked_until = 0.0
+        self.queue = []  # heap of (priority, seq, tokens)
+
+
+class RateLimitScheduler:
+    """
+    Admission control in front of Groq.
+    Tracks requests/min and tokens/min per model, orders waiting calls by priority
+    and rejects a call up front (RateLimitExceeded) when it could not be sent
+    within its priority's maximum wait, instead of letting it hit a 429.
+    """
+
+    def __init__(self, limits=GROQ_RATE_LIMITS, max_wait=SCHEDULER_MAX_WAIT):
+        self.max_wait = max_wait
+        self._models = {m: _ModelState(l["rpm"], l["tpm"]) for m, l in limits.items()}
+        self._lock = threading.Condition()
+        self._seq = itertools.count()
+
+    def _state(self, model):
+        if model not in self._models:
+            # Unknown model: be conservative and use the tightest configured limits
+            rpm = min(s.requests.capacity for s in self._models.values())
+            tpm = min(s.tokens.capacity for s in self._models.values())
+            self._models[model] = _ModelState(rpm, tpm)
+        return self._models[model]
+
+    # --- Admission ---
+
+    def acquire(self, model, tokens, priority=PRIORITY_INTERACTIVE):
+        """Blocks until the call may be sent, or raises RateLimitExceeded."""
+        with self._lock:
+            ticket, deadline = self._enqueue(model, tokens, priority)
+            try:
+                while True:
+                    wait = self._try_admit(model, ticket, deadline)
+                    if wait == 0:
+                        return
+                    self._lock.wait(timeout=wait)
+            except RateLimitExceeded:
+                self._dequeue(model, ticket)
+                self._lock.notify_all()
+                raise
+
+    async def acquire_async(self, model, tokens, priority=PRIORITY_INTERACTIVE):
+        """Awaitable variant of acquire for AsyncLLMService."""
+        with self._lock:
+            ticket, deadline = self._enqueue(model, tokens, priority)
+        try:
+            while True:
+                with self._lock:
+                    wait = self._try_admit(model, ticket, deadline)
+                if wait == 0:
+                    return
+                await asyncio.sleep(min(wait, 0.25))
+        except (RateLimitExceeded, asyncio.CancelledError):
+            with self._lock:
+                self._dequeue(model, ticket)
+                self._lock.notify_all()
+            raise
+
+    def _enqueue(self, model, tokens, priority):
+        state = self._state(model)
+        now = time.monotonic()
+        if tokens > state.tokens.capacity:
+            raise RateLimitExceeded(model, f"Request too large: ~{tokens} tokens exceeds {int(state.tokens.capacity)} TPM")
+
+        # Work queued at the same or a higher priority is served before us
+        ahead = [t for t in state.queue if t[0] <= priority]
+        projected = max(
+            state.tokens.wait_time(tokens + sum(t[2] for t in ahead), now),
+            state.requests.wait_time(1 + len(ahead), now),
+            state.blocked_until - now,
+        )
+        max_wait = self.max_wait.get(priority, 0)
+        if projected > max_wait:
+            raise RateLimitExceeded(model, f"projected wait {projected:.1f}s exceeds {max_wait}s")
+
+        ticket = (priority, next(self._seq), tokens)
+        heapq.heappush(state.queue, ticket)
+        return ticket, now + max_wait
+
+    def _try_admit(self, model, ticket, deadline):
+        """Admits the ticket if it is at the head of the queue and capacity allows. Returns 0 or seconds to wait."""
+        state = self._models[model]
+        now = time.monotonic()
+        if now > deadline:
+            raise RateLimitExceeded(model, "timed out waiting for capacity")
+        if state.queue[0] is not ticket:
+            return 0.05
+        wait = max(
+            state.tokens.wait_time(ticket[2], now),
+            state.requests.wait_time(1, now),
+            state.blocked_until - now,
+        )
+        if wait > 0:
+            return min(wait, max(deadline - now, 0.01))
+        state.tokens.consume(ticket[2], now)
+        state.requests.consume(1, now)
+        heapq.heappop(state.queue)
+        self._lock.notify_all()
+        return 0
+
+    def _dequeue(self, model, ticket):
+        state = self._models[model]
+        if ticket in state.queue:
+            state.queue.remove(ticket)
+            heapq.heapify(state.queue)
+
+    # --- Feedback from Groq ---
+
+    def observe(self, model, headers):
+        """Syncs the buckets with Groq's x-ratelimit-* response headers."""
+        with self._lock:
+            state = self._state(model)
+            now = time.monotonic()
+            remaining_tokens = headers.get("x-ratelimit-remaining-tokens")
+            if remaining_tokens is not None:
+                state.tokens.sync(remaining_tokens, now)
+            # Groq counts requests per day: this only bites once that quota runs low
+            remaining_requests = headers.get("x-ratelimit-remaining-requests")
+            if remaining_requests is not None:
+                state.requests.sync(remaining_requests, now)
+            retry_after = parse_duration(headers.get("retry-after"))
+            if retry_after:
+                state.blocked_until = max(state.blocked_until, now + retry_after)
+
+    def penalize(self, model, headers):
+        """Handles a 429 that slipped through: block the model until Groq says it may retry."""
+        with self._lock:
+            state = self._state(model)
+            now = time.monotonic()
+            retry_after = parse_duration(headers.get("retry-after")) or parse_duration(headers.get("x-ratelimit-reset-tokens")) or 1.0
+            state.blocked_until = max(state.blocked_until, now + retry_after)
+            state.tokens.sync(0, now)
+
+    def settle(self, model, estimated, actual):
+        """Returns the unused part of a reservation once real usage is known."""
+        if actual is None or actual >= estimated:
+            return
+        with self._lock:
+            self._state(model).tokens.refund(estimated - actual, time.monotonic())
+            self._lock.notify_all()
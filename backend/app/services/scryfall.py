@@ -1,5 +1,10 @@
+import asyncio
+import json
 import requests
-from backend.app.core.config import SCRYFALL_NAMED_URL, SCRYFALL_SEARCH_URL
+import httpx
+import os
+from backend.app.core.config import SCRYFALL_NAMED_URL, SCRYFALL_SEARCH_URL, SCRYFALL_BULK_URL, HTTP_TIMEOUT
+from backend.app.utils.io import stream_download
 
 class CardService:
     @staticmethod
@@ -9,45 +14,22 @@ class CardService:
         for name in card_names:
             try:
                 # Try exact match first
-                resp = requests.get(SCRYFALL_NAMED_URL, params={"exact": name}, timeout=10)
+                resp = requests.get(SCRYFALL_NAMED_URL, params={"exact": name}, timeout=HTTP_TIMEOUT)
                 if resp.status_code != 200:
                     # Fallback to fuzzy match
-                    resp = requests.get(SCRYFALL_NAMED_URL, params={"fuzzy": name}, timeout=10)
+                    resp = requests.get(SCRYFALL_NAMED_URL, params={"fuzzy": name}, timeout=HTTP_TIMEOUT)
                 
                 if resp.status_code != 200:
                     continue
                 
                 data = resp.json()
-                info = {
-                    "name": data.get("name"),
-                    "mana_cost": data.get("mana_cost", "N/A"),
-                    "type_line": data.get("type_line", "N/A"),
-                    "oracle_text": data.get("oracle_text", "N/A"),
-                    "power": data.get("power"),
-                    "toughness": data.get("toughness"),
-                    "loyalty": data.get("loyalty"),
-                    "artist": data.get("artist"),
-                    "set_name": data.get("set_name"),
-                    "rarity": data.get("rarity"),
-                    "image": None,
-                    "rulings": []
-                }
-                
-                # Image Logic (Handle DFCs)
-                if "image_uris" in data:
-                    info["image"] = data["image_uris"].get("large") or data["image_uris"].get("normal")
-                elif "card_faces" in data:
-                    # For now just grab the front face
-                    front = data["card_faces"][0]
-                    if "image_uris" in front:
-                        info["image"] = front["image_uris"].get("large") or front["image_uris"].get("normal")
+                info = CardService._parse_card(data)
                 
                 rulings_url = data.get("rulings_uri")
                 if rulings_url:
-                    r_resp = requests.get(rulings_url, timeout=10)
+                    r_resp = requests.get(rulings_url, timeout=HTTP_TIMEOUT)
                     if r_resp.status_code == 200:
-                        r_data = r_resp.json()
-                        info["rulings"] = [r.get("comment") for r in r_data.get("data", [])]
+                        info["rulings"] = CardService._parse_rulings(r_resp.json())
                 
                 card_data.append(info)
             except Exception:
@@ -57,43 +39,147 @@ class CardService:
     @staticmethod
     def get_card_versions(query):
         """Fetches all unique prints based on a Scryfall search query."""
-        versions = []
-        params = {
+        try:
+            resp = requests.get(SCRYFALL_SEARCH_URL, params=CardService._search_params(query), timeout=HTTP_TIMEOUT)
+            if resp.status_code != 200:
+                return []
+            return CardService._parse_versions(resp.json())
+        except Exception:
+            return []
+
+    @staticmethod
+    def bulk_data_entry(kind="default_cards", session=None):
+        """Scryfall's description of a bulk export: download_uri, updated_at, size, ..."""
+        resp = (session or requests).get(SCRYFALL_BULK_URL, timeout=HTTP_TIMEOUT)
+        resp.raise_for_status()
+        return next(e for e in resp.json()["data"] if e["type"] == kind)
+
+    @staticmethod
+    def download_bulk_data(path, kind="default_cards", entry=None, session=None):
+        """Streams a Scryfall bulk export (one JSON array of card objects) to `path`, resuming a partial download. Returns (updated_at, sha256 of the file)."""
+        entry = entry or CardService.bulk_data_entry(kind, session)
+        # download_uri is unique per export, so a .part is only ever resumed against the same file
+        checksum = stream_download(entry["download_uri"], path, session=session)
+        return entry.get("updated_at"), checksum
+
+    @staticmethod
+    def load_bulk_data(path):
+        """Parses a downloaded bulk export into its list of card objects (hundreds of MB: parse it once per run)."""
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    @staticmethod
+    def _parse_card(data):
+        """Maps a Scryfall card object to the fields the Judge uses."""
+        info = {
+            "name": data.get("name"),
+            "mana_cost": data.get("mana_cost", "N/A"),
+            "type_line": data.get("type_line", "N/A"),
+            "oracle_text": data.get("oracle_text", "N/A"),
+            "power": data.get("power"),
+            "toughness": data.get("toughness"),
+            "loyalty": data.get("loyalty"),
+            "artist": data.get("artist"),
+            "set_name": data.get("set_name"),
+            "rarity": data.get("rarity"),
+            "image": None,
+            "rulings": []
+        }
+        
+        # Image Logic (Handle DFCs)
+        if "image_uris" in data:
+            info["image"] = data["image_uris"].get("large") or data["image_uris"].get("normal")
+        elif "card_faces" in data:
+            # For now just grab the front face
+            front = data["card_faces"][0]
+            if "image_uris" in front:
+                info["image"] = front["image_uris"].get("large") or front["image_uris"].get("normal")
+        return info
+
+    @staticmethod
+    def _parse_rulings(r_data):
+        return [r.get("comment") for r in r_data.get("data", [])]
+
+    @staticmethod
+    def _search_params(query):
+        return {
             "q": query.strip(),
             "unique": "prints",
             "order": "released",
             "dir": "asc"
         }
-        
+
+    @staticmethod
+    def _parse_versions(data):
+        versions = []
+        for item in data.get("data", []):
+            prices = item.get("prices", {})
+            legals = [f"{f}:{s}" for f, s in item.get("legalities", {}).items() if s != "not_legal"]
+            
+            versions.append({
+                "id": item.get("id"),
+                "name": item.get("name"),
+                "set_name": item.get("set_name"),
+                "set": item.get("set").upper(),
+
+                "released_at": item.get("released_at"),
+                "collector_number": item.get("collector_number"),
+                "rarity": item.get("rarity").capitalize(),
+                "artist": item.get("artist"),
+                "finishes": item.get("finishes", []),
+                "prices": {
+                    "eur": prices.get("eur") or "N/A",
+                    "eur_foil": prices.get("eur_foil") or "N/A",
+                    "usd": prices.get("usd") or "N/A",
+                    "usd_foil": prices.get("usd_foil") or "N/A"
+                },
+                "legalities": ", ".join(legals)
+            })
+        return versions
+
+
+class AsyncCardService(CardService):
+    """Non-blocking Scryfall client for the API. Parsing is shared with CardService."""
+
+    def __init__(self, client=None):
+        self.client = client or httpx.AsyncClient(timeout=HTTP_TIMEOUT)
+
+    async def get_card_data(self, card_names):
+        """Fetches Oracle text and metadata for a list of cards (concurrently)."""
+        results = await asyncio.gather(*[self._fetch_card(name) for name in card_names])
+        return [info for info in results if info]
+
+    async def _fetch_card(self, name):
         try:
-            resp = requests.get(SCRYFALL_SEARCH_URL, params=params, timeout=10)
+            # Try exact match first
+            resp = await self.client.get(SCRYFALL_NAMED_URL, params={"exact": name})
             if resp.status_code != 200:
-                return []
-            
+                # Fallback to fuzzy match
+                resp = await self.client.get(SCRYFALL_NAMED_URL, params={"fuzzy": name})
+            if resp.status_code != 200:
+                return None
+
             data = resp.json()
-            for item in data.get("data", []):
-                prices = item.get("prices", {})
-                legals = [f"{f}:{s}" for f, s in item.get("legalities", {}).items() if s != "not_legal"]
-                
-                versions.append({
-                    "id": item.get("id"),
-                    "name": item.get("name"),
-                    "set_name": item.get("set_name"),
-                    "set": item.get("set").upper(),
-
-                    "released_at": item.get("released_at"),
-                    "collector_number": item.get("collector_number"),
-                    "rarity": item.get("rarity").capitalize(),
-                    "artist": item.get("artist"),
-                    "finishes": item.get("finishes", []),
-                    "prices": {
-                        "eur": prices.get("eur") or "N/A",
-                        "eur_foil": prices.get("eur_foil") or "N/A",
-                        "usd": prices.get("usd") or "N/A",
-                        "usd_foil": prices.get("usd_foil") or "N/A"
-                    },
-                    "legalities": ", ".join(legals)
-                })
+            info = self._parse_card(data)
+
+            rulings_url = data.get("rulings_uri")
+            if rulings_url:
+                r_resp = await self.client.get(rulings_url)
+                if r_resp.status_code == 200:
+                    info["rulings"] = self._parse_rulings(r_resp.json())
+            return info
         except Exception:
-            pass
-        return versions
+            return None
+
+    async def get_card_versions(self, query):
+        """Fetches all unique prints based on a Scryfall search query."""
+        try:
+            resp = await self.client.get(SCRYFALL_SEARCH_URL, params=self._search_params(query))
+            if resp.status_code != 200:
+                return []
+            return self._parse_versions(resp.json())
+        except Exception:
+            return []
+
+    async def aclose(self):
+        await self.client.aclose()
@@ -0,0 +1,102 @@
+import hashlib
+from backend.app.core.config import ARTIFACT_MAX_QUERIES, ARTIFACT_MAX_CARD_SETS, SESSION_HISTORY_LIMIT
+from backend.app.services.answer_cache import normalize_card_set
+from backend.app.services.history_compactor import answer_key
+
+
+def _query_key(query, history):
+    # The same words mean something else after a different last exchange ("what about it?")
+    tail = hashlib.sha1("\n".join(history[-2:]).encode("utf-8")).hexdigest()[:10] if history else ""
+    return f"{' '.join(query.lower().split())}#{tail}"
+
+
+def _card_key(card_names):
+    return "|".join(normalize_card_set(card_names))
+
+
+class SessionArtifacts:
+    """
+    Pipeline results memoized in the session context (ctx["artifacts"]), so they
+    travel with the session through the SessionStore:
+
+    - per query (and conversation point): intent and resolved card names
+    - per retrieval query: chunk ids, tagged with the index version
+    - per card set: image markdown, the formatted CARD DATA block and the rendered card info
+    - per turn: the summary HistoryCompactor sends in place of the judge answer once it is old
+
+    A retry of the previous question then only re-runs the LLM answer, and a
+    follow-up about the same cards reuses their card block instead of refetching
+    Scryfall data and rulings. Each map keeps only its most recent entries.
+    """
+
+    def __init__(self, ctx, max_queries=ARTIFACT_MAX_QUERIES, max_card_sets=ARTIFACT_MAX_CARD_SETS,
+                 max_summaries=SESSION_HISTORY_LIMIT // 2 + 1):
+        self.data = ctx.setdefault("artifacts", {})
+        for table in ("queries", "chunks", "cards", "summaries"):
+            self.data.setdefault(table, {})
+        self.max_queries = max_queries
+        self.max_card_sets = max_card_sets
+        self.max_summaries = max_summaries  # the turns the session history keeps, plus one for a retry
+
+    @staticmethod
+    def _put(table, key, values, limit):
+        entry = table.pop(key, {})  # re-insert: dicts keep insertion order, oldest first
+        entry.update(values)
+        table[key] = entry
+        while len(table) > limit:
+            table.pop(next(iter(table)))
+
+    # --- Per query ---
+
+    def query(self, query, history):
+        return self.data["queries"].get(_query_key(query, history), {})
+
+    def remember_query(self, query, history, **values):
+        self._put(self.data["queries"], _query_key(query, history), values, self.max_queries)
+
+    # --- Retrieval ---
+
+    def chunk_ids(self, search_query, index_version):
+        """Retrieved chunk ids for the search query, if retrieved against the same index."""
+        entry = self.data["chunks"].get(_query_key(search_query, None))
+        if entry and entry["index_version"] == index_version:
+            return entry["ids"]
+        return None
+
+    def remember_chunk_ids(self, search_query, index_version, chunk_ids):
+        self._put(self.data["chunks"], _query_key(search_query, None),
+                  {"index_version": index_version, "ids": list(chunk_ids)}, self.max_queries)
+
+    # --- Per card set ---
+
+    def card_blocks(self, card_names):
+        """(image markdown, CARD DATA block) for the card set, or None."""
+        entry = self.data["cards"].get(_card_key(card_names))
+        if entry is None:
+            return None
+        return entry["image_md"], entry["card_context"]
+
+    def card_info(self, card_names):
+        """Rendered card explanation for the lookup fast path, or None."""
+        entry = self.data["cards"].get(_card_key(card_names))
+        return entry.get("card_info") if entry else None
+
+    def remember_card_blocks(self, card_names, image_md, card_context, card_info=""):
+        # Empty blocks mean Scryfall failed: let the next request try again
+        if card_names and card_context:
+            self._put(self.data["cards"], _card_key(card_names),
+                      {"image_md": image_md, "card_context": card_context, "card_info": card_info}, self.max_card_sets)
+
+    # --- Per turn ---
+
+    def summaries(self):
+        """answer_key -> summary for the session's recent judge answers (see HistoryCompactor.compact)."""
+        return self.data["summaries"]
+
+    def remember_summary(self, answer, summary):
+        table = self.data["summaries"]
+        key = answer_key(answer)
+        table.pop(key, None)
+        table[key] = summary
+        while len(table) > self.max_summaries:
+            table.pop(next(iter(table)))
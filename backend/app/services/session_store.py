@@ -0,0 +1,139 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import closing
+from backend.app.core.config import (
+    SESSION_BACKEND, SESSION_DB_PATH, SESSION_CACHE_SIZE, SESSION_TTL, SESSION_HISTORY_LIMIT
+)
+
+
+def new_session_id():
+    return uuid.uuid4().hex
+
+
+def new_session_state(history=None, context=None):
+    """A session is the conversation history plus the card context the controller carries between turns."""
+    return {"history": list(history or []), "context": dict(context or {})}
+
+
+def append_turn(state, query, response, limit=SESSION_HISTORY_LIMIT):
+    """Records one exchange, keeping the last `limit` history entries (same window as the CLI)."""
+    history = state["history"] + [query, response]
+    state["history"] = history[-limit:]
+    return state
+
+
+class MemorySessionStore:
+    """In-process session store: LRU bounded, entries expire `ttl` seconds after their last write."""
+
+    def __init__(self, max_size=SESSION_CACHE_SIZE, ttl=SESSION_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._sessions = OrderedDict()  # session_id -> (updated, state), oldest first
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def get(self, session_id):
+        with self._lock:
+            item = self._sessions.get(session_id)
+            if item is None:
+                return None
+            updated, state = item
+            if time.time() - updated > self.ttl:
+                del self._sessions[session_id]
+                return None
+            self._sessions.move_to_end(session_id)
+            # Copy so a request never mutates another request's view of the session
+            return new_session_state(state["history"], state["context"])
+
+    def save(self, session_id, state):
+        with self._lock:
+            self._sessions[session_id] = (time.time(), new_session_state(state["history"], state["context"]))
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_size:
+                self._sessions.popitem(last=False)
+
+    def update(self, session_id, fn):
+        """Applies fn(state) to the stored session atomically. Returns the new state, None if there is none."""
+        with self._lock:
+            item = self._sessions.get(session_id)
+            if item is None or time.time() - item[0] > self.ttl:
+                return None
+            state = new_session_state(item[1]["history"], item[1]["context"])
+            fn(state)
+            self._sessions[session_id] = (time.time(), state)
+            return new_session_state(state["history"], state["context"])
+
+    def delete(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+
+class SQLiteSessionStore:
+    """
+    Session store backed by a SQLite file, so several API worker processes
+    on one host see the same sessions. Expired rows are purged periodically.
+    """
+
+    PURGE_EVERY = 100  # writes
+
+    def __init__(self, path=SESSION_DB_PATH, ttl=SESSION_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._writes = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, state TEXT NOT NULL, updated REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated)")
+
+    def _connect(self):
+        # One short-lived connection per call: safe across threads and processes
+        return sqlite3.connect(self.path, timeout=5)
+
+    def get(self, session_id):
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT state, updated FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            return None
+        return json.loads(row[0])
+
+    def save(self, session_id, state):
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT INTO sessions (id, state, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET state = excluded.state, updated = excluded.updated",
+                (session_id, json.dumps(state), now)
+            )
+            self._writes += 1
+            if self._writes % self.PURGE_EVERY == 0:
+                conn.execute("DELETE FROM sessions WHERE updated < ?", (now - self.ttl,))
+
+    def update(self, session_id, fn):
+        """Applies fn(state) to the stored session in one write transaction, so concurrent writers never lose each other's changes."""
+        with closing(self._connect()) as conn, conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT state, updated FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            if row is None or time.time() - row[1] > self.ttl:
+                return None
+            state = json.loads(row[0])
+            fn(state)
+            conn.execute("UPDATE sessions SET state = ?, updated = ? WHERE id = ?", (json.dumps(state), time.time(), session_id))
+        return state
+
+    def delete(self, session_id):
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+
+def create_session_store(backend=SESSION_BACKEND):
+    if backend == "sqlite":
+        return SQLiteSessionStore()
+    return MemorySessionStore()
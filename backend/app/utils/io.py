@@ -1,12 +1,74 @@
 import os
-from backend.app.core.config import DATA_DIR
+import hashlib
+from backend.app.core.config import DATA_DIR, INTERACTIONS_LOG, HTTP_TIMEOUT
 
 def ensure_data_dir():
     """Ensures the data and logs directories exist."""
     os.makedirs(DATA_DIR, exist_ok=True)
     os.makedirs("logs", exist_ok=True)
 
-def log_interaction(query, response, model_type, is_gold=False):
+def file_sha256(path):
+    """SHA-256 of a file, read in 1 MB blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def stream_download(url, path, session=None, validator=None, size=None, sha256=None, timeout=HTTP_TIMEOUT):
+    """
+    Streams `url` to `path` through `path`.part and returns the file's SHA-256.
+
+    A leftover .part from an interrupted run of the same url / `validator` is resumed
+    with a Range request; the validator (remote ETag or Last-Modified) also goes out as
+    If-Range, so the server sends the whole file instead if it changed in between. The expected `size` / `sha256` are checked
+    before the file replaces `path`; a mismatching download is discarded.
+    """
+    import requests
+    session = session or requests
+    tmp, source = path + ".part", path + ".part.src"
+    origin = f"{url}\n{validator or ''}"
+    offset = os.path.getsize(tmp) if os.path.exists(tmp) else 0
+    if offset:
+        with open(source, "a+", encoding="utf-8") as f:
+            f.seek(0)
+            if f.read() != origin:  # the .part belongs to another file or version
+                offset = 0
+    with open(source, "w", encoding="utf-8") as f:
+        f.write(origin)
+    headers = {}
+    if offset:
+        headers["Range"] = f"bytes={offset}-"
+        if validator:
+            headers["If-Range"] = validator
+
+    digest = hashlib.sha256()
+    with session.get(url, headers=headers, stream=True, timeout=timeout) as resp:
+        if resp.status_code == 416:  # nothing left to fetch (or a stale .part): start over
+            os.remove(tmp)
+            os.remove(source)
+            return stream_download(url, path, session, validator, size, sha256, timeout)
+        resp.raise_for_status()
+        if offset and resp.status_code == 206:
+            with open(tmp, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+            mode = "ab"
+        else:
+            mode = "wb"
+        with open(tmp, mode) as f:
+            for chunk in resp.iter_content(chunk_size=1 << 20):
+                f.write(chunk)
+                digest.update(chunk)
+
+    checksum = digest.hexdigest()
+    if (size is not None and os.path.getsize(tmp) != size) or (sha256 and checksum != sha256):
+        os.remove(tmp)
+        raise ValueError(f"Download of {url} failed verification (size or checksum mismatch).")
+    os.replace(tmp, path)
+    return checksum
+
+def log_interaction(query, response, model_type, is_gold=False, cards=None, index_version=None, features=None, wasted_tokens=None):
     """Logs an interaction for future fine-tuning."""
     import json
     import datetime
@@ -17,5 +79,15 @@ def log_interaction(query, response, model_type, is_gold=False):
         "model": model_type,
         "is_gold": is_gold # True if generated by 70B (either directly or via escalation)
     }
-    with open("logs/interactions.jsonl", "a", encoding="utf-8") as f:
+    # Optional keys let the answer cache be seeded from this log later on.
+    if cards:
+        log_entry["cards"] = cards
+    if index_version:
+        log_entry["index_version"] = index_version
+    # Training data for the escalation predictor
+    if features:
+        log_entry["features"] = features
+    if wasted_tokens:
+        log_entry["wasted_tokens"] = wasted_tokens
+    with open(INTERACTIONS_LOG, "a", encoding="utf-8") as f:
         f.write(json.dumps(log_entry) + "\n")
@@ -0,0 +1,9 @@
+"""
+Local stand-ins for the external services: Groq chat completions, Scryfall, CardTrader
+and the WotC B&R / rules pages, backed by the fixtures in fake_services/fixtures.
+
+Run them with `python -m fake_services` and export the printed variables: config reads
+every base URL from the environment, so the real clients run unchanged against them.
+"""
+from fake_services.settings import FakeSettings
+from fake_services.app import create_app, service_env
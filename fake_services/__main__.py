@@ -0,0 +1,31 @@
+"""
+Serves the stand-in services.
+
+Usage: python -m fake_services [--port 8100] [--latency 0.2] [--token-rate 200] [--http-latency 0.02] [--answers answers.json]
+"""
+import argparse
+import uvicorn
+from fake_services import FakeSettings, create_app, service_env
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", type=float, default=0.2, help="Groq: seconds before the first token")
+    parser.add_argument("--token-rate", type=float, default=200.0, help="Groq: tokens per second (0 = instant)")
+    parser.add_argument("--http-latency", type=float, default=0.02, help="seconds added to Scryfall/CardTrader/WotC calls")
+    parser.add_argument("--answers", help="JSON file of canned Groq replies: {kind: {query: reply}}")
+    args = parser.parse_args()
+
+    options = dict(latency=args.latency, token_rate=args.token_rate, http_latency=args.http_latency)
+    settings = FakeSettings.from_answers_file(args.answers, **options) if args.answers else FakeSettings(**options)
+
+    print("🧪 Fake services ready. Point the Judge at them with:")
+    for key, value in service_env(f"http://{args.host}:{args.port}").items():
+        print(f"   export {key}={value}")
+    uvicorn.run(create_app(settings), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
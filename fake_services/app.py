@@ -0,0 +1,39 @@
+import asyncio
+from fastapi import Depends, FastAPI
+from fake_services.settings import FakeSettings
+from fake_services.groq import groq_router
+from fake_services.scryfall import CardFixtures, scryfall_router
+from fake_services.cardtrader import cardtrader_router
+from fake_services.wotc import wotc_router
+
+
+def create_app(settings=None):
+    """One app serving every stand-in under its own prefix (see service_env for the matching base URLs)."""
+    settings = settings or FakeSettings()
+    cards = CardFixtures(settings.fixture("scryfall_cards.json"))
+
+    async def http_latency():
+        if settings.http_latency:
+            await asyncio.sleep(settings.http_latency)
+
+    app = FastAPI(title="MTG Judge fake services")
+    app.state.settings = settings
+    app.include_router(groq_router(settings, cards), prefix="/groq")
+    app.include_router(scryfall_router(settings, cards), prefix="/scryfall", dependencies=[Depends(http_latency)])
+    app.include_router(cardtrader_router(settings), prefix="/cardtrader/api/v2", dependencies=[Depends(http_latency)])
+    app.include_router(wotc_router(settings), prefix="/wotc", dependencies=[Depends(http_latency)])
+    return app
+
+
+def service_env(base_url):
+    """Environment that points backend.app.core.config at the stand-ins served from base_url."""
+    base_url = base_url.rstrip("/")
+    return {
+        "GROQ_BASE_URL": f"{base_url}/groq",
+        "GROQ_API_KEY": "fake-groq-key",
+        "SCRYFALL_API_URL": f"{base_url}/scryfall",
+        "CARDTRADER_API_URL": f"{base_url}/cardtrader/api/v2",
+        "CARDTRADER_TOKEN": "fake-cardtrader-token",
+        "BR_URL": f"{base_url}/wotc/banned-restricted-list",
+        "RULES_DOWNLOAD_URL": f"{base_url}/wotc/MagicCompRules.txt",
+    }
@@ -0,0 +1,39 @@
+import glob
+import json
+import os
+from fastapi import APIRouter, Depends, Header, HTTPException
+
+
+def cardtrader_router(settings):
+    """/expansions, /blueprints/export and /marketplace/products, like api.cardtrader.com/api/v2."""
+    router = APIRouter()
+    expansions = settings.load_json("cardtrader", "expansions.json")
+    blueprints = {}  # expansion_id -> blueprints
+    for path in glob.glob(settings.fixture("cardtrader", "blueprints_export_*.json")):
+        with open(path, "r", encoding="utf-8") as f:
+            blueprints[int(os.path.basename(path)[len("blueprints_export_"):-len(".json")])] = json.load(f)
+    products = {}  # blueprint_id -> listings
+    for path in glob.glob(settings.fixture("cardtrader", "marketplace_products_*.json")):
+        with open(path, "r", encoding="utf-8") as f:
+            products.update({int(k): v for k, v in json.load(f).items()})
+
+    def authorized(authorization: str = Header(None)):
+        # Any bearer token is accepted; a missing one fails like the real API
+        if not authorization or not authorization.startswith("Bearer "):
+            raise HTTPException(status_code=401, detail="Unauthorized")
+
+    @router.get("/expansions", dependencies=[Depends(authorized)])
+    async def list_expansions():
+        return expansions
+
+    @router.get("/blueprints/export", dependencies=[Depends(authorized)])
+    async def export(expansion_id: int = None, scryfall_id: str = None):
+        if expansion_id is not None:
+            return blueprints.get(expansion_id, [])
+        return [bp for rows in blueprints.values() for bp in rows if scryfall_id and bp.get("scryfall_id") == scryfall_id]
+
+    @router.get("/marketplace/products", dependencies=[Depends(authorized)])
+    async def marketplace(blueprint_id: int):
+        return {str(blueprint_id): products.get(blueprint_id, [])}
+
+    return router
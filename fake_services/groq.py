@@ -0,0 +1,109 @@
+import asyncio
+import json
+import time
+import uuid
+from fastapi import APIRouter, Body
+from fastapi.responses import JSONResponse, StreamingResponse
+from backend.app.core.config import PROMPT_INTENT, PROMPT_SEARCH, PROMPT_PRICE_DETECT, PROMPT_REWRITER
+from backend.app.services.llm import PROMPT_EXTRACT_CARDS
+
+# System prompt -> kind of reply the real model is expected to give
+PROMPT_KINDS = {
+    PROMPT_INTENT: "intent",
+    PROMPT_EXTRACT_CARDS: "extract",
+    PROMPT_SEARCH: "search",
+    PROMPT_PRICE_DETECT: "price_detect",
+    PROMPT_REWRITER: "rewrite",
+}
+INTENT_KEYWORDS = [
+    ("meta", ("who are you", "what can you do")),
+    ("off_topic", ("weather", "recipe", "football")),
+    ("market", ("price", "worth", "buy", "sell", "movers", "cost")),
+    ("versions", ("version", "printing", "prints")),
+    ("lookup", ("what does", "show me", "oracle text")),
+]
+JUDGE_ANSWER = ("1. 🃏 CARD INFO: {card} | {mana_cost} | {type_line}\n"
+                "2. 📜 ORACLE TEXT: {oracle_text}\n"
+                "3. ⚖️ RULING: Under the Comprehensive Rules this works as printed (stand-in answer).\n"
+                "4. 💡 GAMEPLAY SCENARIO: A two-player game where {card} is on the battlefield.")
+
+
+def _query(messages):
+    text = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+    return text[len("Query: "):] if text.startswith("Query: ") else text
+
+
+def _tokens(text):
+    """Roughly one token per word, keeping the whitespace so the stream joins back to `text`."""
+    words = text.split(" ")
+    return [w + " " for w in words[:-1]] + [words[-1]]
+
+
+def groq_router(settings, cards):
+    """OpenAI-compatible chat completions at /openai/v1/chat/completions, like api.groq.com."""
+    router = APIRouter()
+
+    def mentioned(text):
+        lowered = text.lower()
+        return [c for c in cards.names if c.lower() in lowered]
+
+    def reply(kind, query, messages):
+        canned = settings.answers.get(kind, {})
+        if query in canned:
+            return canned[query]
+        lowered = query.lower()
+        if kind == "intent":
+            return next((intent for intent, words in INTENT_KEYWORDS if any(w in lowered for w in words)), "rules")
+        if kind == "extract":
+            return json.dumps(mentioned(query))
+        if kind == "search":
+            names = mentioned(query)
+            return f"!\"{names[0]}\"" if names else query
+        if kind == "price_detect":
+            return "true" if any(w in lowered for w in ("price", "worth", "cost")) else "false"
+        if kind == "rewrite":
+            return query
+        names = mentioned(" ".join(m["content"] for m in messages))
+        card = cards.named(names[0]) if names else None
+        return JUDGE_ANSWER.format(card=card["name"] if card else "N/A", mana_cost=card.get("mana_cost", "") if card else "",
+                                   type_line=card["type_line"] if card else "N/A",
+                                   oracle_text=card["oracle_text"] if card else "N/A")
+
+    def headers():
+        return {"x-ratelimit-remaining-tokens": str(settings.rate_limit_tokens),
+                "x-ratelimit-remaining-requests": "14400", "x-request-id": uuid.uuid4().hex}
+
+    @router.post("/openai/v1/chat/completions")
+    async def chat_completions(body: dict = Body(...)):
+        messages = body["messages"]
+        system = next((m["content"] for m in messages if m["role"] == "system"), "")
+        content = reply(PROMPT_KINDS.get(system, "answer"), _query(messages), messages)
+        tokens = _tokens(content)[:body.get("max_tokens") or None]
+        usage = {"prompt_tokens": sum(len(m["content"]) for m in messages) // 4,
+                 "completion_tokens": len(tokens)}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        base = {"id": f"chatcmpl-{uuid.uuid4().hex[:24]}", "created": int(time.time()), "model": body["model"]}
+        per_token = 1 / settings.token_rate if settings.token_rate else 0
+
+        if not body.get("stream"):
+            await asyncio.sleep(settings.latency + len(tokens) * per_token)
+            return JSONResponse({**base, "object": "chat.completion", "usage": usage, "choices": [
+                {"index": 0, "message": {"role": "assistant", "content": "".join(tokens)}, "finish_reason": "stop"}]},
+                headers=headers())
+
+        async def events():
+            await asyncio.sleep(settings.latency)
+            for token in tokens:
+                chunk = {**base, "object": "chat.completion.chunk",
+                         "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+                if per_token:
+                    await asyncio.sleep(per_token)
+            done = {**base, "object": "chat.completion.chunk", "x_groq": {"usage": usage},
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+            yield f"data: {json.dumps(done)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream", headers=headers())
+
+    return router
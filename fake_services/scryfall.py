@@ -0,0 +1,109 @@
+import json
+import os
+import re
+from fastapi import APIRouter, Body, Request
+from fastapi.responses import FileResponse, JSONResponse
+
+
+def _not_found(details):
+    return JSONResponse({"object": "error", "code": "not_found", "status": 404, "details": details}, status_code=404)
+
+
+class CardFixtures:
+    """Scryfall card objects (one per print) from scryfall_cards.json, with their rulings."""
+
+    def __init__(self, path):
+        with open(path, "r", encoding="utf-8") as f:
+            prints = json.load(f)
+        self.path = path
+        self.rulings = {p["id"]: p.pop("rulings", []) for p in prints}
+        self.prints = sorted(prints, key=lambda p: p.get("released_at", ""))
+        self.by_id = {p["id"]: p for p in self.prints}
+        self.names = sorted({p["name"] for p in self.prints}, key=len, reverse=True)  # longest first
+
+    def named(self, name):
+        """Latest print with exactly this name (case-insensitive)."""
+        matches = [p for p in self.prints if p["name"].lower() == name.lower()]
+        return matches[-1] if matches else None
+
+    def fuzzy(self, name):
+        lowered = name.lower()
+        matches = [p for p in self.prints if lowered in p["name"].lower()]
+        return matches[-1] if matches else None
+
+    def search(self, q):
+        """A subset of Scryfall syntax: !"Exact Name", name:text or plain text (all prints, oldest first)."""
+        exact = re.fullmatch(r'!"?([^"]+)"?', q.strip())
+        if exact:
+            return [p for p in self.prints if p["name"].lower() == exact.group(1).lower()]
+        text = re.sub(r'^name:', "", q.strip()).strip('"').lower()
+        return [p for p in self.prints if text in p["name"].lower()]
+
+
+def scryfall_router(settings, cards):
+    """/cards/named, /cards/search, /cards/collection, rulings and bulk data, like api.scryfall.com."""
+    router = APIRouter()
+
+    def card_json(request, card):
+        return {**card, "rulings_uri": str(request.url_for("rulings", card_id=card["id"]))}
+
+    @router.get("/cards/named")
+    async def named(request: Request, exact: str = None, fuzzy: str = None):
+        card = cards.named(exact) if exact else cards.fuzzy(fuzzy or "")
+        if card is None:
+            return _not_found(f"No card found with the given name: {exact or fuzzy}")
+        return card_json(request, card)
+
+    @router.get("/cards/search")
+    async def search(request: Request, q: str, unique: str = "cards", order: str = "name", dir: str = "auto"):
+        found = cards.search(q)
+        if unique == "cards":
+            latest = {p["name"]: p for p in found}
+            found = list(latest.values())
+        if dir == "desc":
+            found = found[::-1]
+        if not found:
+            return _not_found(f"Your query didn't match any cards: {q}")
+        return {"object": "list", "total_cards": len(found), "has_more": False,
+                "data": [card_json(request, p) for p in found]}
+
+    @router.post("/cards/collection")
+    async def collection(request: Request, body: dict = Body(...)):
+        data, not_found = [], []
+        for ident in body.get("identifiers", [])[:75]:
+            if "id" in ident:
+                card = cards.by_id.get(ident["id"])
+            elif "set" in ident and "collector_number" in ident:
+                card = next((p for p in cards.prints if p["set"] == ident["set"].lower()
+                             and p["collector_number"] == ident["collector_number"]), None)
+            else:
+                card = cards.named(ident.get("name", ""))
+            if card is None:
+                not_found.append(ident)
+            else:
+                data.append(card_json(request, card))
+        return {"object": "list", "not_found": not_found, "data": data}
+
+    @router.get("/cards/{card_id}/rulings", name="rulings")
+    async def rulings(card_id: str):
+        if card_id not in cards.by_id:
+            return _not_found(f"No card found with the given ID: {card_id}")
+        return {"object": "list", "has_more": False, "data": [
+            {"object": "ruling", "source": "wotc", "published_at": "2024-01-01", "comment": c}
+            for c in cards.rulings[card_id]]}
+
+    @router.get("/bulk-data")
+    async def bulk_data(request: Request):
+        stat = os.stat(cards.path)
+        return {"object": "list", "has_more": False, "data": [{
+            "object": "bulk_data", "type": "default_cards", "content_type": "application/json",
+            "download_uri": str(request.url_for("bulk_file")), "size": stat.st_size,
+            "updated_at": f"{int(stat.st_mtime)}",
+        }]}
+
+    @router.get("/bulk/default-cards.json", name="bulk_file")
+    async def bulk_file():
+        # The fixture itself: every print is a full card object (rulings are ignored by bulk consumers)
+        return FileResponse(cards.path, media_type="application/json")
+
+    return router
@@ -0,0 +1,37 @@
+import json
+import os
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+class FakeSettings:
+    """
+    Behaviour of the stand-in services.
+
+    latency / token_rate shape Groq completions (time to first token, then tokens per
+    second; 0 = all at once). http_latency is added to every Scryfall, CardTrader and
+    WotC request. answers overrides the canned Groq replies per prompt kind
+    ("intent", "extract", "search", "price_detect", "rewrite", "answer") and query,
+    e.g. {"intent": {"Is Sol Ring banned?": "rules"}}.
+    """
+
+    def __init__(self, latency=0.2, token_rate=200.0, http_latency=0.02, answers=None, fixtures_dir=FIXTURES_DIR,
+                 rate_limit_tokens=1_000_000):
+        self.latency = latency
+        self.token_rate = token_rate
+        self.http_latency = http_latency
+        self.answers = answers or {}
+        self.fixtures_dir = fixtures_dir
+        self.rate_limit_tokens = rate_limit_tokens
+
+    def fixture(self, *parts):
+        return os.path.join(self.fixtures_dir, *parts)
+
+    def load_json(self, *parts):
+        with open(self.fixture(*parts), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    @classmethod
+    def from_answers_file(cls, path, **kwargs):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(answers=json.load(f), **kwargs)
@@ -0,0 +1,24 @@
+import hashlib
+from fastapi import APIRouter, Request, Response
+from fastapi.responses import FileResponse
+
+
+def wotc_router(settings):
+    """The Banned & Restricted page and the comprehensive rules text file, with ETags, HEAD and Range."""
+    router = APIRouter()
+
+    @router.get("/banned-restricted-list")
+    async def banned_restricted(request: Request):
+        with open(settings.fixture("banned_restricted.html"), "rb") as f:
+            page = f.read()
+        etag = f'"{hashlib.sha256(page).hexdigest()[:16]}"'
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        return Response(page, media_type="text/html", headers={"ETag": etag})
+
+    @router.api_route("/MagicCompRules.txt", methods=["GET", "HEAD"])
+    async def rules():
+        # FileResponse handles HEAD, Range and If-Range
+        return FileResponse(settings.fixture("MagicCompRules.txt"), media_type="text/plain")
+
+    return router
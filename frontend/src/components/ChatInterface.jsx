@@ -13,8 +13,8 @@ const ChatInterface = () => {
     const [isLoading, setIsLoading] = useState(false);
     const messagesEndRef = useRef(null);
 
-    // History tracking for context
-    const [history, setHistory] = useState([]);
+    // Conversation history and card context are kept server-side per session
+    const [sessionId, setSessionId] = useState(null);
 
     useEffect(() => {
         messagesEndRef.current?.scrollIntoView({ behavior: "smooth" });
@@ -34,9 +34,8 @@ const ChatInterface = () => {
         try {
             const payload = {
                 query: userText,
-                history: history,
-                smart_mode: smartMode,
-                context: null // We could persist context here if needed
+                session_id: sessionId,
+                smart_mode: smartMode
             };
 
             const response = await fetch(`${API_URL}/chat`, {
@@ -56,10 +55,7 @@ const ChatInterface = () => {
                 queryContext: userText
             }]);
 
-            // Update history (keep last 8 interactions)
-            const newHistory = [...history, userText, data.response];
-            if (newHistory.length > 8) newHistory.splice(0, newHistory.length - 8);
-            setHistory(newHistory);
+            setSessionId(data.session_id);
 
         } catch (error) {
             console.error("Chat Error:", error);
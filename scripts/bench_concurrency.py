@@ -0,0 +1,172 @@
+"""
+Concurrency benchmark for /api/chat.
+
+Drives the real FastAPI app in-process with N simultaneous conversations and
+compares the old blocking pipeline (sync ChatController called from the async
+endpoint) against AsyncChatController. External services are replaced by
+stand-ins with fixed latencies, so the numbers measure our pipeline, not Groq.
+
+Usage: python scripts/bench_concurrency.py [--clients 32] [--llm-latency 0.3]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+
+# Ensure project root is in path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.app.main import app
+from backend.app.dependencies import get_chat_controller
+from backend.app.services.chat_controller import ChatController, AsyncChatController
+from backend.app.services.llm import LLMService
+from backend.app.services.rag import RAGService
+
+ANSWER = ("1. 🃏 CARD INFO: Blood Moon | 3 | Enchantment\n2. 📜 ORACLE TEXT: Nonbasic lands are Mountains.\n"
+          "3. ⚖️ RULING: Urza's Saga loses its chapter abilities.\n4. 💡 GAMEPLAY SCENARIO: Example.")
+
+
+class StandInLLM:
+    validate_format = LLMService.validate_format
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def classify_intent(self, query, history=[]):
+        time.sleep(self.latency / 3)
+        return "rules"
+
+    def extract_cards(self, query, history=[]):
+        time.sleep(self.latency / 3)
+        return ["Blood Moon"]
+
+    def get_completion(self, model, messages, temperature=0.7, max_tokens=1000):
+        time.sleep(self.latency)
+        return ANSWER
+
+
+class AsyncStandInLLM(StandInLLM):
+    async def classify_intent(self, query, history=[]):
+        await asyncio.sleep(self.latency / 3)
+        return "rules"
+
+    async def extract_cards(self, query, history=[]):
+        await asyncio.sleep(self.latency / 3)
+        return ["Blood Moon"]
+
+    async def get_completion(self, model, messages, temperature=0.7, max_tokens=1000):
+        await asyncio.sleep(self.latency)
+        return ANSWER
+
+
+class StandInCards:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def get_card_data(self, card_names):
+        time.sleep(self.latency)
+        return [{"name": n, "oracle_text": "Nonbasic lands are Mountains.", "type_line": "Enchantment", "image": None}
+                for n in card_names]
+
+
+class AsyncStandInCards(StandInCards):
+    async def get_card_data(self, card_names):
+        await asyncio.sleep(self.latency)
+        return [{"name": n, "oracle_text": "Nonbasic lands are Mountains.", "type_line": "Enchantment", "image": None}
+                for n in card_names]
+
+
+class StandInRAG:
+    """Encoding stand-in: sleeps like a CPU-bound MiniLM call would occupy a thread."""
+    index_version = "bench"
+
+    def __init__(self, latency):
+        self.latency = latency
+        from concurrent.futures import ThreadPoolExecutor
+        self.executor = ThreadPoolExecutor(max_workers=2)
+
+    search_query = staticmethod(RAGService.search_query)
+    index_data = {"chunks": [{"rule_num": "613.1", "text": "Layer system."}]}
+
+    def get_chunks(self, ids, index_version=None):
+        return [self.index_data["chunks"][i] for i in ids]
+
+    def retrieve_ids(self, query, history=None, top_k=10, index_version=None):
+        time.sleep(self.latency)
+        return [0]
+
+    async def aretrieve_ids(self, query, history=None, top_k=10, index_version=None):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.retrieve_ids, query, history, top_k)
+
+
+class BlockingAdapter:
+    """Reproduces the pre-async endpoint: an awaitable wrapper around a blocking call."""
+
+    def __init__(self, controller):
+        self.controller = controller
+
+    async def process_message(self, *args, **kwargs):
+        return self.controller.process_message(*args, **kwargs)
+
+
+async def drive(clients, requests_per_client):
+    transport = httpx.ASGITransport(app=app)
+    latencies = []
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def conversation():
+            for _ in range(requests_per_client):
+                start = time.perf_counter()
+                resp = await client.post("/api/chat", json={"query": "How does Blood Moon affect Urza's Saga?"})
+                resp.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*[conversation() for _ in range(clients)])
+        wall = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "wall": wall,
+        "throughput": len(latencies) / wall,
+        "p50": latencies[len(latencies) // 2],
+        "p95": latencies[int(len(latencies) * 0.95) - 1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2, help="sequential requests per client")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="seconds per completion")
+    parser.add_argument("--http-latency", type=float, default=0.05, help="seconds per Scryfall call")
+    parser.add_argument("--encode-latency", type=float, default=0.01, help="seconds per retrieval encode")
+    args = parser.parse_args()
+
+    def blocking():
+        return BlockingAdapter(ChatController(
+            StandInLLM(args.llm_latency), StandInRAG(args.encode_latency), StandInCards(args.http_latency), None, None, None))
+
+    def non_blocking():
+        return AsyncChatController(
+            AsyncStandInLLM(args.llm_latency), StandInRAG(args.encode_latency), AsyncStandInCards(args.http_latency), None, None, None)
+
+    print(f"🚀 {args.clients} concurrent clients x {args.requests} requests")
+    results = {}
+    for label, factory in [("blocking", blocking), ("async", non_blocking)]:
+        app.dependency_overrides[get_chat_controller] = factory
+        results[label] = asyncio.run(drive(args.clients, args.requests))
+        r = results[label]
+        print(f"  {label:<9} wall {r['wall']:.2f}s | {r['throughput']:.1f} req/s | p50 {r['p50']:.2f}s | p95 {r['p95']:.2f}s")
+    app.dependency_overrides.clear()
+
+    speedup = results["async"]["throughput"] / results["blocking"]["throughput"]
+    print(f"📈 Async pipeline throughput: {speedup:.1f}x the blocking pipeline on one worker.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Pre-generates Judge persona answers for the meta, off_topic and clarify intents.
+
+The API answers those intents from a rotating pool (backend/app/services/fast_paths.py)
+instead of calling Groq on every message. This script asks the LLM once for extra
+variants and writes them to PERSONA_POOL_PATH, where PersonaPool picks them up.
+
+Usage: python scripts/generate_persona_pool.py [--variants 5]
+"""
+import argparse
+import json
+import os
+import sys
+
+# Ensure project root is in path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.app.core.config import SMART_MODEL, PROMPT_OFF_TOPIC, PROMPT_CLARIFY, PERSONA_POOL_PATH
+from backend.app.services.chat_controller import PROMPT_META
+from backend.app.services.llm import LLMService
+from backend.app.services.scheduler import PRIORITY_BACKGROUND
+from backend.app.utils.security import get_api_key
+
+SAMPLE_QUERIES = {
+    "meta": ["Who are you?", "What can you do?", "How can you help me?", "Are you a real judge?", "What do you know about?"],
+    "off_topic": ["How do I make pancakes?", "Write me a python script", "Who won the football match?", "What is the capital of Peru?", "Any tips for my love life?"],
+    "clarify": ["Does it work?", "Can I do that?", "What happens then?", "Is that legal?", "Who wins?"],
+}
+PROMPTS = {"meta": PROMPT_META, "off_topic": PROMPT_OFF_TOPIC, "clarify": PROMPT_CLARIFY}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--variants", type=int, default=5, help="answers per intent")
+    parser.add_argument("--output", default=PERSONA_POOL_PATH)
+    args = parser.parse_args()
+
+    llm = LLMService(get_api_key())
+    pool = {}
+    for intent, prompt in PROMPTS.items():
+        queries = SAMPLE_QUERIES[intent]
+        answers = []
+        for i in range(args.variants):
+            messages = [{"role": "system", "content": prompt}, {"role": "user", "content": queries[i % len(queries)]}]
+            answer = llm.get_completion(SMART_MODEL, messages, temperature=0.9, max_tokens=300, priority=PRIORITY_BACKGROUND)
+            if answer.startswith("Error:"):
+                print(f"⚠️ {intent}: {answer}")
+                continue
+            answers.append(answer.strip())
+        pool[intent] = answers
+        print(f"✅ {intent}: {len(answers)} answers")
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(pool, f, indent=2, ensure_ascii=False)
+    print(f"💾 Persona pool saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""
+Rebuilds the local CardTrader blueprint index (scryfall_id -> blueprint ids).
+
+The API and CLI refresh it in the background once it is older than
+CARDTRADER_INDEX_MAX_AGE; this script does it on demand (or from cron), e.g.
+right after a new set is released.
+
+Usage: python scripts/refresh_cardtrader_index.py [--force]
+"""
+import argparse
+import os
+import sys
+
+# Ensure project root is in path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.app.services.cardtrader import CardTraderService
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--force", action="store_true", help="rebuild even if the index is still fresh")
+    args = parser.parse_args()
+
+    service = CardTraderService(api_key=os.getenv("CARDTRADER_TOKEN"))
+    if not service.api_key:
+        print("❌ CardTrader API key missing (CARDTRADER_TOKEN or keyring 'cardtrader_api_key').")
+        sys.exit(1)
+    count = service.refresh_blueprint_index(force=args.force)
+    print(f"💾 {count} prints indexed in {service.index.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,11 +5,12 @@ import sys
 # Ensure project root is in path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from src.services.llm import LLMService
-from src.services.rag import RAGService
-from src.services.scryfall import CardService
-from src.config import NORMAL_MODEL, SMART_MODEL, PROMPT_JUDGE
-from src.utils.security import get_api_key
+from backend.app.services.llm import LLMService
+from backend.app.services.rag import RAGService
+from backend.app.services.scryfall import CardService
+from backend.app.services.escalation import Escalator
+from backend.app.core.config import NORMAL_MODEL, SMART_MODEL, PROMPT_JUDGE
+from backend.app.utils.security import get_api_key
 
 class BenchmarkRunner:
     def __init__(self):
@@ -17,6 +18,7 @@ class BenchmarkRunner:
         self.llm = LLMService(api_key)
         self.rag = RAGService()
         self.cards = CardService()
+        self.escalator = Escalator(self.llm)
         
     def run_case(self, case):
         query = case['query']
@@ -64,14 +66,13 @@ class BenchmarkRunner:
         system_instruction = f"{PROMPT_JUDGE}\n\n{card_context}\n\n{rules_context}{force_truth}"
         messages = [{"role": "system", "content": system_instruction}, {"role": "user", "content": query}]
         
-        response = self.llm.get_completion(NORMAL_MODEL, messages)
-        
-        # Phase 2 Critic Escalation (Benchmark also tests this)
-        if NORMAL_MODEL in str(NORMAL_MODEL): # Always True, just to match cli.py structure
-            is_valid, _ = self.llm.validate_format(response)
-            if not is_valid and "Error" not in response:
-                print("🕵️ Critic: Format invalid. Escalating to Deep (70B)...")
-                response = self.llm.get_completion(SMART_MODEL, messages)
+        # Phase 2 Critic Escalation (same streamed/hedged path as cli.py)
+        def on_abandon(reason, partial):
+            print(f"🕵️ Critic: Format invalid ({reason}). Escalating to Deep (70B)...")
+
+        response, final_model = self.escalator.complete(NORMAL_MODEL, messages, on_abandon=on_abandon)
+        if final_model == SMART_MODEL:
+            print("   ↳ answered by Deep (70B)")
         
         
         # 4. Validate
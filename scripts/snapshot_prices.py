@@ -0,0 +1,53 @@
+"""
+Daily price snapshot: downloads the Scryfall default_cards bulk export and appends
+today's eur / eur_foil / usd / usd_foil per print to the local price history
+(PRICE_HISTORY_DIR), which feeds the 7/30/90-day averages, volatility and trends
+of MarketIntelligenceService.get_card_stats. The same bulk file also rebuilds the
+local card catalog used by deck analysis (CARD_CATALOG_PATH).
+
+Run it once a day (e.g. cron: 30 3 * * * python scripts/snapshot_prices.py).
+
+Usage: python scripts/snapshot_prices.py [--bulk-file path] [--skip-download]
+"""
+import argparse
+import os
+import sys
+import time
+
+# Ensure project root is in path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.app.core.config import SCRYFALL_BULK_PATH
+from backend.app.services.scryfall import CardService
+from backend.app.services.price_history import PriceHistoryStore
+from backend.app.services.card_catalog import CardCatalog
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bulk-file", default=SCRYFALL_BULK_PATH)
+    parser.add_argument("--skip-download", action="store_true", help="snapshot an already downloaded bulk file")
+    args = parser.parse_args()
+
+    if not args.skip_download:
+        print("📡 Downloading Scryfall bulk data (default_cards)...")
+        updated_at, _ = CardService.download_bulk_data(args.bulk_file)
+        print(f"✅ Bulk data saved to {args.bulk_file} (updated {updated_at})")
+
+    # The export is hundreds of MB: parse it once for both the catalog and the snapshot
+    cards = CardService.load_bulk_data(args.bulk_file)
+    catalog = CardCatalog()
+    print(f"📚 Card catalog: {catalog.build_from_cards(cards)} cards.")
+
+    store = PriceHistoryStore()
+    start = time.perf_counter()
+    count = store.append_snapshot(cards)
+    if not count:
+        print(f"⏭️ Snapshot for {store.last_day} already recorded.")
+        return
+    print(f"💾 {count} prints snapshotted in {time.perf_counter() - start:.1f}s "
+          f"({len(store)} days, {len(store.ids)} prints tracked).")
+
+
+if __name__ == "__main__":
+    main()
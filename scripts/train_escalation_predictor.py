@@ -0,0 +1,142 @@
+"""
+Trains the 8B -> 70B escalation predictor from logs/interactions.jsonl.
+
+Only answers that started on 8B are labelled: escalated (is_gold) or not.
+Log lines written before features were recorded are dropped, not backfilled,
+and no model is written until ESCALATION_PREDICTOR_MIN_SAMPLES usable rows exist.
+Prints accuracy against the logged escalations and the tokens the router
+would have saved by skipping doomed 8B generations, then writes the model
+to ESCALATION_PREDICTOR_PATH where the CLI picks it up.
+
+Usage: python scripts/train_escalation_predictor.py [--threshold 0.5] [--min-samples 100] [--dry-run]
+"""
+import argparse
+import json
+import os
+import sys
+
+# Ensure project root is in path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.app.core.config import (
+    INTERACTIONS_LOG, NORMAL_MODEL, ESCALATION_PREDICTOR_PATH, ESCALATION_PREDICTOR_THRESHOLD,
+    ESCALATION_PREDICTOR_MIN_SAMPLES
+)
+from backend.app.services.escalation_predictor import EscalationPredictor, extract_features, has_features, was_escalated
+
+MIN_HOLDOUT_SAMPLES = 40
+TOKENS_PER_CHAR = 0.25
+
+
+def load_entries(path=INTERACTIONS_LOG):
+    """Labelled 8B answers that recorded their features, and how many 8B answers were dropped for lacking them."""
+    entries, dropped = [], 0
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            # Answers that started on 70B (user choice or router) have no 8B outcome
+            if entry.get("model") != NORMAL_MODEL or (entry.get("features") or {}).get("routed"):
+                continue
+            if has_features(entry):
+                entries.append(entry)
+            else:
+                dropped += 1
+    return entries, dropped
+
+
+def wasted_tokens(entry):
+    """Tokens burnt by the discarded 8B attempt; estimated from the final answer for older logs."""
+    if entry.get("wasted_tokens"):
+        return entry["wasted_tokens"]
+    feats = entry.get("features") or {}
+    return feats.get("prompt_tokens", 0) + int(len(entry.get("response", "")) * TOKENS_PER_CHAR)
+
+
+def evaluate(predictor, entries):
+    tp = fp = tn = fn = 0
+    saved = 0
+    for entry in entries:
+        predicted = predictor.should_escalate(extract_features(entry))
+        actual = was_escalated(entry)
+        if predicted and actual:
+            tp += 1
+            saved += wasted_tokens(entry)
+        elif predicted:
+            fp += 1
+        elif actual:
+            fn += 1
+        else:
+            tn += 1
+    total = max(len(entries), 1)
+    return {
+        "samples": len(entries),
+        "escalations": tp + fn,
+        "accuracy": (tp + tn) / total,
+        "baseline_accuracy": (tn + fp) / total,  # always start on 8B
+        "precision": tp / (tp + fp) if tp + fp else 0.0,
+        "recall": tp / (tp + fn) if tp + fn else 0.0,
+        "unnecessary_70b": fp,
+        "wasted_tokens_logged": sum(wasted_tokens(e) for e in entries if was_escalated(e)),
+        "wasted_tokens_saved": saved,
+    }
+
+
+def print_report(metrics, label):
+    print(f"\n📊 {label}: {metrics['samples']} answers, {metrics['escalations']} logged escalations")
+    print(f"   Accuracy {metrics['accuracy']:.1%} (always-8B baseline {metrics['baseline_accuracy']:.1%})")
+    print(f"   Precision {metrics['precision']:.1%} | Recall {metrics['recall']:.1%}")
+    print(f"   Wasted 8B tokens: {metrics['wasted_tokens_logged']} logged, {metrics['wasted_tokens_saved']} avoidable")
+    print(f"   Requests sent to 70B unnecessarily: {metrics['unnecessary_70b']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--log", default=INTERACTIONS_LOG)
+    parser.add_argument("--output", default=ESCALATION_PREDICTOR_PATH)
+    parser.add_argument("--threshold", type=float, default=ESCALATION_PREDICTOR_THRESHOLD)
+    parser.add_argument("--min-samples", type=int, default=ESCALATION_PREDICTOR_MIN_SAMPLES,
+                        help="usable (feature-bearing) 8B answers required before training")
+    parser.add_argument("--dry-run", action="store_true", help="report only, do not save the model")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.log):
+        print(f"Error: {args.log} not found.")
+        return
+
+    entries, dropped = load_entries(args.log)
+    entries.sort(key=lambda e: e.get("timestamp", ""))
+    print(f"📒 {len(entries)} usable 8B answers ({dropped} older ones without recorded features dropped).")
+    if len(entries) < args.min_samples:
+        print(f"Error: need at least {args.min_samples} answers with recorded features to train a router. "
+              f"No model written.")
+        return
+    labels = [was_escalated(e) for e in entries]
+    if not any(labels) or all(labels):
+        print(f"Error: need both escalated and non-escalated 8B answers ({sum(labels)}/{len(labels)} escalated).")
+        return
+
+    # Chronological split: train on the past, evaluate on the most recent answers
+    split = int(len(entries) * 0.75)
+    holdout = entries[split:]
+    train = entries[:split]
+    if len(entries) < MIN_HOLDOUT_SAMPLES or not any(labels[:split]) or all(labels[:split]):
+        print(f"⚠️ No usable holdout in {len(entries)} labelled answers: reporting in-sample metrics.")
+        train = holdout = entries
+
+    predictor = EscalationPredictor.fit([extract_features(e) for e in train], [was_escalated(e) for e in train],
+                                        threshold=args.threshold)
+    metrics = evaluate(predictor, holdout)
+    print_report(metrics, "Holdout" if holdout is not train else "In-sample")
+
+    predictor = EscalationPredictor.fit([extract_features(e) for e in entries], labels, threshold=args.threshold)
+    predictor.metrics = {**metrics, "usable_rows": len(entries), "dropped_rows": dropped}
+    if not args.dry_run:
+        predictor.save(args.output)
+        print(f"\n✅ Predictor saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
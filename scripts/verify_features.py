@@ -6,12 +6,12 @@ from dotenv import load_dotenv
 # Add src to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from src.services.llm import LLMService
-from src.services.scryfall import CardService
-from src.services.rag import RAGService
-from src.services.legality import LegalityService
-from src.services.cardtrader import CardTraderService
-from src.services.market import MarketIntelligenceService
+from backend.app.services.llm import LLMService
+from backend.app.services.scryfall import CardService
+from backend.app.services.rag import RAGService
+from backend.app.services.legality import LegalityService
+from backend.app.services.cardtrader import CardTraderService
+from backend.app.services.market import MarketIntelligenceService
 from src.cli import MTGJudgeCLI
 from backend.app.core.config import NORMAL_MODEL, SMART_MODEL
 
@@ -0,0 +1,328 @@
+"""
+Micro-benchmarks for the pipeline's pure-Python hot paths.
+
+Every case runs on synthetic or fixture data: no network, no API keys and no sentence
+model (retrieval uses a hashing encoder, so it times the search and chunk lookup
+around the model). Each case is timed with timeit in rounds alternating with a fixed
+pure-Python calibration loop. Baselines (benchmarks/baseline.json) store its relative
+time, the median case/calibration ratio over --repeat rounds, so one recorded on one
+machine stays meaningful on another. A case whose relative time exceeds its baseline
+by more than --tolerance is a regression: the run exits with 1.
+
+Usage:
+  python -m src.bench [--only rag_retrieve,parse_rulebook] [--tolerance 0.25] [--json out.json]
+  python -m src.bench --update    # store the current timings as the baseline
+"""
+import argparse
+import hashlib
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import timeit
+import numpy as np
+from backend.app.core.config import BASE_DIR, BENCH_BASELINE_PATH, BENCH_TOLERANCE, NORMAL_MODEL
+from backend.app.services.llm import LLMService
+from backend.app.services.rag import RAGService
+from backend.app.services.scryfall import CardService
+from backend.app.services.card_catalog import CardCatalog, normalize_card_name, _entry
+from backend.app.services.legality import LegalityService
+from backend.app.services.chat_controller import ChatController
+from backend.app.utils import market_links
+from src.indexer import parse_rulebook_into_chunks, publish_index, rulebook_version
+
+FIXTURE_CARDS = os.path.join(BASE_DIR, "fake_services", "fixtures", "scryfall_cards.json")
+WORDS = ("creature", "player", "permanent", "ability", "damage", "battlefield", "library", "counter", "spell",
+         "controller", "turn", "effect", "target", "mana", "cost", "graveyard", "exile", "token", "combat", "step",
+         "priority", "trigger", "opponent", "card", "zone", "loses", "copy", "layer", "attacking", "blocking")
+ANSWER = ("1. 🃏 CARD INFO: Blood Moon | {2}{R} | Enchantment\n"
+          "2. 📜 ORACLE TEXT: Nonbasic lands are Mountains.\n"
+          "3. ⚖️ RULING: " + "Blood Moon applies in layer 4 and removes the lands' other abilities. " * 12 + "\n"
+          "4. 💡 GAMEPLAY SCENARIO: " + "Your opponent fetches a Mountain in response. " * 8)
+
+
+# --- Synthetic data ---
+
+def synthetic_rulebook(seed=7, chapters=9, rules_per_chapter=20, subrules=9):
+    """Comprehensive-Rules-shaped text of about the real size (numbered rules, lettered subrules)."""
+    rng = random.Random(seed)
+
+    def sentence(n):
+        return " ".join(rng.choice(WORDS) for _ in range(n)).capitalize() + "."
+
+    lines = ["Magic: The Gathering Comprehensive Rules", "", "Introduction", "", sentence(40), ""]
+    for chapter in range(1, chapters + 1):
+        for rule in range(chapter * 100, chapter * 100 + rules_per_chapter):
+            lines += [f"{rule}. {sentence(3).rstrip('.')}", ""]
+            for sub in range(1, subrules + 1):
+                lines += [f"{rule}.{sub}. {sentence(rng.randint(12, 45))}", ""]
+                for letter in "abcde"[:rng.randint(0, 5)]:
+                    lines += [f"{rule}.{sub}{letter} {sentence(rng.randint(10, 35))}", ""]
+    lines += ["Glossary", "", sentence(60)]
+    return "\n".join(lines)
+
+
+class HashEncoder:
+    """Sentence-model stand-in: a deterministic unit vector per text, MiniLM sized."""
+    dimensions = 384
+
+    def encode(self, texts, **kwargs):
+        return np.stack([np.random.default_rng(int.from_bytes(hashlib.sha256(t.encode("utf-8")).digest()[:8], "big"))
+                         .standard_normal(self.dimensions).astype(np.float32) for t in texts])
+
+
+def fixture_cards():
+    with open(FIXTURE_CARDS, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def synthetic_prints(card, count=500, seed=11):
+    """A Scryfall search page with `count` printings of one card (some without a EUR price)."""
+    rng = random.Random(seed)
+    items = []
+    for i in range(count):
+        eur = None if rng.random() < 0.2 else f"{rng.uniform(0.5, 300):.2f}"
+        items.append({**card, "id": f"{card['id'][:-4]}{i:04d}", "set": f"s{i:03d}",
+                      "set_name": f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()}: Edition {i}",
+                      "collector_number": str(i), "released_at": f"{1993 + i % 30}-01-01",
+                      "prices": {"eur": eur, "usd": eur}})
+    return CardService._parse_versions({"data": items})
+
+
+class StubCards:
+    """get_card_data from the fixtures (already parsed, rulings included)."""
+
+    def __init__(self, cards):
+        self.cards = {c["name"]: {**CardService._parse_card(c), "rulings": list(c.get("rulings", [])) * 3} for c in cards}
+
+    def get_card_data(self, card_names):
+        return [self.cards[n] for n in card_names if n in self.cards]
+
+
+# --- Cases: each setup returns the callable that is timed ---
+
+def setup_parse_rulebook(tmp):
+    text = synthetic_rulebook()
+    return lambda: parse_rulebook_into_chunks(text)
+
+
+def setup_rag_retrieve(tmp):
+    text = synthetic_rulebook()
+    chunks = parse_rulebook_into_chunks(text)
+    encoder = HashEncoder()
+    publish_index({"chunks": chunks, "embeddings": encoder.encode([c["text"] for c in chunks]),
+                   "model_name": "hash-encoder", "version": rulebook_version(text)},
+                  index_dir=os.path.join(tmp, "indexes"), manifest_path=os.path.join(tmp, "manifest.json"))
+    rag = RAGService(manifest_path=os.path.join(tmp, "manifest.json"), model_loader=lambda name: encoder)
+    history = ["Does deathtouch work with trample?", "Yes."]
+    return lambda: (rag.retrieve("How do layers apply to Blood Moon and Urza's Saga?"), rag.retrieve("and why?", history))
+
+
+def setup_check_legality(tmp):
+    rng = random.Random(3)
+    names = [f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()} {i}" for i in range(30000)]
+    names += [c["name"] for c in fixture_cards()]
+    formats = ("standard", "pioneer", "modern", "legacy", "vintage", "commander", "pauper")
+    catalog = CardCatalog(path=None)
+    catalog._index({normalize_card_name(n): _entry({"name": n, "type_line": "Creature",
+                                                     "legalities": {f: "legal" for f in formats}}) for n in names})
+    br = {fmt.title(): {"banned": rng.sample(names, 60), "restricted": rng.sample(names, 10) if fmt == "vintage" else []}
+          for fmt in formats}
+    br_file = os.path.join(tmp, "banned_restricted.json")
+    with open(br_file, "w", encoding="utf-8") as f:
+        json.dump(br, f)
+    legality = LegalityService(catalog, br_file=br_file)
+    lookups = rng.sample(names, 80) + br["Modern"]["banned"][:10] + ["Nonexistent Card", "JÖTUN GRUNT", "Fire // Ice"]
+    lookups += [n.upper() for n in br["Vintage"]["restricted"][:7]]
+    return lambda: [legality.check_legality(name) for name in lookups]
+
+
+def setup_versions_menu(tmp):
+    card = next(c for c in fixture_cards() if c["name"] == "Sol Ring")
+    versions = synthetic_prints(card)
+    rng = random.Random(5)
+    ct_prices = [rng.choice(["N/A", "N/A (Key missing)", f"{rng.uniform(0.5, 300):.2f}€"]) for _ in versions]
+    controller = ChatController(None, None, None, None, None, None)
+    return lambda: controller._generate_versions_menu(versions, ["Sol Ring"], ct_prices)
+
+
+def setup_validate_format(tmp):
+    validate = LLMService("bench").validate_format
+    malformed = ANSWER.replace("GAMEPLAY SCENARIO", "EXAMPLE")
+    return lambda: (validate(ANSWER), validate(malformed))
+
+
+def setup_market_links(tmp):
+    names = [c["name"] for c in fixture_cards()] + ["Jötun Grunt", "Fire // Ice", "Ach! Hans, Run!", "Borrowing 100,000 Arrows"]
+    sets = ["Commander Legends: Battle for Baldur's Gate", "Magic 2010", "Duel Decks: Elves vs. Goblins", "Alpha"]
+    pairs = [(n, s) for n in names for s in sets]
+
+    def links():
+        for name, set_name in pairs:
+            market_links.get_cm_search_link(name)
+            market_links.get_cm_version_link(name, set_name)
+            market_links.get_ct_search_link(name)
+            market_links.get_ct_version_link(name, set_name)
+    return links
+
+
+def setup_card_context(tmp):
+    from src.cli import MTGJudgeCLI
+    cards = StubCards(fixture_cards())
+    cli = MTGJudgeCLI(None, None, cards, None, None, None)
+    names = list(cards.cards)[:4]
+    return lambda: cli._get_card_context(names)
+
+
+def setup_rules_prompt(tmp):
+    cards = StubCards(fixture_cards())
+    controller = ChatController(None, None, cards, None, None, None)
+    names = list(cards.cards)[:4]
+    chunks = parse_rulebook_into_chunks(synthetic_rulebook())[:10]
+    history = ["Does Blood Moon stop Urza's Saga?", ANSWER, "What about Dryad of the Ilysian Grove?", ANSWER]
+
+    def prompt():
+        ctx = ChatController._new_context({"cards": names})
+        _, card_context = controller._run(controller._card_blocks(names, ctx), ctx)
+        rules_context = controller._format_rules_context(chunks)
+        return controller._rules_messages("And with Blood Moon?", history, card_context, rules_context, NORMAL_MODEL)
+    return prompt
+
+
+CASES = {
+    "parse_rulebook": ("parse_rulebook_into_chunks on a full-size synthetic rulebook", setup_parse_rulebook),
+    "rag_retrieve": ("RAGService.retrieve, fresh and follow-up query (hashing encoder)", setup_rag_retrieve),
+    "check_legality": ("LegalityService.check_legality x100 over a 30k-card catalog", setup_check_legality),
+    "versions_menu_500": ("ChatController._generate_versions_menu for 500 prints", setup_versions_menu),
+    "validate_format": ("LLMService.validate_format, valid and malformed answer", setup_validate_format),
+    "market_links": ("Cardmarket/CardTrader link builders for 56 card/set pairs", setup_market_links),
+    "card_context": ("MTGJudgeCLI._get_card_context for 4 cards with rulings", setup_card_context),
+    "rules_prompt": ("controller card blocks + rules context + judge prompt assembly", setup_rules_prompt),
+}
+
+
+# --- Timing ---
+
+def calibration_loop():
+    """Fixed pure-Python work (arithmetic, dicts, strings): the unit the cases are measured in."""
+    table = {}
+    for i in range(2000):
+        table[i % 97] = table.get(i % 97, 0) + i * i % 7
+    return ",".join(str(v) for v in table.values())
+
+
+def _batch_size(timer, min_time):
+    number = 1
+    while timer.timeit(number) < min_time:
+        number *= 2
+    return number
+
+
+def measure(fn, repeat=9, min_time=0.02):
+    """
+    Seconds per call of fn and of the calibration loop (best batch each) and their ratio.
+    Loops are doubled until a batch takes min_time. Each round times a batch of both back
+    to back; the ratio is the median over rounds, so a machine that speeds up or slows
+    down mid-run (frequency scaling, noisy neighbours) shifts both sides of it.
+    """
+    timers = [timeit.Timer(fn), timeit.Timer(calibration_loop)]
+    numbers = [_batch_size(t, min_time) for t in timers]
+    rounds = [[timer.timeit(number) / number for timer, number in zip(timers, numbers)] for _ in range(repeat)]
+    ratio = float(np.median([case / calibration for case, calibration in rounds]))
+    return min(r[0] for r in rounds), min(r[1] for r in rounds), ratio
+
+
+def run_suite(names=None, repeat=9, min_time=0.02):
+    """Times the selected cases. Returns {"cases": {name: {"us", "calibration_us", "relative"}}, ...}."""
+    names = names or list(CASES)
+    unknown = [n for n in names if n not in CASES]
+    if unknown:
+        raise ValueError(f"Unknown benchmark(s): {', '.join(unknown)}")
+
+    cases = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in names:
+            seconds, calibration, relative = measure(CASES[name][1](tmp), repeat, min_time)
+            cases[name] = {"us": round(seconds * 1e6, 3), "calibration_us": round(calibration * 1e6, 3),
+                           "relative": round(relative, 4)}
+    return {"python": platform.python_version(), "machine": platform.machine(), "cases": cases}
+
+
+def compare(results, baseline, tolerance=BENCH_TOLERANCE):
+    """Per case: relative time vs the baseline and a status ("ok", "regression", "faster" or "new")."""
+    rows = {}
+    for name, current in results["cases"].items():
+        base = (baseline or {}).get("cases", {}).get(name)
+        if base is None:
+            rows[name] = {**current, "baseline": None, "change": None, "status": "new"}
+            continue
+        change = current["relative"] / base["relative"] - 1
+        status = "regression" if change > tolerance else "faster" if change < -tolerance else "ok"
+        rows[name] = {**current, "baseline": base["relative"], "change": round(change, 4), "status": status}
+    return rows
+
+
+def load_baseline(path=BENCH_BASELINE_PATH):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(results, path=BENCH_BASELINE_PATH):
+    """Stores the results as the baseline; cases that were not run keep their stored timings."""
+    baseline = load_baseline(path) or {"cases": {}}
+    merged = {**results, "cases": {**baseline.get("cases", {}), **results["cases"]}}
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(merged, f, indent=2, sort_keys=True)
+        f.write("\n")
+    os.replace(path + ".tmp", path)
+
+
+def print_report(results, rows, tolerance):
+    icons = {"ok": "✅", "faster": "⚡", "regression": "🔺", "new": "🆕"}
+    print(f"\nPython {results['python']} ({results['machine']}); relative = time / calibration loop")
+    print(f"{'case':<20} {'µs/op':>12} {'calib µs':>10} {'relative':>10} {'baseline':>10} {'change':>8}")
+    for name, row in rows.items():
+        baseline = f"{row['baseline']:.3f}" if row["baseline"] is not None else "-"
+        change = f"{row['change']:+.1%}" if row["change"] is not None else "-"
+        print(f"{name:<20} {row['us']:>12.2f} {row['calibration_us']:>10.1f} {row['relative']:>10.3f} {baseline:>10} {change:>8}  {icons[row['status']]}")
+    regressions = [name for name, row in rows.items() if row["status"] == "regression"]
+    if regressions:
+        print(f"\n❌ Slower than baseline by more than {tolerance:.0%}: {', '.join(regressions)}")
+    else:
+        print(f"\n✅ No hot path regressed beyond {tolerance:.0%}.")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", help=f"comma-separated cases ({', '.join(CASES)})")
+    parser.add_argument("--tolerance", type=float, default=BENCH_TOLERANCE, help="allowed slowdown vs the baseline")
+    parser.add_argument("--repeat", type=int, default=9, help="timed rounds per case (median ratio)")
+    parser.add_argument("--min-time", type=float, default=0.02, help="seconds per timed batch")
+    parser.add_argument("--baseline", default=BENCH_BASELINE_PATH)
+    parser.add_argument("--update", action="store_true", help="store these timings as the baseline")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    names = args.only.split(",") if args.only else None
+    print(f"⏱️ Benchmarking {len(names or CASES)} hot paths ({args.repeat} rounds each)...")
+    results = run_suite(names, repeat=args.repeat, min_time=args.min_time)
+    rows = compare(results, load_baseline(args.baseline), args.tolerance)
+    regressions = print_report(results, rows, args.tolerance)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({**results, "cases": rows}, f, indent=2)
+    if args.update:
+        save_baseline(results, args.baseline)
+        print(f"💾 Baseline written to {args.baseline}")
+        return
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,64 +1,154 @@
 import requests
 from bs4 import BeautifulSoup
+import hashlib
 import json
 import os
-from src.config import BR_URL, BR_FILE
+import time
+from backend.app.core.config import BR_URL, BR_FILE, BR_META_FILE
+
+
+def content_hash(data):
+    return hashlib.sha256(data if isinstance(data, bytes) else data.encode("utf-8")).hexdigest()
+
 
 class BRParser:
-    def __init__(self):
-        self.url = BR_URL
+    """
+    Syncs the official Banned & Restricted page into BR_FILE.
+
+    The page is fetched conditionally (ETag / Last-Modified from the previous sync, kept
+    in BR_META_FILE), re-parsed only when its content hash changed, and the JSON is
+    written atomically and only when the parsed lists actually differ, so running
+    services (LegalityService.start_watch) reload only on real ban updates.
+    """
+
+    def __init__(self, url=BR_URL, path=BR_FILE, meta_path=BR_META_FILE, session=None):
+        self.url = url
+        self.path = path
+        self.meta_path = meta_path
+        self.session = session or requests
         self.data = {}
+        self.changed = False
 
     def run(self):
-        """Fetches and parses the B&R list."""
+        """Fetches and parses the B&R list. Returns True on success (see `changed` for whether the file moved)."""
         print(f"Syncing with: {self.url}")
+        self.changed = False
+        meta = self._load_meta()
         try:
-            resp = requests.get(self.url, timeout=15)
+            headers = {}
+            if not os.path.exists(self.path):
+                meta = {}  # nothing to compare against: fetch and write unconditionally
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+            resp = self.session.get(self.url, headers=headers, timeout=15)
+            if resp.status_code == 304:
+                print("B&R page not modified since the last sync.")
+                return True
             resp.raise_for_status()
-            soup = BeautifulSoup(resp.text, 'html.parser')
-            
-            # The WotC page uses headers for formats and UL/LI for cards
-            # We'll look for sections containing "Banned" or "Restricted"
-            
-            sections = soup.find_all(['h3', 'h4'])
-            for section in sections:
-                title = section.get_text().strip()
-                if "Banned Cards" in title or "Banned and Restricted" in title:
-                    format_name = title.split(" Banned")[0].strip()
-                    cards = []
-                    
-                    # Look for the next siblings until another header
-                    node = section.find_next_sibling()
-                    while node and node.name not in ['h3', 'h4']:
-                        if node.name == 'ul':
-                            cards.extend([li.get_text().strip() for li in node.find_all('li')])
-                        node = node.find_next_sibling()
-                    
-                    if cards:
-                        if "Vintage" in format_name:
-                            # Vintage often has split lists, we'll handle this in a simplified way
-                            self.data["Vintage"] = {"banned": [c for c in cards if "banned" in title.lower()], 
-                                                   "restricted": [c for c in cards if "restricted" in title.lower()]}
-                        else:
-                            self.data[format_name] = cards
-
-            # Add categorical bans if sections found, or defaults
-            self.data["Categorical"] = {
-                "Attractions": "Banned in Standard, Modern, Legacy, Vintage, Pauper",
-                "Stickers": "Banned in Standard, Modern, Legacy, Vintage, Pauper"
-            }
-
-            self._save()
-            print(f"Successfully synced {len(self.data)} formats.")
+
+            meta.update(etag=resp.headers.get("ETag"), last_modified=resp.headers.get("Last-Modified"), checked_at=time.time())
+            page_hash = content_hash(resp.content)
+            if page_hash == meta.get("page_hash"):
+                print("B&R page unchanged (same content hash).")
+                self._save_meta(meta)
+                return True
+
+            self.data = self.parse(resp.text)
+            data_hash = content_hash(json.dumps(self.data, sort_keys=True))
+            meta["page_hash"] = page_hash
+            if data_hash != meta.get("data_hash"):
+                self._save()
+                meta["data_hash"] = data_hash
+                self.changed = True
+            self._save_meta(meta)
+            print(f"Successfully synced {len(self.data)} formats{'' if self.changed else ' (no list changes)'}.")
             return True
         except Exception as e:
             print(f"Sync failed: {e}")
             return False
 
+    @staticmethod
+    def parse(html):
+        """
+        Format -> banned cards from the WotC page. Vintage keeps its two lists apart:
+        {"banned": [...], "restricted": [...]}, plus "unclassified" for cards listed
+        without a banned/restricted lead-in (LegalityService keeps their catalog status).
+        """
+        data = {}
+        soup = BeautifulSoup(html, 'html.parser')
+
+        # The WotC page uses headers for formats and UL/LI for cards; inside a combined
+        # "Banned and Restricted" section a lead-in paragraph says which list follows
+
+        sections = soup.find_all(['h3', 'h4'])
+        for section in sections:
+            title = section.get_text().strip()
+            if "Banned" not in title and "Restricted" not in title:
+                continue
+            format_name = title.split(" Banned")[0].split(" Restricted")[0].strip()
+            if "Banned" not in title:
+                label = "restricted"
+            elif "Restricted" not in title:
+                label = "banned"
+            else:
+                label = None  # until a lead-in names the list
+            lists = {"banned": [], "restricted": [], "unclassified": []}
+
+            # Look for the next siblings until another header
+            node = section.find_next_sibling()
+            while node and node.name not in ['h3', 'h4']:
+                if node.name == 'ul':
+                    lists[label or "unclassified"].extend([li.get_text().strip() for li in node.find_all('li')])
+                else:
+                    lead_in = node.get_text().lower()
+                    if "restricted" in lead_in:
+                        label = "restricted"
+                    elif "banned" in lead_in:
+                        label = "banned"
+                node = node.find_next_sibling()
+
+            if not any(lists.values()):
+                continue
+            if "Vintage" in format_name:
+                vintage = data.setdefault("Vintage", {"banned": [], "restricted": []})
+                for status, cards in lists.items():
+                    if cards:
+                        vintage.setdefault(status, []).extend(cards)
+            else:
+                data[format_name] = lists["banned"] + lists["restricted"] + lists["unclassified"]
+
+        # Add categorical bans if sections found, or defaults
+        data["Categorical"] = {
+            "Attractions": "Banned in Standard, Modern, Legacy, Vintage, Pauper",
+            "Stickers": "Banned in Standard, Modern, Legacy, Vintage, Pauper"
+        }
+        return data
+
+    def _load_meta(self):
+        if os.path.exists(self.meta_path):
+            try:
+                with open(self.meta_path, 'r') as f:
+                    return json.load(f)
+            except Exception:
+                return {}
+        return {}
+
+    def _save_meta(self, meta):
+        self._write(self.meta_path, meta)
+
     def _save(self):
-        os.makedirs(os.path.dirname(BR_FILE), exist_ok=True)
-        with open(BR_FILE, 'w') as f:
-            json.dump(self.data, f, indent=4)
+        self._write(self.path, self.data, indent=4)
+
+    @staticmethod
+    def _write(path, data, indent=None):
+        # Readers (LegalityService) must never see a half-written file
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, 'w') as f:
+            json.dump(data, f, indent=indent)
+        os.replace(tmp, path)
 
 if __name__ == "__main__":
     parser = BRParser()
@@ -0,0 +1,236 @@
+"""
+Record/replay of outbound HTTP traffic ("cassettes").
+
+Exchanges are captured at the transport, so every client is covered unchanged: the
+Groq SDK and the async clients (httpx) as well as Scryfall, CardTrader and WotC calls
+made with requests. While recording the real call goes out and its response is
+appended to the cassette (one JSON line per exchange); while replaying nothing
+touches the network and each request is answered from the cassette.
+
+A request matches on method, URL (query parameters sorted) and body (JSON
+canonicalized), in recorded order when the same request was made more than once.
+Without an exact match it falls back to the next unplayed exchange for the same
+method and endpoint (a prompt that embeds a price which timed out while recording,
+say) and counts as a fuzzy hit; a strict cassette raises CassetteMiss instead.
+"""
+import base64
+import hashlib
+import http
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+import httpx
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+# Bodies are stored decoded, so these no longer describe them
+DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+
+class CassetteMiss(RuntimeError):
+    """A replayed request has no recorded exchange."""
+
+
+def normalize_url(url):
+    parts = urlsplit(str(url))
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, query, ""))
+
+
+def endpoint(method, url):
+    parts = urlsplit(str(url))
+    return f"{method.upper()} {parts.scheme}://{parts.netloc}{parts.path}"
+
+
+def request_key(method, url, body=None):
+    """Fingerprint of a request: method, normalized URL and canonical body (headers, e.g. keys, are ignored)."""
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    body = body or b""
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True, separators=(",", ":")).encode("utf-8")
+    except ValueError:
+        pass
+    digest = hashlib.sha256(f"{method.upper()} {normalize_url(url)}\n".encode("utf-8") + body)
+    return digest.hexdigest()[:24]
+
+
+class Cassette:
+    """
+    Context manager that records (mode="record") or replays (mode="replay") every
+    HTTP exchange made while it is active. Only one cassette can be active at a time.
+    """
+
+    def __init__(self, path, mode="replay", strict=False):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.strict = strict
+        self.exchanges = []
+        self.stats = {"recorded": 0, "hits": 0, "fuzzy": 0, "misses": 0}
+        self.missed = []  # endpoints of the first misses, for the report
+        self._lock = threading.Lock()
+        self._file = None
+        self._patched = []
+        if mode == "replay":
+            self.load()
+
+    # --- Storage ---
+
+    def load(self):
+        with open(self.path, encoding="utf-8") as f:
+            self.exchanges = [json.loads(line) for line in f if line.strip()]
+        self.rewind()
+
+    def rewind(self):
+        """Makes every exchange playable again (start of a new replay pass)."""
+        self._by_key = defaultdict(deque)
+        self._by_endpoint = defaultdict(deque)
+        self._last = {}
+        for i, ex in enumerate(self.exchanges):
+            self._by_key[ex["key"]].append(i)
+            self._by_endpoint[ex["endpoint"]].append(i)
+        self._played = set()
+
+    def record(self, method, url, body, status, headers, content, elapsed):
+        ex = {
+            "key": request_key(method, url, body),
+            "endpoint": endpoint(method, url),
+            "url": normalize_url(url),
+            "status": status,
+            "headers": [[k, v] for k, v in headers if k.lower() not in DROPPED_HEADERS],
+            "elapsed_ms": round(elapsed * 1000, 1),
+        }
+        try:
+            ex["body"] = content.decode("utf-8")
+        except UnicodeDecodeError:
+            ex["body_b64"] = base64.b64encode(content).decode("ascii")
+        with self._lock:
+            self.exchanges.append(ex)
+            self.stats["recorded"] += 1
+            self._file.write(json.dumps(ex, ensure_ascii=False) + "\n")
+            self._file.flush()
+
+    def play(self, method, url, body=None):
+        """The recorded exchange answering this request."""
+        key = request_key(method, url, body)
+        with self._lock:
+            i = self._next(self._by_key.get(key))
+            if i is not None:
+                self.stats["hits"] += 1
+            elif key in self._last:
+                i = self._last[key]  # replayed more often than recorded: same answer again
+                self.stats["hits"] += 1
+            elif not self.strict and (i := self._next(self._by_endpoint.get(endpoint(method, url)))) is not None:
+                self.stats["fuzzy"] += 1
+            else:
+                self.stats["misses"] += 1
+                if len(self.missed) < 10:
+                    self.missed.append(endpoint(method, url))
+                raise CassetteMiss(f"No recorded exchange for {method.upper()} {normalize_url(url)}")
+            self._played.add(i)
+            self._last[key] = i
+            return self.exchanges[i]
+
+    def _next(self, queue):
+        while queue:
+            i = queue.popleft()
+            if i not in self._played:
+                return i
+        return None
+
+    @staticmethod
+    def content(ex):
+        if "body_b64" in ex:
+            return base64.b64decode(ex["body_b64"])
+        return ex["body"].encode("utf-8")
+
+    # --- Transport patches ---
+
+    def __enter__(self):
+        if self.mode == "record":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._file = open(self.path, "w", encoding="utf-8")
+        self._patch(httpx.HTTPTransport, "handle_request", self._httpx_sync)
+        self._patch(httpx.AsyncHTTPTransport, "handle_async_request", self._httpx_async)
+        self._patch(requests.adapters.HTTPAdapter, "send", self._requests_send)
+        return self
+
+    def __exit__(self, *exc):
+        for owner, name, original in reversed(self._patched):
+            setattr(owner, name, original)
+        self._patched = []
+        if self._file:
+            self._file.close()
+            self._file = None
+        return False
+
+    def _patch(self, owner, name, wrapper):
+        original = owner.__dict__[name]
+        self._patched.append((owner, name, original))
+        setattr(owner, name, wrapper(original))
+
+    def _httpx_sync(self, original):
+        cassette = self
+
+        def handle_request(transport, request):
+            if cassette.mode == "replay":
+                return cassette._httpx_response(cassette.play(request.method, request.url, request.read()), request)
+            started = time.perf_counter()
+            response = original(transport, request)
+            response.read()  # whole body (streams included) before it is handed back
+            cassette.record(request.method, request.url, request.content, response.status_code,
+                            response.headers.multi_items(), response.content, time.perf_counter() - started)
+            return response
+
+        return handle_request
+
+    def _httpx_async(self, original):
+        cassette = self
+
+        async def handle_async_request(transport, request):
+            if cassette.mode == "replay":
+                body = await request.aread()
+                return cassette._httpx_response(cassette.play(request.method, request.url, body), request)
+            started = time.perf_counter()
+            response = await original(transport, request)
+            await response.aread()
+            cassette.record(request.method, request.url, request.content, response.status_code,
+                            response.headers.multi_items(), response.content, time.perf_counter() - started)
+            return response
+
+        return handle_async_request
+
+    def _requests_send(self, original):
+        cassette = self
+
+        def send(adapter, request, **kwargs):
+            if cassette.mode == "replay":
+                return cassette._requests_response(cassette.play(request.method, request.url, request.body), request)
+            started = time.perf_counter()
+            response = original(adapter, request, **kwargs)
+            cassette.record(request.method, request.url, request.body, response.status_code,
+                            response.headers.items(), response.content, time.perf_counter() - started)
+            return response
+
+        return send
+
+    def _httpx_response(self, ex, request):
+        return httpx.Response(ex["status"], headers=ex["headers"], content=self.content(ex), request=request)
+
+    def _requests_response(self, ex, request):
+        response = requests.Response()
+        response.status_code = ex["status"]
+        response.headers = CaseInsensitiveDict(ex["headers"])
+        response.reason = http.HTTPStatus(ex["status"]).phrase
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = self.content(ex)
+        response._content_consumed = True
+        response.url = request.url
+        response.request = request
+        return response
@@ -1,22 +1,35 @@
 import sys
 from backend.app.core.config import SMART_MODEL, NORMAL_MODEL, PROMPT_OFF_TOPIC, PROMPT_CLARIFY, PROMPT_JUDGE
 from backend.app.utils.market_links import get_cm_search_link, get_cm_version_link, get_ct_search_link, get_ct_version_link
+from backend.app.services.escalation import Escalator
+from backend.app.services.escalation_predictor import EscalationPredictor, extract_features
+from backend.app.services.scheduler import estimate_tokens
+from backend.app.services.history_compactor import HistoryCompactor
+from backend.app.services.deck import format_deck_report
 
 
 class MTGJudgeCLI:
-    def __init__(self, llm_service, rag_service, card_service, legality_service, cardtrader_service, market_service):
+    def __init__(self, llm_service, rag_service, card_service, legality_service, cardtrader_service, market_service, answer_cache=None, deck_analyzer=None):
         self.llm = llm_service
         self.rag = rag_service
         self.cards = card_service
         self.legality = legality_service
         self.cardtrader = cardtrader_service
         self.market = market_service
+        self.answer_cache = answer_cache
+        self.deck_analyzer = deck_analyzer
         self.history = []
         self.active_context = {"cards": [], "intent": None}
+        self._streamed_text = None
+        self.escalator = Escalator(llm_service)
+        self.compactor = HistoryCompactor()
+        self.predictor = EscalationPredictor.load()
+        self._last_chunk_count = 0
 
     def start(self):
         print("\n=== MTG Rulebook AI Judge ===")
-        print("Authoritative rulings and card data.\n")
+        print("Authoritative rulings and card data.")
+        print("Type '/deck [file]' to check a decklist (paste it, then 'end').\n")
         
         while True:
             try:
@@ -28,11 +41,18 @@ class MTGJudgeCLI:
                 if not user_input:
                     continue
 
+                # Decklist check: local data only, no model needed
+                if user_input.lower().split()[0] == "/deck":
+                    print(self._handle_deck(user_input[len("/deck"):].strip()))
+                    continue
+
                 # Model Selection
                 print("[1] Fast (8B) [2] Deep (70B)")
                 choice = input("Brain Level (default 1): ").strip()
                 selected_model = SMART_MODEL if choice == '2' else NORMAL_MODEL
                 
+                self._streamed_text = None
+
                 # 2. Intent
                 intent = self.llm.classify_intent(user_input, self.history)
                 print(f"🎯 Intent: {intent}")
@@ -53,7 +73,9 @@ class MTGJudgeCLI:
                 
                 self.active_context["intent"] = intent
 
-                print(f"\nJudge: {response}")
+                # Rules answers are already printed token by token while generating
+                if response != self._streamed_text:
+                    print(f"\nJudge: {response}")
                 
                 # Update history
                 self.history.extend([user_input, response])
@@ -66,6 +88,26 @@ class MTGJudgeCLI:
             except Exception as e:
                 print(f"\nRuntime Error: {e}")
 
+    def _handle_deck(self, path=""):
+        if not self.deck_analyzer:
+            return "Deck analysis unavailable."
+        if path:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    text = f.read()
+            except OSError as e:
+                return f"Error: {e}"
+        else:
+            print("Paste the decklist (MTGO or Arena), then type 'end':")
+            lines = []
+            while True:
+                line = input()
+                if line.strip().lower() == "end":
+                    break
+                lines.append(line)
+            text = "\n".join(lines)
+        return format_deck_report(self.deck_analyzer.analyze(text))
+
     def _handle_meta(self, query, model):
         system_msg = """You are the MTG Know-it-all Judge. 
 Explain that you are the ultimate authority on Magic: The Gathering. 
@@ -229,13 +271,16 @@ Maintain your 'Know-it-all' persona: confident, expert, and slightly showy about
                     f"- Avg Price: {stats['avg_price']}€\n"
                     f"- Price Spread: {stats['price_spread']}€ | Range: {stats['min_price']}€ - {stats['max_price']}€\n"
                     f"- Unique Versions: {stats['version_count']}\n"
+                    f"- 7/30/90-day Avg: {stats['last_7d_avg']} / {stats['last_30d_avg']} / {stats['last_90d_avg']} | "
+                    f"30-day Volatility: {stats['volatility_30d']}%\n"
+                    f"- Trend: {stats['trend_graph'] or 'N/A'}\n"
                 )
             else:
                 extra_context = f"\nSPECIFIC CARD ANALYSIS: No consistent price data found for {card_name}.\n"
 
         messages = [
             {"role": "system", "content": PROMPT_MARKET_ANALYST},
-            {"role": "user", "content": f"Query: {query}\n\n{extra_context}"}
+            {"role": "user", "content": f"Query: {query}\n\n{self.market.movers_context(query)}{extra_context}"}
         ]
         return self.llm.get_completion(model, messages, max_tokens=1000)
 
@@ -244,6 +289,13 @@ Maintain your 'Know-it-all' persona: confident, expert, and slightly showy about
         # 1. Update Context
         self._refresh_card_context(query)
         card_names = self.active_context.get("cards", [])
+
+        use_cache = self.answer_cache is not None and not (self.history and len(query.split()) < 5)
+        if use_cache:
+            hit = self.answer_cache.lookup(query, card_names, model, self.rag.index_version)
+            if hit:
+                print(f"♻️ Answer cache hit ({hit['score']:.2f}): {hit['query'][:60]}")
+                return hit["answer"]
         
         card_context = self._get_card_context(card_names)
         rules_context = self._get_rules_context(query)
@@ -252,12 +304,27 @@ Maintain your 'Know-it-all' persona: confident, expert, and slightly showy about
         system_instruction = f"{PROMPT_JUDGE}\n\n{card_context}\n\n{rules_context}{force_truth}"
         
         messages = [{"role": "system", "content": system_instruction}]
-        for i in range(0, len(self.history), 2):
-            messages.append({"role": "user", "content": self.history[i]})
-            messages.append({"role": "assistant", "content": self.history[i+1]})
+        messages.extend(self.compactor.compact(self.history, model))
         messages.append({"role": "user", "content": query})
 
-        return self._get_completion_with_escalation(query, model, messages)
+        features = {
+            "intent": "rules",
+            "cards": len(card_names),
+            "chunks": self._last_chunk_count,
+            "query_words": len(query.split()),
+            "history_turns": len(self.history) // 2,
+            "prompt_tokens": estimate_tokens(messages),
+        }
+        answer_model = model
+        if model == NORMAL_MODEL and self.predictor and self.predictor.should_escalate(extract_features({"features": features})):
+            print("🔮 Router: likely too complex for Fast (8B). Starting on Deep (70B)...")
+            features["routed"] = True
+            answer_model = SMART_MODEL
+
+        result = self._get_completion_with_escalation(query, answer_model, messages, features)
+        if use_cache and self.llm.validate_format(result)[0]:
+            self.answer_cache.store(query, result, card_names, model, self.rag.index_version)
+        return result
 
     def _refresh_card_context(self, query):
         """Extracts and updates card context from the query."""
@@ -303,6 +370,7 @@ Maintain your 'Know-it-all' persona: confident, expert, and slightly showy about
     def _get_rules_context(self, query):
         """Retrieves and truncates relevant rules from the vector index."""
         chunks = self.rag.retrieve(query, self.history)
+        self._last_chunk_count = len(chunks)
         print(f"📚 {len(chunks)} rule chapters retrieved.")
         
         rules_text_list = []
@@ -317,24 +385,29 @@ Maintain your 'Know-it-all' persona: confident, expert, and slightly showy about
             
         return "COMPREHENSIVE RULES:\n" + "".join(rules_text_list)
 
-    def _get_completion_with_escalation(self, query, model, messages):
+    def _get_completion_with_escalation(self, query, model, messages, features=None):
         """Handles LLM generation with automatic 8B -> 70B escalation if format fails."""
         from backend.app.utils.io import log_interaction
+        wasted = {}
+
+        def on_abandon(reason, partial):
+            # Prompt plus the partial 8B answer are thrown away
+            wasted["tokens"] = estimate_tokens(messages) + len(partial) // 4
+            print(f"\n🕵️ Critic: Format invalid ({reason}). Escalating to Deep (70B) model...")
+            print("\nJudge: ", end="", flush=True)
+
+        print("\nJudge: ", end="", flush=True)
+        result, final_model = self.escalator.complete(
+            model, messages, on_delta=lambda d: print(d, end="", flush=True), on_abandon=on_abandon)
+        print()
+        self._streamed_text = result
+        is_gold = (final_model == SMART_MODEL)
         
-        result = self.llm.get_completion(model, messages)
-        is_gold = (model == SMART_MODEL)
-        
-        if model == NORMAL_MODEL:
-            is_valid, _ = self.llm.validate_format(result)
-            if not is_valid and "rate_limit_exceeded" not in result:
-                print("🕵️ Critic: Format invalid. Escalating to Deep (70B) model...")
-                result = self.llm.get_completion(SMART_MODEL, messages)
-                is_gold = True
-        
-        log_interaction(query, result, model, is_gold=is_gold)
+        log_interaction(query, result, model, is_gold=is_gold,
+                        cards=self.active_context.get("cards"), index_version=self.rag.index_version,
+                        features=features, wasted_tokens=wasted.get("tokens"))
 
         if "rate_limit_exceeded" in result or "Request too large" in result:
              return "I apologize, but that query generated too much technical data for my current memory speed. Please try a simpler question, or select [2] Deep (70B) for more complex interactions."
             
         return result
-
@@ -1,51 +1,211 @@
-import requests
+import argparse
+import hashlib
+import json
 import os
 import sys
-from src.config import RULES_DOWNLOAD_URL, RULEBOOK_PATH
-from src.utils.io import ensure_data_dir
-from src.indexer import create_index
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from backend.app.core.config import (
+    RULES_DOWNLOAD_URL, RULEBOOK_PATH, INDEX_MANIFEST_PATH, SCRYFALL_BULK_PATH, SETUP_STATE_PATH, HTTP_TIMEOUT,
+    CARD_CATALOG_PATH, PRICE_HISTORY_DIR
+)
+from backend.app.utils.io import ensure_data_dir, file_sha256, stream_download
+from backend.app.services.rag import read_manifest
+from backend.app.services.scryfall import CardService
+from backend.app.services.card_catalog import CardCatalog
+from backend.app.services.price_history import PriceHistoryStore
 from src.br_updater import BRParser
+from src.indexer import create_index, rulebook_version
+
+STEPS = ("rules", "br", "scryfall")
+
+
+def input_hash(*parts):
+    return hashlib.sha256("\n".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+
+class SetupState:
+    """
+    Input hash (and output checksum) of every completed setup stage, in SETUP_STATE_PATH.
+    A stage whose input hash did not change and whose output file is intact is skipped;
+    each stage is recorded as soon as it finishes, so an interrupted setup resumes where it stopped.
+    """
+
+    def __init__(self, path=SETUP_STATE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.stages = json.load(f)
+        except (OSError, ValueError):
+            self.stages = {}
+
+    def done(self, stage, digest, output=None):
+        entry = self.stages.get(stage)
+        if not entry or entry["input"] != digest:
+            return False
+        return output is None or self._intact(output, entry)
+
+    @staticmethod
+    def _intact(path, entry):
+        # Size and mtime as recorded: trusted. Touched or rewritten: checked against the recorded checksum.
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        if stat.st_size != entry.get("size"):
+            return False
+        return stat.st_mtime_ns == entry.get("mtime_ns") or file_sha256(path) == entry.get("sha256")
+
+    def record(self, stage, digest, output=None, sha256=None):
+        entry = {"input": digest, "at": time.time()}
+        if output:
+            stat = os.stat(output)
+            entry.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns, sha256=sha256 or file_sha256(output))
+        with self._lock:
+            self.stages[stage] = entry
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.stages, f, indent=2)
+            os.replace(tmp, self.path)
+
+    def sha256(self, stage):
+        return self.stages.get(stage, {}).get("sha256")
+
+
+class SetupPipeline:
+    """
+    Data preparation as independent steps run concurrently:
+
+    - rules: comprehensive rules download (skipped when the remote ETag / Last-Modified is
+      unchanged), then the index build (skipped when the manifest already has that rulebook version)
+    - br: Banned & Restricted sync (conditional fetch, see BRParser)
+    - scryfall: bulk export download (skipped when Scryfall's updated_at is unchanged), then
+      the card catalog and today's price snapshot
+
+    Downloads stream to disk and resume after an interruption (stream_download).
+    """
 
-def download_rules():
-    """Downloads the official MTG Comprehensive Rules in TXT format."""
-    print(f"📡 Downloading rules from: {RULES_DOWNLOAD_URL}")
-    try:
-        response = requests.get(RULES_DOWNLOAD_URL, timeout=30)
-        response.raise_for_status()
-        
-        with open(RULEBOOK_PATH, 'wb') as f:
-            f.write(response.content)
-        
-        print(f"✅ Rules saved to {RULEBOOK_PATH}")
-        return True
-    except Exception as e:
-        print(f"❌ Failed to download rules: {e}")
-        return False
-
-def run_setup():
-    """Performs the full data preparation sequence."""
+    def __init__(self, session=None, state=None, rules_url=RULES_DOWNLOAD_URL, rulebook_path=RULEBOOK_PATH,
+                 manifest_path=INDEX_MANIFEST_PATH, bulk_path=SCRYFALL_BULK_PATH, indexer=None, br_parser=None,
+                 catalog=None, history=None, force=False):
+        self.session = session or requests.Session()
+        self.state = state or SetupState()
+        self.rules_url = rules_url
+        self.rulebook_path = rulebook_path
+        self.manifest_path = manifest_path
+        self.bulk_path = bulk_path
+        self.indexer = indexer
+        self.br_parser = br_parser
+        self.catalog = catalog
+        self.history = history
+        self.force = force
+
+    def run(self, steps=STEPS):
+        """Runs the steps in parallel. Returns {step: {"status", "seconds", "detail"}}."""
+        runners = {"rules": self.step_rules, "br": self.step_br, "scryfall": self.step_scryfall}
+        with ThreadPoolExecutor(max_workers=len(steps), thread_name_prefix="setup") as pool:
+            futures = {step: pool.submit(self._timed, runners[step]) for step in steps}
+            return {step: future.result() for step, future in futures.items()}
+
+    @staticmethod
+    def _timed(step):
+        start = time.perf_counter()
+        try:
+            status, detail = step()
+        except Exception as e:
+            status, detail = "failed", str(e)
+        return {"status": status, "seconds": round(time.perf_counter() - start, 2), "detail": detail}
+
+    def _skip(self, stage, digest, output=None):
+        return not self.force and self.state.done(stage, digest, output)
+
+    # --- Steps ---
+
+    def step_rules(self):
+        head = self.session.head(self.rules_url, timeout=HTTP_TIMEOUT, allow_redirects=True)
+        head.raise_for_status()
+        validator = head.headers.get("ETag") or head.headers.get("Last-Modified")
+        size = head.headers.get("Content-Length")
+        digest = input_hash(self.rules_url, validator, size)
+        downloaded = not self._skip("rules.download", digest, self.rulebook_path)
+        if downloaded:
+            print(f"📡 Downloading rules from: {self.rules_url}")
+            checksum = stream_download(self.rules_url, self.rulebook_path, session=self.session, validator=validator,
+                                       size=int(size) if size and not head.headers.get("Content-Encoding") else None,
+                                       timeout=HTTP_TIMEOUT * 3)
+            self.state.record("rules.download", digest, self.rulebook_path, checksum)
+            print(f"✅ Rules saved to {self.rulebook_path}")
+
+        with open(self.rulebook_path, "r", encoding="utf-8") as f:
+            version = rulebook_version(f.read())
+        manifest = read_manifest(self.manifest_path) or {}
+        if not self.force and manifest.get("active") == version:
+            return ("updated" if downloaded else "skipped"), f"index {version} already built"
+        print("🧠 Initialising rulebook index...")
+        (self.indexer or create_index)(self.rulebook_path)
+        return "updated", f"index {version} built"
+
+    def step_br(self):
+        parser = self.br_parser or BRParser(session=self.session)
+        if not parser.run():
+            return "failed", "B&R sync failed"
+        return ("updated", f"{len(parser.data)} formats") if parser.changed else ("skipped", "list unchanged")
+
+    def step_scryfall(self):
+        entry = CardService.bulk_data_entry(session=self.session)
+        digest = input_hash(entry["download_uri"], entry.get("updated_at"), entry.get("size"))
+        if not self._skip("scryfall.download", digest, self.bulk_path):
+            print(f"📡 Downloading Scryfall bulk data ({entry.get('updated_at')})...")
+            _, checksum = CardService.download_bulk_data(self.bulk_path, entry=entry, session=self.session)
+            self.state.record("scryfall.download", digest, self.bulk_path, checksum)
+        bulk = self.state.sha256("scryfall.download")
+
+        done = []
+        cards = None  # the export is parsed at most once, and only when a stage needs it
+        # A deleted (or damaged) catalog or price history is rebuilt even when the export is unchanged
+        catalog_path = getattr(self.catalog, "path", CARD_CATALOG_PATH)
+        if not self._skip("scryfall.catalog", bulk, catalog_path):
+            cards = CardService.load_bulk_data(self.bulk_path)
+            catalog = self.catalog or CardCatalog()
+            done.append(f"{catalog.build_from_cards(cards)} cards")
+            self.state.record("scryfall.catalog", bulk, catalog_path)
+        if not (self._skip("scryfall.snapshot", bulk) and os.path.isdir(getattr(self.history, "path", PRICE_HISTORY_DIR))):
+            if cards is None:
+                cards = CardService.load_bulk_data(self.bulk_path)
+            history = self.history or PriceHistoryStore()
+            done.append(f"{history.append_snapshot(cards)} prices")
+            self.state.record("scryfall.snapshot", bulk)
+        return ("updated", ", ".join(done)) if done else ("skipped", f"bulk data from {entry.get('updated_at')}")
+
+
+def print_summary(results):
+    icons = {"updated": "✅", "skipped": "⏭️", "failed": "❌"}
+    print("\n⏱️ Setup summary:")
+    for step, result in results.items():
+        print(f"   {icons[result['status']]} {step:<9} {result['status']:<8} {result['seconds']:>7.2f}s  {result['detail']}")
+
+
+def run_setup(steps=STEPS, force=False):
+    """Performs the data preparation, skipping everything that is already up to date."""
     print("🚀 Starting automated data setup...")
-    
     ensure_data_dir()
-    
-    # 1. Download Rulebook
-    if not download_rules():
-        print("🛑 Setup aborted: Rules download failed.")
-        sys.exit(1)
-    
-    # 2. Run Indexer
-    print("\n🧠 Initialising rulebook index...")
-    create_index()
-    
-    # 3. Sync B&R List
-    print("\n📋 Syncing Banned & Restricted list...")
-    parser = BRParser()
-    if parser.run():
-        print("✅ B&R data updated.")
-    else:
-        print("⚠️  B&R sync failed, but setup will continue.")
+    start = time.perf_counter()
+    results = SetupPipeline(force=force).run(steps)
+    print_summary(results)
+    print(f"   Total {time.perf_counter() - start:.2f}s")
 
+    if results.get("rules", {}).get("status") == "failed":
+        print("🛑 Setup failed: the rulebook index is not available.")
+        sys.exit(1)
     print("\n✨ Data setup complete! You can now run the main application.")
 
+
 if __name__ == "__main__":
-    run_setup()
+    parser = argparse.ArgumentParser(description="Downloads and prepares rules, B&R and card data.")
+    parser.add_argument("--only", nargs="+", choices=STEPS, default=list(STEPS))
+    parser.add_argument("--force", action="store_true", help="redo every stage even if its inputs are unchanged")
+    args = parser.parse_args()
+    run_setup(tuple(args.only), args.force)
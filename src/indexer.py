@@ -1,10 +1,12 @@
 import re
+import hashlib
+import json
 import pickle
 import os
-from sentence_transformers import SentenceTransformer
+import time
 import numpy as np
-from src.config import RULEBOOK_PATH, INDEX_PATH
-from src.utils.io import ensure_data_dir
+from backend.app.core.config import RULEBOOK_PATH, INDEX_DIR, INDEX_MANIFEST_PATH
+from backend.app.utils.io import ensure_data_dir
 
 def parse_rulebook_into_chunks(rulebook_text):
     """Parses the rulebook into logically coherent chunks."""
@@ -41,22 +43,28 @@ def parse_rulebook_into_chunks(rulebook_text):
     
     return chunks
 
-def create_index():
+def rulebook_version(rulebook_text):
+    """Rulebook content hash: caches keyed on the index are invalidated by a new release."""
+    return hashlib.sha1(rulebook_text.encode('utf-8')).hexdigest()[:12]
+
+def create_index(rulebook_path=RULEBOOK_PATH):
     """Generates the semantic index for the RAG service."""
     ensure_data_dir()
     
-    if not os.path.exists(RULEBOOK_PATH):
-        print(f"Error: Rulebook not found at {RULEBOOK_PATH}")
+    if not os.path.exists(rulebook_path):
+        print(f"Error: Rulebook not found at {rulebook_path}")
         return
 
     print("Loading rulebook documents...")
-    with open(RULEBOOK_PATH, 'r', encoding='utf-8') as f:
+    with open(rulebook_path, 'r', encoding='utf-8') as f:
         rulebook_text = f.read()
     
     chunks = parse_rulebook_into_chunks(rulebook_text)
     print(f"Initialised {len(chunks)} rule segments.")
     
     print("Loading transformer model...")
+    # Imported here: data setup checks rulebook_version without paying for the model import
+    from sentence_transformers import SentenceTransformer
     model_name = 'all-MiniLM-L6-v2'
     model = SentenceTransformer(model_name)
     
@@ -67,13 +75,41 @@ def create_index():
     index_data = {
         'chunks': chunks,
         'embeddings': embeddings,
-        'model_name': model_name
+        'model_name': model_name,
+        'version': rulebook_version(rulebook_text)
     }
     
-    with open(INDEX_PATH, 'wb') as f:
+    path = publish_index(index_data)
+    print(f"Index successfully saved to {path}")
+
+
+def publish_index(index_data, index_dir=INDEX_DIR, manifest_path=INDEX_MANIFEST_PATH):
+    """
+    Writes the index as its own versioned file, then points the manifest at it.
+    Running API workers (RAGService.start_watch) load, warm and swap it in without a restart.
+    """
+    version = index_data['version']
+    os.makedirs(index_dir, exist_ok=True)
+    path = os.path.join(index_dir, f"rulebook_{version}.pkl")
+    with open(path + ".tmp", 'wb') as f:
         pickle.dump(index_data, f)
-    
-    print(f"Index successfully saved to {INDEX_PATH}")
+    os.replace(path + ".tmp", path)
+
+    manifest = {"active": None, "versions": {}}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    manifest["versions"][version] = {
+        "path": path,
+        "model_name": index_data['model_name'],
+        "chunks": len(index_data['chunks']),
+        "created_at": time.time(),
+    }
+    manifest["active"] = version
+    with open(manifest_path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(manifest_path + ".tmp", manifest_path)
+    return path
 
 if __name__ == "__main__":
     create_index()
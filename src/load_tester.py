@@ -1,149 +1,359 @@
+"""
+Load generator for /api/chat.
+
+Open loop (--rate: Poisson arrivals per second, sent whether or not earlier requests
+finished, latency measured from the scheduled arrival so queueing is not hidden) or
+closed loop (--concurrency: N clients sending back to back). Questions are drawn from
+a weighted intent mix. The target is the real FastAPI app, in-process over ASGI with
+stand-ins for Groq, Scryfall, CardTrader and the sentence model (deterministic
+latencies, so runs are reproducible), or a running server with --url.
+
+Reports throughput, p50/p95/p99 latency overall and per intent, errors, and the
+per-stage breakdown the API returns in its Server-Timing header.
+
+Usage: python -m src.load_tester [--rate 20 | --concurrency 16] [--requests 200] [--url http://localhost:8000]
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
 import time
-import os
-import sys
-import keyring
-from groq import Groq
-from sentence_transformers import SentenceTransformer
+from concurrent.futures import ThreadPoolExecutor
+import httpx
 import numpy as np
-import pickle
-from dotenv import load_dotenv
-
-# Re-use constants from main.py
-SERVICE_NAME = "mtg_rulebook_ai"
-USERNAME = "groq_api_key"
-INDEX_PATH = 'data/rulebook_index.pkl'
-TOP_K_CHUNKS = 10
-
-# Testing Questions (20 varied and complex MTG questions)
-QUESTIONS = [
-    # General Rules
-    "How many poison counters does a player need to lose the game?",
-    "What happens if a player is required to draw a card but their library is empty?",
-    "What is the starting life total for a game of Commander?",
-    
-    # Combat & Keywords
-    "Does Deathtouch work with Trample? Describe the interaction.",
-    "If a creature with Lifelink is blocked by multiple creatures, does it gain life for each damage dealt?",
-    "Explain the interaction between Vigilance and an effect that says 'Tap all attacking creatures'.",
-    
-    # Interactions & Layers
-    "How does Layer 7 work with Humility and Giant Growth?",
-    "What is the interaction between Blood Moon and Urza's Saga?",
-    "If I have Teferi, Time Raveler, can my opponent cast spells with Flash during my turn?",
-    "What happens if I cast a spell with cascade and I hit a spell with X in its cost?",
-    
-    # Commander Specific
-    "Can I use a fetch land to find a Triome in a Commander game if my Commander doesn't have all those colors?",
-    "If my Commander is exiled, can I put it back into the Command Zone?",
-    
-    # Complex Scenarios
-    "If I have a Doubling Season, how many loyalty counters does a Planeswalker enter with?",
-    "What happens if I control two copies of the same Legendary creature?",
-    "Can I counter a spell that says it can't be countered with a spell that exiles it?",
-    "Explain the interaction between Panglacial Wurm and Selvala, Explorer Returned.",
-    "If I cast a spell with Storm and it gets countered, do the copies still go on the stack?",
-    "What happens if I use Phasing on a creature attached with an Equipment?",
-    "If I control a Chalice of the Void with 1 counter, and my opponent casts an overloaded Cyclonic Rift, is it countered?",
-    "Explain how Initiative works in a multiplayer game if the current leader leaves the game."
-]
-
-def get_api_key():
-    api_key = keyring.get_password(SERVICE_NAME, USERNAME)
-    if not api_key:
-        load_dotenv()
-        api_key = os.getenv("GROQ_API_KEY")
-    return api_key
-
-def load_index():
-    if not os.path.exists(INDEX_PATH):
-        print(f"❌ Index not found at {INDEX_PATH}")
-        sys.exit(1)
-    with open(INDEX_PATH, 'rb') as f:
-        return pickle.load(f)
-
-def retrieve_relevant_chunks(query, index_data, model, top_k=TOP_K_CHUNKS):
-    query_embedding = model.encode([query])[0]
-    chunk_embeddings = index_data['embeddings']
-    similarities = np.dot(chunk_embeddings, query_embedding) / (
-        np.linalg.norm(chunk_embeddings, axis=1) * np.linalg.norm(query_embedding)
-    )
-    top_indices = np.argsort(similarities)[-top_k:][::-1]
-    return [index_data['chunks'][i] for i in top_indices]
-
-def run_test():
-    print("🚀 Starting Load Test for MTG Rulebook AI Judge")
-    print(f"   Testing {len(QUESTIONS)} questions")
-    
-    api_key = get_api_key()
-    if not api_key:
-        print("❌ No API key found. Please run src/main.py first to set it up.")
-        return
-
-    client = Groq(api_key=api_key)
-    index_data = load_index()
-    embedding_model = SentenceTransformer(index_data['model_name'])
-    
-    results = []
-    start_test_time = time.time()
-    
-    for i, question in enumerate(QUESTIONS): # Test all questions
-        print(f"[{i+1}/{len(QUESTIONS)}] Processing: {question[:50]}...")
-        
-        start_time = time.time()
+from backend.app.services.llm import LLMService
+from backend.app.services.rag import RAGService
+
+ANSWER = ("1. 🃏 CARD INFO: {card} | 2 | Instant\n2. 📜 ORACLE TEXT: Stand-in oracle text.\n"
+          "3. ⚖️ RULING: Stand-in ruling.\n4. 💡 GAMEPLAY SCENARIO: Example.")
+
+# Intent -> (share of traffic, questions, cards named in them)
+WORKLOAD = {
+    "rules": (0.55, [
+        ("How many poison counters does a player need to lose the game?", []),
+        ("What happens if a player is required to draw a card but their library is empty?", []),
+        ("Does Deathtouch work with Trample? Describe the interaction.", []),
+        ("How does Layer 7 work with Humility and Giant Growth?", ["Humility", "Giant Growth"]),
+        ("What is the interaction between Blood Moon and Urza's Saga?", ["Blood Moon", "Urza's Saga"]),
+        ("If I have Teferi, Time Raveler, can my opponent cast spells with Flash during my turn?", ["Teferi, Time Raveler"]),
+        ("If I have a Doubling Season, how many loyalty counters does a Planeswalker enter with?", ["Doubling Season"]),
+        ("Explain the interaction between Panglacial Wurm and Selvala, Explorer Returned.", ["Panglacial Wurm", "Selvala, Explorer Returned"]),
+        ("If I control a Chalice of the Void with 1 counter, and my opponent casts an overloaded Cyclonic Rift, is it countered?",
+         ["Chalice of the Void", "Cyclonic Rift"]),
+        ("Explain how Initiative works in a multiplayer game if the current leader leaves the game.", []),
+    ]),
+    "lookup": (0.15, [
+        ("What does Ragavan, Nimble Pilferer do?", ["Ragavan, Nimble Pilferer"]),
+        ("Show me Sheoldred, the Apocalypse", ["Sheoldred, the Apocalypse"]),
+        ("Oracle text of Orcish Bowmasters", ["Orcish Bowmasters"]),
+    ]),
+    "market": (0.12, [
+        ("Is The One Ring a good buy right now?", ["The One Ring"]),
+        ("What are the biggest price movers in Modern this week?", []),
+        ("How much is a Ragavan worth?", ["Ragavan, Nimble Pilferer"]),
+    ]),
+    "versions": (0.08, [
+        ("Which printings of Lightning Bolt are there?", ["Lightning Bolt"]),
+        ("Show me all versions of Sol Ring", ["Sol Ring"]),
+    ]),
+    "off_topic": (0.05, [("What's the weather like in Seattle?", [])]),
+    "meta": (0.05, [("Who are you and what can you do?", [])]),
+}
+INTENT_OF = {q: intent for intent, (_, items) in WORKLOAD.items() for q, _ in items}
+CARDS_OF = {q: cards for _, (_, items) in WORKLOAD.items() for q, cards in items}
+
+
+def stand_in_latency(base, *key):
+    """Deterministic lognormal-ish latency for a call: same inputs, same delay, on every run."""
+    rng = random.Random(hashlib.sha256("|".join(map(str, key)).encode("utf-8")).digest())
+    return base * rng.lognormvariate(0, 0.35)
+
+
+# --- In-process stand-ins (same interfaces as the async services) ---
+
+class StandInLLM:
+    validate_format = LLMService.validate_format
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    async def classify_intent(self, query, history=[]):
+        await asyncio.sleep(stand_in_latency(self.latency / 4, "classify", query))
+        return INTENT_OF.get(query, "rules")
+
+    async def extract_cards(self, query, history=[]):
+        await asyncio.sleep(stand_in_latency(self.latency / 4, "extract", query))
+        return CARDS_OF.get(query, [])
+
+    async def generate_search_query(self, query, history=[]):
+        await asyncio.sleep(stand_in_latency(self.latency / 4, "search", query))
+        cards = CARDS_OF.get(query) or ["Lightning Bolt"]
+        return f"!\"{cards[0]}\""
+
+    async def get_completion(self, model, messages, temperature=0.7, max_tokens=1000):
+        await asyncio.sleep(stand_in_latency(self.latency, "completion", messages[-1]["content"][:200]))
+        return ANSWER.format(card="Stand-in")
+
+
+class StandInRAG:
+    """Retrieval stand-in: encoding occupies an encoder thread like MiniLM would."""
+    index_version = "load-test"
+    search_query = staticmethod(RAGService.search_query)
+    index_data = {"chunks": [{"rule_num": f"702.{i}", "text": f"Stand-in rule {i}."} for i in range(10)]}
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="encoder")
+
+    def encode(self, texts):
+        time.sleep(stand_in_latency(self.latency, "encode", texts[0]))
+        return np.array([np.frombuffer(hashlib.sha256(t.encode("utf-8")).digest(), dtype=np.uint8) / 255.0
+                         for t in texts], dtype=np.float32)
+
+    def get_chunks(self, ids, index_version=None):
+        return [self.index_data["chunks"][i] for i in ids]
+
+    def retrieve_ids(self, query, history=None, top_k=10, index_version=None):
+        self.encode([self.search_query(query, history)])
+        return list(range(top_k))
+
+    async def aencode(self, texts):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self.encode, texts)
+
+    async def aretrieve_ids(self, query, history=None, top_k=10, index_version=None):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self.retrieve_ids, query, history, top_k)
+
+
+class StandInCards:
+    def __init__(self, latency):
+        self.latency = latency
+
+    async def get_card_data(self, card_names):
+        await asyncio.sleep(stand_in_latency(self.latency, "cards", *card_names))
+        return [{"name": n, "mana_cost": "{1}{R}", "type_line": "Instant", "oracle_text": "Stand-in oracle text.",
+                 "image": None, "rulings": []} for n in card_names]
+
+    async def get_card_versions(self, query):
+        await asyncio.sleep(stand_in_latency(self.latency, "versions", query))
+        name = query.strip('!"')
+        return [{"id": f"{name}-{i}", "name": name, "set_name": f"Set {i}", "set": f"s{i:02d}", "rarity": "rare",
+                 "prices": {"eur": f"{1.5 * i:.2f}"}} for i in range(1, 6)]
+
+
+class StandInCardTrader:
+    def __init__(self, latency):
+        self.latency = latency
+
+    async def get_nm_price(self, scryfall_id):
+        await asyncio.sleep(stand_in_latency(self.latency, "cardtrader", scryfall_id))
+        return "2.50€"
+
+
+def stand_in_app(llm_latency=0.3, http_latency=0.05, encode_latency=0.01, answer_cache=True):
+    """The FastAPI app wired to stand-in services and an in-memory session store."""
+    from backend.app.main import app
+    from backend.app.dependencies import get_chat_controller, get_session_store
+    from backend.app.services.chat_controller import AsyncChatController
+    from backend.app.services.answer_cache import AnswerCache
+    from backend.app.services.session_store import MemorySessionStore
+
+    rag = StandInRAG(encode_latency)
+    controller = AsyncChatController(
+        StandInLLM(llm_latency), rag, StandInCards(http_latency), None, StandInCardTrader(http_latency), None,
+        answer_cache=AnswerCache(rag.encode) if answer_cache else None)
+    store = MemorySessionStore()
+    app.dependency_overrides[get_chat_controller] = lambda: controller
+    app.dependency_overrides[get_session_store] = lambda: store
+    return app
+
+
+# --- Load generation ---
+
+def parse_server_timing(header):
+    """'classify;dur=12.5, llm;dur=300' -> {"classify": 12.5, "llm": 300.0}"""
+    stages = {}
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "dur" and name:
+                stages[name] = float(value)
+    return stages
+
+
+class LoadTest:
+    def __init__(self, client, mix=None, seed=42, smart_share=0.0, timeout=60.0):
+        self.client = client
+        self.rng = random.Random(seed)
+        self.mix = mix or {intent: share for intent, (share, _) in WORKLOAD.items()}
+        self.smart_share = smart_share
+        self.timeout = timeout
+        self.results = []
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def next_request(self):
+        intents = list(self.mix)
+        intent = self.rng.choices(intents, weights=[self.mix[i] for i in intents])[0]
+        query, _ = self.rng.choice(WORKLOAD[intent][1])
+        return intent, {"query": query, "smart_mode": self.rng.random() < self.smart_share}
+
+    async def send(self, intent, payload, scheduled):
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        record = {"intent": intent, "error": None, "cached": False, "stages": {}}
         try:
-            # 1. Retrieval
-            relevant_chunks = retrieve_relevant_chunks(question, index_data, embedding_model, top_k=TOP_K_CHUNKS)
-            context = "\n\n".join([f"[Rule {c['rule_num']}]\n{c['text']}" for c in relevant_chunks])
-            
-            # 2. Generation
-            system_instruction = f"You are an expert MTG Judge. Answer based on these rules:\n\n{context}"
-            
-            response = client.chat.completions.create(
-                model="llama-3.3-70b-versatile",
-                messages=[
-                    {"role": "system", "content": system_instruction},
-                    {"role": "user", "content": question}
-                ],
-                temperature=0.3
-            )
-            
-            end_time = time.time()
-            duration = end_time - start_time
-            results.append(duration)
-            print(f"   ✅ Done in {duration:.2f}s")
-            
-            # Stay within TPM limit - 3s delay between requests
-            if i < len(QUESTIONS) - 1:
-                time.sleep(3)
-            
+            resp = await self.client.post("/api/chat", json=payload, timeout=self.timeout)
+            if resp.status_code != 200:
+                record["error"] = f"HTTP {resp.status_code}"
+            else:
+                record["cached"] = resp.json().get("cached", False)
+                record["stages"] = parse_server_timing(resp.headers.get("Server-Timing"))
         except Exception as e:
-            print(f"   ❌ Error: {e}")
-            results.append(None)
-            time.sleep(2)
-            
-    end_test_time = time.time()
-    total_duration = end_test_time - start_test_time
-    
-    # Analysis
-    valid_results = [r for r in results if r is not None]
-    if valid_results:
-        avg_time = sum(valid_results) / len(valid_results)
-        qpm = 60 / avg_time
-        print("\n--- Load Test Results ---")
-        print(f"Total Questions: {len(QUESTIONS)}")
-        print(f"Successful: {len(valid_results)}")
-        print(f"Total Time: {total_duration:.2f}s")
-        print(f"Average Time per Question: {avg_time:.2f}s")
-        print(f"Measured Throughput: {qpm:.2f} Questions Per Minute (QPM)")
-        
-        if qpm >= 10:
-            print("🚀 Performance: EXCELLENT (meets 10 QPM goal)")
-        elif qpm >= 5:
-            print("📈 Performance: GOOD (meets 5 QPM goal)")
-        else:
-            print("⚠️  Performance: SLOW (below 5 QPM goal)")
+            record["error"] = type(e).__name__
+        finally:
+            self.in_flight -= 1
+        record["latency"] = time.perf_counter() - scheduled
+        self.results.append(record)
+
+    async def open_loop(self, rate, total):
+        """Poisson arrivals at `rate`/s; each request is sent at its arrival time regardless of the others."""
+        tasks = []
+        start = time.perf_counter()
+        arrival = 0.0
+        for _ in range(total):
+            arrival += self.rng.expovariate(rate)
+            delay = start + arrival - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            intent, payload = self.next_request()
+            tasks.append(asyncio.create_task(self.send(intent, payload, start + arrival)))
+        await asyncio.gather(*tasks)
+        return time.perf_counter() - start
+
+    async def closed_loop(self, concurrency, total):
+        """`concurrency` clients, each sending its next request as soon as the previous one returns."""
+        remaining = [total]
+
+        async def client():
+            while remaining[0] > 0:
+                remaining[0] -= 1
+                intent, payload = self.next_request()
+                await self.send(intent, payload, time.perf_counter())
+
+        start = time.perf_counter()
+        await asyncio.gather(*[client() for _ in range(concurrency)])
+        return time.perf_counter() - start
+
+
+def percentiles(values):
+    if not values:
+        return {"p50": None, "p95": None, "p99": None}
+    p50, p95, p99 = np.percentile(np.asarray(values, dtype=np.float64), [50, 95, 99])
+    return {"p50": round(float(p50), 4), "p95": round(float(p95), 4), "p99": round(float(p99), 4)}
+
+
+def summarize(results, wall, offered_rate=None, peak_in_flight=0):
+    ok = [r for r in results if r["error"] is None]
+    errors = {}
+    for r in results:
+        if r["error"]:
+            errors[r["error"]] = errors.get(r["error"], 0) + 1
+
+    by_intent = {}
+    for intent in sorted({r["intent"] for r in results}):
+        rows = [r for r in results if r["intent"] == intent]
+        lat = [r["latency"] for r in rows if r["error"] is None]
+        by_intent[intent] = {"requests": len(rows), "errors": len(rows) - len(lat), **percentiles(lat)}
+
+    stages = {}
+    for name in sorted({s for r in ok for s in r["stages"]}):
+        ms = [r["stages"][name] for r in ok if name in r["stages"]]
+        stages[name] = {"count": len(ms), "mean_ms": round(float(np.mean(ms)), 1),
+                        **{k: round(v, 1) for k, v in percentiles(ms).items()}}
+
+    return {
+        "requests": len(results),
+        "wall_s": round(wall, 3),
+        "offered_rps": offered_rate,
+        "throughput_rps": round(len(ok) / wall, 2) if wall else 0.0,
+        "error_rate": round(1 - len(ok) / len(results), 4) if results else 0.0,
+        "errors": errors,
+        "cache_hit_rate": round(sum(r["cached"] for r in ok) / len(ok), 4) if ok else 0.0,
+        "peak_in_flight": peak_in_flight,
+        "latency_s": percentiles([r["latency"] for r in ok]),
+        "intents": by_intent,
+        "stages_ms": stages,
+    }
+
+
+def print_report(report):
+    lat = report["latency_s"]
+    offered = f" (offered {report['offered_rps']}/s)" if report["offered_rps"] else ""
+    print("\n--- Load Test Results ---")
+    print(f"Requests: {report['requests']} in {report['wall_s']:.2f}s | peak in flight {report['peak_in_flight']}")
+    print(f"Throughput: {report['throughput_rps']:.2f} req/s{offered}")
+    if lat["p50"] is not None:
+        print(f"Latency: p50 {lat['p50']:.3f}s | p95 {lat['p95']:.3f}s | p99 {lat['p99']:.3f}s")
+    print(f"Errors: {report['error_rate']:.1%} {report['errors'] or ''} | answer cache hits {report['cache_hit_rate']:.0%}")
+
+    print("\nPer intent:")
+    for intent, row in report["intents"].items():
+        if row["p50"] is None:
+            print(f"  {intent:<10} {row['requests']:>5} req  all failed")
+            continue
+        print(f"  {intent:<10} {row['requests']:>5} req  p50 {row['p50']:.3f}s  p95 {row['p95']:.3f}s  "
+              f"p99 {row['p99']:.3f}s  errors {row['errors']}")
+
+    if report["stages_ms"]:
+        print("\nPer stage (Server-Timing, ms):")
+        for name, row in report["stages_ms"].items():
+            print(f"  {name:<10} n={row['count']:<5} mean {row['mean_ms']:>8.1f}  p50 {row['p50']:>8.1f}  "
+                  f"p95 {row['p95']:>8.1f}  p99 {row['p99']:>8.1f}")
+
+
+async def run_load(args):
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url)
     else:
-        print("❌ No successful queries to analyze.")
+        app = stand_in_app(args.llm_latency, args.http_latency, args.encode_latency, answer_cache=not args.no_cache)
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://load-test")
+
+    async with client:
+        test = LoadTest(client, seed=args.seed, smart_share=args.smart_share, timeout=args.timeout)
+        if args.concurrency:
+            wall = await test.closed_loop(args.concurrency, args.requests)
+        else:
+            wall = await test.open_loop(args.rate, args.requests)
+    return summarize(test.results, wall, None if args.concurrency else args.rate, test.peak_in_flight)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=float, default=20.0, help="open loop: mean arrivals per second")
+    parser.add_argument("--concurrency", type=int, default=0, help="closed loop: concurrent clients (overrides --rate)")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--url", help="load a running server instead of the in-process app with stand-ins")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--smart-share", type=float, default=0.0, help="fraction of requests with smart_mode")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="stand-in seconds per completion")
+    parser.add_argument("--http-latency", type=float, default=0.05, help="stand-in seconds per Scryfall/CardTrader call")
+    parser.add_argument("--encode-latency", type=float, default=0.01, help="stand-in seconds per encode")
+    parser.add_argument("--no-cache", action="store_true", help="in-process: run without the answer cache")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    mode = f"{args.concurrency} concurrent clients" if args.concurrency else f"open loop at {args.rate}/s"
+    print(f"🚀 Load test: {args.requests} requests, {mode}, target {args.url or 'in-process app (stand-ins)'}")
+    report = asyncio.run(run_load(args))
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Report written to {args.json}")
+
 
 if __name__ == "__main__":
-    run_test()
+    main()
@@ -7,6 +7,10 @@ from backend.app.services.scryfall import CardService
 from backend.app.services.legality import LegalityService
 from backend.app.services.cardtrader import CardTraderService
 from backend.app.services.market import MarketIntelligenceService
+from backend.app.services.answer_cache import AnswerCache
+from backend.app.services.scheduler import RateLimitScheduler
+from backend.app.services.card_catalog import CardCatalog
+from backend.app.services.deck import DeckAnalyzer
 from src.cli import MTGJudgeCLI
 
 def main():
@@ -16,16 +20,24 @@ def main():
     
     # Initialize services
     print("Initialising services...")
-    llm = LLMService(api_key)
+    llm = LLMService(api_key, scheduler=RateLimitScheduler())
     rag = RAGService()
+    rag.start_watch()  # a re-run of the indexer is swapped in without restarting the CLI
     cards = CardService()
-    legality = LegalityService()
-    cardtrader = CardTraderService()
+    catalog = CardCatalog()
+    legality = LegalityService(catalog)
+    legality.start_watch()
     cardtrader = CardTraderService()
+    cardtrader.start_index_refresh()
     market = MarketIntelligenceService(cardtrader)
+    market.start_history_watch()  # movers are recomputed when a new price snapshot lands
+    answer_cache = AnswerCache(rag.encode)
+    answer_cache.seed_from_log(rag.index_version)
+    rag.on_swap(lambda old, new: answer_cache.invalidate(old))
     
     # Start Interface
-    app = MTGJudgeCLI(llm, rag, cards, legality, cardtrader, market)
+    deck_analyzer = DeckAnalyzer(catalog, legality, market)
+    app = MTGJudgeCLI(llm, rag, cards, legality, cardtrader, market, answer_cache=answer_cache, deck_analyzer=deck_analyzer)
     app.start()
 
 if __name__ == "__main__":
@@ -0,0 +1,390 @@
+"""
+Record/replay of logged traffic through ChatController.process_message.
+
+record: sends the queries from the logs (interactions, feedback or issues: any JSONL
+with a "query" field) through the full pipeline with the real services, while a
+cassette (src/cassette.py) captures every Groq, Scryfall and CardTrader exchange.
+Queries of one log less than --gap seconds apart form one conversation, so
+follow-ups run with the history and card context the pipeline produced.
+
+replay: runs the recorded conversations again fully offline, answering every
+outbound call from the cassette. Given the cassette the pipeline is deterministic,
+so runs are comparable. Reports CPU and wall time per message, allocations
+(--allocations, tracemalloc), per-stage latency (classify, extract, card_data,
+retrieve, embed, llm, prices) and answers that differ from the recording.
+
+Usage:
+  python -m src.replay record [--log logs/interactions.jsonl ...] [--limit 1000] [--dir data/replays/session]
+  python -m src.replay replay [--dir data/replays/session] [--repeat 3] [--allocations] [--strict] [--json out.json]
+"""
+import argparse
+import contextlib
+import datetime
+import hashlib
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+import numpy as np
+from backend.app.core.config import INTERACTIONS_LOG, REPLAY_DIR, REPLAY_CONVERSATION_GAP, SMART_MODEL
+from backend.app.services.llm import LLMService
+from backend.app.services.scryfall import CardService
+from backend.app.services.cardtrader import CardTraderService
+from backend.app.services.market import MarketIntelligenceService
+from backend.app.services.answer_cache import AnswerCache
+from backend.app.services.chat_controller import ChatController
+from backend.app.services.session_store import new_session_state, append_turn
+from src.cassette import Cassette
+from src.load_tester import percentiles
+
+CASSETTE_FILE = "cassette.jsonl"
+CONVERSATIONS_FILE = "conversations.jsonl"
+SESSION_FILE = "session.json"
+
+# Service method -> stage (same names as the API's Server-Timing stages, plus marketplace prices)
+STAGES = {
+    "classify_intent": "classify",
+    "extract_cards": "extract",
+    "generate_search_query": "llm",
+    "get_completion": "llm",
+    "get_card_data": "card_data",
+    "get_card_versions": "card_data",
+    "retrieve_ids": "retrieve",
+    "encode": "embed",
+    "get_nm_price": "prices",
+}
+
+
+# --- Conversations ---
+
+def _timestamp(entry):
+    try:
+        return datetime.datetime.fromisoformat(entry["timestamp"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def load_conversations(paths, gap=REPLAY_CONVERSATION_GAP, limit=None):
+    """Logged queries grouped into conversations: consecutive entries of one log at most `gap` seconds apart."""
+    conversations = []
+    for path in paths:
+        entries = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(entry, dict) and isinstance(entry.get("query"), str) and entry["query"].strip():
+                    entries.append(entry)
+        entries.sort(key=lambda e: str(e.get("timestamp") or ""))  # ISO timestamps sort chronologically
+
+        last = None
+        for entry in entries:
+            stamp = _timestamp(entry)
+            if last is None or stamp is None or stamp - last > gap:
+                conversations.append({"id": len(conversations), "source": os.path.basename(path), "turns": []})
+            conversations[-1]["turns"].append({"query": entry["query"].strip(),
+                                               "smart_mode": entry.get("model") in ("smart", SMART_MODEL)})
+            last = stamp
+    return conversations[:limit] if limit else conversations
+
+
+def digest(text):
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()[:16]
+
+
+# --- Instrumented pipeline ---
+
+class StageClock:
+    """Wall time spent in selected service methods (see STAGES), accumulated until reset()."""
+
+    def __init__(self, stages=STAGES):
+        self.stages = stages
+        self._timings = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def wrap(self, service):
+        return _TimedService(service, self)
+
+    def add(self, stage, ms):
+        with self._lock:
+            self._timings[stage] += ms
+
+    def reset(self):
+        """Timings since the last reset (ms per stage)."""
+        with self._lock:
+            timings, self._timings = dict(self._timings), defaultdict(float)
+        return {stage: round(ms, 3) for stage, ms in timings.items()}
+
+
+class _TimedService:
+    """Proxy that times the methods named in the clock's stages and passes everything else through."""
+
+    def __init__(self, service, clock):
+        self._service = service
+        self._clock = clock
+
+    def __getattr__(self, name):
+        attr = getattr(self._service, name)
+        stage = self._clock.stages.get(name)
+        if stage is None or not callable(attr):
+            return attr
+
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return attr(*args, **kwargs)
+            finally:
+                self._clock.add(stage, (time.perf_counter() - started) * 1000)
+        return timed
+
+
+def build_controller(rag, clock, groq_key, cardtrader_key, offline=False):
+    """The sync controller as the CLI wires it (no scheduler, cold caches), with timed services."""
+    llm = LLMService(groq_key)
+    if offline:
+        llm.client = llm.client.with_options(max_retries=0)  # a cassette miss fails at once instead of backing off
+    cardtrader = CardTraderService(api_key=cardtrader_key or "unused")
+    cardtrader.api_key = cardtrader_key  # no key: prices stay "N/A (Key missing)", as when recording without one
+    timed_rag = clock.wrap(rag)
+    return ChatController(clock.wrap(llm), timed_rag, clock.wrap(CardService()), None,
+                          clock.wrap(cardtrader), MarketIntelligenceService(cardtrader),
+                          answer_cache=AnswerCache(timed_rag.encode))
+
+
+def play_conversation(controller, conversation, clock, allocations=False):
+    """Runs one conversation turn by turn (history and context carried like an API session)."""
+    state = new_session_state()
+    rows = []
+    for turn in conversation["turns"]:
+        clock.reset()
+        if allocations:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        cpu, wall = time.process_time(), time.perf_counter()
+        try:
+            result = controller.process_message(turn["query"], state["history"], smart_mode=turn["smart_mode"],
+                                                context=state["context"])
+            error = None
+        except Exception as e:
+            result, error = None, type(e).__name__
+        row = {
+            "conversation": conversation["id"],
+            "query": turn["query"],
+            "cpu_ms": (time.process_time() - cpu) * 1000,
+            "wall_ms": (time.perf_counter() - wall) * 1000,
+            "stages": clock.reset(),
+            "error": error,
+            "intent": result["intent"] if result else None,
+            "digest": digest(result["response"]) if result else None,
+        }
+        if allocations:
+            current, peak = tracemalloc.get_traced_memory()
+            row["peak_kib"] = (peak - base) / 1024
+            row["retained_kib"] = (current - base) / 1024
+        rows.append(row)
+        if result:
+            for key in ("timings", "session_id"):
+                result["context"].pop(key, None)
+            state["context"] = result["context"]
+            append_turn(state, turn["query"], result["response"])
+    return rows
+
+
+def run_pass(conversations, rag, groq_key, cardtrader_key, allocations=False, offline=False):
+    clock = StageClock()
+    controller = build_controller(rag, clock, groq_key, cardtrader_key, offline)
+    rows = []
+    # The pipeline's progress prints would drown the report
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for conversation in conversations:
+            rows.extend(play_conversation(controller, conversation, clock, allocations))
+    controller.price_executor.shutdown(wait=True)  # background prefetches finish inside this pass
+    return rows
+
+
+# --- Record / replay ---
+
+def _default_rag():
+    from backend.app.services.rag import RAGService
+    return RAGService()
+
+
+def record(conversations, session_dir, rag=None, groq_key=None, cardtrader_key=None):
+    """Runs the conversations live, capturing every exchange. Returns the recorded rows."""
+    from backend.app.utils.security import get_api_key
+    rag = rag or _default_rag()  # built before recording: loading the model is not pipeline traffic
+    groq_key = groq_key or get_api_key()
+    cardtrader_key = cardtrader_key or CardTraderService().api_key
+
+    os.makedirs(session_dir, exist_ok=True)
+    started = time.perf_counter()
+    with Cassette(os.path.join(session_dir, CASSETTE_FILE), mode="record") as cassette:
+        rows = run_pass(conversations, rag, groq_key, cardtrader_key)
+
+    results = iter(rows)
+    with open(os.path.join(session_dir, CONVERSATIONS_FILE), "w", encoding="utf-8") as f:
+        for conversation in conversations:
+            turns = [{**turn, "intent": row["intent"], "digest": row["digest"]}
+                     for turn, row in zip(conversation["turns"], results)]
+            f.write(json.dumps({**conversation, "turns": turns}, ensure_ascii=False) + "\n")
+    with open(os.path.join(session_dir, SESSION_FILE), "w", encoding="utf-8") as f:
+        json.dump({
+            "recorded_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            "conversations": len(conversations),
+            "messages": len(rows),
+            "exchanges": cassette.stats["recorded"],
+            "index_version": getattr(rag, "index_version", None),
+            "cardtrader": bool(cardtrader_key),
+            "wall_s": round(time.perf_counter() - started, 3),
+        }, f, indent=2)
+    return rows
+
+
+def load_session(session_dir):
+    with open(os.path.join(session_dir, SESSION_FILE), encoding="utf-8") as f:
+        meta = json.load(f)
+    with open(os.path.join(session_dir, CONVERSATIONS_FILE), encoding="utf-8") as f:
+        conversations = [json.loads(line) for line in f if line.strip()]
+    return meta, conversations
+
+
+def replay(session_dir, rag=None, repeat=1, allocations=False, strict=False):
+    """Replays a recorded session offline `repeat` times. Returns the report (see summarize)."""
+    meta, conversations = load_session(session_dir)
+    rag = rag or _default_rag()
+    version = getattr(rag, "index_version", None)
+    if version != meta.get("index_version"):
+        print(f"⚠️ Recorded with index {meta.get('index_version')}, replaying with {version}: prompts will differ.")
+
+    expected = {(c["id"], i): turn for c in conversations for i, turn in enumerate(c["turns"])}
+    rows = []
+    cassette = Cassette(os.path.join(session_dir, CASSETTE_FILE), mode="replay", strict=strict)
+    if allocations:
+        tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        with cassette:
+            for _ in range(repeat):
+                cassette.rewind()
+                rows.extend(run_pass(conversations, rag, "replay", "replay" if meta.get("cardtrader") else None,
+                                     allocations, offline=True))
+    finally:
+        if allocations:
+            tracemalloc.stop()
+    wall = time.perf_counter() - started
+
+    turn_of = defaultdict(int)
+    for row in rows:
+        i = turn_of[row["conversation"]] % len(conversations[row["conversation"]]["turns"])
+        turn_of[row["conversation"]] += 1
+        row["diverged"] = row["digest"] != expected[(row["conversation"], i)]["digest"]
+    return summarize(rows, wall, cassette, repeat)
+
+
+def summarize(rows, wall, cassette, passes=1):
+    ok = [r for r in rows if r["error"] is None]
+    errors = defaultdict(int)
+    for r in rows:
+        if r["error"]:
+            errors[r["error"]] += 1
+
+    by_intent = {}
+    for intent in sorted({r["intent"] for r in ok}):
+        cpu = [r["cpu_ms"] for r in ok if r["intent"] == intent]
+        by_intent[intent] = {"messages": len(cpu), **percentiles(cpu)}
+
+    stages = {}
+    for name in sorted({s for r in ok for s in r["stages"]}):
+        ms = [r["stages"][name] for r in ok if name in r["stages"]]
+        stages[name] = {"count": len(ms), "total_ms": round(sum(ms), 1), "mean_ms": round(float(np.mean(ms)), 3),
+                        **percentiles(ms)}
+
+    report = {
+        "passes": passes,
+        "messages": len(rows),
+        "wall_s": round(wall, 3),
+        "cpu_ms": {"total": round(sum(r["cpu_ms"] for r in rows), 1), **percentiles([r["cpu_ms"] for r in ok])},
+        "wall_ms": percentiles([r["wall_ms"] for r in ok]),
+        "errors": dict(errors),
+        "divergent": sum(r["diverged"] for r in rows),
+        "divergent_queries": sorted({r["query"] for r in rows if r["diverged"]})[:10],
+        "cassette": dict(cassette.stats),
+        "missed_endpoints": cassette.missed,
+        "intents_cpu_ms": by_intent,
+        "stages_ms": stages,
+    }
+    if rows and "peak_kib" in rows[0]:
+        report["allocations_kib"] = {"peak": percentiles([r["peak_kib"] for r in rows]),
+                                     "retained_total": round(sum(r["retained_kib"] for r in rows), 1)}
+    return report
+
+
+def print_report(report):
+    cpu, wall = report["cpu_ms"], report["wall_ms"]
+    print("\n--- Replay Results ---")
+    print(f"Messages: {report['messages']} ({report['passes']} pass(es)) in {report['wall_s']:.2f}s")
+    if cpu["p50"] is not None:
+        print(f"CPU per message: p50 {cpu['p50']:.2f}ms | p95 {cpu['p95']:.2f}ms | p99 {cpu['p99']:.2f}ms "
+              f"| total {cpu['total'] / 1000:.2f}s")
+        print(f"Wall per message: p50 {wall['p50']:.2f}ms | p95 {wall['p95']:.2f}ms | p99 {wall['p99']:.2f}ms")
+    if "allocations_kib" in report:
+        peak = report["allocations_kib"]["peak"]
+        print(f"Allocations (tracemalloc, timings inflated): peak p50 {peak['p50']:.1f}KiB | p95 {peak['p95']:.1f}KiB "
+              f"| retained {report['allocations_kib']['retained_total']:.1f}KiB")
+    stats = report["cassette"]
+    print(f"Cassette: {stats['hits']} hits, {stats['fuzzy']} fuzzy, {stats['misses']} misses "
+          f"{report['missed_endpoints'] or ''}")
+    print(f"Errors: {report['errors'] or 'none'} | divergent answers: {report['divergent']}")
+    for query in report["divergent_queries"]:
+        print(f"  ≠ {query[:80]}")
+
+    print("\nCPU per intent (ms):")
+    for intent, row in report["intents_cpu_ms"].items():
+        print(f"  {intent:<10} n={row['messages']:<6} p50 {row['p50']:>8.2f}  p95 {row['p95']:>8.2f}  p99 {row['p99']:>8.2f}")
+    if report["stages_ms"]:
+        print("\nPer stage (ms):")
+        for name, row in report["stages_ms"].items():
+            print(f"  {name:<10} n={row['count']:<6} mean {row['mean_ms']:>8.3f}  p50 {row['p50']:>8.3f}  "
+                  f"p95 {row['p95']:>8.3f}  p99 {row['p99']:>8.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    rec = sub.add_parser("record", help="run logged queries live and record a cassette")
+    rec.add_argument("--log", action="append", help=f"JSONL log with 'query' entries (default {INTERACTIONS_LOG})")
+    rec.add_argument("--limit", type=int, help="record at most this many conversations")
+    rec.add_argument("--gap", type=float, default=REPLAY_CONVERSATION_GAP, help="seconds that end a conversation")
+    rec.add_argument("--dir", default=os.path.join(REPLAY_DIR, "session"))
+    rep = sub.add_parser("replay", help="replay a recorded session offline and report")
+    rep.add_argument("--dir", default=os.path.join(REPLAY_DIR, "session"))
+    rep.add_argument("--repeat", type=int, default=1, help="passes over the recorded conversations")
+    rep.add_argument("--allocations", action="store_true", help="trace allocations (slows the run)")
+    rep.add_argument("--strict", action="store_true", help="no fuzzy matching: unmatched requests fail")
+    rep.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        conversations = load_conversations(args.log or [INTERACTIONS_LOG], gap=args.gap, limit=args.limit)
+        turns = sum(len(c["turns"]) for c in conversations)
+        print(f"🎙️ Recording {len(conversations)} conversations ({turns} messages) into {args.dir}")
+        rows = record(conversations, args.dir)
+        failed = sum(r["error"] is not None for r in rows)
+        print(f"✅ Recorded {len(rows)} messages ({failed} failed).")
+        return
+
+    print(f"▶️ Replaying {args.dir} offline ({args.repeat} pass(es))")
+    report = replay(args.dir, repeat=args.repeat, allocations=args.allocations, strict=args.strict)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Report written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
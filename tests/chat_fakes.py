@@ -0,0 +1,95 @@
+"""Stand-in services for the chat controller tests (sync and async variants)."""
+import asyncio
+
+from backend.app.services.chat_controller import ChatController, AsyncChatController
+from backend.app.services.llm import LLMService
+from backend.app.services.rag import RAGService
+
+ANSWER = "1. 🃏 CARD INFO: Blood Moon | 3 | Enchantment\n2. 📜 ORACLE TEXT: Nonbasic lands are Mountains.\n3. ⚖️ RULING: Yes.\n4. 💡 GAMEPLAY SCENARIO: Example."
+
+
+class FakeLLM:
+    validate_format = LLMService.validate_format
+
+    def __init__(self, intent="rules"):
+        self.intent = intent
+        self.completions = 0
+
+    def classify_intent(self, query, history=[]):
+        return self.intent
+
+    def extract_cards(self, query, history=[]):
+        return ["Blood Moon"]
+
+    def get_completion(self, model, messages, temperature=0.7, max_tokens=1000):
+        self.completions += 1
+        return ANSWER
+
+    def stream_completion(self, model, messages, temperature=0.7, max_tokens=1000):
+        self.completions += 1
+        for i in range(0, len(ANSWER), 16):
+            yield ANSWER[i:i + 16]
+
+
+class FakeRAG:
+    index_version = "test"
+    search_query = staticmethod(RAGService.search_query)
+    index_data = {"chunks": [{"rule_num": "613.1", "text": "Layers."}]}
+
+    def get_chunks(self, ids, index_version=None):
+        return [self.index_data["chunks"][i] for i in ids]
+
+    def retrieve_ids(self, query, history=None, index_version=None):
+        return [0]
+
+
+class FakeCards:
+    def get_card_data(self, card_names):
+        return [{"name": n, "oracle_text": "Nonbasic lands are Mountains.", "type_line": "Enchantment",
+                 "image": f"https://img/{n}.jpg"} for n in card_names]
+
+
+class AsyncFakeLLM(FakeLLM):
+    async def classify_intent(self, query, history=[]):
+        await asyncio.sleep(0.05)
+        return self.intent
+
+    async def extract_cards(self, query, history=[]):
+        await asyncio.sleep(0.05)
+        return ["Blood Moon"]
+
+    async def get_completion(self, model, messages, temperature=0.7, max_tokens=1000):
+        await asyncio.sleep(0.05)
+        return ANSWER
+
+    async def stream_completion(self, model, messages, temperature=0.7, max_tokens=1000):
+        for i in range(0, len(ANSWER), 16):
+            await asyncio.sleep(0)
+            yield ANSWER[i:i + 16]
+
+
+class AsyncFakeRAG(FakeRAG):
+    def __init__(self):
+        self.cancelled = False
+
+    async def aretrieve_ids(self, query, history=None, index_version=None):
+        try:
+            await asyncio.sleep(0.05)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return self.retrieve_ids(query, history)
+
+
+class AsyncFakeCards(FakeCards):
+    async def get_card_data(self, card_names):
+        await asyncio.sleep(0.05)
+        return FakeCards.get_card_data(self, card_names)
+
+
+def make_controller(llm=None):
+    return ChatController(llm or FakeLLM(), FakeRAG(), FakeCards(), None, None, None)
+
+
+def make_async_controller():
+    return AsyncChatController(AsyncFakeLLM(), AsyncFakeRAG(), AsyncFakeCards(), None, None, None)
@@ -0,0 +1,63 @@
+import sys
+import os
+import json
+import zlib
+
+import numpy as np
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.app.services.answer_cache import AnswerCache
+
+
+def bag_of_words(texts):
+    """Deterministic stand-in for the sentence encoder."""
+    out = []
+    for text in texts:
+        vec = np.zeros(64, dtype=np.float32)
+        for word in text.lower().split():
+            vec[zlib.crc32(word.encode()) % 64] += 1
+        out.append(vec)
+    return out
+
+
+def test_paraphrase_hits_within_same_bucket():
+    cache = AnswerCache(bag_of_words, threshold=0.8)
+    cache.store("how does blood moon affect urza's saga", "ANSWER", ["Blood Moon", "Urza's Saga"], "8b", "v1")
+
+    hit = cache.lookup("how does blood moon affect urza's saga ?", ["urza's saga", "blood moon"], "8b", "v1")
+    assert hit and hit["answer"] == "ANSWER"
+
+    # Same wording, but a different card set, model tier or rules version never matches
+    assert cache.lookup("how does blood moon affect urza's saga", ["Blood Moon"], "8b", "v1") is None
+    assert cache.lookup("how does blood moon affect urza's saga", ["Blood Moon", "Urza's Saga"], "70b", "v1") is None
+    assert cache.lookup("how does blood moon affect urza's saga", ["Blood Moon", "Urza's Saga"], "8b", "v2") is None
+
+
+def test_lru_and_ttl_eviction():
+    cache = AnswerCache(bag_of_words, max_size=2, ttl=60, threshold=0.99)
+    cache.store("first question", "A", ["X"], "8b", "v1")
+    cache.store("second question", "B", ["Y"], "8b", "v1")
+    assert cache.lookup("first question", ["X"], "8b", "v1")  # refresh "first"
+    cache.store("third question", "C", ["Z"], "8b", "v1")
+
+    assert len(cache) == 2
+    assert cache.lookup("second question", ["Y"], "8b", "v1") is None
+
+    cache.store("stale question", "D", ["W"], "8b", "v1", timestamp=0)
+    assert cache.lookup("stale question", ["W"], "8b", "v1") is None
+
+
+def test_seed_from_log_uses_gold_entries_only(tmp_path):
+    log = tmp_path / "interactions.jsonl"
+    entries = [
+        {"query": "what does goblin lackey do", "response": "1. **🃏 CARD INFO**: Goblin Lackey | {R} | Creature", "model": "70b", "is_gold": True},
+        {"query": "what does goblin guide do", "response": "1. 🃏 CARD INFO: Goblin Guide | {R} | Creature", "model": "8b", "is_gold": False},
+        {"query": "old rules", "response": "x", "cards": ["Tundra"], "model": "70b", "is_gold": True, "index_version": "old"},
+    ]
+    log.write_text("\n".join(json.dumps(e) for e in entries) + "\n")
+
+    cache = AnswerCache(bag_of_words)
+    assert cache.seed_from_log("v1", log_path=str(log)) == 1
+    assert cache.lookup("what does goblin lackey do", ["Goblin Lackey"], "70b", "v1")
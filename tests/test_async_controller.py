@@ -0,0 +1,86 @@
+import sys
+import os
+import asyncio
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.app.services.chat_controller import AsyncChatController
+from tests.chat_fakes import ANSWER, AsyncFakeLLM, AsyncFakeRAG, AsyncFakeCards, make_controller
+
+
+class StageLog:
+    """Order in which the fake service calls start and end, and how many of each overlap."""
+
+    def __init__(self):
+        self.events = []
+        self.in_flight = {}
+        self.peak = {}
+
+    async def run(self, stage, awaitable):
+        self.events.append(("start", stage))
+        self.in_flight[stage] = self.in_flight.get(stage, 0) + 1
+        self.peak[stage] = max(self.peak.get(stage, 0), self.in_flight[stage])
+        try:
+            return await awaitable
+        finally:
+            self.in_flight[stage] -= 1
+            self.events.append(("end", stage))
+
+    def index(self, event, stage):
+        return self.events.index((event, stage))
+
+
+def logged_controller(log, intent="rules"):
+    class LoggedLLM(AsyncFakeLLM):
+        async def classify_intent(self, query, history=[]):
+            return await log.run("classify", super().classify_intent(query, history))
+
+        async def extract_cards(self, query, history=[]):
+            return await log.run("extract", super().extract_cards(query, history))
+
+        async def get_completion(self, model, messages, temperature=0.7, max_tokens=1000):
+            return await log.run("llm", super().get_completion(model, messages, temperature, max_tokens))
+
+    class LoggedRAG(AsyncFakeRAG):
+        async def aretrieve_ids(self, query, history=None, index_version=None):
+            return await log.run("retrieve", super().aretrieve_ids(query, history, index_version))
+
+    class LoggedCards(AsyncFakeCards):
+        async def get_card_data(self, card_names):
+            return await log.run("card_data", super().get_card_data(card_names))
+
+    return AsyncChatController(LoggedLLM(intent), LoggedRAG(), LoggedCards(), None, None, None)
+
+
+def test_async_controller_matches_sync_and_interleaves_requests():
+    blocking = make_controller().process_message("How does Blood Moon work?", [])
+    log = StageLog()
+
+    async def run_many(n):
+        return await asyncio.gather(*[
+            logged_controller(log).process_message("How does Blood Moon work?", []) for _ in range(n)
+        ])
+
+    results = asyncio.run(run_many(20))
+
+    assert all(r["response"] == blocking["response"] for r in results)
+    # All 20 requests were waiting on their classification at once, not one after another
+    assert log.peak["classify"] == 20
+
+
+def test_async_stages_fan_out_and_unneeded_work_is_cancelled():
+    log = StageLog()
+    result = asyncio.run(logged_controller(log).process_message("How does Blood Moon work?", []))
+    assert result["response"].endswith(ANSWER)
+
+    # Extraction and retrieval start speculatively, before the intent is known
+    classified = log.index("end", "classify")
+    assert log.index("start", "extract") < classified and log.index("start", "retrieve") < classified
+    # Card data waits for extraction only; the completion is the join point of every stage
+    assert log.index("start", "card_data") > log.index("end", "extract")
+    assert log.index("start", "llm") > max(log.index("end", "card_data"), log.index("end", "retrieve"))
+
+    controller = logged_controller(StageLog(), intent="meta")
+    asyncio.run(controller.process_message("Who are you?", []))
+    assert controller.rag.cancelled
@@ -0,0 +1,45 @@
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from src.bench import CASES, compare, run_suite, save_baseline, load_baseline, synthetic_rulebook
+from src.indexer import parse_rulebook_into_chunks
+
+
+def test_every_case_runs_offline():
+    results = run_suite(repeat=1, min_time=0.001)
+    assert set(results["cases"]) == set(CASES)
+    for row in results["cases"].values():
+        assert row["us"] > 0 and row["relative"] > 0
+
+
+def test_synthetic_rulebook_is_deterministic_and_chunks_like_the_real_one():
+    text = synthetic_rulebook()
+    assert text == synthetic_rulebook()
+    chunks = parse_rulebook_into_chunks(text)
+    assert len(chunks) > 500 and all(len(c["text"]) < 3000 for c in chunks)
+    assert chunks[1]["rule_num"].startswith("100")
+
+
+def test_regressions_against_the_baseline(tmp_path):
+    path = str(tmp_path / "baseline.json")
+    save_baseline({"cases": {"a": {"us": 10.0, "relative": 1.0}, "b": {"us": 10.0, "relative": 1.0}}}, path)
+    save_baseline({"cases": {"c": {"us": 5.0, "relative": 0.5}}}, path)  # merged: a and b are kept
+    baseline = load_baseline(path)
+    assert sorted(baseline["cases"]) == ["a", "b", "c"]
+
+    current = {"cases": {"a": {"us": 13.0, "relative": 1.3}, "b": {"us": 11.0, "relative": 1.1},
+                         "c": {"us": 2.0, "relative": 0.2}, "d": {"us": 1.0, "relative": 0.1}}}
+    rows = compare(current, baseline, tolerance=0.25)
+    assert {name: row["status"] for name, row in rows.items()} == {
+        "a": "regression", "b": "ok", "c": "faster", "d": "new"}
+    assert rows["a"]["change"] == pytest.approx(0.3)
+    assert compare(current, None)["a"]["status"] == "new"
+
+
+def test_unknown_case_is_rejected():
+    with pytest.raises(ValueError):
+        run_suite(["nope"])
@@ -0,0 +1,139 @@
+import sys
+import os
+import json
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.br_updater import BRParser
+from backend.app.services.card_catalog import CardCatalog
+from backend.app.services.legality import LegalityService
+
+PAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "br", "banned_restricted.html")
+
+
+class PageResponse:
+    def __init__(self, status_code, body=b"", headers=None):
+        self.status_code = status_code
+        self.content = body
+        self.text = body.decode("utf-8")
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(self.status_code)
+
+
+class ConditionalSite:
+    """Serves the page with an ETag and honours If-None-Match, like the WotC CDN."""
+
+    def __init__(self, body, etag='"v1"'):
+        self.body, self.etag = body, etag
+        self.requests = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.requests.append(dict(headers or {}))
+        if (headers or {}).get("If-None-Match") == self.etag:
+            return PageResponse(304)
+        return PageResponse(200, self.body, {"ETag": self.etag})
+
+
+def test_sync_skips_unchanged_pages_and_lists(tmp_path):
+    with open(PAGE, "rb") as f:
+        site = ConditionalSite(f.read())
+    path = str(tmp_path / "br.json")
+    parser = BRParser(path=path, meta_path=str(tmp_path / "br.meta.json"), session=site)
+
+    assert parser.run() and parser.changed
+    with open(path) as f:
+        data = json.load(f)
+    assert data["Modern"] == ["Fable of the Mirror-Breaker", "Violent Outburst"]
+    # The combined Vintage section is split on its lead-ins: nothing lands on both lists
+    assert data["Vintage"] == {"banned": ["Chaos Orb", "Shahrazad"], "restricted": ["Black Lotus", "Sol Ring"]}
+    mtime = os.stat(path).st_mtime_ns
+
+    # Same ETag: 304, nothing parsed or written
+    assert parser.run() and not parser.changed
+    assert site.requests[-1]["If-None-Match"] == '"v1"'
+
+    # New ETag, same bytes: skipped on the content hash
+    site.etag = '"v2"'
+    assert parser.run() and not parser.changed
+
+    # Cosmetic page change, same lists: the JSON file is left alone
+    site.etag, site.body = '"v3"', site.body.replace(b"<article>", b"<article class='x'>")
+    assert parser.run() and not parser.changed
+    assert os.stat(path).st_mtime_ns == mtime and not os.path.exists(path + ".tmp")
+
+
+def test_legality_hot_swaps_new_lists(tmp_path):
+    path = tmp_path / "br.json"
+    path.write_text(json.dumps({"Modern": ["Violent Outburst"]}))
+    legality = LegalityService(CardCatalog(None), str(path))
+    old_version = legality.version
+    old_state = legality._state
+    assert legality.check_legality("violent outburst") == ["**BANNED** in Modern"]
+    assert not legality.reload()
+
+    path.write_text(json.dumps({"Modern": ["Violent Outburst", "Fable of the Mirror-Breaker"]}))
+    os.utime(path, ns=(1, 1))  # make sure the stamp differs even on coarse clocks
+    assert legality.reload() and legality.version != old_version
+    assert legality.format_status("Fable of the Mirror-Breaker") == {"modern": "banned"}
+    # The previous index object is untouched: an in-flight lookup finishes on a consistent version
+    assert "fable of the mirror-breaker" not in old_state["index"]
+
+
+def test_unbanned_cards_fall_back_to_legal(tmp_path):
+    legal = {"modern": "legal", "legacy": "legal", "vintage": "legal"}
+    bulk = tmp_path / "bulk.json"
+    bulk.write_text(json.dumps([
+        {"id": "jace", "name": "Jace, the Mind Sculptor", "legalities": {**legal, "modern": "banned"}},
+        {"id": "lotus", "name": "Black Lotus", "legalities": {**legal, "legacy": "banned", "vintage": "restricted"}},
+    ]), encoding="utf-8")
+    catalog = CardCatalog(str(tmp_path / "catalog.json"))
+    catalog.build_from_bulk(str(bulk))
+    catalog = CardCatalog(catalog.path)
+
+    path = tmp_path / "br.json"
+    path.write_text(json.dumps({"Modern": ["Jace, the Mind Sculptor"], "Vintage": {"banned": [], "restricted": ["Black Lotus"]}}))
+    legality = LegalityService(catalog, str(path))
+    assert legality.format_status("Jace, the Mind Sculptor")["modern"] == "banned"
+
+    # Jace comes off the Modern list before Scryfall's bulk data catches up
+    path.write_text(json.dumps({"Modern": [], "Vintage": {"banned": [], "restricted": ["Black Lotus"]}}))
+    os.utime(path, ns=(1, 1))
+    assert legality.reload()
+    assert legality.format_status("Jace, the Mind Sculptor")["modern"] == "legal"
+    assert legality.check_legality("Jace, the Mind Sculptor") == []
+    # Formats the file does not cover keep the catalog status
+    assert legality.check_legality("Black Lotus") == ["**BANNED** in Legacy", "**RESTRICTED** in Vintage"]
+    assert catalog.get("Jace, the Mind Sculptor")["legalities"]["modern"] == "banned"
+
+
+def test_vintage_banned_cards_stay_banned(tmp_path):
+    legal = {"legacy": "legal", "vintage": "legal"}
+    bulk = tmp_path / "bulk.json"
+    bulk.write_text(json.dumps([
+        {"id": "orb", "name": "Chaos Orb", "legalities": {"legacy": "banned", "vintage": "banned"}},
+        {"id": "lotus", "name": "Black Lotus", "legalities": {"legacy": "banned", "vintage": "restricted"}},
+        {"id": "ring", "name": "Sol Ring", "legalities": {"legacy": "banned", "vintage": "restricted"}},
+    ]), encoding="utf-8")
+    catalog = CardCatalog(str(tmp_path / "catalog.json"))
+    catalog.build_from_bulk(str(bulk))
+
+    # A file from an older sync: every Vintage card on both lists says nothing about either
+    path = tmp_path / "br.json"
+    listed = ["Chaos Orb", "Black Lotus"]
+    path.write_text(json.dumps({"Vintage": {"banned": listed, "restricted": listed}}))
+    legality = LegalityService(catalog, str(path))
+    assert legality.check_legality("Chaos Orb") == ["**BANNED** in Legacy", "**BANNED** in Vintage"]
+    assert legality.format_status("Black Lotus")["vintage"] == "restricted"
+
+    # Separate lists: "banned" wins over any other listing of the card
+    path.write_text(json.dumps({"Vintage": {"banned": ["Chaos Orb", "Sol Ring"], "restricted": ["Black Lotus"],
+                                            "unclassified": ["Sol Ring"]}}))
+    os.utime(path, ns=(1, 1))
+    assert legality.reload()
+    assert legality.format_status("Chaos Orb")["vintage"] == "banned"
+    assert legality.format_status("Black Lotus")["vintage"] == "restricted"
+    assert legality.format_status("Sol Ring")["vintage"] == "banned"
@@ -0,0 +1,107 @@
+import sys
+import os
+import json
+import asyncio
+import httpx
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.app.services.cardtrader import CardTraderService, AsyncCardTraderService, BlueprintIndex
+from backend.app.services.market import MarketIntelligenceService
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "cardtrader")
+SOL_RING_2XM = "3b8a5e8d-bf8d-4f8a-9e4c-5a6e7d0c1f2b"
+SOL_RING_LEA = "9aee4d2c-2e8d-4d2b-9f3b-6a1c0c5b8f1a"
+BOLT_LEA = "ce711943-c1a1-43a0-8b89-8d169cfb8e06"
+
+
+def fixture_for(path, params):
+    """Recorded CardTrader response for an API path and query, or None."""
+    if path.endswith("/expansions"):
+        name = "expansions.json"
+    elif path.endswith("/blueprints/export") and "expansion_id" in params:
+        name = f"blueprints_export_{params['expansion_id']}.json"
+    elif path.endswith("/marketplace/products"):
+        name = f"marketplace_products_{params['blueprint_id']}.json"
+    else:
+        return None
+    file = os.path.join(FIXTURES, name)
+    if not os.path.exists(file):
+        return None
+    with open(file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class FixtureResponse:
+    def __init__(self, data):
+        self.data = data
+
+    def raise_for_status(self):
+        if self.data is None:
+            raise RuntimeError("404")
+
+    def json(self):
+        return self.data
+
+
+class FixtureSession:
+    def __init__(self):
+        self.calls = []
+
+    def get(self, url, params=None, headers=None, timeout=None):
+        self.calls.append((url, dict(params or {})))
+        return FixtureResponse(fixture_for(url, params or {}))
+
+
+def build_service(tmp_path):
+    session = FixtureSession()
+    service = CardTraderService(api_key="test", session=session, index=BlueprintIndex(str(tmp_path / "bp.json")))
+    service.refresh_blueprint_index()
+    session.calls.clear()
+    return service, session
+
+
+def test_blueprint_index_and_nm_prices(tmp_path):
+    service, session = build_service(tmp_path)
+
+    # Only MTG expansions are exported; sealed products (no scryfall_id) are skipped
+    assert len(service.index) == 3
+    assert service.index.get(SOL_RING_2XM) == [172544, 172545]
+    assert not service.index.is_stale()
+
+    # Cheapest English NM non-foil, unsigned, ungraded listing across both blueprints of the print
+    assert service.get_nm_price(SOL_RING_2XM) == "2.75€"
+    assert service.get_nm_price(BOLT_LEA) == "520.00€"
+    assert service.get_nm_price(SOL_RING_LEA) == "N/A"
+    assert all(url.endswith("/marketplace/products") for url, _ in session.calls)
+
+    # Repeated lookups are served from the price cache
+    session.calls.clear()
+    assert service.get_nm_price(SOL_RING_2XM) == "2.75€"
+    assert session.calls == []
+
+    # The index survives a restart
+    assert BlueprintIndex(service.index.path).get(SOL_RING_2XM) == [172544, 172545]
+
+
+def test_async_prices_and_arbitrage(tmp_path):
+    service, _ = build_service(tmp_path)
+    market = MarketIntelligenceService(service)
+
+    arb = market.analyze_arbitrage("Sol Ring", "2.50€", SOL_RING_2XM)
+    assert arb["ct"] == 2.75 and arb["cm"] == 2.5 and round(arb["pct"]) == 10
+
+    def handler(request):
+        data = fixture_for(request.url.path, dict(request.url.params))
+        return httpx.Response(200 if data is not None else 404, json=data)
+
+    async def run():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        async_service = AsyncCardTraderService(api_key="test", client=client, index=service.index)
+        try:
+            return await async_service.get_nm_price(SOL_RING_2XM), await async_service.get_nm_price("unknown")
+        finally:
+            await async_service.aclose()
+
+    assert asyncio.run(run()) == ("2.75€", "N/A")
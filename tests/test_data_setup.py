@@ -0,0 +1,194 @@
+import sys
+import os
+import json
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from backend.app.core.config import SCRYFALL_BULK_URL
+from backend.app.utils.io import stream_download, file_sha256
+from src.data_setup import SetupPipeline, SetupState
+from src.indexer import rulebook_version
+
+RULES_URL = "https://media.example/MagicCompRules.txt"
+BULK_URI = "https://data.example/default-cards-20251019.json"
+RULES = b"100.1. These Magic rules apply to any Magic game.\n702.19a Trample is a static ability.\n"
+BULK = json.dumps([{"id": "p1", "name": "Lightning Bolt"}]).encode("utf-8")
+
+
+class Response:
+    def __init__(self, status_code, body=b"", headers=None, payload=None):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {}
+        self.payload = payload
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(self.status_code)
+
+    def json(self):
+        return self.payload
+
+    def iter_content(self, chunk_size=1):
+        for i in range(0, len(self.body), 16):
+            yield self.body[i:i + 16]
+
+
+class Site:
+    """Static files with ETags and Range / If-Range support, plus Scryfall's bulk-data listing."""
+
+    def __init__(self, files):
+        self.files = files  # url -> (body, etag)
+        self.requests = []
+
+    def head(self, url, **kwargs):
+        body, etag = self.files[url]
+        return Response(200, headers={"ETag": etag, "Content-Length": str(len(body))})
+
+    def get(self, url, headers=None, **kwargs):
+        headers = headers or {}
+        self.requests.append((url, dict(headers)))
+        if url == SCRYFALL_BULK_URL:
+            return Response(200, payload={"data": [{"type": "default_cards", "download_uri": BULK_URI,
+                                                    "updated_at": "2025-10-19T09:00:00", "size": len(BULK)}]})
+        body, etag = self.files[url]
+        if "Range" in headers and headers.get("If-Range", etag) == etag:
+            start = int(headers["Range"][len("bytes="):-1])
+            return Response(206, body[start:], {"ETag": etag})
+        return Response(200, body, {"ETag": etag})
+
+
+class FakeBR:
+    data = {"Modern": ["Mox Opal"]}
+
+    def __init__(self):
+        self.changed = False
+
+    def run(self):
+        return True
+
+
+class FakeBuilder:
+    def __init__(self, path):
+        self.path = path
+        self.calls = 0
+        self.cards = None
+
+    def build_from_cards(self, cards):
+        self.calls += 1
+        self.cards = cards
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(cards, f)
+        return len(cards)
+
+    def append_snapshot(self, cards):
+        self.calls += 1
+        self.cards = cards
+        os.makedirs(self.path, exist_ok=True)
+        return len(cards)
+
+
+def make_pipeline(tmp_path, site, **kwargs):
+    builds = []
+    pipeline = SetupPipeline(
+        session=site, state=SetupState(str(tmp_path / "state.json")), rules_url=RULES_URL,
+        rulebook_path=str(tmp_path / "rules.txt"), manifest_path=str(tmp_path / "manifest.json"),
+        bulk_path=str(tmp_path / "bulk.json"), indexer=builds.append, br_parser=FakeBR(),
+        catalog=FakeBuilder(str(tmp_path / "catalog.json")), history=FakeBuilder(str(tmp_path / "history")), **kwargs)
+    return pipeline, builds
+
+
+def test_stream_download_resumes_partial_file(tmp_path):
+    site = Site({RULES_URL: (RULES, '"r1"')})
+    path = str(tmp_path / "rules.txt")
+    stream_download(RULES_URL, path, session=site, validator='"r1"')
+    os.remove(path)
+
+    # Interrupted download: the first 20 bytes are on disk
+    with open(path + ".part", "wb") as f:
+        f.write(RULES[:20])
+    with open(path + ".part.src", "w") as f:
+        f.write(f'{RULES_URL}\n"r1"')
+    checksum = stream_download(RULES_URL, path, session=site, validator='"r1"', size=len(RULES))
+
+    assert site.requests[-1][1]["Range"] == "bytes=20-"
+    assert open(path, "rb").read() == RULES
+    assert checksum == file_sha256(path)
+    assert not os.path.exists(path + ".part")
+
+
+def test_stream_download_rejects_bad_checksum(tmp_path):
+    site = Site({RULES_URL: (RULES, '"r1"')})
+    path = str(tmp_path / "rules.txt")
+    with pytest.raises(ValueError):
+        stream_download(RULES_URL, path, session=site, sha256="0" * 64)
+    assert not os.path.exists(path) and not os.path.exists(path + ".part")
+
+
+def test_second_run_skips_unchanged_steps(tmp_path):
+    site = Site({RULES_URL: (RULES, '"r1"'), BULK_URI: (BULK, '"b1"')})
+    pipeline, builds = make_pipeline(tmp_path, site)
+    results = pipeline.run()
+    assert {step: r["status"] for step, r in results.items()} == {"rules": "updated", "br": "skipped", "scryfall": "updated"}
+    assert len(builds) == 1 and pipeline.catalog.calls == 1 and pipeline.history.calls == 1
+    # One parse of the bulk export feeds both the catalog and the snapshot
+    assert pipeline.catalog.cards is pipeline.history.cards and pipeline.catalog.cards[0]["name"] == "Lightning Bolt"
+    # The indexer publishes the rulebook version as active
+    with open(tmp_path / "manifest.json", "w") as f:
+        json.dump({"active": rulebook_version(RULES.decode("utf-8")), "versions": {}}, f)
+
+    site.requests.clear()
+    pipeline, builds = make_pipeline(tmp_path, site)
+    results = pipeline.run()
+    assert all(r["status"] == "skipped" for r in results.values())
+    assert [url for url, _ in site.requests] == [SCRYFALL_BULK_URL]  # no file was downloaded again
+    assert not builds and pipeline.catalog.calls == 0 and pipeline.history.calls == 0
+
+
+def test_changed_or_damaged_inputs_rerun(tmp_path):
+    site = Site({RULES_URL: (RULES, '"r1"'), BULK_URI: (BULK, '"b1"')})
+    pipeline, _ = make_pipeline(tmp_path, site)
+    pipeline.run()
+
+    # A new rules release (new ETag) and a corrupted local bulk file
+    site.files[RULES_URL] = (RULES + b"702.2a Deathtouch is a static ability.\n", '"r2"')
+    with open(tmp_path / "bulk.json", "wb") as f:
+        f.write(b"x" * len(BULK))
+    pipeline, builds = make_pipeline(tmp_path, site)
+    results = pipeline.run()
+
+    assert results["rules"]["status"] == "updated" and len(builds) == 1
+    assert open(tmp_path / "bulk.json", "rb").read() == BULK
+    assert results["scryfall"]["status"] == "skipped"  # same bulk export: catalog and snapshot are current
+
+
+def test_missing_outputs_are_rebuilt_without_rehashing_the_export(tmp_path, monkeypatch):
+    import src.data_setup
+    hashed = []
+    monkeypatch.setattr(src.data_setup, "file_sha256", lambda path: hashed.append(path) or file_sha256(path))
+    site = Site({RULES_URL: (RULES, '"r1"'), BULK_URI: (BULK, '"b1"')})
+    pipeline, _ = make_pipeline(tmp_path, site)
+    pipeline.run(steps=("scryfall",))
+    # stream_download already returned the checksum of the export
+    assert str(tmp_path / "bulk.json") not in hashed
+    assert pipeline.state.sha256("scryfall.download") == file_sha256(str(tmp_path / "bulk.json"))
+
+    os.remove(tmp_path / "catalog.json")
+    pipeline, _ = make_pipeline(tmp_path, site)
+    results = pipeline.run(steps=("scryfall",))
+    assert results["scryfall"]["status"] == "updated"
+    assert pipeline.catalog.calls == 1 and pipeline.history.calls == 0
+    assert os.path.exists(tmp_path / "catalog.json")
+
+    os.rmdir(tmp_path / "history")
+    pipeline, _ = make_pipeline(tmp_path, site)
+    pipeline.run(steps=("scryfall",))
+    assert pipeline.catalog.calls == 0 and pipeline.history.calls == 1
@@ -0,0 +1,129 @@
+import sys
+import os
+import json
+import datetime
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.app.services.card_catalog import CardCatalog, normalize_card_name
+from backend.app.services.deck import DeckAnalyzer, parse_decklist, format_deck_report
+from backend.app.services.legality import LegalityService
+from backend.app.services.market import MarketIntelligenceService
+from backend.app.services.price_history import PriceHistoryStore
+from src.br_updater import BRParser
+
+BR_PAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "br", "banned_restricted.html")
+
+LEGAL_EVERYWHERE = {f: "legal" for f in ("standard", "pioneer", "modern", "legacy", "vintage", "pauper", "commander")}
+BULK = [
+    {"id": "bolt", "name": "Lightning Bolt", "type_line": "Instant", "cmc": 1, "oracle_text": "Deal 3.",
+     "legalities": {**LEGAL_EVERYWHERE, "standard": "not_legal", "pioneer": "not_legal"}, "prices": {"eur": "1.50"}},
+    {"id": "bolt-2", "name": "Lightning Bolt", "type_line": "Instant", "cmc": 1,
+     "legalities": {**LEGAL_EVERYWHERE, "standard": "not_legal", "pioneer": "not_legal"}, "prices": {"eur": "0.90"}},
+    {"id": "mountain", "name": "Mountain", "type_line": "Basic Land — Mountain", "cmc": 0,
+     "legalities": LEGAL_EVERYWHERE, "prices": {"eur": "0.10"}},
+    {"id": "fable", "name": "Fable of the Mirror-Breaker // Reflection of Kiki-Jiro", "cmc": 3,
+     "card_faces": [{"type_line": "Enchantment — Saga", "oracle_text": "..."}, {"type_line": "Enchantment Creature", "oracle_text": ""}],
+     "legalities": {**LEGAL_EVERYWHERE, "pauper": "not_legal"}, "prices": {"eur": "12.00"}},
+    {"id": "lotus", "name": "Black Lotus", "type_line": "Artifact", "cmc": 0,
+     "legalities": {**LEGAL_EVERYWHERE, "standard": "not_legal", "pioneer": "not_legal", "modern": "not_legal",
+                    "legacy": "banned", "vintage": "restricted", "pauper": "not_legal", "commander": "banned"},
+     "prices": {"eur": None}},
+    {"id": "dnt", "name": "Lim-Dûl's Vault", "type_line": "Instant", "cmc": 2, "legalities": LEGAL_EVERYWHERE, "prices": {"eur": "2.00"}},
+]
+
+ARENA = """Deck
+4 Lightning Bolt (2XM) 129
+4 Fable of the Mirror-Breaker (NEO) 141
+50 Mountain (ONE) 276
+2 Lim-Dul's Vault
+
+Sideboard
+1 Lim-Dûl's Vault (ALL) 52
+1 Black Lotus (LEA) 232
+"""
+
+MTGO = """4 lightning bolt
+4x Fable of the Mirror-Breaker
+52 Mountain
+
+SB: 1 Black Lotus
+2 Llanowar Elves
+"""
+
+
+def build_analyzer(tmp_path):
+    bulk = tmp_path / "bulk.json"
+    bulk.write_text(json.dumps(BULK), encoding="utf-8")
+    catalog = CardCatalog(str(tmp_path / "catalog.json"))
+    assert catalog.build_from_bulk(str(bulk)) == 5
+    history = PriceHistoryStore(str(tmp_path / "history"))
+    history.snapshot_from_bulk(str(bulk), day=datetime.date(2025, 1, 1))
+
+    br_file = tmp_path / "br.json"
+    with open(BR_PAGE, encoding="utf-8") as f:
+        br_file.write_text(json.dumps(BRParser.parse(f.read())))
+    catalog = CardCatalog(catalog.path)
+    return DeckAnalyzer(catalog, LegalityService(catalog, str(br_file)), MarketIntelligenceService(None, history=history))
+
+
+def test_parse_mtgo_and_arena_lists():
+    arena = parse_decklist(ARENA)
+    assert arena["main"] == {"Lightning Bolt": 4, "Fable of the Mirror-Breaker": 4, "Mountain": 50, "Lim-Dul's Vault": 2}
+    assert arena["sideboard"] == {"Lim-Dûl's Vault": 1, "Black Lotus": 1}
+
+    mtgo = parse_decklist(MTGO)
+    assert sum(mtgo["main"].values()) == 60
+    assert mtgo["sideboard"] == {"Black Lotus": 1, "Llanowar Elves": 2}
+    assert normalize_card_name("Lim-Dûl’s  Vault") == normalize_card_name("lim-dul's vault")
+
+
+def test_deck_legality_and_prices(tmp_path):
+    analyzer = build_analyzer(tmp_path)
+    result = analyzer.analyze(ARENA, formats=["modern", "legacy", "vintage", "pauper"])
+
+    assert result["counts"] == {"main": 60, "sideboard": 2, "commander": 0}
+    assert result["unknown"] == []
+    fable = next(c for c in result["cards"] if c["name"].startswith("Fable"))
+    assert fable["legalities"]["modern"] == "banned" and fable["type_line"] == "Enchantment — Saga"
+
+    formats = result["formats"]
+    assert formats["vintage"]["legal"]  # restricted Lotus x1, accented and plain Vault spellings merge to 3 copies
+    assert any("Fable" in i and "banned" in i for i in formats["modern"]["issues"])
+    assert "Black Lotus is banned." in formats["legacy"]["issues"]
+    assert formats["legacy"]["legal"] is False and formats["pauper"]["legal"] is False
+
+    # Cheapest printings: Bolt at 0.90€, Lotus has no price
+    price = result["price"]
+    assert price["main_eur"] == round(4 * 0.9 + 4 * 12 + 50 * 0.1 + 2 * 2, 2)
+    assert price["sideboard_eur"] == 2.0 and price["missing"] == ["Black Lotus"]
+    assert "❌ Modern" in format_deck_report(result)
+
+    over = analyzer.analyze(MTGO.replace("4 lightning bolt", "5 lightning bolt"), formats=["legacy"])
+    assert "Lightning Bolt: 5 copies (maximum 4)." in over["formats"]["legacy"]["issues"]
+    assert over["unknown"] == ["Llanowar Elves"]
+
+
+def test_legality_index_lookups(tmp_path):
+    legality = build_analyzer(tmp_path).legality
+    # Front face, case and accents all hit the same entry
+    assert legality.format_status("fable of the mirror-breaker")["modern"] == "banned"
+    assert legality.format_status("Fable of the Mirror-Breaker // Reflection of Kiki-Jiro")["pioneer"] == "legal"
+    assert legality.check_legality("Black Lotus") == ["**BANNED** in Legacy", "**RESTRICTED** in Vintage", "**BANNED** in Commander"]
+    assert legality.check_legality("Lightning Bolt") == []
+    # Vintage bans stay bans: only the restricted list allows a single copy
+    assert legality.format_status("Chaos Orb") == {"vintage": "banned"}
+    assert legality.format_status("Sol Ring")["vintage"] == "restricted"
+
+    statuses = legality.check_many(["LIM-DUL'S VAULT", "Nonexistent Card"], formats=["modern", "pauper"])
+    assert statuses == [{"modern": "legal", "pauper": "legal"}, {"modern": "unknown", "pauper": "unknown"}]
+    # The overlay copies only listed cards: the catalog's own legalities stay untouched
+    assert legality.catalog.get("Fable of the Mirror-Breaker")["legalities"]["modern"] == "legal"
+
+
+def test_catalog_builds_at_a_bare_relative_path(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    catalog = CardCatalog("catalog.json")
+    assert catalog.build_from_cards(BULK) == 5
+    assert CardCatalog("catalog.json").get("Lightning Bolt")["name"] == "Lightning Bolt"
@@ -0,0 +1,141 @@
+import sys
+import os
+import json
+import time
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from backend.app.core.config import NORMAL_MODEL, SMART_MODEL
+from backend.app.services.escalation import Escalator, FormatTracker
+
+VALID = ("1. 🃏 CARD INFO: Blood Moon\n2. 📜 ORACLE TEXT: Nonbasic lands are Mountains.\n"
+         "3. ⚖️ RULING: Urza's Saga loses its abilities.\n4. 💡 GAMEPLAY SCENARIO: Example.")
+RAMBLING = "Well, let me think about this interaction in detail. " * 40
+
+
+class StreamingLLM:
+    """Streams canned answers in 10-char chunks and records how much of each was consumed."""
+
+    def __init__(self, answers, delays=None):
+        self.answers = answers
+        self.delays = delays or {}
+        self.consumed = {}
+        self.calls = []
+
+    def stream_completion(self, model, messages, temperature=0.7, max_tokens=1000, priority=0):
+        self.calls.append(model)
+        text = self.answers[model]
+        self.consumed[model] = 0
+        for i in range(0, len(text), 10):
+            time.sleep(self.delays.get(model, 0.0))
+            self.consumed[model] = i + 10
+            yield text[i:i + 10]
+
+
+def test_tracker_flags_missing_header_early():
+    tracker = FormatTracker([100, 100, 100, 100])
+    assert tracker.feed("1. CARD INFO: Blood Moon\n")
+    assert not tracker.feed("x" * 150)
+    assert "ORACLE TEXT" in tracker.broken_reason
+
+    tracker = FormatTracker([100, 100, 100, 100])
+    for i in range(0, len(VALID), 7):
+        assert tracker.feed(VALID[i:i + 7])
+    assert tracker.is_valid()
+
+
+def test_broken_8b_answer_is_abandoned_mid_stream():
+    llm = StreamingLLM({NORMAL_MODEL: RAMBLING, SMART_MODEL: VALID})
+    escalator = Escalator(llm, mode="stream", budgets=[200, 600, 1500, 3000])
+    reasons = []
+
+    text, model = escalator.complete(NORMAL_MODEL, [], on_abandon=lambda reason, partial: reasons.append(reason))
+
+    assert (text, model) == (VALID, SMART_MODEL)
+    assert llm.calls == [NORMAL_MODEL, SMART_MODEL]
+    # Stopped reading the 8B answer shortly after the CARD INFO budget ran out
+    assert llm.consumed[NORMAL_MODEL] < len(RAMBLING) // 4
+    assert "CARD INFO" in reasons[0]
+
+
+def test_valid_8b_answer_is_not_escalated():
+    llm = StreamingLLM({NORMAL_MODEL: VALID, SMART_MODEL: VALID})
+    streamed = []
+    text, model = Escalator(llm, mode="stream").complete(NORMAL_MODEL, [], on_delta=streamed.append)
+    assert (text, model) == (VALID, NORMAL_MODEL)
+    assert "".join(streamed) == VALID
+    assert llm.calls == [NORMAL_MODEL]
+
+
+def test_hedge_returns_first_valid_answer():
+    # 8B is slow (~0.4s), hedge fires after 0.1s and 70B answers first
+    llm = StreamingLLM({NORMAL_MODEL: VALID, SMART_MODEL: VALID.replace("Example", "Hedged")},
+                       delays={NORMAL_MODEL: 0.02})
+    escalator = Escalator(llm, mode="hedge", hedge_after=0.1)
+
+    text, model = escalator.complete(NORMAL_MODEL, [])
+    assert model == SMART_MODEL and "Hedged" in text
+    escalator.executor.shutdown(wait=True)
+    # The losing 8B stream was cancelled, not read to the end
+    assert llm.consumed[NORMAL_MODEL] < len(VALID)
+
+
+def test_hedge_waits_for_the_other_answer_when_the_first_fails_validation():
+    # 70B finishes first but rate-limited: the slower, valid 8B answer wins
+    llm = StreamingLLM({NORMAL_MODEL: VALID, SMART_MODEL: "Error: rate_limit_exceeded"},
+                       delays={NORMAL_MODEL: 0.01})
+    escalator = Escalator(llm, mode="hedge", hedge_after=0.05)
+
+    text, model = escalator.complete(NORMAL_MODEL, [])
+    assert (text, model) == (VALID, NORMAL_MODEL)
+    assert llm.calls == [NORMAL_MODEL, SMART_MODEL]
+
+
+def test_predictor_learns_escalations_from_log_entries(tmp_path):
+    from backend.app.services.escalation_predictor import EscalationPredictor, extract_features, was_escalated
+
+    def entry(cards, words, escalated):
+        return {"query": " ".join(["word"] * words), "response": "", "model": NORMAL_MODEL, "is_gold": escalated,
+                "features": {"intent": "rules", "cards": cards, "chunks": 10, "query_words": words, "history_turns": 0,
+                             "prompt_tokens": 3000}}
+
+    # Multi-card, long questions are the ones 8B fails on
+    entries = [entry(1, 6, False)] * 20 + [entry(2, 10, False)] * 10 + [entry(4, 40, True)] * 6
+    predictor = EscalationPredictor.fit([extract_features(e) for e in entries], [was_escalated(e) for e in entries])
+
+    path = str(tmp_path / "predictor.json")
+    predictor.save(path)
+    loaded = EscalationPredictor.load(path)
+    assert loaded.should_escalate(extract_features(entry(4, 35, False)))
+    assert not loaded.should_escalate(extract_features(entry(1, 5, False)))
+    # Old log lines without recorded features are not backfilled
+    with pytest.raises(ValueError):
+        extract_features({"query": "what does x do", "response": "CARD INFO: X | 1"})
+
+
+def test_training_drops_rows_without_features_and_refuses_small_logs(tmp_path, monkeypatch, capsys):
+    from scripts import train_escalation_predictor as trainer
+
+    features = {"intent": "rules", "cards": 1, "chunks": 10, "query_words": 6, "history_turns": 0, "prompt_tokens": 900}
+    rows = ([{"query": "q", "model": NORMAL_MODEL, "is_gold": i % 4 == 0, "features": features} for i in range(30)]
+            + [{"query": "old line", "model": NORMAL_MODEL, "is_gold": True}] * 5
+            + [{"query": "partial", "model": NORMAL_MODEL, "features": {"intent": "rules", "cards": 2}}]
+            + [{"query": "70b", "model": SMART_MODEL, "features": features}])
+    log = tmp_path / "interactions.jsonl"
+    log.write_text("".join(json.dumps(r) + "\n" for r in rows), encoding="utf-8")
+
+    entries, dropped = trainer.load_entries(str(log))
+    assert len(entries) == 30 and dropped == 6
+
+    output = tmp_path / "predictor.json"
+    monkeypatch.setattr(sys, "argv", ["train", "--log", str(log), "--output", str(output), "--min-samples", "31"])
+    trainer.main()
+    out = capsys.readouterr().out
+    assert "30 usable 8B answers (6 older ones" in out and "No model written" in out
+    assert not output.exists()
+
+    monkeypatch.setattr(sys, "argv", ["train", "--log", str(log), "--output", str(output), "--min-samples", "30"])
+    trainer.main()
+    assert json.loads(output.read_text())["metrics"]["usable_rows"] == 30
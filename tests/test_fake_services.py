@@ -0,0 +1,93 @@
+import sys
+import os
+import json
+import socket
+import subprocess
+import threading
+import time
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import uvicorn
+from fastapi.testclient import TestClient
+from fake_services import FakeSettings, create_app, service_env
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in a fresh interpreter: config reads the base URLs from the environment at import time
+CLIENT_SCRIPT = r"""
+import json, sys, tempfile, os
+from backend.app.services.llm import LLMService
+from backend.app.services.scryfall import CardService
+from backend.app.services.cardtrader import CardTraderService, BlueprintIndex
+from backend.app.utils.io import stream_download
+from backend.app.core.config import SMART_MODEL, RULES_DOWNLOAD_URL
+from src.br_updater import BRParser
+
+tmp = tempfile.mkdtemp()
+llm = LLMService(os.environ["GROQ_API_KEY"])
+card = CardService.get_card_data(["Blood Moon"])[0]
+br = BRParser(path=os.path.join(tmp, "br.json"), meta_path=os.path.join(tmp, "br.meta.json"))
+print(json.dumps({
+    "intent": llm.classify_intent("How much is Sol Ring worth?"),
+    "cards": llm.extract_cards("Does Blood Moon stop Urza's Saga?"),
+    "answer_ok": llm.validate_format(llm.get_completion(SMART_MODEL, [{"role": "user", "content": "Blood Moon?"}]))[0],
+    "streamed": "".join(llm.stream_completion(SMART_MODEL, [{"role": "user", "content": "Blood Moon?"}])).startswith("1. "),
+    "card": card["name"], "rulings": len(card["rulings"]),
+    "versions": [v["set"] for v in CardService.get_card_versions('!"Sol Ring"')],
+    "ct_price": CardTraderService(index=BlueprintIndex(os.path.join(tmp, "bp.json"))).get_nm_price("3b8a5e8d-bf8d-4f8a-9e4c-5a6e7d0c1f2b"),
+    "br": [br.run(), br.changed, br.run(), br.changed],
+    "rules_sha": len(stream_download(RULES_DOWNLOAD_URL, os.path.join(tmp, "rules.txt"))),
+}))
+"""
+
+
+def serve(app):
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    deadline = time.time() + 10
+    while not server.started and time.time() < deadline:
+        time.sleep(0.05)
+    return server, f"http://127.0.0.1:{port}"
+
+
+def test_real_clients_run_against_fakes():
+    server, base_url = serve(create_app(FakeSettings(latency=0.01, token_rate=0, http_latency=0)))
+    try:
+        env = {**os.environ, **service_env(base_url)}
+        out = subprocess.run([sys.executable, "-c", CLIENT_SCRIPT], cwd=ROOT, env=env, capture_output=True,
+                             text=True, timeout=120)
+    finally:
+        server.should_exit = True
+    assert out.returncode == 0, out.stderr
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+
+    assert result["intent"] == "market"
+    assert sorted(result["cards"]) == ["Blood Moon", "Urza's Saga"]
+    assert result["answer_ok"] and result["streamed"]
+    assert result["card"] == "Blood Moon" and result["rulings"] == 2
+    assert result["versions"] == ["LEA", "2XM"]
+    assert result["ct_price"] == "2.75€"  # cheapest English NM non-foil across both blueprints
+    assert result["br"] == [True, True, True, False]  # second sync: 304 / unchanged
+    assert result["rules_sha"] == 64
+
+
+def test_canned_answers_and_pages():
+    client = TestClient(create_app(FakeSettings(latency=0, token_rate=0, http_latency=0,
+                                                answers={"answer": {"Is it legal?": "Canned."}})))
+    resp = client.post("/groq/openai/v1/chat/completions", json={
+        "model": "m", "messages": [{"role": "system", "content": "x"}, {"role": "user", "content": "Is it legal?"}]})
+    assert resp.json()["choices"][0]["message"]["content"] == "Canned."
+
+    page = client.get("/wotc/banned-restricted-list")
+    assert client.get("/wotc/banned-restricted-list", headers={"If-None-Match": page.headers["etag"]}).status_code == 304
+    part = client.get("/wotc/MagicCompRules.txt", headers={"Range": "bytes=0-9"})
+    assert part.status_code == 206 and part.content == b"Magic: The"
+
+    found = client.post("/scryfall/cards/collection", json={"identifiers": [{"name": "Sol Ring"}, {"name": "Nope"}]}).json()
+    assert [c["name"] for c in found["data"]] == ["Sol Ring"] and found["not_found"] == [{"name": "Nope"}]
+    assert client.get("/cardtrader/api/v2/expansions").status_code == 401
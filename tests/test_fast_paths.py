@@ -0,0 +1,38 @@
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.app.services.chat_controller import ChatController
+from tests.chat_fakes import FakeLLM, FakeRAG, FakeCards
+
+
+def test_fast_paths_answer_without_generation():
+    class NoCallLLM(FakeLLM):
+        def classify_intent(self, query, history=[]):
+            assert not query.isdigit(), "menu selections must not be classified by the LLM"
+            return self.intent
+
+        def generate_search_query(self, query, history=[]):
+            raise AssertionError("menu selections must not build a search query")
+
+    class FakeCardTrader:
+        def get_nm_price(self, blueprint_id):
+            return "12.5€"
+
+    llm = NoCallLLM(intent="meta")
+    controller = ChatController(llm, FakeRAG(), FakeCards(), None, FakeCardTrader(), None)
+    first = controller.process_message("Who are you?", [])["response"]
+    second = controller.process_message("What can you do?", [])["response"]
+    assert first != second and llm.completions == 0
+
+    llm.intent = "lookup"
+    lookup = controller.process_message("Tell me about Blood Moon", [])
+    assert "**Blood Moon**" in lookup["response"] and "Nonbasic lands are Mountains." in lookup["response"]
+    assert llm.completions == 0
+
+    version = {"id": "abc", "name": "Blood Moon", "set_name": "The Dark", "set": "drk", "rarity": "rare", "prices": {"eur": "40.0"}}
+    report = controller.process_message("1", [], context={"cards": ["Blood Moon"], "active_versions": [version]})
+    assert report["intent"] == "versions"
+    assert "Blood Moon | The Dark" in report["response"] and "12.5€ (Cardtrader)" in report["response"]
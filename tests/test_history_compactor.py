@@ -0,0 +1,58 @@
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.app.core.config import NORMAL_MODEL, SMART_MODEL
+from backend.app.services.history_compactor import HistoryCompactor, summarize_answer
+from backend.app.services.scheduler import estimate_tokens
+
+
+def judge_answer(card, ruling):
+    return (f"\n\n![{card}](https://img/{card}.jpg)1. 🃏 CARD INFO: {card} | R | Enchantment\n"
+            f"2. 📜 ORACLE TEXT: {'Long oracle text. ' * 30}\n3. ⚖️ RULING: {ruling}\n"
+            f"4. 💡 GAMEPLAY SCENARIO: {'A long example. ' * 40}")
+
+
+def test_summary_keeps_card_and_ruling_only():
+    summary = summarize_answer(judge_answer("Blood Moon", "Urza's Saga loses its chapter abilities."))
+    assert summary == "[Earlier ruling on Blood Moon] Urza's Saga loses its chapter abilities."
+    assert summarize_answer("Found 12 versions of Tundra.").startswith("[Earlier answer] Found 12")
+
+
+def test_old_answers_are_summarized_and_budget_is_enforced():
+    history = []
+    for i in range(4):
+        history += [f"question {i}", judge_answer(f"Card {i}", f"Ruling {i}.")]
+
+    compactor = HistoryCompactor(verbatim_turns=1, budgets={NORMAL_MODEL: 600, SMART_MODEL: 5000})
+    roomy = compactor.compact(history, SMART_MODEL)
+    assert [m["content"] for m in roomy[:2]] == ["question 0", "[Earlier ruling on Card 0] Ruling 0."]
+    assert roomy[-1]["content"] == history[-1]
+
+    tight = compactor.compact(history, NORMAL_MODEL)
+    assert estimate_tokens(tight) <= 600
+    assert tight[-2:] == [{"role": "user", "content": "question 3"}, {"role": "assistant", "content": history[-1]}]
+    # Summaries were computed once per older answer and reused across calls
+    assert len(compactor._summaries) == 3
+
+
+def test_summaries_stored_with_the_session_are_read_back():
+    from backend.app.services.session_artifacts import SessionArtifacts
+
+    history = []
+    ctx = {}
+    artifacts = SessionArtifacts(ctx, max_summaries=3)
+    for i in range(4):
+        answer = judge_answer(f"Card {i}", f"Ruling {i}.")
+        history += [f"question {i}", answer]
+        artifacts.remember_summary(answer, f"[Stored summary {i}]")
+    assert len(artifacts.summaries()) == 3  # bounded like the session history
+
+    # A fresh process (empty LRU) compacts from the session's summaries, recomputing only the evicted one
+    compactor = HistoryCompactor(verbatim_turns=1, budgets={NORMAL_MODEL: 5000, SMART_MODEL: 5000})
+    messages = compactor.compact(history, NORMAL_MODEL, SessionArtifacts(ctx).summaries())
+    assert [m["content"] for m in messages[1:6:2]] == [
+        "[Earlier ruling on Card 0] Ruling 0.", "[Stored summary 1]", "[Stored summary 2]"]
+    assert len(compactor._summaries) == 1
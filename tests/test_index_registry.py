@@ -0,0 +1,149 @@
+import sys
+import os
+import numpy as np
+import pytest
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.app.services.rag import RAGService, IndexVersionGone, read_manifest
+from backend.app.services.chat_controller import ChatController
+from src.indexer import publish_index
+
+RULES = ["702.19 Trample", "702.2 Deathtouch", "702.26 Phasing"]
+
+
+class KeywordModel:
+    """Deterministic stand-in for the sentence model: one dimension per keyword."""
+
+    def encode(self, texts, **kwargs):
+        return np.array([[1.0 + (word.lower() in text.lower()) * 5 for word in ("trample", "deathtouch", "phasing")]
+                         for text in texts], dtype=np.float32)
+
+
+def publish(tmp_path, version, suffix):
+    chunks = [{"rule_num": r.split()[0], "text": f"{r} {suffix}"} for r in RULES]
+    data = {"chunks": chunks, "embeddings": KeywordModel().encode([c["text"] for c in chunks]),
+            "model_name": "keyword", "version": version}
+    return publish_index(data, index_dir=str(tmp_path), manifest_path=str(tmp_path / "manifest.json"))
+
+
+def make_service(tmp_path, loads):
+    def loader(name):
+        loads.append(name)
+        return KeywordModel()
+    return RAGService(manifest_path=str(tmp_path / "manifest.json"), model_loader=loader)
+
+
+def test_publish_writes_versioned_files_and_manifest(tmp_path):
+    path = publish(tmp_path, "v1", "(2024)")
+    publish(tmp_path, "v2", "(2025)")
+
+    manifest = read_manifest(str(tmp_path / "manifest.json"))
+    assert manifest["active"] == "v2"
+    assert set(manifest["versions"]) == {"v1", "v2"}
+    assert manifest["versions"]["v1"]["path"] == path and os.path.exists(path)
+    assert manifest["versions"]["v2"]["chunks"] == 3
+
+
+def test_hot_swap_keeps_pinned_version_and_notifies(tmp_path):
+    publish(tmp_path, "v1", "(2024)")
+    loads = []
+    rag = make_service(tmp_path, loads)
+    swaps = []
+    rag.on_swap(lambda old, new: swaps.append((old, new)))
+    assert rag.index_version == "v1"
+    assert rag.check_for_update(wait=True) is None  # manifest unchanged
+
+    # A request pins v1 before the new release lands
+    pinned = rag.index_version
+    ids = rag.retrieve_ids("Does trample work?", index_version=pinned)
+
+    publish(tmp_path, "v2", "(2025)")
+    os.utime(tmp_path / "manifest.json", ns=(1, 1))  # mtime always differs from the first publish
+    assert rag.check_for_update(wait=True) == "v2"
+
+    assert rag.index_version == "v2"
+    assert swaps == [("v1", "v2")]
+    assert loads == ["keyword"]  # the model is shared across versions
+    assert rag.get_chunks(ids, index_version=pinned)[0]["text"] == "702.19 Trample (2024)"
+    assert rag.get_chunks(ids)[0]["text"] == "702.19 Trample (2025)"
+
+    status = rag.status()
+    assert status["active"] == "v2" and status["retained"] == ["v1", "v2"]
+    assert status["loading"] is None and status["last_error"] is None
+
+
+def test_evicted_pinned_version_is_retrieved_again_on_the_active_index(tmp_path):
+    publish(tmp_path, "v1", "(2024)")
+    rag = make_service(tmp_path, [])
+    ids = rag.retrieve_ids("Does trample work?", index_version="v1")
+
+    def release(version, suffix, stamp):
+        publish(tmp_path, version, suffix)
+        os.utime(tmp_path / "manifest.json", ns=(stamp, stamp))
+        assert rag.check_for_update(wait=True) == version
+
+    # Two releases land while the request is in flight: v1 is evicted (INDEX_RETAIN = 2)
+    release("v2", "(2025)", 1)
+    release("v3", "(2026)", 2)
+    with pytest.raises(IndexVersionGone):
+        rag.get_chunks(ids, index_version="v1")
+
+    class SwapDuringRetrieval:
+        """Publishes v4 and v5 while the first retrieval (pinned to v3) runs."""
+        def __init__(self):
+            self.pinned = []
+
+        def __getattr__(self, name):
+            return getattr(rag, name)
+
+        def retrieve_ids(self, query, history=None, index_version=None):
+            self.pinned.append(index_version)
+            result = rag.retrieve_ids(query, history, index_version=index_version)
+            if len(self.pinned) == 1:
+                release("v4", "(2027)", 3)
+                release("v5", "(2028)", 4)
+            return result
+
+    wrapped = SwapDuringRetrieval()
+    controller = ChatController(None, wrapped, None, None, None, None)
+    ctx = {"timings": {}}
+    chunks = controller._run(controller._retrieve("Does trample work?", [], ctx), ctx)
+    assert wrapped.pinned == ["v3", "v5"]
+    assert chunks[0]["text"] == "702.19 Trample (2028)"
+
+
+def test_failed_load_keeps_serving_current_index(tmp_path):
+    publish(tmp_path, "v1", "(2024)")
+    rag = make_service(tmp_path, [])
+    path = publish(tmp_path, "v2", "(2025)")
+    os.remove(path)
+    os.utime(tmp_path / "manifest.json", ns=(1, 1))
+
+    rag.check_for_update(wait=True)
+    assert rag.index_version == "v1"
+    assert rag.status()["last_error"].startswith("v2")
+
+
+def test_admin_routes_are_denied_without_a_configured_token(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    import backend.app.api.endpoints as endpoints
+    from backend.app.main import app
+    from backend.app.dependencies import get_rag_service
+
+    publish(tmp_path, "v1", "(2024)")
+    rag = make_service(tmp_path, [])
+    app.dependency_overrides[get_rag_service] = lambda: rag
+    try:
+        client = TestClient(app)
+        monkeypatch.setattr(endpoints, "ADMIN_TOKEN", None)
+        assert client.get("/api/admin/index").status_code == 403
+        assert client.post("/api/admin/index/reload", headers={"X-Admin-Token": ""}).status_code == 403
+
+        monkeypatch.setattr(endpoints, "ADMIN_TOKEN", "s3cret")
+        assert client.get("/api/admin/index", headers={"X-Admin-Token": "wrong"}).status_code == 403
+        resp = client.get("/api/admin/index", headers={"X-Admin-Token": "s3cret"})
+        assert resp.status_code == 200 and resp.json()["active"] == "v1"
+    finally:
+        app.dependency_overrides.clear()
@@ -0,0 +1,44 @@
+import sys
+import os
+import asyncio
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from src.load_tester import LoadTest, stand_in_app, summarize, parse_server_timing, stand_in_latency
+
+
+def test_parse_server_timing():
+    assert parse_server_timing("classify;dur=12.5, llm;desc=\"groq\";dur=300, total;dur=320.1") == \
+        {"classify": 12.5, "llm": 300.0, "total": 320.1}
+    assert parse_server_timing(None) == {}
+
+
+def test_stand_in_latencies_are_reproducible():
+    assert stand_in_latency(0.3, "completion", "q") == stand_in_latency(0.3, "completion", "q")
+    assert stand_in_latency(0.3, "completion", "q") != stand_in_latency(0.3, "completion", "other q")
+
+
+def test_open_loop_reports_latency_and_stage_breakdown():
+    from backend.app.main import app
+
+    async def run():
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://load-test")
+        async with client:
+            test = LoadTest(client, seed=7)
+            wall = await test.open_loop(rate=200, total=40)
+        return summarize(test.results, wall, 200, test.peak_in_flight)
+
+    stand_in_app(llm_latency=0.02, http_latency=0.005, encode_latency=0.001)
+    try:
+        report = asyncio.run(run())
+    finally:
+        app.dependency_overrides.clear()
+
+    assert report["requests"] == 40 and report["error_rate"] == 0.0
+    assert report["peak_in_flight"] > 1  # arrivals did not wait for earlier responses
+    assert report["latency_s"]["p50"] <= report["latency_s"]["p95"] <= report["latency_s"]["p99"]
+    assert "rules" in report["intents"]
+    assert {"classify", "total"} <= set(report["stages_ms"])
+    assert report["stages_ms"]["total"]["count"] == 40
@@ -0,0 +1,134 @@
+import sys
+import os
+import datetime
+import numpy as np
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.app.services.price_history import PriceHistoryStore
+from backend.app.services.market import MarketIntelligenceService
+
+DAY = datetime.date(2025, 1, 1)
+
+
+def card(print_id, eur, name="Sol Ring", usd=None):
+    return {"id": print_id, "name": name, "set": "cmm", "legalities": {"commander": "legal", "modern": "not_legal"},
+            "prices": {"eur": None if eur is None else str(eur), "eur_foil": None, "usd": usd, "usd_foil": None}}
+
+
+def build_store(path, days=40):
+    store = PriceHistoryStore(str(path))
+    for d in range(days):
+        cards = [card("a", 1 + d * 0.1), card("b", None if d % 5 == 0 else 3.0), card("x", 9.0, name="Other")]
+        if d >= 30:
+            cards.append(card("c", 2.0))  # new print, appended after the existing ones
+        store.append_snapshot(cards, day=DAY + datetime.timedelta(days=d))
+    return store
+
+
+def test_append_only_columns_and_windows(tmp_path):
+    store = build_store(tmp_path)
+    assert len(store) == 40 and store.ids == ["a", "b", "x", "c"]
+    assert list(store.widths[:2]) == [3, 3] and store.widths[-1] == 4
+    # Re-running the same day is a no-op
+    assert store.append_snapshot([card("a", 99)], day=DAY + datetime.timedelta(days=39)) == 0
+
+    days, matrix = store.window(store.indices(["a", "c"]), days=15)
+    assert matrix.shape == (15, 2)
+    assert np.isnan(matrix[:5, 1]).all() and (matrix[5:, 1] == 2.0).all()
+    assert np.isclose(matrix[-1, 0], 4.9)
+
+    # A fresh reader (memory-mapped) sees the same data; a crash-appended tail is ignored
+    with open(os.path.join(tmp_path, "eur.f4"), "ab") as f:
+        np.asarray([123.0], dtype=np.float32).tofile(f)
+    reopened = PriceHistoryStore(str(tmp_path))
+    assert reopened.card_stats(name="Other")["avg_90d"] == 9.0
+    reopened.append_snapshot([card("a", 5.0)], day=DAY + datetime.timedelta(days=40))
+    assert reopened.window(reopened.indices(["a"]), days=2)[1][:, 0].tolist() == [np.float32(4.9), 5.0]
+
+
+def test_reload_publishes_a_new_state_without_touching_the_held_one(tmp_path):
+    store = build_store(tmp_path, days=3)
+    held = store.snapshot()
+    store.append_snapshot([card("a", 7.0), card("d", 1.0)], day=DAY + datetime.timedelta(days=3))
+
+    assert store.snapshot() is not held and len(store) == 4 and store.ids == ["a", "b", "x", "d"]
+    # A reader still holding the previous state gets a consistent view of 3 days and 3 prints
+    assert len(held["days"]) == 3 and held["ids"] == ["a", "b", "x"]
+    days, matrix = store.window(np.arange(4), days=10, state=held)
+    assert len(days) == 3 and np.isnan(matrix[:, 3]).all()
+    assert store.latest([0])[0] == np.float32(7.0)
+
+
+def test_card_stats_feed_market_service(tmp_path):
+    store = build_store(tmp_path)
+    stats = store.card_stats(print_ids=["a"])
+    assert stats["avg_7d"] == round(np.mean([1 + d * 0.1 for d in range(33, 40)]), 2)
+    assert stats["history_days"] == 40 and len(stats["trend"]) == 30
+    assert stats["volatility_30d"] > 0
+
+    market = MarketIntelligenceService(None, history=store)
+    versions = [{"id": "a", "prices": {"eur": "4.9"}}, {"id": "b", "prices": {"eur": "3.0"}}]
+    result = market.get_card_stats("Sol Ring", versions)
+    assert result["last_30d_avg"] != "N/A" and result["trend_graph"].startswith("[")
+    assert "Price History (40 days" in result["source"]
+
+    empty = MarketIntelligenceService(None, history=PriceHistoryStore(str(tmp_path / "none")))
+    assert empty.get_card_stats("Sol Ring", versions)["last_30d_avg"] == "N/A"
+
+
+def test_market_movers_precomputed_per_format(tmp_path):
+    store = PriceHistoryStore(str(tmp_path))
+    legal_modern = {"modern": "legal", "commander": "legal"}
+    for d in range(10):
+        cards = [
+            dict(card("up1", 10 + d), legalities=legal_modern),             # +7€ over the week
+            dict(card("up2", 10 + d * 0.5, name="Sol Ring"), legalities={}),  # second print: same card
+            dict(card("dn", 20 - d, name="Ragavan"), legalities=legal_modern),
+            card("cheap", 0.1 * (d + 1), name="Bulk"),                        # +700% but under the minimum
+            card("thin", None if d % 2 else 50 + d * 5, name="Rare Listing"),  # illiquid
+        ]
+        store.append_snapshot(cards, day=DAY + datetime.timedelta(days=d))
+
+    market = MarketIntelligenceService(None, history=store)
+    movers = market.get_market_movers()
+    assert movers["days"] == 7
+    assert [m["id"] for m in movers["gainers_abs"]] == ["up1"]  # one print per card, the best one
+    assert movers["gainers_abs"][0]["change"] == 7.0
+    assert [m["name"] for m in movers["losers_pct"]] == ["Ragavan"]
+    assert market.get_market_movers("legacy")["gainers_abs"] == []
+    assert "Ragavan" in market.movers_context("What is moving in Modern?")
+
+
+class FixedCardTrader:
+    def __init__(self, prices):
+        self.prices = prices
+
+    def get_nm_prices(self, scryfall_ids):
+        return np.array([self.prices.get(i, np.nan) for i in scryfall_ids], dtype=np.float64)
+
+    def get_nm_price(self, scryfall_id):
+        return f"{self.prices[scryfall_id]}€" if scryfall_id in self.prices else "N/A"
+
+
+def test_batch_arbitrage_keeps_prices_numeric(tmp_path):
+    store = build_store(tmp_path)  # latest eur: a 4.9, b 3.0, x 9.0, c 2.0
+    market = MarketIntelligenceService(FixedCardTrader({"a": 6.0, "x": 9.5, "c": 1.0}), history=store)
+
+    cards = ["a", "Other", {"name": "Sol Ring"}, {"id": "b", "cm": 2.5}, "Unknown Card"]
+    result = market.analyze_batch(cards)
+    # "Sol Ring" resolves to its cheapest print (c at 2.0€)
+    assert result["id"].tolist() == ["a", "x", "c", "b", ""]
+    assert np.allclose(result["cm"][:4], [4.9, 9.0, 2.0, 2.5])
+    assert result["rating"].tolist() == ["High", "Normal", "High", "N/A", "N/A"]
+    assert np.isnan(result["pct"][3]) and np.isnan(result["avg_30d"][4])
+    assert np.isclose(result["avg_7d"][1], 9.0) and result["volatility_30d"][0] > 0
+
+    from backend.app.services.market import batch_records
+    rows = batch_records(result)
+    assert rows[2]["pct"] == -50.0 and rows[4]["cm"] is None and rows[4]["name"] == "Unknown Card"
+
+    # The single-card path shares the vectorized math
+    assert market.analyze_arbitrage("Sol Ring", "5.5€", "a")["rating"] == "Normal"
+    assert market.analyze_arbitrage("Sol Ring", "N/A", "a") is None
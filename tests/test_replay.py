@@ -0,0 +1,108 @@
+import sys
+import os
+import json
+import subprocess
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+import requests
+from fake_services import FakeSettings, create_app, service_env
+from src.cassette import Cassette, CassetteMiss, request_key
+from src.replay import load_conversations
+from tests.test_fake_services import ROOT, serve
+
+# Runs in a fresh interpreter: config reads the base URLs from the environment at import time
+SESSION_SCRIPT = r"""
+import json, os, sys
+from src.load_tester import StandInRAG
+from src.replay import load_conversations, record, replay
+
+mode, session_dir, log = sys.argv[1:4]
+rag = StandInRAG(latency=0)
+if mode == "record":
+    rows = record(load_conversations([log]), session_dir, rag=rag, groq_key="fake-groq-key",
+                  cardtrader_key="fake-cardtrader-token")
+    print(json.dumps({"errors": [r["error"] for r in rows if r["error"]], "intents": [r["intent"] for r in rows]}))
+else:
+    print(json.dumps(replay(session_dir, rag=rag, repeat=2, allocations=True, strict=True)))
+"""
+
+LOG = [
+    {"timestamp": "2025-12-19T10:00:00", "query": "Does Blood Moon stop Urza's Saga?", "model": "llama-3.1-8b-instant"},
+    {"timestamp": "2025-12-19T10:01:00", "query": "And what is Blood Moon worth?", "model": "llama-3.1-8b-instant"},
+    {"timestamp": "2025-12-19T10:02:00", "query": "Show me all printings of Sol Ring", "model": "llama-3.3-70b-versatile"},
+    {"timestamp": "2025-12-19T10:02:30", "query": "1", "model": "llama-3.1-8b-instant"},
+    {"timestamp": "2025-12-19T18:00:00", "query": "Who are you?", "model": "fast"},
+]
+
+
+def run_session(mode, session_dir, log, env):
+    out = subprocess.run([sys.executable, "-c", SESSION_SCRIPT, mode, session_dir, log], cwd=ROOT, env=env,
+                         capture_output=True, text=True, timeout=180)
+    assert out.returncode == 0, out.stderr
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def test_record_then_replay_offline(tmp_path):
+    log = tmp_path / "interactions.jsonl"
+    log.write_text("".join(json.dumps(e) + "\n" for e in LOG), encoding="utf-8")
+    session_dir = str(tmp_path / "session")
+
+    server, base_url = serve(create_app(FakeSettings(latency=0, token_rate=0, http_latency=0)))
+    env = {**os.environ, **service_env(base_url)}
+    try:
+        recorded = run_session("record", session_dir, str(log), env)
+    finally:
+        server.should_exit = True
+    assert recorded["errors"] == []
+    assert recorded["intents"] == ["rules", "market", "versions", "versions", "meta"]
+
+    # Same URLs, server stopped: every exchange must come from the cassette
+    report = run_session("replay", session_dir, str(log), env)
+
+    assert report["messages"] == 10 and report["passes"] == 2
+    assert report["errors"] == {} and report["divergent"] == 0
+    assert report["cassette"]["misses"] == 0 and report["cassette"]["fuzzy"] == 0
+    assert {"classify", "extract", "card_data", "retrieve", "llm", "prices"} <= set(report["stages_ms"])
+    assert report["cpu_ms"]["p50"] > 0 and report["allocations_kib"]["peak"]["p50"] > 0
+
+
+def test_conversations_split_on_gaps_and_models(tmp_path):
+    log = tmp_path / "interactions.jsonl"
+    log.write_text("".join(json.dumps(e) + "\n" for e in LOG) + "not json\n" + json.dumps({"query": " "}) + "\n",
+                   encoding="utf-8")
+    conversations = load_conversations([str(log)], gap=600)
+    assert [len(c["turns"]) for c in conversations] == [4, 1]
+    assert [t["smart_mode"] for t in conversations[0]["turns"]] == [False, False, True, False]
+    assert load_conversations([str(log)], gap=600, limit=1)[0]["id"] == 0
+
+
+def test_cassette_matching(tmp_path):
+    path = str(tmp_path / "cassette.jsonl")
+    server, base_url = serve(create_app(FakeSettings(latency=0, token_rate=0, http_latency=0)))
+    try:
+        with Cassette(path, mode="record"):
+            first = requests.get(f"{base_url}/scryfall/cards/named", params={"exact": "Sol Ring"}).json()
+            requests.get(f"{base_url}/scryfall/cards/named", params={"exact": "Blood Moon"})
+    finally:
+        server.should_exit = True
+
+    # Query order and JSON key order do not change the fingerprint
+    assert request_key("GET", "http://x/a?b=1&a=2") == request_key("get", "http://x/a?a=2&b=1")
+    assert request_key("POST", "http://x/a", b'{"a": 1, "b": 2}') == request_key("POST", "http://x/a", '{"b":2,"a":1}')
+
+    cassette = Cassette(path, mode="replay")
+    with cassette:
+        assert requests.get(f"{base_url}/scryfall/cards/named", params={"exact": "Sol Ring"}).json() == first
+        assert requests.get(f"{base_url}/scryfall/cards/named", params={"exact": "Sol Ring"}).json() == first  # again
+        # Unknown query: next unplayed exchange of the same endpoint
+        assert requests.get(f"{base_url}/scryfall/cards/named", params={"exact": "Nope"}).json()["name"] == "Blood Moon"
+        with pytest.raises(CassetteMiss):
+            requests.get(f"{base_url}/scryfall/cards/search")
+    assert cassette.stats == {"recorded": 0, "hits": 2, "fuzzy": 1, "misses": 1}
+
+    with Cassette(path, mode="replay", strict=True) as strict:
+        with pytest.raises(CassetteMiss):
+            strict.play("GET", f"{base_url}/scryfall/cards/named?exact=Nope")
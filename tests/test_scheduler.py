@@ -0,0 +1,117 @@
+import sys
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.app.services.scheduler import (
+    RateLimitScheduler, RateLimitExceeded, estimate_tokens, parse_duration,
+    PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
+)
+
+LIMITS = {"8b": {"rpm": 600, "tpm": 1000}}
+
+
+def test_estimate_and_durations():
+    messages = [{"role": "system", "content": "x" * 400}, {"role": "user", "content": "y" * 40}]
+    assert estimate_tokens(messages, max_tokens=100) == 100 + 10 + 4 + 100 + 4
+    assert parse_duration("7.66s") == pytest.approx(7.66)
+    assert parse_duration("2m59.5s") == pytest.approx(179.5)
+    assert parse_duration("120ms") == pytest.approx(0.12)
+    assert parse_duration("3") == 3
+
+
+def test_rejects_early_instead_of_overrunning_quota():
+    scheduler = RateLimitScheduler(LIMITS, max_wait={0: 0.5, 2: 0.5})
+    with pytest.raises(RateLimitExceeded, match="Request too large"):
+        scheduler.acquire("8b", 5000)
+
+    scheduler.acquire("8b", 990)
+    # Refill is 1000 tokens/min: 500 more tokens would take ~30s
+    with pytest.raises(RateLimitExceeded, match="rate_limit_exceeded"):
+        scheduler.acquire("8b", 500)
+
+
+def test_server_headers_tighten_the_bucket():
+    scheduler = RateLimitScheduler(LIMITS, max_wait={0: 0.5})
+    scheduler.observe("8b", {"x-ratelimit-remaining-tokens": "10"})
+    with pytest.raises(RateLimitExceeded):
+        scheduler.acquire("8b", 500)
+
+    # Remaining requests are synced too (Groq reports the daily request quota)
+    scheduler = RateLimitScheduler(LIMITS, max_wait={0: 0.05})  # 600 rpm: one request refills in 0.1s
+    scheduler.observe("8b", {"x-ratelimit-remaining-requests": "0"})
+    with pytest.raises(RateLimitExceeded):
+        scheduler.acquire("8b", 1)
+
+    scheduler = RateLimitScheduler(LIMITS, max_wait={0: 0.5})
+    scheduler.penalize("8b", {"retry-after": "30"})
+    with pytest.raises(RateLimitExceeded):
+        scheduler.acquire("8b", 1)
+
+
+def test_interactive_requests_jump_the_queue():
+    # 6000 tokens/min = 100 tokens/s
+    scheduler = RateLimitScheduler({"8b": {"rpm": 6000, "tpm": 6000}}, max_wait={0: 5, 2: 5})
+    scheduler.acquire("8b", 6000)  # drain the bucket
+    order = []
+
+    def worker(priority, name):
+        scheduler.acquire("8b", 10, priority)
+        order.append(name)
+
+    background = threading.Thread(target=worker, args=(PRIORITY_BACKGROUND, "background"))
+    background.start()
+    time.sleep(0.02)
+    interactive = threading.Thread(target=worker, args=(PRIORITY_INTERACTIVE, "interactive"))
+    interactive.start()
+    background.join()
+    interactive.join()
+
+    assert order == ["interactive", "background"]
+
+
+class FakeStreamClient:
+    """Stands in for Groq's raw-response API: streams `deltas`, then a final chunk carrying `usage`."""
+
+    def __init__(self, deltas, usage=None):
+        chunks = [SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=d))], usage=None, x_groq=None)
+                  for d in deltas]
+        if usage is not None:
+            chunks.append(SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=None))], usage=None,
+                                          x_groq=SimpleNamespace(usage=SimpleNamespace(total_tokens=usage))))
+        stream = type("Stream", (), {"__iter__": lambda self: iter(chunks), "close": lambda self: None})()
+        raw = SimpleNamespace(headers={}, parse=lambda: stream)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(
+            with_raw_response=SimpleNamespace(create=lambda **kwargs: raw)))
+
+
+def test_streamed_completions_settle_their_reservation():
+    from backend.app.services.llm import LLMService
+
+    messages = [{"role": "user", "content": "x" * 400}]
+    reserved = estimate_tokens(messages, 500)
+
+    def tokens_left(deltas, usage=None, consume=None):
+        scheduler = RateLimitScheduler(LIMITS, max_wait={0: 0.5})
+        llm = LLMService("test-key", scheduler=scheduler)
+        llm.client = FakeStreamClient(deltas, usage)
+        stream = llm.stream_completion("8b", messages, max_tokens=500)
+        for _ in range(consume if consume is not None else len(deltas) + 1):
+            next(stream, None)
+        stream.close()
+        state = scheduler._models["8b"].tokens
+        state.rate = 0  # freeze the refill so only the settlement shows
+        return state.level
+
+    # Usage reported on the final chunk refunds the rest of the max_tokens reservation
+    assert tokens_left(["Blood ", "Moon"], usage=150) == pytest.approx(1000 - 150, abs=1)
+    # No usage (abandoned after the first delta): estimated from the prompt and the streamed text
+    left = tokens_left(["a" * 40, "b" * 400], consume=1)
+    assert left == pytest.approx(1000 - (estimate_tokens(messages) + 10), abs=1)
+    assert left > 1000 - reserved
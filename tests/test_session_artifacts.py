@@ -0,0 +1,53 @@
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.app.services.chat_controller import ChatController
+from tests.chat_fakes import FakeLLM, FakeRAG, FakeCards
+
+
+def test_retry_and_follow_ups_reuse_session_artifacts():
+    class CountingLLM(FakeLLM):
+        def __init__(self):
+            super().__init__()
+            self.calls = []
+
+        def classify_intent(self, query, history=[]):
+            self.calls.append("intent")
+            return "retry" if query == "try again" else "rules"
+
+        def extract_cards(self, query, history=[]):
+            self.calls.append("extract")
+            return ["Blood Moon"]
+
+    class CountingRAG(FakeRAG):
+        retrievals = 0
+
+        def retrieve_ids(self, query, history=None, index_version=None):
+            self.retrievals += 1
+            return [0]
+
+    class CountingCards(FakeCards):
+        fetches = 0
+
+        def get_card_data(self, card_names):
+            self.fetches += 1
+            return FakeCards.get_card_data(self, card_names)
+
+    llm, rag, cards = CountingLLM(), CountingRAG(), CountingCards()
+    controller = ChatController(llm, rag, cards, None, None, None)
+    query = "How does Blood Moon interact with Urza's Saga?"
+    first = controller.process_message(query, [])
+    history = [query, first["response"]]
+
+    llm.calls.clear()
+    retry = controller.process_message("try again", history, context=first["context"])
+    # Only 'try again' itself is classified; cards, card data and chunks come from the session
+    assert llm.calls == ["intent"]
+    assert (llm.completions, cards.fetches, rag.retrievals) == (2, 1, 1)
+    assert retry["response"] == first["response"]
+
+    controller.process_message("What if my opponent also controls Blood Moon?", history, context=retry["context"])
+    assert (cards.fetches, rag.retrievals) == (1, 2)
@@ -0,0 +1,63 @@
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.app.services.session_store import (
+    MemorySessionStore, SQLiteSessionStore, new_session_state, append_turn
+)
+
+
+def test_memory_store_is_lru_and_ttl_bounded():
+    store = MemorySessionStore(max_size=2, ttl=60)
+    store.save("a", new_session_state(["q"], {"cards": ["Blood Moon"]}))
+    store.save("b", new_session_state())
+    store.get("a")  # touch: 'b' is now the oldest
+    store.save("c", new_session_state())
+    assert store.get("b") is None
+    assert store.get("a")["context"]["cards"] == ["Blood Moon"]
+
+    store.ttl = -1
+    assert store.get("a") is None
+
+
+def test_memory_store_returns_copies():
+    store = MemorySessionStore()
+    store.save("a", new_session_state())
+    state = store.get("a")
+    append_turn(state, "q", "r")
+    state["context"]["cards"] = ["Tarmogoyf"]
+    assert store.get("a") == new_session_state()
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    writer, reader = SQLiteSessionStore(path), SQLiteSessionStore(path)
+    state = new_session_state(context={"cards": ["Urza's Saga"], "active_versions": [{"id": "x"}]})
+    for i in range(6):
+        append_turn(state, f"q{i}", f"r{i}")
+    writer.save("s1", state)
+
+    loaded = reader.get("s1")
+    assert loaded["context"]["cards"] == ["Urza's Saga"]
+    assert loaded["history"] == ["q2", "r2", "q3", "r3", "q4", "r4", "q5", "r5"]
+
+    writer.delete("s1")
+    assert reader.get("s1") is None
+
+
+def test_update_merges_into_the_stored_state(tmp_path):
+    def add_price(state):
+        state["context"]["ct_prices"] = {**state["context"].get("ct_prices", {}), "print-6": "6.00€"}
+
+    for store in (MemorySessionStore(), SQLiteSessionStore(str(tmp_path / "sessions.db"))):
+        assert store.update("missing", add_price) is None and store.get("missing") is None
+        store.save("s1", new_session_state(["q1", "r1"], {"cards": ["Blood Moon"]}))
+        stale = store.get("s1")
+        # A turn is saved between a reader's get() and its write: update() applies to the newer state
+        store.save("s1", append_turn(store.get("s1"), "q2", "r2"))
+        store.update("s1", add_price)
+        state = store.get("s1")
+        assert state["history"] == ["q1", "r1", "q2", "r2"] and stale["history"] == ["q1", "r1"]
+        assert state["context"] == {"cards": ["Blood Moon"], "ct_prices": {"print-6": "6.00€"}}
@@ -0,0 +1,44 @@
+import sys
+import os
+import json
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tests.chat_fakes import ANSWER, make_controller, make_async_controller
+
+
+def test_stream_emits_meta_then_tokens_then_done():
+    controller = make_controller()
+    events = list(controller.process_message_stream("How does Blood Moon work?", []))
+
+    assert events[0]["event"] == "meta"
+    assert events[0]["intent"] == "rules"
+    assert "https://img/Blood Moon.jpg" in events[0]["image"]
+    tokens = [e["content"] for e in events if e["event"] == "token"]
+    assert len(tokens) > 1 and "".join(tokens) == ANSWER
+    assert events[-1]["event"] == "done"
+    assert events[-1]["response"] == events[0]["image"] + ANSWER
+
+
+def test_stream_matches_blocking_response():
+    blocking = make_controller().process_message("How does Blood Moon work?", [])
+    streamed = list(make_controller().process_message_stream("How does Blood Moon work?", []))[-1]
+    assert streamed["response"] == blocking["response"]
+    assert streamed["context"]["cards"] == blocking["context"]["cards"]
+
+
+def test_sse_endpoint():
+    from fastapi.testclient import TestClient
+    from backend.app.main import app
+    from backend.app.dependencies import get_chat_controller
+
+    app.dependency_overrides[get_chat_controller] = make_async_controller
+    try:
+        resp = TestClient(app).post("/api/chat/stream", json={"query": "How does Blood Moon work?"})
+    finally:
+        app.dependency_overrides.clear()
+
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    events = [json.loads(line[len("data: "):]) for line in resp.text.splitlines() if line.startswith("data: ")]
+    assert [events[0]["event"], events[-1]["event"]] == ["meta", "done"]
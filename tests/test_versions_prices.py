@@ -0,0 +1,153 @@
+import sys
+import os
+import asyncio
+import threading
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.app.services.chat_controller import AsyncChatController
+from tests.chat_fakes import AsyncFakeLLM, AsyncFakeRAG, AsyncFakeCards
+
+
+def test_versions_menu_prices_are_fetched_concurrently_and_late_ones_land_in_the_session(monkeypatch):
+    import backend.app.services.chat_controller as chat_controller
+    from backend.app.services.session_store import MemorySessionStore, new_session_state
+    monkeypatch.setattr(chat_controller, "CT_PRICE_DEADLINE", 0.05)
+
+    versions = [{"id": f"print-{i}", "name": "Blood Moon", "set_name": f"Set {i}", "set": f"s{i}",
+                 "rarity": "rare", "prices": {"eur": "N/A"}} for i in range(1, 7)]
+
+    class VersionsLLM(AsyncFakeLLM):
+        async def generate_search_query(self, query, history=[]):
+            return '!"Blood Moon"'
+
+    class VersionsCards(AsyncFakeCards):
+        async def get_card_versions(self, query):
+            return versions
+
+    class GatedCardTrader:
+        """print-6 only answers once released; the others answer once all six are in flight."""
+        def __init__(self):
+            self.calls = []
+            self.in_flight = self.max_in_flight = 0
+            self.all_started = asyncio.Event()
+            self.release = asyncio.Event()
+
+        async def get_nm_price(self, scryfall_id):
+            self.calls.append(scryfall_id)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            if len(self.calls) == len(versions):
+                self.all_started.set()
+            await (self.release if scryfall_id == "print-6" else self.all_started).wait()
+            self.in_flight -= 1
+            return f"{scryfall_id[-1]}.00€"
+
+    class WatchedStore(MemorySessionStore):
+        def __init__(self):
+            super().__init__()
+            self.updated = threading.Event()
+
+        def update(self, session_id, fn):
+            # Off the event loop: the real store may block
+            assert not self._on_event_loop()
+            try:
+                return super().update(session_id, fn)
+            finally:
+                self.updated.set()
+
+        @staticmethod
+        def _on_event_loop():
+            try:
+                asyncio.get_running_loop()
+                return True
+            except RuntimeError:
+                return False
+
+    sessions = WatchedStore()
+    cardtrader = GatedCardTrader()
+    controller = AsyncChatController(VersionsLLM(intent="versions"), AsyncFakeRAG(), VersionsCards(), None, cardtrader, None,
+                                     session_store=sessions)
+
+    async def conversation():
+        menu = await controller.process_message("Show me versions of Blood Moon", [], session_id="s1")
+        menu["context"].pop("timings")
+        sessions.save("s1", new_session_state(["Show me versions of Blood Moon", menu["response"]], menu["context"]))
+        late = controller._price_fetches["print-6"]
+        cardtrader.release.set()
+        await late
+        assert await asyncio.to_thread(sessions.updated.wait, 5)
+        state = sessions.get("s1")
+        calls = len(cardtrader.calls)
+        report = await controller.process_message("6", state["history"], context=state["context"], session_id="s1")
+        return menu, state, report, calls
+
+    menu, state, report, calls = asyncio.run(conversation())
+    # All six lookups ran at once; the menu answered without the slow one
+    assert cardtrader.max_in_flight == 6
+    assert "Lowest found: 1.0€ on Cardtrader" in menu["response"]
+    # The late price was written into the stored session and the report read it from there
+    assert state["context"]["ct_prices"]["print-6"] == "6.00€"
+    assert "6.0€ (Cardtrader)" in report["response"]
+    assert len(cardtrader.calls) == calls == 6
+    # Finished lookups are not kept: the controller only dedupes the ones in flight
+    assert controller._price_fetches == {}
+
+
+def test_concurrent_menus_join_the_lookup_in_flight():
+    started = []
+
+    class BlockingCardTrader:
+        def __init__(self):
+            self.release = asyncio.Event()
+
+        async def get_nm_price(self, scryfall_id):
+            started.append(scryfall_id)
+            await self.release.wait()
+            return "3.00€"
+
+    cardtrader = BlockingCardTrader()
+    controller = AsyncChatController(AsyncFakeLLM(), AsyncFakeRAG(), AsyncFakeCards(), None, cardtrader, None)
+
+    async def lookups():
+        first, second = controller._fetch_price("abc"), controller._fetch_price("abc")
+        cardtrader.release.set()
+        await asyncio.gather(first, second)
+        joined = len(started)
+        await asyncio.sleep(0)
+        third = controller._fetch_price("abc")
+        await third
+        return first, second, third, joined
+
+    first, second, third, joined = asyncio.run(lookups())
+    # One lookup for both menus; once finished, the next menu asks again (CardTraderService caches prices)
+    assert first is second and joined == 1
+    assert third is not first and len(started) == 2
+
+
+def test_menu_price_lookups_are_bounded(monkeypatch):
+    import backend.app.services.chat_controller as chat_controller
+    monkeypatch.setattr(chat_controller, "CT_PRICE_WORKERS", 2)
+
+    class CountingCardTrader:
+        def __init__(self):
+            self.in_flight = self.max_in_flight = 0
+
+        async def get_nm_price(self, scryfall_id):
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            await asyncio.sleep(0.01)
+            self.in_flight -= 1
+            return "1.00€"
+
+    cardtrader = CountingCardTrader()
+    controller = AsyncChatController(AsyncFakeLLM(), AsyncFakeRAG(), AsyncFakeCards(), None, cardtrader, None)
+
+    async def lookups():
+        fetches = [controller._fetch_price(f"print-{i}") for i in range(5)]
+        return await asyncio.gather(*fetches)
+
+    assert asyncio.run(lookups()) == ["1.00€"] * 5
+    # A 60-print menu cannot use up the CardTrader rate limit on its own
+    assert cardtrader.max_in_flight == 2